@@ -39,7 +39,10 @@ INSERT INTO Reservation (heureDebut, heureFin, noSalle, noPersonne, nombrePerson
 INSERT INTO Capteur (nom, type) VALUES
   ('PIR-1', 'MOUVEMENT'),
   ('MIC-1', 'BRUIT'),
-  ('CAM-1', 'CAMERA');
+  ('CAM-1', 'CAMERA'),
+  ('AUD-1', 'AUDIO'),
+  ('TMP-1', 'TEMPERATURE'),
+  ('AIR-1', 'CO2');
 
 -- ──────────────
 -- Donnees
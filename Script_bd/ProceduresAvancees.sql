@@ -416,12 +416,19 @@ BEGIN
          WHERE d.noSalle = @IdSalle
          AND d.dateHeure BETWEEN @DateDebut AND @DateFin
          AND e.type = 'BRUIT_FORT') AS NbIncidentsBruit,
-        -- Niveau de bruit moyen
-        (SELECT AVG(d.mesure) FROM Donnees d
-         JOIN Capteur c ON c.idCapteur_PK = d.idCapteur
-         WHERE d.noSalle = @IdSalle
+        -- Niveau de bruit moyen et Leq (agrégats par quart d'heure, pas les mesures brutes)
+        (SELECT SUM(a.moyenne * a.nbMesures) / NULLIF(SUM(a.nbMesures), 0)
+         FROM AgregatQuartHeure a
+         JOIN Capteur c ON c.idCapteur_PK = a.idCapteur
+         WHERE a.noSalle = @IdSalle
+         AND c.type = 'BRUIT'
+         AND a.debut BETWEEN @DateDebut AND @DateFin) AS NiveauBruitMoyen,
+        (SELECT 10 * LOG10(SUM(a.nbMesures * POWER(10.0, a.leq / 10)) / NULLIF(SUM(a.nbMesures), 0))
+         FROM AgregatQuartHeure a
+         JOIN Capteur c ON c.idCapteur_PK = a.idCapteur
+         WHERE a.noSalle = @IdSalle
          AND c.type = 'BRUIT'
-         AND d.dateHeure BETWEEN @DateDebut AND @DateFin) AS NiveauBruitMoyen,
+         AND a.debut BETWEEN @DateDebut AND @DateFin) AS LeqBruit,
         -- Taux d'occupation (%)
         ROUND(
             (SUM(DATEDIFF(MINUTE, r.heureDebut, r.heureFin)) * 100.0)
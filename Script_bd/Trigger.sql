@@ -162,6 +162,20 @@ BEGIN
         RETURN;
     END
 
+    -- Vérifier capteur AUDIO : clip (BLOB) obligatoire, pas de mesure
+    IF EXISTS (
+        SELECT 1
+        FROM inserted i
+        JOIN Capteur c ON c.idCapteur_PK = i.idCapteur
+        WHERE c.type = 'AUDIO'
+          AND (i.photoBlob IS NULL OR i.mesure IS NOT NULL)
+    )
+    BEGIN
+        RAISERROR('Un capteur AUDIO doit avoir un clip (BLOB) et pas de mesure', 16, 1);
+        ROLLBACK TRANSACTION;
+        RETURN;
+    END
+
     -- Vérifier plage de mesure pour capteur BRUIT (0-120 dB)
     IF EXISTS (
         SELECT 1
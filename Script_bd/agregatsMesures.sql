@@ -0,0 +1,47 @@
+/* ============================================================
+   AGRÉGATS DES MESURES - SalleSense
+   ============================================================
+   À 1 mesure/seconde, Donnees reçoit 86 400 lignes par jour et
+   par micro. Les Raspberry Pi calculent aussi des résumés par
+   fenêtre fixe (1 minute et 15 minutes) que le tableau de bord
+   et usp_Statistiques_Salle lisent à la place des lignes brutes.
+   Les niveaux sont en dB: moyenne arithmétique des mesures,
+   leq = moyenne énergétique 10·log10(moyenne(10^(mesure/10))).
+   ============================================================ */
+
+USE Prog3A25_bdSalleSense;
+GO
+
+IF OBJECT_ID('AgregatMinute', 'U') IS NOT NULL DROP TABLE AgregatMinute;
+IF OBJECT_ID('AgregatQuartHeure', 'U') IS NOT NULL DROP TABLE AgregatQuartHeure;
+GO
+
+-- Une ligne par capteur et par minute (debut = début de la fenêtre)
+CREATE TABLE AgregatMinute (
+    noSalle                     INT                         NOT NULL,
+    idCapteur                   INT                         NOT NULL,
+    debut                       DATETIME2                   NOT NULL,
+    nbMesures                   INT                         NOT NULL,
+    minimum                     FLOAT                       NOT NULL,
+    maximum                     FLOAT                       NOT NULL,
+    moyenne                     FLOAT                       NOT NULL,
+    p95                         FLOAT                       NOT NULL,
+    leq                         FLOAT                       NOT NULL,
+    PRIMARY KEY (noSalle, idCapteur, debut)
+);
+GO
+
+-- Une ligne par capteur et par quart d'heure
+CREATE TABLE AgregatQuartHeure (
+    noSalle                     INT                         NOT NULL,
+    idCapteur                   INT                         NOT NULL,
+    debut                       DATETIME2                   NOT NULL,
+    nbMesures                   INT                         NOT NULL,
+    minimum                     FLOAT                       NOT NULL,
+    maximum                     FLOAT                       NOT NULL,
+    moyenne                     FLOAT                       NOT NULL,
+    p95                         FLOAT                       NOT NULL,
+    leq                         FLOAT                       NOT NULL,
+    PRIMARY KEY (noSalle, idCapteur, debut)
+);
+GO
@@ -176,7 +176,7 @@ GO
 ALTER TABLE Capteur
 ADD CONSTRAINT ck_capteur_type_valide
 CHECK (
-    type IN ('MOUVEMENT', 'BRUIT', 'CAMERA', 'TEMPERATURE', 'HUMIDITE', 'CO2')
+    type IN ('MOUVEMENT', 'BRUIT', 'CAMERA', 'AUDIO', 'TEMPERATURE', 'HUMIDITE', 'CO2')
 );
 GO
 
@@ -185,7 +185,9 @@ GO
    DONNEES - Contraintes avancées
    ============================================================ */
 
--- 12) Mesure: plage valide selon type standard (0-200)
+-- 12) Mesure: plage commune à tous les types (-40 °C à 10000 ppm)
+-- La plage de chaque type (BRUIT, TEMPERATURE, HUMIDITE, CO2) est vérifiée par
+-- trg_check_donnees_capteur (contraintesAvancees.sql): un CHECK ne lit pas Capteur
 IF EXISTS (SELECT 1 FROM sys.check_constraints WHERE name = 'ck_donnees_mesure_range')
     ALTER TABLE Donnees DROP CONSTRAINT ck_donnees_mesure_range;
 GO
@@ -194,7 +196,7 @@ ALTER TABLE Donnees
 ADD CONSTRAINT ck_donnees_mesure_range
 CHECK (
     mesure IS NULL
-    OR mesure BETWEEN 0 AND 200
+    OR mesure BETWEEN -40 AND 10000
 );
 GO
 
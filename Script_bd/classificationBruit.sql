@@ -0,0 +1,29 @@
+/* ============================================================
+   CLASSIFICATION DES ÉPISODES DE BRUIT - SalleSense
+   ============================================================
+   Chaque événement BRUIT_FORT (un par épisode) reçoit une classe
+   calculée sur le Pi (caracteristiques_son.py): VOIX, CLAQUEMENT,
+   VENTILATION... avec les caractéristiques moyennes de l'épisode.
+   energiesBandesDb: part de l'énergie de chaque bande en dB,
+   séparées par ';' (bandes 0-250, 250-500, 500-1000, 1000-2000
+   et 2000 Hz-Nyquist).
+   ============================================================ */
+
+USE Prog3A25_bdSalleSense;
+GO
+
+IF OBJECT_ID('ClassificationBruit', 'U') IS NOT NULL DROP TABLE ClassificationBruit;
+GO
+
+CREATE TABLE ClassificationBruit (
+    idEvenement                 INT                         PRIMARY KEY,
+    classe                      NVARCHAR(30)                NOT NULL,
+    confiance                   FLOAT                       NOT NULL,
+    nbFenetres                  INT                         NOT NULL,
+    centroideHz                 FLOAT                       NOT NULL,
+    passagesZero                FLOAT                       NOT NULL,
+    facteurCreteDb              FLOAT                       NOT NULL,
+    energiesBandesDb            NVARCHAR(200)               NOT NULL,
+    FOREIGN KEY (idEvenement) REFERENCES Evenement(idEvenement_PK)
+);
+GO
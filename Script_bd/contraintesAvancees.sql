@@ -140,6 +140,8 @@ GO
    - MOUVEMENT: pas de mesure numérique, pas de photo
    - BRUIT: mesure obligatoire, pas de photo
    - CAMERA: photo obligatoire, pas de mesure
+   - Plage de mesure de chaque type (mêmes bornes que
+     service_adc.PLAGES_MESURE côté Raspberry Pi)
    ============================================================ */
 IF OBJECT_ID('trg_check_donnees_capteur', 'TR') IS NOT NULL
     DROP TRIGGER trg_check_donnees_capteur;
@@ -207,6 +209,48 @@ BEGIN
         ROLLBACK TRANSACTION;
         RETURN;
     END
+
+    -- Vérifier plage de mesure pour capteur TEMPERATURE (-40 à 125 °C)
+    IF EXISTS (
+        SELECT 1
+        FROM inserted i
+        JOIN Capteur c ON c.idCapteur_PK = i.idCapteur
+        WHERE c.type = 'TEMPERATURE'
+          AND (i.mesure < -40 OR i.mesure > 125)
+    )
+    BEGIN
+        RAISERROR('La mesure de température doit être entre -40 et 125 °C', 16, 1);
+        ROLLBACK TRANSACTION;
+        RETURN;
+    END
+
+    -- Vérifier plage de mesure pour capteur HUMIDITE (0-100 %)
+    IF EXISTS (
+        SELECT 1
+        FROM inserted i
+        JOIN Capteur c ON c.idCapteur_PK = i.idCapteur
+        WHERE c.type = 'HUMIDITE'
+          AND (i.mesure < 0 OR i.mesure > 100)
+    )
+    BEGIN
+        RAISERROR('La mesure d''humidité doit être entre 0 et 100 %%', 16, 1);
+        ROLLBACK TRANSACTION;
+        RETURN;
+    END
+
+    -- Vérifier plage de mesure pour capteur CO2 (0-10000 ppm)
+    IF EXISTS (
+        SELECT 1
+        FROM inserted i
+        JOIN Capteur c ON c.idCapteur_PK = i.idCapteur
+        WHERE c.type = 'CO2'
+          AND (i.mesure < 0 OR i.mesure > 10000)
+    )
+    BEGIN
+        RAISERROR('La mesure de CO2 doit être entre 0 et 10000 ppm', 16, 1);
+        ROLLBACK TRANSACTION;
+        RETURN;
+    END
 END;
 GO
 
@@ -0,0 +1,21 @@
+/* ============================================================
+   HASH PERCEPTUEL DES PHOTOS - SalleSense
+   ============================================================
+   Chaque photo reçoit un dHash de 64 bits calculé sur le Pi
+   (hash_perceptuel.py), stocké en BIGINT signé. Deux photos
+   presque identiques ont des hash à faible distance de Hamming:
+   les outils regroupent les doublons sans décoder les JPEG.
+   NULL pour les mesures, vidéos et photos plus anciennes.
+   ============================================================ */
+
+USE Prog3A25_bdSalleSense;
+GO
+
+IF COL_LENGTH('dbo.Donnees','hashPerceptuel') IS NULL
+  ALTER TABLE dbo.Donnees ADD hashPerceptuel BIGINT NULL;
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Donnees_hashPerceptuel')
+  CREATE INDEX IX_Donnees_hashPerceptuel ON dbo.Donnees(hashPerceptuel)
+  WHERE hashPerceptuel IS NOT NULL;
+GO
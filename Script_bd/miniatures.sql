@@ -0,0 +1,25 @@
+/* ============================================================
+   MINIATURES DES PHOTOS ET VIDÉOS - SalleSense
+   ============================================================
+   Chaque photo ou vidéo reçoit, au moment de la capture sur le
+   Pi (miniatures.py), une miniature JPEG (320x180 au plus) et un
+   aperçu minuscule (48x27 au plus). La galerie lit ces quelques
+   KB au lieu de la photo pleine résolution. Pour une vidéo, la
+   miniature est l'image du déclenchement.
+   ============================================================ */
+
+USE Prog3A25_bdSalleSense;
+GO
+
+IF OBJECT_ID('MiniatureDonnee', 'U') IS NOT NULL DROP TABLE MiniatureDonnee;
+GO
+
+CREATE TABLE MiniatureDonnee (
+    idDonnee                    INT                         PRIMARY KEY,
+    miniatureJpeg               VARBINARY(MAX)              NOT NULL,
+    apercuJpeg                  VARBINARY(MAX)              NOT NULL,
+    largeur                     INT                         NOT NULL,
+    hauteur                     INT                         NOT NULL,
+    FOREIGN KEY (idDonnee) REFERENCES Donnees(idDonnee_PK)
+);
+GO
@@ -0,0 +1,21 @@
+/* ============================================================
+   PROGRESSION DES SPOOLS LOCAUX - SalleSense
+   ============================================================
+   Chaque Raspberry Pi écrit ses mesures dans un spool local
+   (SQLite) avant de les expédier. Le dernier ID local expédié
+   est enregistré ici, dans la même transaction que les données,
+   pour ne jamais renvoyer une ligne après un redémarrage.
+   ============================================================ */
+
+USE Prog3A25_bdSalleSense;
+GO
+
+IF OBJECT_ID('SpoolProgression', 'U') IS NOT NULL DROP TABLE SpoolProgression;
+GO
+
+CREATE TABLE SpoolProgression (
+    nomSpool                    NVARCHAR(200)               PRIMARY KEY,
+    dernierIdSpool              BIGINT                      NOT NULL,
+    dateMaj                     DATETIME2                   NOT NULL
+);
+GO
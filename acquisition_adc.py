@@ -0,0 +1,314 @@
+"""
+Acquisition continue de l'ADC (MCP3008) à fréquence fixe
+Un thread dédié remplit un tampon circulaire préalloué; les consommateurs y lisent
+des fenêtres d'échantillons sans copie
+"""
+
+import threading
+import time
+from array import array
+from typing import Callable, Optional, Tuple
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    print("⚠ numpy non disponible - fenêtres lues en memoryview")
+    NUMPY_AVAILABLE = False
+
+
+# Retard (en secondes) au-delà duquel le thread abandonne les échantillons manqués
+# au lieu de les rattraper en rafale (ils sont comptés comme débordements)
+RETARD_MAX = 0.01
+
+
+class TamponCirculaire:
+    """
+    Tampon circulaire d'échantillons 10 bits (stockés sur 16 bits)
+
+    Un seul écrivain, des lecteurs sans verrou: l'écrivain publie le compteur après
+    avoir écrit l'échantillon, un lecteur ne voit donc jamais de case non écrite.
+    Chaque échantillon est écrit deux fois (indices i et i + capacite): toute fenêtre
+    d'au plus capacite échantillons est contiguë et se lit sans copie.
+    """
+
+    def __init__(self, capacite: int):
+        """
+        Args:
+            capacite: Nombre d'échantillons conservés
+        """
+        self.capacite = capacite
+        self._donnees = array('H', bytes(2 * 2 * capacite))
+        self._vue = memoryview(self._donnees)
+        self._tableau = np.frombuffer(self._vue, dtype=np.uint16) if NUMPY_AVAILABLE else None
+        self.compteur = 0  # Échantillons écrits depuis le début (position absolue du prochain)
+
+    def ecrire(self, valeur: int):
+        """Ajoute un échantillon (réservé au thread d'acquisition)"""
+        i = self.compteur % self.capacite
+        self._donnees[i] = valeur
+        self._donnees[i + self.capacite] = valeur
+        self.compteur += 1
+
+    def ecrire_bloc(self, valeurs):
+        """Ajoute un bloc d'échantillons (tableau NumPy, au plus capacite)"""
+        indices = (self.compteur + np.arange(len(valeurs))) % self.capacite
+        self._tableau[indices] = valeurs
+        self._tableau[indices + self.capacite] = valeurs
+        self.compteur += len(valeurs)
+
+    def vue(self, debut: int, fin: int) -> memoryview:
+        """
+        Retourne les échantillons des positions absolues [debut, fin) sans copie
+
+        La vue pointe dans le tampon: ses échantillons les plus vieux sont écrasés
+        après capacite - (fin - debut) nouvelles écritures (voir est_valide).
+        """
+        n = fin - debut
+        i = debut % self.capacite
+        return self._vue[i:i + n]
+
+    def est_valide(self, position: int) -> bool:
+        """Vrai si l'échantillon à cette position absolue n'a pas encore été écrasé"""
+        return position >= self.compteur - self.capacite
+
+
+class AcquisitionADC:
+    """Échantillonne un canal de l'ADC à fréquence fixe dans un thread dédié"""
+
+    def __init__(self, lire_echantillon: Callable[[], int], frequence: int = 8000,
+                 duree_tampon: float = 2.0,
+                 lire_bloc: Optional[Callable[[int], object]] = None,
+                 duree_bloc: float = 0.01):
+        """
+        Args:
+            lire_echantillon: Fonction qui lit un échantillon (0-1023, ou -1 si erreur)
+            frequence: Échantillons par seconde visés (défaut: 8000)
+            duree_tampon: Secondes d'échantillons conservées (défaut: 2)
+            lire_bloc: Fonction qui lit n échantillons d'un coup (tableau NumPy), utilisée
+                       à la place de lire_echantillon si fournie (voir pour_mcp3008)
+            duree_bloc: Secondes d'échantillons par appel à lire_bloc (défaut: 0.01)
+        """
+        self.lire_echantillon = lire_echantillon
+        self.lire_bloc = lire_bloc if NUMPY_AVAILABLE else None
+        self.frequence = frequence
+        self.tampon = TamponCirculaire(max(1, int(frequence * duree_tampon)))
+        self.taille_bloc = min(max(1, int(frequence * duree_bloc)), self.tampon.capacite)
+
+        self._arret = threading.Event()
+        self._thread = None
+
+        # Statistiques
+        self.debordements = 0          # Échantillons jamais lus: thread trop en retard
+        self.pertes_lecteurs = 0       # Échantillons écrasés avant d'être lus (lire_depuis)
+        self.erreurs = 0               # Lectures ADC en erreur
+        self.frequence_reelle = 0.0    # Échantillons par seconde mesurés sur la dernière seconde
+
+    @classmethod
+    def pour_mcp3008(cls, lecteur, canal: int, frequence: int = 8000,
+                     duree_tampon: float = 2.0) -> 'AcquisitionADC':
+        """
+        Acquisition d'un canal du MCP3008, par lots si NumPy est disponible
+
+        Args:
+            lecteur: LecteurMCP3008
+            canal: Canal du micro (0-7)
+            frequence: Échantillons par seconde visés
+            duree_tampon: Secondes d'échantillons conservées
+
+        Returns:
+            AcquisitionADC (non démarrée)
+        """
+        lire_bloc = None
+        if lecteur.par_lots:
+            def lire_bloc(n):
+                return lecteur.lire_bloc((canal,), n, frequence)[:, 0]
+        return cls(lambda: lecteur.lire(canal), frequence=frequence,
+                   duree_tampon=duree_tampon, lire_bloc=lire_bloc)
+
+    def demarrer(self):
+        """Démarre le thread d'acquisition"""
+        if self._thread is not None:
+            return
+
+        self._arret.clear()
+        self._thread = threading.Thread(target=self._boucle, name="AcquisitionADC", daemon=True)
+        self._thread.start()
+
+    def arreter(self):
+        """Arrête le thread d'acquisition (le tampon reste lisible)"""
+        if self._thread is not None:
+            self._arret.set()
+            self._thread.join()
+            self._thread = None
+
+    def _boucle(self):
+        """Lit un échantillon (ou un bloc) à chaque période, à heure fixe (pas de dérive cumulée)"""
+        if self.lire_bloc is not None:
+            self._boucle_blocs()
+            return
+
+        periode = 1.0 / self.frequence
+        retard_max = max(RETARD_MAX, periode)
+        tampon = self.tampon
+        lire = self.lire_echantillon
+
+        prochaine = time.perf_counter()
+        debut_mesure, compteur_mesure = prochaine, tampon.compteur
+
+        while not self._arret.is_set():
+            maintenant = time.perf_counter()
+            attente = prochaine - maintenant
+            if attente > 0:
+                time.sleep(attente)
+                continue
+
+            if -attente > retard_max:
+                # Trop en retard (ordonnanceur, GC...): repartir de maintenant
+                manques = int(-attente / periode)
+                self.debordements += manques
+                prochaine += manques * periode
+
+            valeur = lire()
+            if valeur < 0:
+                self.erreurs += 1
+            else:
+                tampon.ecrire(valeur)
+            prochaine += periode
+
+            if maintenant - debut_mesure >= 1.0:
+                self.frequence_reelle = (tampon.compteur - compteur_mesure) / (maintenant - debut_mesure)
+                debut_mesure, compteur_mesure = maintenant, tampon.compteur
+
+    def _boucle_blocs(self):
+        """
+        Lit taille_bloc échantillons par appel
+
+        Avec le MCP3008 par ioctl, le noyau espace lui-même les échantillons d'un bloc
+        et l'appel dure le temps du bloc; sinon le thread attend entre deux blocs.
+        """
+        duree_bloc = self.taille_bloc / self.frequence
+        retard_max = max(RETARD_MAX, duree_bloc)
+        tampon = self.tampon
+
+        prochaine = time.perf_counter()
+        debut_mesure, compteur_mesure = prochaine, tampon.compteur
+
+        while not self._arret.is_set():
+            maintenant = time.perf_counter()
+            attente = prochaine - maintenant
+            if attente > 0:
+                time.sleep(attente)
+                continue
+
+            if -attente > retard_max:
+                manques = int(-attente * self.frequence)
+                self.debordements += manques
+                prochaine += manques / self.frequence
+
+            try:
+                tampon.ecrire_bloc(self.lire_bloc(self.taille_bloc))
+            except (OSError, ValueError) as e:
+                self.erreurs += 1
+                if self.erreurs == 1:
+                    print(f"✗ Erreur lecture ADC: {e}")
+            prochaine += duree_bloc
+
+            if maintenant - debut_mesure >= 1.0:
+                self.frequence_reelle = (tampon.compteur - compteur_mesure) / (maintenant - debut_mesure)
+                debut_mesure, compteur_mesure = maintenant, tampon.compteur
+
+    def fenetre(self, nb_echantillons: int):
+        """
+        Retourne les derniers échantillons acquis, sans copie
+
+        Args:
+            nb_echantillons: Taille de la fenêtre (bornée par la capacité du tampon)
+
+        Returns:
+            Tableau NumPy uint16 (memoryview si NumPy est absent), éventuellement plus
+            court que demandé au démarrage de l'acquisition
+        """
+        fin = self.tampon.compteur
+        n = min(nb_echantillons, self.tampon.capacite, fin)
+        return self._exposer(self.tampon.vue(fin - n, fin))
+
+    def lire_depuis(self, position: int) -> Tuple[object, int]:
+        """
+        Retourne les échantillons acquis depuis une position, sans copie (lecture en flux)
+
+        Si le lecteur a pris plus de duree_tampon secondes de retard, les échantillons
+        écrasés sont sautés et comptés dans pertes_lecteurs.
+
+        Args:
+            position: Position absolue retournée par l'appel précédent (0 au premier appel)
+
+        Returns:
+            Tuple (échantillons, position à passer à l'appel suivant)
+        """
+        fin = self.tampon.compteur
+        plus_vieille = fin - self.tampon.capacite
+        if position < plus_vieille:
+            self.pertes_lecteurs += plus_vieille - position
+            position = plus_vieille
+        return self._exposer(self.tampon.vue(position, fin)), fin
+
+    @staticmethod
+    def _exposer(vue: memoryview):
+        return np.frombuffer(vue, dtype=np.uint16) if NUMPY_AVAILABLE else vue
+
+    def attendre(self, nb_echantillons: int, timeout: Optional[float] = None) -> bool:
+        """
+        Attend que le tampon contienne au moins nb_echantillons échantillons
+
+        Returns:
+            True si atteint, False si timeout
+        """
+        limite = None if timeout is None else time.monotonic() + timeout
+        cible = min(nb_echantillons, self.tampon.capacite)
+        while self.tampon.compteur < cible:
+            if limite is not None and time.monotonic() >= limite:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def etat(self) -> dict:
+        """
+        Instantané de l'acquisition
+
+        Returns:
+            Dictionnaire {frequence, frequence_reelle, echantillons, debordements,
+            pertes_lecteurs, erreurs}
+        """
+        return {
+            'frequence': self.frequence,
+            'frequence_reelle': self.frequence_reelle,
+            'echantillons': self.tampon.compteur,
+            'debordements': self.debordements,
+            'pertes_lecteurs': self.pertes_lecteurs,
+            'erreurs': self.erreurs
+        }
+
+    def resume(self) -> str:
+        """Résumé d'une ligne pour l'affichage (ex: à l'arrêt)"""
+        e = self.etat()
+        return (f"{e['frequence_reelle']:.0f} éch/s (cible {e['frequence']}), "
+                f"{e['echantillons']} échantillon(s), {e['debordements']} débordement(s), "
+                f"{e['erreurs']} erreur(s) ADC")
+
+
+def statistiques_fenetre(valeurs) -> Optional[Tuple[int, int, int]]:
+    """
+    Moyenne, minimum et maximum d'une fenêtre d'échantillons
+
+    Args:
+        valeurs: Fenêtre retournée par AcquisitionADC.fenetre()
+
+    Returns:
+        Tuple (moyenne, minimum, maximum), ou None si la fenêtre est vide
+    """
+    if len(valeurs) == 0:
+        return None
+    if NUMPY_AVAILABLE and isinstance(valeurs, np.ndarray):
+        return int(valeurs.mean()), int(valeurs.min()), int(valeurs.max())
+    return sum(valeurs) // len(valeurs), min(valeurs), max(valeurs)
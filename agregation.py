@@ -0,0 +1,330 @@
+"""
+Agrégats des mesures calculés sur le Pi (fenêtres fixes de 1 minute et 15 minutes)
+min/max/moyenne/p95/Leq/nombre de mesures, écrits dans AgregatMinute et AgregatQuartHeure
+par un thread en arrière-plan, avec purge optionnelle des lignes brutes de Donnees
+"""
+
+import math
+import threading
+from collections import namedtuple
+from datetime import datetime, timedelta
+from typing import Optional
+
+import numpy as np
+
+from db_connection import DatabaseConnection
+
+
+Agregat = namedtuple('Agregat', ['debut', 'nb_mesures', 'minimum', 'maximum', 'moyenne', 'p95', 'leq'])
+
+# Table de chaque granularité (durée de la fenêtre en secondes)
+TABLES_AGREGATS = {
+    60: 'AgregatMinute',
+    900: 'AgregatQuartHeure'
+}
+
+
+def calculer_agregat(debut: datetime, valeurs) -> Agregat:
+    """
+    Résume les mesures (dB) d'une fenêtre
+
+    Args:
+        debut: Début de la fenêtre
+        valeurs: Mesures de la fenêtre (au moins une)
+
+    Returns:
+        Agregat (leq: moyenne énergétique, pas la moyenne arithmétique des dB)
+    """
+    mesures = np.asarray(valeurs, dtype=np.float64)
+    return Agregat(
+        debut=debut,
+        nb_mesures=len(mesures),
+        minimum=float(mesures.min()),
+        maximum=float(mesures.max()),
+        moyenne=float(mesures.mean()),
+        p95=float(np.percentile(mesures, 95)),
+        leq=10 * math.log10(float(np.mean(10 ** (mesures / 10))))
+    )
+
+
+def fusionner_agregats(a: Agregat, b: Agregat) -> Agregat:
+    """
+    Combine deux agrégats de la même fenêtre (ex: fenêtre coupée par un redémarrage)
+
+    Le p95 exact n'est plus calculable sans les mesures: le plus grand des deux est gardé.
+    """
+    nb = a.nb_mesures + b.nb_mesures
+    energie = a.nb_mesures * 10 ** (a.leq / 10) + b.nb_mesures * 10 ** (b.leq / 10)
+    return Agregat(
+        debut=a.debut,
+        nb_mesures=nb,
+        minimum=min(a.minimum, b.minimum),
+        maximum=max(a.maximum, b.maximum),
+        moyenne=(a.moyenne * a.nb_mesures + b.moyenne * b.nb_mesures) / nb,
+        p95=max(a.p95, b.p95),
+        leq=10 * math.log10(energie / nb)
+    )
+
+
+class FenetreFixe:
+    """Accumule les mesures d'une fenêtre alignée sur l'horloge (ex: 10:15:00-10:30:00)"""
+
+    def __init__(self, duree: int):
+        """
+        Args:
+            duree: Durée de la fenêtre en secondes (diviseur d'une journée, ex: 60, 900)
+        """
+        self.duree = duree
+        self.debut: Optional[datetime] = None
+        self._valeurs = []
+
+    def debut_fenetre(self, date_heure: datetime) -> datetime:
+        """Début de la fenêtre qui contient date_heure"""
+        minuit = date_heure.replace(hour=0, minute=0, second=0, microsecond=0)
+        secondes = int((date_heure - minuit).total_seconds())
+        return minuit + timedelta(seconds=secondes - secondes % self.duree)
+
+    def ajouter(self, date_heure: datetime, valeur: float) -> Optional[Agregat]:
+        """
+        Ajoute une mesure
+
+        Returns:
+            L'agrégat de la fenêtre précédente si la mesure en ouvre une nouvelle, None sinon
+        """
+        debut = self.debut_fenetre(date_heure)
+        agregat = None
+        if debut != self.debut:
+            agregat = self.terminer()
+            self.debut = debut
+        self._valeurs.append(valeur)
+        return agregat
+
+    def terminer(self) -> Optional[Agregat]:
+        """Clôt la fenêtre en cours (même incomplète) et retourne son agrégat, ou None si vide"""
+        agregat = calculer_agregat(self.debut, self._valeurs) if self._valeurs else None
+        self._valeurs = []
+        return agregat
+
+
+class AgregateurMesures:
+    """
+    Agrégats par minute et par quart d'heure des mesures d'un capteur
+
+    La boucle de mesure appelle seulement ajouter(): les agrégats terminés sont écrits
+    par un thread d'envoi, qui réessaie tant que la BD est injoignable (les mesures
+    brutes restent de leur côté dans le spool ou le BatchWriter).
+    """
+
+    REQUETE_LECTURE = (
+        """SELECT nbMesures, minimum, maximum, moyenne, p95, leq
+           FROM {table}
+           WHERE noSalle = ? AND idCapteur = ? AND debut = ?"""
+    )
+    REQUETE_INSERTION = (
+        """INSERT INTO {table} (noSalle, idCapteur, debut, nbMesures, minimum, maximum,
+                                moyenne, p95, leq)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+    )
+    REQUETE_MISE_A_JOUR = (
+        """UPDATE {table}
+           SET nbMesures = ?, minimum = ?, maximum = ?, moyenne = ?, p95 = ?, leq = ?
+           WHERE noSalle = ? AND idCapteur = ? AND debut = ?"""
+    )
+
+    # Lignes brutes couvertes par les agrégats; les mesures liées à un événement sont gardées
+    REQUETE_PURGE = (
+        """DELETE FROM Donnees
+           WHERE noSalle = ? AND idCapteur = ? AND dateHeure < ?
+             AND mesure IS NOT NULL AND photoBlob IS NULL
+             AND NOT EXISTS (SELECT 1 FROM Evenement e WHERE e.idDonnee = Donnees.idDonnee_PK)"""
+    )
+
+    def __init__(self, db_connection: DatabaseConnection, id_capteur: int, id_salle: int,
+                 retention_brutes: Optional[float] = None, delai_reessai: float = 30.0,
+                 taille_attente_max: int = 20000):
+        """
+        Args:
+            db_connection: Connexion à la base de données
+            id_capteur: ID du capteur agrégé
+            id_salle: ID de la salle
+            retention_brutes: Jours de mesures brutes conservées dans Donnees
+                              (None: aucune purge, 0: seulement les agrégats)
+            delai_reessai: Secondes entre deux essais si la BD refuse les agrégats (défaut: 30)
+            taille_attente_max: Agrégats gardés au maximum en attente d'envoi (défaut: 20000)
+        """
+        self.db = db_connection
+        self.id_capteur = id_capteur
+        self.id_salle = id_salle
+        self.retention_brutes = retention_brutes
+        self.delai_reessai = delai_reessai
+        self.taille_attente_max = taille_attente_max
+
+        self.fenetres = {duree: FenetreFixe(duree) for duree in TABLES_AGREGATS}
+
+        self._attente = []              # (table, Agregat) à écrire
+        self._fin_quart_ecrit = None    # Fin du dernier quart d'heure écrit (borne de la purge)
+        self._fin_quart_purge = None    # Borne de la dernière purge (une purge par quart d'heure)
+        self._verrou = threading.Lock()
+        self._verrou_envoi = threading.Lock()
+        self._reveil = threading.Event()
+        self._arret = threading.Event()
+        self._thread = None
+
+        # Statistiques
+        self.compteur_agregats = 0
+        self.compteur_pertes = 0
+
+    def demarrer(self):
+        """Démarre le thread d'envoi des agrégats"""
+        if self._thread is not None:
+            return
+
+        self._arret.clear()
+        self._thread = threading.Thread(target=self._boucle_envoi, name="Agregateur", daemon=True)
+        self._thread.start()
+
+    def arreter(self):
+        """Clôt les fenêtres en cours (incomplètes), arrête le thread et envoie une dernière fois"""
+        with self._verrou:
+            for duree, fenetre in self.fenetres.items():
+                self._mettre_en_attente(duree, fenetre.terminer())
+
+        if self._thread is not None:
+            self._arret.set()
+            self._reveil.set()
+            self._thread.join()
+            self._thread = None
+
+        self.envoyer()
+        if self._attente:
+            print(f"⚠ {len(self._attente)} agrégat(s) non envoyé(s) à l'arrêt")
+
+    def ajouter(self, date_heure: datetime, mesure: float):
+        """
+        Ajoute une mesure aux fenêtres en cours
+
+        Args:
+            date_heure: Heure d'acquisition
+            mesure: Niveau mesuré (dB)
+        """
+        termine = False
+        with self._verrou:
+            for duree, fenetre in self.fenetres.items():
+                agregat = fenetre.ajouter(date_heure, mesure)
+                termine |= self._mettre_en_attente(duree, agregat)
+
+        if termine:
+            self._reveil.set()
+
+    def en_attente(self) -> int:
+        """Retourne le nombre d'agrégats en attente d'envoi"""
+        with self._verrou:
+            return len(self._attente)
+
+    def envoyer(self) -> bool:
+        """
+        Écrit les agrégats en attente en une seule transaction
+
+        Une fenêtre déjà présente en BD (coupée par un redémarrage) est fusionnée.
+
+        Returns:
+            True si tout a été écrit (ou rien n'attendait), False si la BD a refusé
+        """
+        with self._verrou_envoi:
+            with self._verrou:
+                lot = list(self._attente)
+
+            if not lot:
+                return True
+
+            with self.db.transaction() as transaction:
+                for table, agregat in lot:
+                    self._ecrire(table, agregat)
+
+            if not transaction.validee:
+                return False
+
+            with self._verrou:
+                del self._attente[:len(lot)]
+            self.compteur_agregats += len(lot)
+
+            quarts = [a for table, a in lot if table == TABLES_AGREGATS[900]]
+            if quarts:
+                self._fin_quart_ecrit = max(a.debut for a in quarts) + timedelta(seconds=900)
+            return True
+
+    def purger_brutes(self) -> bool:
+        """
+        Supprime de Donnees les mesures brutes plus vieilles que la rétention
+
+        Seules les mesures déjà couvertes par un quart d'heure écrit sont supprimées,
+        et au plus une fois par nouveau quart d'heure (la requête parcourt Donnees).
+
+        Returns:
+            True si la purge a réussi (ou n'avait rien à faire)
+        """
+        if self.retention_brutes is None or self._fin_quart_ecrit in (None, self._fin_quart_purge):
+            return True
+
+        limite = min(datetime.now() - timedelta(days=self.retention_brutes), self._fin_quart_ecrit)
+        if not self.db.execute_non_query(self.REQUETE_PURGE, (self.id_salle, self.id_capteur, limite)):
+            return False
+        self._fin_quart_purge = self._fin_quart_ecrit
+        return True
+
+    def _mettre_en_attente(self, duree: int, agregat: Optional[Agregat]) -> bool:
+        """Ajoute un agrégat terminé à la file d'envoi (appelé sous self._verrou)"""
+        if agregat is None:
+            return False
+
+        self._attente.append((TABLES_AGREGATS[duree], agregat))
+        surplus = len(self._attente) - self.taille_attente_max
+        if surplus > 0:
+            del self._attente[:surplus]
+            self.compteur_pertes += surplus
+            print(f"⚠ File des agrégats pleine - {surplus} agrégat(s) parmi les plus anciens abandonné(s)")
+        return True
+
+    def _ecrire(self, table: str, agregat: Agregat):
+        """Insère un agrégat, ou le fusionne avec la ligne existante de la même fenêtre"""
+        cle = (self.id_salle, self.id_capteur, agregat.debut)
+        existant = self.db.execute_query(self.REQUETE_LECTURE.format(table=table), cle)
+
+        if existant:
+            agregat = fusionner_agregats(Agregat(agregat.debut, *existant[0]), agregat)
+            self.db.execute_non_query(
+                self.REQUETE_MISE_A_JOUR.format(table=table),
+                (agregat.nb_mesures, agregat.minimum, agregat.maximum,
+                 agregat.moyenne, agregat.p95, agregat.leq) + cle
+            )
+        else:
+            self.db.execute_non_query(
+                self.REQUETE_INSERTION.format(table=table),
+                cle + (agregat.nb_mesures, agregat.minimum, agregat.maximum,
+                       agregat.moyenne, agregat.p95, agregat.leq)
+            )
+
+    def _boucle_envoi(self):
+        """Thread d'envoi: écrit les agrégats terminés, puis purge les mesures brutes"""
+        try:
+            while not self._arret.is_set():
+                self._reveil.wait(self.delai_reessai if self.en_attente() else None)
+                self._reveil.clear()
+
+                if self._arret.is_set():
+                    break
+
+                if self.envoyer():
+                    self.purger_brutes()
+        finally:
+            # Rendre la connexion de ce thread au pool
+            self.db.liberer_connexion()
+
+    def __enter__(self):
+        """Support du context manager (with statement)"""
+        self.demarrer()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Écrit les fenêtres en cours à la sortie du context manager"""
+        self.arreter()
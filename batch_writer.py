@@ -0,0 +1,202 @@
+"""
+Écriture par lots des mesures dans la table Donnees
+Regroupe les échantillons et les envoie en une transaction (fast_executemany)
+"""
+
+import threading
+from datetime import datetime
+from typing import Optional
+from db_connection import DatabaseConnection
+
+
+class BatchWriter:
+    """Tampon de mesures vidé vers la BD par taille ou par âge"""
+
+    REQUETE_INSERTION = (
+        """INSERT INTO Donnees (dateHeure, idCapteur, mesure, photoBlob, noSalle)
+           VALUES (?, ?, ?, NULL, ?)"""
+    )
+
+    def __init__(self, db_connection: DatabaseConnection, taille_max: int = 50,
+                 age_max: float = 10.0, taille_tampon_max: int = 10000):
+        """
+        Initialise le tampon d'écriture
+
+        Args:
+            db_connection: Connexion à la base de données
+            taille_max: Nombre de lignes qui déclenche un envoi (défaut: 50)
+            age_max: Âge en secondes de la plus vieille ligne qui déclenche un envoi (défaut: 10)
+            taille_tampon_max: Lignes conservées au maximum si la BD refuse les envois (défaut: 10000)
+        """
+        self.db = db_connection
+        self.taille_max = taille_max
+        self.age_max = age_max
+        self.taille_tampon_max = taille_tampon_max
+
+        self._tampon = []
+        self._debut_tampon = None       # Heure d'ajout de la plus vieille ligne en attente
+        self._verrou = threading.Lock()
+        self._verrou_envoi = threading.Lock()
+        self._reveil = threading.Event()
+        self._arret = threading.Event()
+        self._thread = None
+
+        # Statistiques
+        self.compteur_lignes = 0
+        self.compteur_lots = 0
+        self.compteur_pertes = 0
+        self.compteur_rejets = 0        # Lignes refusées par le serveur (contrainte, trigger)
+
+    def demarrer(self):
+        """Démarre le thread qui vide le tampon quand il devient trop vieux"""
+        if self._thread is not None:
+            return
+
+        self._arret.clear()
+        self._thread = threading.Thread(target=self._boucle_envoi, name="BatchWriter", daemon=True)
+        self._thread.start()
+
+    def arreter(self):
+        """Arrête le thread d'envoi et vide le tampon une dernière fois"""
+        if self._thread is not None:
+            self._arret.set()
+            self._reveil.set()
+            self._thread.join()
+            self._thread = None
+
+        self.vider()
+        if self._tampon:
+            print(f"⚠ {len(self._tampon)} mesure(s) non envoyée(s) à l'arrêt")
+        if self.compteur_rejets:
+            print(f"⚠ {self.compteur_rejets} mesure(s) refusée(s) par le serveur et abandonnée(s)")
+
+    def ajouter(self, date_heure: datetime, id_capteur: int, mesure: float, id_salle: int):
+        """
+        Ajoute une mesure au tampon
+
+        Args:
+            date_heure: Heure d'acquisition de l'échantillon (pas l'heure d'insertion)
+            id_capteur: ID du capteur
+            mesure: Valeur mesurée
+            id_salle: ID de la salle
+        """
+        with self._verrou:
+            if not self._tampon:
+                self._debut_tampon = datetime.now()
+            self._tampon.append((date_heure, id_capteur, mesure, id_salle))
+            plein = len(self._tampon) >= self.taille_max
+
+        if plein:
+            # L'envoi se fait sur le thread d'envoi pour ne pas bloquer la boucle de mesure
+            self._reveil.set()
+
+    def en_attente(self) -> int:
+        """Retourne le nombre de lignes en attente d'envoi"""
+        with self._verrou:
+            return len(self._tampon)
+
+    def vider(self) -> bool:
+        """
+        Envoie toutes les lignes en attente en une seule transaction
+
+        Si le serveur refuse le lot (contrainte, trigger), il est renvoyé ligne par
+        ligne et seules les lignes refusées sont abandonnées: elles ne bloquent pas
+        les suivantes. Après une coupure, le lot reste en tête du tampon.
+
+        Returns:
+            True si le tampon a été envoyé (ou était vide), False si le lot reste en attente
+        """
+        with self._verrou_envoi:
+            with self._verrou:
+                lot, self._tampon = self._tampon, []
+                self._debut_tampon = None
+
+            if not lot:
+                return True
+
+            with self.db.transaction() as transaction:
+                self.db.execute_many(self.REQUETE_INSERTION, lot)
+
+            if transaction.validee:
+                self.compteur_lignes += len(lot)
+                self.compteur_lots += 1
+                return True
+
+            if self.db.est_rejet(transaction.erreur):
+                return self._isoler_rejets(lot)
+
+            # Coupure: remettre le lot en tête du tampon pour le prochain essai
+            self._remettre(lot)
+            return False
+
+    def _isoler_rejets(self, lot: list) -> bool:
+        """
+        Renvoie un lot refusé ligne par ligne; les lignes refusées sont abandonnées
+
+        Returns:
+            True si toutes les lignes ont été envoyées ou abandonnées, False après une coupure
+            (les lignes pas encore essayées sont remises en tête du tampon)
+        """
+        for position, ligne in enumerate(lot):
+            with self.db.transaction() as transaction:
+                self.db.execute_many(self.REQUETE_INSERTION, [ligne])
+
+            if transaction.validee:
+                self.compteur_lignes += 1
+            elif self.db.est_rejet(transaction.erreur):
+                self.compteur_rejets += 1
+                date_heure, id_capteur, mesure, _ = ligne
+                print(f"✗ Mesure refusée par le serveur, abandonnée (capteur {id_capteur}, "
+                      f"{date_heure:%H:%M:%S}, mesure {mesure}): {transaction.erreur}")
+            else:
+                self._remettre(lot[position:])
+                return False
+
+        self.compteur_lots += 1
+        return True
+
+    def _remettre(self, lignes: list):
+        """Remet des lignes non envoyées en tête du tampon (les plus anciennes sautent s'il est plein)"""
+        with self._verrou:
+            self._tampon = lignes + self._tampon
+            self._debut_tampon = datetime.now()
+            surplus = len(self._tampon) - self.taille_tampon_max
+            if surplus > 0:
+                del self._tampon[:surplus]
+                self.compteur_pertes += surplus
+                print(f"⚠ Tampon plein - {surplus} mesure(s) parmi les plus anciennes abandonnée(s)")
+
+    def _age_tampon(self) -> Optional[float]:
+        """Âge en secondes de la plus vieille ligne en attente (None si vide)"""
+        with self._verrou:
+            if self._debut_tampon is None:
+                return None
+            return (datetime.now() - self._debut_tampon).total_seconds()
+
+    def _boucle_envoi(self):
+        """Thread d'envoi: vide le tampon quand il est plein ou trop vieux"""
+        try:
+            while not self._arret.is_set():
+                age = self._age_tampon()
+                attente = self.age_max if age is None else max(0.0, self.age_max - age)
+                self._reveil.wait(attente)
+                self._reveil.clear()
+
+                if self._arret.is_set():
+                    break
+
+                age = self._age_tampon()
+                if self.en_attente() >= self.taille_max or (age is not None and age >= self.age_max):
+                    self.vider()
+        finally:
+            # Rendre la connexion de ce thread au pool
+            self.db.liberer_connexion()
+
+    def __enter__(self):
+        """Support du context manager (with statement)"""
+        self.demarrer()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Vide le tampon à la sortie du context manager"""
+        self.arreter()
@@ -0,0 +1,172 @@
+"""
+Microbenchmark des caractéristiques spectrales: temps de calcul par fenêtre audio
+Vérifie que l'extraction tient dans le budget CPU (CARACTERISTIQUES_BUDGET_CPU) aux
+durées de fenêtre de la boucle de mesure, puis classe des signaux synthétiques:
+- signaux de référence: ceux dont MODELE_DEFAUT est tiré; les reconnaître vérifie
+  seulement la chaîne extraction + classification, pas la précision
+- signaux tenus à l'écart (autre graine, autres paramètres: voix plus aiguë ou plus
+  grave, autre rythme de claquement, secteur 50 Hz...): score indicatif sur des sons
+  que le modèle n'a pas vus, toujours synthétiques
+
+La précision réelle se mesure sur des clips de la salle (python caracteristiques_son.py
+--entrainer <dossier>). Le temps de calcul dépend de la machine: à lancer sur le Raspberry Pi.
+"""
+
+import time
+
+import numpy as np
+
+from caracteristiques_son import ExtracteurCaracteristiques, ClassifieurBruit
+from config import ADC_FREQUENCE, CARACTERISTIQUES_BUDGET_CPU, CADENCE_INTERVALLE_MIN
+
+
+NB_REPETITIONS = 200
+REPOS = 512.0
+
+
+def signal_voix(duree: float, frequence: int, generateur: np.random.Generator,
+                fondamentale_hz: float = 140, formant_hz: float = 800, syllabes_hz: float = 4) -> np.ndarray:
+    """Voix simulée: harmoniques d'une fondamentale variable, modulées au rythme des syllabes"""
+    t = np.arange(int(duree * frequence)) / frequence
+    fondamentale = fondamentale_hz + 30 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(fondamentale) / frequence
+    # Harmoniques renforcées autour des formants (500-1500 Hz)
+    signal = sum(np.sin(k * phase) * np.exp(-((k * 150 - formant_hz) / 700) ** 2) for k in range(1, 25))
+    syllabes = 0.5 + 0.5 * np.sin(2 * np.pi * syllabes_hz * t) ** 2
+    signal = signal * syllabes + 0.05 * generateur.standard_normal(len(t))
+    return REPOS + 150 * signal / np.abs(signal).max()
+
+
+def signal_claquement(duree: float, frequence: int, generateur: np.random.Generator,
+                      periode: float = 0.5, decroissance: float = 0.03) -> np.ndarray:
+    """Claquement de porte simulé: impulsions large bande à décroissance rapide"""
+    n = int(duree * frequence)
+    signal = 0.02 * generateur.standard_normal(n)
+    enveloppe = np.exp(-np.arange(int(0.15 * frequence)) / (decroissance * frequence))
+    for debut in range(0, n, int(periode * frequence)):
+        fin = min(n, debut + len(enveloppe))
+        signal[debut:fin] += generateur.standard_normal(fin - debut) * enveloppe[:fin - debut]
+    return REPOS + 400 * signal / np.abs(signal).max()
+
+
+def signal_ventilation(duree: float, frequence: int, generateur: np.random.Generator,
+                       secteur_hz: float = 60, lissage: int = 64) -> np.ndarray:
+    """Ventilation simulée: ronflement du secteur (60/120 Hz) et souffle grave"""
+    n = int(duree * frequence)
+    t = np.arange(n) / frequence
+    souffle = np.convolve(generateur.standard_normal(n), np.ones(lissage) / lissage, mode='same')
+    signal = (np.sin(2 * np.pi * secteur_hz * t) + 0.5 * np.sin(2 * np.pi * 2 * secteur_hz * t)
+              + 2 * souffle)
+    return REPOS + 100 * signal / np.abs(signal).max()
+
+
+SIGNAUX_TYPES = {
+    'VOIX': signal_voix,
+    'CLAQUEMENT': signal_claquement,
+    'VENTILATION': signal_ventilation,
+}
+
+# Graine des signaux de référence (ceux de MODELE_DEFAUT) et des signaux tenus à l'écart
+GRAINE_REFERENCE = 1
+GRAINE_ECART = 7
+
+# Paramètres des signaux tenus à l'écart, différents de ceux des signaux de référence
+VARIANTES_ECART = {
+    'VOIX': [dict(fondamentale_hz=210, formant_hz=1000, syllabes_hz=5),
+             dict(fondamentale_hz=110, formant_hz=650, syllabes_hz=3)],
+    'CLAQUEMENT': [dict(periode=0.8, decroissance=0.05),
+                   dict(periode=0.3, decroissance=0.02)],
+    'VENTILATION': [dict(secteur_hz=50, lissage=96),
+                    dict(secteur_hz=60, lissage=40)],
+}
+
+
+def mesurer(extracteur: ExtracteurCaracteristiques, duree_fenetre: float) -> float:
+    """Chronomètre l'extraction sur des fenêtres de duree_fenetre secondes (ms par fenêtre)"""
+    fenetre = signal_voix(duree_fenetre, extracteur.frequence, np.random.default_rng(0)).astype(np.uint16)
+    extracteur.extraire(fenetre, REPOS)  # Préparation (hors chronomètre)
+
+    debut = time.perf_counter()
+    for _ in range(NB_REPETITIONS):
+        extracteur.extraire(fenetre, REPOS)
+    return 1000 * (time.perf_counter() - debut) / NB_REPETITIONS
+
+
+def classer_signaux(titre: str, signaux, graine: int) -> int:
+    """
+    Classe des signaux synthétiques avec le modèle par défaut
+
+    Args:
+        titre: Titre affiché
+        signaux: Liste de (classe attendue, paramètres du générateur)
+        graine: Graine du bruit des signaux
+
+    Returns:
+        Nombre de signaux reconnus
+    """
+    extracteur = ExtracteurCaracteristiques(ADC_FREQUENCE, budget_cpu=None)
+    classifieur = ClassifieurBruit()
+    generateur = np.random.default_rng(graine)
+    reconnus = 0
+
+    print(f"\n{titre}")
+    print("─" * 63)
+    for attendu, parametres in signaux:
+        fabriquer = SIGNAUX_TYPES[attendu]
+        vecteurs = [extracteur.extraire(fabriquer(1.0, ADC_FREQUENCE, generateur, **parametres).astype(np.uint16),
+                                        REPOS)
+                    for _ in range(5)]
+        resultat = classifieur.classer(np.mean(vecteurs, axis=0), len(vecteurs))
+        ok = resultat.classe == attendu
+        reconnus += ok
+        details = ", ".join(f"{nom}={valeur:g}" for nom, valeur in parametres.items()) or "référence"
+        print(f"  {'✓' if ok else '✗'} {attendu:12} → {resultat.classe:12} ({resultat.confiance:.0%}) [{details}]")
+    return reconnus
+
+
+def verifier_classification() -> bool:
+    """
+    Chaîne de classification (signaux de référence), puis score sur des signaux tenus à l'écart
+
+    Returns:
+        True si les signaux de référence sont reconnus (la chaîne fonctionne);
+        le score sur les signaux tenus à l'écart est seulement affiché
+    """
+    reference = [(classe, {}) for classe in SIGNAUX_TYPES]
+    chaine_ok = classer_signaux("Contrôle de la chaîne: signaux de référence du modèle par défaut "
+                                "(pas une mesure de précision)", reference, GRAINE_REFERENCE) == len(reference)
+
+    ecart = [(classe, parametres) for classe, variantes in VARIANTES_ECART.items() for parametres in variantes]
+    reconnus = classer_signaux("Signaux synthétiques tenus à l'écart (autre graine, autres paramètres)",
+                               ecart, GRAINE_ECART)
+    print(f"  → {reconnus}/{len(ecart)} reconnus - indicatif: la précision réelle se mesure sur des clips "
+          f"de la salle")
+    return chaine_ok
+
+
+def main():
+    """Fonction principale"""
+    print("\n╔═══════════════════════════════════════════════════════════╗")
+    print("║     SalleSense - Benchmark caractéristiques spectrales    ║")
+    print("╚═══════════════════════════════════════════════════════════╝")
+
+    print(f"\nExtraction à {ADC_FREQUENCE} Hz (budget: {CARACTERISTIQUES_BUDGET_CPU:.0%} d'un cœur)")
+    print("─" * 63)
+    dans_budget = True
+    for duree_fenetre in sorted({CADENCE_INTERVALLE_MIN, 0.5, 1.0}):
+        sans_limite = mesurer(ExtracteurCaracteristiques(ADC_FREQUENCE, budget_cpu=None), duree_fenetre)
+        avec_budget = mesurer(ExtracteurCaracteristiques(ADC_FREQUENCE, budget_cpu=CARACTERISTIQUES_BUDGET_CPU),
+                              duree_fenetre)
+        charge = avec_budget / 1000 / duree_fenetre
+        ok = charge <= CARACTERISTIQUES_BUDGET_CPU * 1.2  # Marge: le budget est une moyenne glissante
+        dans_budget &= ok
+        print(f"  {'✓' if ok else '✗'} Fenêtre {duree_fenetre:4g}s: {sans_limite:6.2f} ms (toutes les trames), "
+              f"{avec_budget:6.2f} ms avec budget → {charge:.1%} d'un cœur")
+
+    correct = verifier_classification()
+    print()
+    return 0 if dans_budget and correct else 1
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,158 @@
+"""
+Microbenchmark de lecture du MCP3008: échantillons par seconde
+Compare la lecture actuelle (un xfer2 par échantillon) aux lectures par lots de mcp3008.py
+
+Sans argument, le bus SPI est simulé (faux spidev et faux ioctl): le résultat mesure le
+coût Python de chaque méthode, pas le temps de transfert sur le bus.
+Sur le Raspberry Pi: python benchmark_mcp3008.py --materiel
+"""
+
+import ctypes
+import math
+import sys
+import time
+
+import numpy as np
+
+import mcp3008
+from mcp3008 import LecteurMCP3008, TYPE_TRANSFERT, commande, decoder
+from config import SPI_BUS, SPI_DEVICE
+
+
+NB_ECHANTILLONS = 20000
+TAILLE_LOT = 256
+
+
+def valeur_simulee(canal: int, instant: int) -> int:
+    """Signal simulé: sinusoïde autour de 512, déphasée selon le canal"""
+    return int(512 + 300 * math.sin(instant / 20 + canal))
+
+
+class FauxSpiDev:
+    """Remplaçant de spidev.SpiDev: répond aux trames du MCP3008 avec un signal simulé"""
+
+    def __init__(self, avec_ioctl: bool = True):
+        self.max_speed_hz = 1350000
+        self.avec_ioctl = avec_ioctl
+        self.instant = 0
+
+    def xfer2(self, trame):
+        canal = (trame[1] >> 4) - 8
+        valeur = valeur_simulee(canal, self.instant)
+        self.instant += 1
+        return [0, (valeur >> 8) & 3, valeur & 0xFF]
+
+    def fileno(self):
+        if not self.avec_ioctl:
+            raise OSError("Pas de descripteur (simulation)")
+        return -1
+
+    def close(self):
+        pass
+
+
+def faux_ioctl(fd, requete, argument):
+    """Remplaçant de fcntl.ioctl pour SPI_IOC_MESSAGE: remplit rx_buf comme le ferait le MCP3008"""
+    transferts = np.frombuffer(argument, dtype=TYPE_TRANSFERT)
+    n = len(transferts)
+    tx = np.frombuffer(ctypes.string_at(int(transferts['tx_buf'][0]), 3 * n), dtype=np.uint8)
+    canaux = (tx[1::3] >> 4).astype(np.int64) - 8
+
+    instants = faux_ioctl.instant + np.arange(n)
+    valeurs = (512 + 300 * np.sin(instants / 20 + canaux)).astype(np.uint16)
+    faux_ioctl.instant += n
+
+    rx = np.zeros((n, 3), dtype=np.uint8)
+    rx[:, 1] = (valeurs >> 8) & 3
+    rx[:, 2] = valeurs & 0xFF
+    ctypes.memmove(int(transferts['rx_buf'][0]), rx.ctypes.data, rx.nbytes)
+    return 0
+
+
+faux_ioctl.instant = 0
+
+
+def mesurer(nom: str, lire_n, nb_echantillons: int = NB_ECHANTILLONS) -> float:
+    """Chronomètre la lecture de nb_echantillons échantillons et affiche le débit"""
+    lire_n(TAILLE_LOT)  # Préparation des lots (hors chronomètre)
+
+    debut = time.perf_counter()
+    lus = 0
+    while lus < nb_echantillons:
+        lus += lire_n(TAILLE_LOT)
+    duree = time.perf_counter() - debut
+
+    debit = lus / duree
+    print(f"  {nom:45} {debit:12,.0f} éch/s")
+    return debit
+
+
+def comparer(spi, lecteur: LecteurMCP3008, titre: str):
+    """Compare les méthodes de lecture sur un même périphérique"""
+    print(f"\n{titre}")
+    print("─" * 63)
+
+    def par_echantillon(n):
+        for _ in range(n):
+            decoder(spi.xfer2(commande(0)))
+        return n
+
+    def par_lot(n):
+        return lecteur.lire_bloc((0,), n).size
+
+    def balayage_8_canaux(n):
+        return lecteur.lire_bloc(range(8), n // 8).size
+
+    reference = mesurer("xfer2 par échantillon (read_adc actuel)", par_echantillon)
+    mode = "ioctl" if lecteur.par_ioctl else "xfer2 par trame"
+    debit = mesurer(f"lire_bloc, 1 canal ({mode}, NumPy)", par_lot)
+    mesurer(f"lire_bloc, 8 canaux ({mode}, NumPy)", balayage_8_canaux)
+    print(f"  → Gain par lot: x{debit / reference:.1f}")
+
+
+def verifier_decodage():
+    """Le décodage par lot doit donner les mêmes valeurs que le décodage échantillon par échantillon"""
+    faux_ioctl.instant = 0
+    valeurs = LecteurMCP3008(FauxSpiDev()).lire_bloc(range(8), 100)
+    attendu = [[valeur_simulee(c, i * 8 + c) for c in range(8)] for i in range(100)]
+    if valeurs.tolist() != attendu:
+        print("✗ Décodage par lot incorrect")
+        return False
+    print("✓ Décodage par lot identique au décodage par échantillon (8 canaux x 100 balayages)")
+    return True
+
+
+def main():
+    """Fonction principale"""
+    print("\n╔═══════════════════════════════════════════════════════════╗")
+    print("║          SalleSense - Benchmark lecture MCP3008          ║")
+    print("╚═══════════════════════════════════════════════════════════╝")
+
+    if "--materiel" in sys.argv:
+        import spidev
+        spi = spidev.SpiDev()
+        spi.open(SPI_BUS, SPI_DEVICE)
+        spi.max_speed_hz = 1350000
+        try:
+            comparer(spi, LecteurMCP3008(spi), f"Vrai MCP3008 (SPI {SPI_BUS}.{SPI_DEVICE})")
+        finally:
+            spi.close()
+        return 0
+
+    # Bus simulé: le faux ioctl remplace fcntl.ioctl dans mcp3008
+    mcp3008.ioctl = faux_ioctl
+    mcp3008.IOCTL_AVAILABLE = True
+
+    if not verifier_decodage():
+        return 1
+
+    comparer(FauxSpiDev(avec_ioctl=False), LecteurMCP3008(FauxSpiDev(avec_ioctl=False)),
+             "Faux spidev sans ioctl (lots envoyés trame par trame)")
+    comparer(FauxSpiDev(), LecteurMCP3008(FauxSpiDev()),
+             "Faux spidev avec ioctl SPI_IOC_MESSAGE simulé")
+    print("\n⚠ Bus simulé: seul le coût Python est mesuré (voir --materiel sur le Pi)\n")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,144 @@
+"""
+Cache en mémoire des tables de référence (Capteur, Salle)
+Ces tables changent rarement: inutile de les relire ou de les joindre à chaque requête
+"""
+
+import re
+import threading
+import time
+from collections import namedtuple
+from typing import Dict, Optional, Tuple
+
+
+Capteur = namedtuple('Capteur', ['id', 'nom', 'type'])
+Salle = namedtuple('Salle', ['id', 'numero', 'capacite'])
+
+# Écritures qui rendent le cache obsolète (détectées dans execute_non_query)
+_ECRITURE_REFERENCE = re.compile(r"\b(INSERT\s+INTO|UPDATE|DELETE\s+FROM)\s+(?:dbo\.)?(Capteur|Salle)\b",
+                                 re.IGNORECASE)
+
+
+class CacheReference:
+    """Capteurs et salles chargés d'un coup, rechargés après ttl secondes ou sur invalidation"""
+
+    def __init__(self, db_connection, ttl: float = 300.0):
+        """
+        Args:
+            db_connection: Connexion à la base de données (DatabaseConnection)
+            ttl: Durée de vie des données en secondes (défaut: 5 minutes)
+        """
+        self.db = db_connection
+        self.ttl = ttl
+
+        self._capteurs: Dict[int, Capteur] = {}
+        self._capteurs_par_type: Dict[str, Tuple[int, ...]] = {}
+        self._salles: Dict[int, Salle] = {}
+        self._expiration = {'Capteur': 0.0, 'Salle': 0.0}
+        self._verrou = threading.Lock()
+
+    def invalider(self, table: Optional[str] = None):
+        """
+        Force le rechargement au prochain accès
+
+        Args:
+            table: 'Capteur' ou 'Salle' (None: les deux)
+        """
+        with self._verrou:
+            for nom in ([table] if table else list(self._expiration)):
+                self._expiration[nom] = 0.0
+
+    def invalider_si_ecriture(self, query: str):
+        """Invalide la table concernée si la requête modifie Capteur ou Salle"""
+        correspondance = _ECRITURE_REFERENCE.search(query)
+        if correspondance:
+            self.invalider(correspondance.group(2).capitalize())
+
+    def capteur(self, id_capteur: int) -> Optional[Capteur]:
+        """Retourne le capteur (id, nom, type), ou None s'il n'existe pas"""
+        self._charger_capteurs()
+        return self._capteurs.get(id_capteur)
+
+    def capteurs(self) -> Dict[int, Capteur]:
+        """Retourne tous les capteurs indexés par ID"""
+        self._charger_capteurs()
+        return dict(self._capteurs)
+
+    def capteur_nomme(self, nom: str) -> Optional[Capteur]:
+        """Retourne le capteur portant ce nom (ex: 'TMP-1'), ou None s'il n'existe pas"""
+        self._charger_capteurs()
+        return next((c for c in self._capteurs.values() if c.nom == nom), None)
+
+    def ids_capteurs(self, type_capteur: str) -> Tuple[int, ...]:
+        """Retourne les IDs des capteurs d'un type (BRUIT, CAMERA, ...), en ordre croissant"""
+        self._charger_capteurs()
+        return self._capteurs_par_type.get(type_capteur, ())
+
+    def premier_capteur(self, type_capteur: str) -> Optional[int]:
+        """Retourne l'ID du premier capteur d'un type, ou None s'il n'y en a aucun"""
+        ids = self.ids_capteurs(type_capteur)
+        return ids[0] if ids else None
+
+    def filtre_capteurs(self, type_capteur: str, colonne: str = "d.idCapteur") -> str:
+        """
+        Construit un filtre SQL sur les capteurs d'un type, sans jointure sur Capteur
+
+        Les IDs sont des entiers lus dans la BD: ils sont insérés tels quels dans la requête.
+
+        Args:
+            type_capteur: Type de capteur (BRUIT, CAMERA, ...)
+            colonne: Colonne à filtrer (défaut: d.idCapteur)
+
+        Returns:
+            Ex: 'd.idCapteur IN (1, 4)' ou '1 = 0' si aucun capteur de ce type
+        """
+        ids = self.ids_capteurs(type_capteur)
+        if not ids:
+            return "1 = 0"
+        return f"{colonne} IN ({', '.join(str(int(i)) for i in ids)})"
+
+    def salle(self, id_salle: int) -> Optional[Salle]:
+        """Retourne la salle (id, numero, capacite), ou None si elle n'existe pas"""
+        self._charger_salles()
+        return self._salles.get(id_salle)
+
+    def salles(self) -> Dict[int, Salle]:
+        """Retourne toutes les salles indexées par ID"""
+        self._charger_salles()
+        return dict(self._salles)
+
+    def _expiree(self, table: str) -> bool:
+        return time.monotonic() >= self._expiration[table]
+
+    def _charger_capteurs(self):
+        """Recharge la table Capteur si elle est expirée"""
+        with self._verrou:
+            if not self._expiree('Capteur'):
+                return
+
+            lignes = self.db.execute_query("SELECT idCapteur_PK, nom, type FROM Capteur")
+            if not lignes and self._capteurs:
+                # Erreur probable (execute_query retourne [] en cas d'échec): garder l'ancienne
+                # version et réessayer au prochain accès
+                return
+
+            capteurs = {ligne[0]: Capteur(*ligne) for ligne in lignes}
+            par_type = {}
+            for capteur in sorted(capteurs.values()):
+                par_type.setdefault(capteur.type, []).append(capteur.id)
+
+            self._capteurs = capteurs
+            self._capteurs_par_type = {t: tuple(ids) for t, ids in par_type.items()}
+            self._expiration['Capteur'] = time.monotonic() + self.ttl
+
+    def _charger_salles(self):
+        """Recharge la table Salle si elle est expirée"""
+        with self._verrou:
+            if not self._expiree('Salle'):
+                return
+
+            lignes = self.db.execute_query("SELECT idSalle_PK, numero, capaciteMaximale FROM Salle")
+            if not lignes and self._salles:
+                return
+
+            self._salles = {ligne[0]: Salle(*ligne) for ligne in lignes}
+            self._expiration['Salle'] = time.monotonic() + self.ttl
@@ -0,0 +1,145 @@
+"""
+Cadence adaptative des mesures de son
+Peu d'écritures quand la salle est calme et stable (la nuit), une mesure toutes
+les fractions de seconde quand le niveau approche du seuil de bruit fort
+"""
+
+import math
+import statistics
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Optional
+
+
+# Modes de la cadence
+RAPIDE = 'RAPIDE'
+NORMAL = 'NORMAL'
+CALME = 'CALME'
+
+
+class CadenceAdaptative:
+    """
+    Choisit l'attente entre deux mesures et les mesures à écrire en BD
+
+    - RAPIDE: niveau à moins de marge_rapide dB du seuil, ou incident en cours:
+      une mesure écrite toutes les intervalle_min secondes
+    - CALME: les nb_stables dernières mesures sont loin sous le seuil et stables:
+      l'intervalle entre deux écritures double à chaque écriture, jusqu'à intervalle_max
+      (la mesure écrite est le Leq des mesures depuis la précédente écriture)
+    - NORMAL sinon: une mesure écrite toutes les intervalle secondes
+
+    Le niveau est toujours mesuré au moins toutes les intervalle secondes:
+    un bruit fort est vu aussi vite la nuit que le jour.
+    """
+
+    def __init__(self, seuil: float, intervalle: float = 1.0, intervalle_min: float = 0.25,
+                 intervalle_max: float = 30.0, marge_rapide: float = 5.0,
+                 marge_calme: float = 15.0, ecart_stable: float = 2.0, nb_stables: int = 30):
+        """
+        Args:
+            seuil: Seuil de bruit fort (dB)
+            intervalle: Secondes entre deux mesures en mode normal (défaut: 1)
+            intervalle_min: Secondes entre deux mesures en mode rapide (défaut: 0.25)
+            intervalle_max: Secondes max entre deux écritures en mode calme (défaut: 30)
+            marge_rapide: Passage en mode rapide à seuil - marge_rapide dB (défaut: 5)
+            marge_calme: Mode calme seulement sous seuil - marge_calme dB (défaut: 15)
+            ecart_stable: Écart-type max (dB) des dernières mesures en mode calme (défaut: 2)
+            nb_stables: Mesures récentes qui doivent être calmes et stables (défaut: 30)
+        """
+        self.seuil = seuil
+        self.intervalle_base = intervalle
+        self.intervalle_min = min(intervalle_min, intervalle)
+        self.intervalle_max = max(intervalle_max, intervalle)
+        self.marge_rapide = marge_rapide
+        self.marge_calme = marge_calme
+        self.ecart_stable = ecart_stable
+
+        self.mode = NORMAL
+        self.intervalle = intervalle    # Secondes visées entre deux écritures
+
+        self._recents = deque(maxlen=nb_stables)
+        self._dernier_envoi: Optional[datetime] = None
+        self._energie = 0.0
+        self._nb = 0
+
+        # Statistiques
+        self.compteur_mesures = 0
+        self.compteur_envois = 0
+        self.compteur_changements = 0
+
+    @property
+    def attente(self) -> float:
+        """Secondes à attendre avant la prochaine mesure"""
+        return min(self.intervalle, self.intervalle_base)
+
+    def ajouter(self, date_heure: datetime, niveau: float, incident: bool = False) -> Optional[float]:
+        """
+        Prend en compte une mesure et décide si elle doit être écrite
+
+        Args:
+            date_heure: Heure de la mesure
+            niveau: Niveau sonore (dB)
+            incident: True si un épisode de bruit fort est en cours ou vient de changer
+                      d'état (mode rapide, mesure écrite aussitôt)
+
+        Returns:
+            Niveau à écrire (Leq des mesures depuis la dernière écriture), ou None
+        """
+        self.compteur_mesures += 1
+        self._recents.append(niveau)
+        self._energie += 10 ** (niveau / 10)
+        self._nb += 1
+
+        ancien_intervalle = self.intervalle
+        self._changer_mode(self._choisir_mode(niveau, incident))
+
+        du = (incident or self._dernier_envoi is None or self.intervalle < ancien_intervalle
+              or date_heure - self._dernier_envoi >= timedelta(seconds=self.intervalle - self.attente / 2))
+        if not du:
+            return None
+
+        leq = 10 * math.log10(self._energie / self._nb)
+        self._energie = 0.0
+        self._nb = 0
+        self._dernier_envoi = date_heure
+        self.compteur_envois += 1
+
+        # Calme qui dure: espacer encore les écritures
+        if self.mode == CALME and self.intervalle < self.intervalle_max:
+            self._changer_intervalle(min(self.intervalle * 2, self.intervalle_max))
+        return leq
+
+    def resume(self) -> str:
+        """Résumé des écritures évitées"""
+        evitees = self.compteur_mesures - self.compteur_envois
+        pourcentage = 100.0 * evitees / self.compteur_mesures if self.compteur_mesures else 0.0
+        return (f"{self.compteur_envois}/{self.compteur_mesures} mesures écrites "
+                f"({pourcentage:.0f}% évitées), {self.compteur_changements} changement(s) de cadence")
+
+    def _choisir_mode(self, niveau: float, incident: bool) -> str:
+        if incident or niveau >= self.seuil - self.marge_rapide:
+            return RAPIDE
+
+        if (len(self._recents) == self._recents.maxlen
+                and max(self._recents) <= self.seuil - self.marge_calme
+                and statistics.pstdev(self._recents) <= self.ecart_stable):
+            return CALME
+        return NORMAL
+
+    def _changer_mode(self, mode: str):
+        if mode == self.mode:
+            return
+        self.mode = mode
+        if mode == RAPIDE:
+            self._changer_intervalle(self.intervalle_min)
+        elif mode == NORMAL or self.intervalle < self.intervalle_base:
+            # CALME repart de l'intervalle normal puis double à chaque écriture
+            self._changer_intervalle(self.intervalle_base)
+
+    def _changer_intervalle(self, intervalle: float):
+        if intervalle == self.intervalle:
+            return
+        print(f"⏱ Cadence {self.mode}: une mesure écrite toutes les {intervalle:g}s "
+              f"(au lieu de {self.intervalle:g}s)")
+        self.intervalle = intervalle
+        self.compteur_changements += 1
@@ -1,13 +1,29 @@
 """
 Script de capture continue de photos avec la Pi Camera
-Les photos sont prises toutes les 5 secondes et envoyées vers la BD
+Les photos sont prises quand la scène change (détection de mouvement sur le flux
+basse résolution), au plus toutes les 5 secondes, plus une image de contrôle
+périodique, et envoyées vers la BD
+Une photo presque identique à la dernière photo envoyée (hash perceptuel) est ignorée;
+chaque photo envoyée part avec sa miniature (galerie)
 """
 
+import os
 import time
 from datetime import datetime
-from io import BytesIO
+from typing import Optional
 from db_connection import DatabaseConnection
-from config import DB_SERVER, DB_NAME, DB_USERNAME, DB_PASSWORD, ID_SALLE
+from spool import SpoolLocal, ExpediteurSpool
+from db_stats import formater_stats
+from session_camera import SessionCamera
+from detection_mouvement import DetecteurMouvement
+from hash_perceptuel import dhash, distance_hamming, enregistrer_hash
+from miniatures import miniatures_jpeg, enregistrer_miniatures
+from config import (DB_SERVER, DB_NAME, DB_USERNAME, DB_PASSWORD, ID_SALLE, SPOOL_ACTIF, SPOOL_DIR,
+                    DB_SEUIL_REQUETE_LENTE, DB_JOURNAL_REQUETES_LENTES, PHOTO_WIDTH, PHOTO_HEIGHT,
+                    CAMERA_TAILLE_LORES, MOUVEMENT_ACTIF, MOUVEMENT_SENSIBILITE, MOUVEMENT_SEUIL_PIXEL,
+                    MOUVEMENT_INTERVALLE_ANALYSE, PHOTO_INTERVALLE_CONTROLE, PHOTO_DEDOUBLONNAGE,
+                    PHOTO_DISTANCE_HAMMING_MAX, MINIATURE_TAILLE, MINIATURE_TAILLE_APERCU,
+                    MINIATURE_QUALITE)
 
 try:
     from picamera2 import Picamera2
@@ -20,69 +36,100 @@ except ImportError:
 class CapturePhotosContinu:
     """Capture des photos en continu et les envoie vers la BD"""
 
-    def __init__(self, db_connection: DatabaseConnection, id_salle: int, intervalle: int = 5):
+    def __init__(self, db_connection: DatabaseConnection, id_salle: int, intervalle: int = 5,
+                 spool: Optional[SpoolLocal] = None, mouvement: bool = False,
+                 intervalle_analyse: float = 0.5, intervalle_controle: float = 600.0,
+                 dedoublonnage: bool = False, distance_max: int = 5):
         """
         Initialise le système de capture
 
         Args:
             db_connection: Connexion à la base de données
             id_salle: ID de la salle à monitorer
-            intervalle: Intervalle en secondes entre chaque photo (défaut: 5)
+            intervalle: Intervalle en secondes entre chaque photo (défaut: 5);
+                        avec mouvement, intervalle minimal entre deux photos
+            spool: Spool local où écrire d'abord les photos (None: envoi direct vers la BD)
+            mouvement: True pour ne garder que les photos où la scène change (voir detection_mouvement)
+            intervalle_analyse: Secondes entre deux analyses du flux lores si mouvement (défaut: 0.5)
+            intervalle_controle: Secondes max sans photo si mouvement: image de contrôle (défaut: 600)
+            dedoublonnage: True pour ignorer les photos presque identiques à la dernière envoyée
+                           (sauf après intervalle_controle secondes sans photo)
+            distance_max: Distance de Hamming (bits sur 64) jusqu'à laquelle une photo est un doublon
         """
         self.db = db_connection
         self.id_salle = id_salle
         self.intervalle = intervalle
-        self.camera = None
+        self.session_camera = None
         self.id_capteur_camera = None
         self.compteur_photos = 0
 
+        # Photos déclenchées par le mouvement (None: une photo toutes les intervalle secondes)
+        self.detecteur = None
+        if mouvement:
+            self.detecteur = DetecteurMouvement(sensibilite=MOUVEMENT_SENSIBILITE,
+                                                seuil_pixel=MOUVEMENT_SEUIL_PIXEL)
+        self.intervalle_analyse = intervalle_analyse
+        self.intervalle_controle = intervalle_controle
+        self._debut_capture = None
+
+        # Hash perceptuel de chaque photo (colonne Donnees.hashPerceptuel), doublons ignorés
+        self.dedoublonnage = dedoublonnage
+        self.distance_max = distance_max
+        self._dernier_hash = None
+        self.compteur_doublons = 0
+
+        # Store-and-forward: les photos attendent sur la carte SD si la BD est injoignable
+        self.spool = spool
+        self.expediteur = ExpediteurSpool(spool, db_connection, taille_lot=20) if spool else None
+
     def setup(self):
         """Configure la caméra et récupère l'ID du capteur"""
         print("=== Configuration du système de capture ===\n")
 
         # 1. Récupérer l'ID du capteur caméra
         try:
-            capteur = self.db.execute_query(
-                "SELECT idCapteur_PK FROM Capteur WHERE type = 'CAMERA'"
-            )
+            self.id_capteur_camera = self.db.references.premier_capteur('CAMERA')
 
-            if not capteur:
+            if self.id_capteur_camera is None:
                 print("✗ Aucun capteur CAMERA trouvé dans la BD")
                 print("   Lancez d'abord: python initialiser_bd.py")
                 return False
 
-            self.id_capteur_camera = capteur[0][0]
             print(f"✓ Capteur CAMERA trouvé - ID: {self.id_capteur_camera}")
 
         except Exception as e:
             print(f"✗ Erreur lors de la récupération du capteur: {e}")
             return False
 
-        # 2. Initialiser la caméra
-        if CAMERA_AVAILABLE:
-            try:
-                self.camera = Picamera2()
+        # 2. Initialiser la caméra (démarrée une fois: flux main pour les photos, lores pour l'analyse)
+        try:
+            if CAMERA_AVAILABLE:
+                print("⏳ Stabilisation de la caméra (2 secondes)...")
+            else:
+                print("⚠ Mode simulation - Pas de vraie caméra (images simulées)")
+            self.session_camera = SessionCamera(Picamera2() if CAMERA_AVAILABLE else None,
+                                                taille=(PHOTO_WIDTH, PHOTO_HEIGHT),
+                                                taille_lores=CAMERA_TAILLE_LORES)
+            self.session_camera.demarrer()
+            print(f"✓ Pi Camera initialisée ({PHOTO_WIDTH}x{PHOTO_HEIGHT})")
 
-                # Configuration pour capture d'images JPEG
-                config = self.camera.create_still_configuration(
-                    main={"size": (1920, 1080)},  # Résolution Full HD
-                    buffer_count=2
-                )
-                self.camera.configure(config)
-                self.camera.start()
+        except Exception as e:
+            print(f"✗ Erreur lors de l'initialisation de la caméra: {e}")
+            print("   Vérifiez que la caméra est connectée et activée (raspi-config)")
+            return False
 
-                print("✓ Pi Camera initialisée (1920x1080)")
+        if self.detecteur:
+            print(f"✓ Détection de mouvement: {self.detecteur.sensibilite:.1%} des pixels, "
+                  f"analyse toutes les {self.intervalle_analyse:g}s, "
+                  f"image de contrôle toutes les {self.intervalle_controle:g}s")
+        if self.dedoublonnage:
+            print(f"✓ Doublons ignorés: hash perceptuel à {self.distance_max} bits ou moins "
+                  f"de la dernière photo")
 
-                # Temps de stabilisation de la caméra
-                print("⏳ Stabilisation de la caméra (2 secondes)...")
-                time.sleep(2)
-
-            except Exception as e:
-                print(f"✗ Erreur lors de l'initialisation de la caméra: {e}")
-                print("   Vérifiez que la caméra est connectée et activée (raspi-config)")
-                return False
-        else:
-            print("⚠ Mode simulation - Pas de vraie caméra")
+        # 3. Démarrer l'expédition du spool local
+        if self.expediteur:
+            self.expediteur.demarrer()
+            print(f"✓ Spool local: {self.spool.chemin} ({self.spool.en_attente()} en attente)")
 
         print("\n✓ Configuration terminée\n")
         return True
@@ -92,54 +139,105 @@ class CapturePhotosContinu:
         Capture une photo et la retourne sous forme de bytes (JPEG)
 
         Returns:
-            Données binaires de la photo (JPEG)
+            Données binaires de la photo (JPEG), None si erreur
         """
-        if CAMERA_AVAILABLE and self.camera:
-            try:
-                # Capturer l'image en mémoire (format JPEG)
-                buffer = BytesIO()
-                self.camera.capture_file(buffer, format='jpeg')
-                photo_bytes = buffer.getvalue()
-                buffer.close()
+        # Caméra déjà démarrée: la photo est prise sur le flux actif
+        return self.session_camera.photo_jpeg()
 
-                return photo_bytes
+    MOTIF_CONTROLE = "image de contrôle"
 
-            except Exception as e:
-                print(f"✗ Erreur lors de la capture: {e}")
-                return None
-        else:
-            # Mode simulation - Créer des données factices
-            return b"PHOTO_SIMULEE_" + str(datetime.now()).encode()
+    def motif_photo(self, derniere_photo: Optional[float]) -> Optional[str]:
+        """
+        Analyse l'image lores et décide si une photo doit être gardée
 
-    def envoyer_photo_bd(self, photo_bytes: bytes) -> bool:
+        Args:
+            derniere_photo: Instant (time.monotonic) de la dernière photo gardée, None si aucune
+
+        Returns:
+            Motif de la photo (pour la description), ou None s'il n'y a rien à garder
+        """
+        mouvement, proportion = self.detecteur.analyser(self.session_camera.image_lores())
+        ecoule = None if derniere_photo is None else time.monotonic() - derniere_photo
+
+        if mouvement and (ecoule is None or ecoule >= self.intervalle):
+            return f"mouvement ({proportion:.1%} de l'image)"
+        if ecoule is None or ecoule >= self.intervalle_controle:
+            return self.MOTIF_CONTROLE
+        return None
+
+    def hash_photo(self) -> int:
+        """Hash perceptuel de l'image actuelle (flux lores, pris au même instant que la photo)"""
+        return dhash(self.session_camera.image_lores())
+
+    def distance_doublon(self, hash_photo: int, derniere_photo: Optional[float]) -> Optional[int]:
+        """
+        Compare une photo à la dernière photo envoyée
+
+        Args:
+            hash_photo: Hash perceptuel de la nouvelle photo
+            derniere_photo: Instant (time.monotonic) de la dernière photo envoyée, None si aucune
+
+        Returns:
+            Distance de Hamming si la photo est un doublon à ignorer, None sinon
+        """
+        if self._dernier_hash is None or derniere_photo is None:
+            return None
+        # Une photo au moins toutes les intervalle_controle secondes, même identique
+        if time.monotonic() - derniere_photo >= self.intervalle_controle:
+            return None
+        distance = distance_hamming(hash_photo, self._dernier_hash)
+        return distance if distance <= self.distance_max else None
+
+    def envoyer_photo_bd(self, photo_bytes: bytes, motif: Optional[str] = None,
+                         hash_photo: Optional[int] = None) -> bool:
         """
         Envoie la photo vers la base de données
 
         Args:
             photo_bytes: Données binaires de la photo
+            motif: Raison de la photo (mouvement, image de contrôle), ajoutée à la description
+            hash_photo: Hash perceptuel, écrit dans Donnees.hashPerceptuel (optionnel)
 
         Returns:
             True si succès, False sinon
         """
         try:
             date_heure = datetime.now()
+            description = f'Photo capturée à {date_heure.strftime("%H:%M:%S")}'
+            if motif:
+                description += f" - {motif}"
+
+            # Miniature pour la galerie (JPEG décodé à échelle réduite, quelques ms)
+            miniatures = miniatures_jpeg(photo_bytes, MINIATURE_TAILLE, MINIATURE_TAILLE_APERCU,
+                                         MINIATURE_QUALITE)
+
+            if self.spool:
+                # Écriture locale, l'expéditeur envoie vers la BD en arrière-plan
+                id_local = self.spool.ajouter(
+                    date_heure, self.id_capteur_camera, self.id_salle, blob=photo_bytes,
+                    type_evenement='CAPTURE', description=description, hash_perceptuel=hash_photo,
+                    miniatures=miniatures
+                )
+                self.compteur_photos += 1
+                print(f"[{date_heure.strftime('%H:%M:%S')}] Photo #{self.compteur_photos} mise en spool "
+                      f"({len(photo_bytes) / 1024:.1f} KB) - ID local: {id_local}")
+                return True
+
+            # Insérer la photo, son événement CAPTURE, son hash et sa miniature en une transaction
+            with self.db.transaction() as transaction:
+                ids = self.db.insert_donnee_avec_evenement(
+                    date_heure, self.id_capteur_camera, self.id_salle,
+                    'CAPTURE', description,
+                    blob=photo_bytes
+                )
+                if ids and hash_photo is not None:
+                    enregistrer_hash(self.db, ids[0], hash_photo)
+                if ids and miniatures:
+                    enregistrer_miniatures(self.db, ids[0], miniatures)
+            if ids is None or not transaction.validee:
+                return False
 
-            # Insérer la photo dans la BD
-            self.db.execute_non_query(
-                """INSERT INTO Donnees (dateHeure, idCapteur, mesure, photoBlob, noSalle)
-                   VALUES (?, ?, NULL, ?, ?)""",
-                (date_heure, self.id_capteur_camera, photo_bytes, self.id_salle)
-            )
-
-            # Récupérer l'ID de la donnée insérée
-            id_donnee = self.db.execute_query("SELECT @@IDENTITY AS id")[0][0]
-
-            # Créer un événement
-            self.db.execute_non_query(
-                """INSERT INTO Evenement (type, idDonnee, description)
-                   VALUES (?, ?, ?)""",
-                ('CAPTURE', id_donnee, f'Photo capturée à {date_heure.strftime("%H:%M:%S")}')
-            )
+            id_donnee = ids[0]
 
             self.compteur_photos += 1
             taille_kb = len(photo_bytes) / 1024
@@ -158,37 +256,78 @@ class CapturePhotosContinu:
         print("╔═══════════════════════════════════════════════════════════╗")
         print("║      Capture de photos en continu - Pi Camera V2         ║")
         print("╚═══════════════════════════════════════════════════════════╝\n")
-        print(f"📷 Intervalle: {self.intervalle} secondes")
+        if self.detecteur:
+            print(f"📷 Photos sur mouvement (au plus toutes les {self.intervalle} secondes)")
+        else:
+            print(f"📷 Intervalle: {self.intervalle} secondes")
         print(f"🏢 Salle: {self.id_salle}")
         print(f"💾 Stockage: Base de données (VARBINARY)")
         print("\nAppuyez sur Ctrl+C pour arrêter\n")
         print("─" * 63)
 
+        self._debut_capture = time.monotonic()
+        derniere_photo = None
         try:
             while True:
-                # Capturer la photo
-                photo_bytes = self.capturer_photo()
-
-                if photo_bytes:
-                    # Envoyer vers la BD
-                    self.envoyer_photo_bd(photo_bytes)
-                else:
-                    print("✗ Échec de la capture")
-
-                # Attendre avant la prochaine capture
-                time.sleep(self.intervalle)
+                # Sans détection de mouvement: une photo à chaque tour
+                motif = self.motif_photo(derniere_photo) if self.detecteur else None
+
+                if motif or not self.detecteur:
+                    # Doublon de la dernière photo envoyée: ni capture ni envoi
+                    # Jamais pour une photo sur mouvement: une personne qui traverse la salle
+                    # change à peine le hash (grille 8x8), le détecteur a déjà jugé la scène
+                    hash_photo = self.hash_photo() if self.dedoublonnage else None
+                    distance = None
+                    if hash_photo is not None and motif in (None, self.MOTIF_CONTROLE):
+                        distance = self.distance_doublon(hash_photo, derniere_photo)
+
+                    if distance is not None:
+                        self.compteur_doublons += 1
+                        print(f"[{datetime.now().strftime('%H:%M:%S')}] Photo ignorée: identique "
+                              f"à la précédente ({distance} bit(s) d'écart)")
+                    else:
+                        # Capturer la photo
+                        photo_bytes = self.capturer_photo()
+
+                        if photo_bytes:
+                            # Envoyer vers la BD (une photo non stockée ne retarde pas la suivante)
+                            if self.envoyer_photo_bd(photo_bytes, motif, hash_photo):
+                                self._dernier_hash = hash_photo
+                                derniere_photo = time.monotonic()
+                        else:
+                            print("✗ Échec de la capture")
+
+                # Attendre avant la prochaine analyse ou capture
+                time.sleep(self.intervalle_analyse if self.detecteur else self.intervalle)
 
         except KeyboardInterrupt:
             print("\n\n─" * 63)
             print(f"\n✓ Arrêt demandé - {self.compteur_photos} photos capturées")
+            if self.detecteur:
+                # Photos qu'aurait prises la capture à intervalle fixe
+                fixes = int((time.monotonic() - self._debut_capture) / self.intervalle) + 1
+                print(f"✓ Détection de mouvement: {self.detecteur.compteur_mouvements}/"
+                      f"{self.detecteur.compteur_images} images analysées avec mouvement, "
+                      f"{self.compteur_photos} photo(s) gardée(s) au lieu de {fixes}")
+            if self.dedoublonnage:
+                print(f"✓ Doublons: {self.compteur_doublons} photo(s) presque identique(s) non envoyée(s)")
             print("✓ Programme terminé")
 
     def cleanup(self):
-        """Nettoie les ressources (caméra)"""
-        if self.camera:
+        """Nettoie les ressources (spool, caméra)"""
+        if self.expediteur:
+            self.expediteur.arreter()
+            self.spool.fermer()
+            print(f"✓ Spool: {self.expediteur.compteur_expedies} photo(s) expédiée(s)")
+
+        # Temps passé par requête (diagnostic de lenteur)
+        print("\n📊 Requêtes SQL:")
+        print(formater_stats(self.db.stats()))
+
+        if self.session_camera:
             try:
-                self.camera.stop()
-                self.camera.close()
+                print(f"✓ Caméra: {self.session_camera.resume()}")
+                self.session_camera.arreter()
                 print("✓ Caméra fermée proprement")
             except:
                 pass
@@ -201,14 +340,22 @@ def main():
     print("╚═══════════════════════════════════════════════════════════╝\n")
 
     # Connexion à la base de données
-    db = DatabaseConnection(DB_SERVER, DB_NAME, DB_USERNAME, DB_PASSWORD)
+    db = DatabaseConnection(DB_SERVER, DB_NAME, DB_USERNAME, DB_PASSWORD,
+                            seuil_requete_lente=DB_SEUIL_REQUETE_LENTE,
+                            journal_requetes_lentes=DB_JOURNAL_REQUETES_LENTES)
 
     if not db.connect():
         print("\n✗ Impossible de se connecter à la base de données")
         return 1
 
     # Créer le système de capture
-    capture_system = CapturePhotosContinu(db, ID_SALLE, intervalle=5)
+    spool = SpoolLocal(os.path.join(SPOOL_DIR, "capture_photos.db")) if SPOOL_ACTIF else None
+    capture_system = CapturePhotosContinu(db, ID_SALLE, intervalle=5, spool=spool,
+                                          mouvement=MOUVEMENT_ACTIF,
+                                          intervalle_analyse=MOUVEMENT_INTERVALLE_ANALYSE,
+                                          intervalle_controle=PHOTO_INTERVALLE_CONTROLE,
+                                          dedoublonnage=PHOTO_DEDOUBLONNAGE,
+                                          distance_max=PHOTO_DISTANCE_HAMMING_MAX)
 
     # Configuration
     if not capture_system.setup():
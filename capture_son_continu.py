@@ -3,25 +3,38 @@ Script de capture continue du son avec micro électret + MCP3008
 Les mesures sont prises toutes les secondes et envoyées vers la BD
 """
 
-import spidev
+import os
 import time
 from datetime import datetime
+from typing import Optional
 from db_connection import DatabaseConnection
-from config import DB_SERVER, DB_NAME, DB_USERNAME, DB_PASSWORD, ID_SALLE
-
-try:
-    import spidev
-    SPI_AVAILABLE = True
-except ImportError:
-    print("⚠ spidev non disponible - mode simulation")
-    SPI_AVAILABLE = False
+from batch_writer import BatchWriter
+from spool import SpoolLocal, ExpediteurSpool
+from db_stats import formater_stats
+from pipeline_son import PipelineSon
+from detection_episodes import DEBUT, SUITE
+from agregation import AgregateurMesures
+from cadence_adaptative import CadenceAdaptative
+from caracteristiques_son import Classification, en_dict, enregistrer_classification
+from config import (DB_SERVER, DB_NAME, DB_USERNAME, DB_PASSWORD, ID_SALLE,
+                    BATCH_TAILLE_MAX, BATCH_AGE_MAX, SPOOL_ACTIF, SPOOL_DIR,
+                    DB_SEUIL_REQUETE_LENTE, DB_JOURNAL_REQUETES_LENTES,
+                    SEUIL_BRUIT_FORT, SEUIL_FIN_BRUIT_FORT,
+                    AGREGATS_ACTIFS, RETENTION_BRUTES_JOURS, CADENCE_ADAPTATIVE,
+                    CADENCE_INTERVALLE_MIN, CADENCE_INTERVALLE_MAX, CADENCE_MARGE_RAPIDE,
+                    CADENCE_MARGE_CALME, CLIP_AUDIO_ACTIF, CLASSIFICATION_ACTIVE)
 
 
 class CaptureSonContinu:
     """Capture du son en continu avec micro électret + MCP3008"""
 
     def __init__(self, db_connection: DatabaseConnection, id_salle: int,
-                 intervalle: int = 1, seuil_bruit_fort: float = 50.0):
+                 intervalle: int = 1, seuil_bruit_fort: float = 50.0,
+                 seuil_fin_bruit_fort: Optional[float] = None,
+                 taille_lot: int = 50, age_max_lot: float = 10.0,
+                 spool: Optional[SpoolLocal] = None, agregats: bool = False,
+                 retention_brutes: Optional[float] = None, cadence_adaptative: bool = False,
+                 clips_audio: bool = False, classification: bool = False):
         """
         Initialise le système de capture audio
 
@@ -29,233 +42,206 @@ class CaptureSonContinu:
             db_connection: Connexion à la base de données
             id_salle: ID de la salle à monitorer
             intervalle: Intervalle en secondes entre chaque mesure (défaut: 1)
-            seuil_bruit_fort: Seuil pour déclencher événement BRUIT_FORT (défaut: 50.0)
+            seuil_bruit_fort: Seuil qui ouvre un épisode BRUIT_FORT (défaut: 50.0)
+            seuil_fin_bruit_fort: Seuil sous lequel l'épisode se termine (défaut: seuil - 5)
+            taille_lot: Nombre de mesures envoyées ensemble vers la BD (défaut: 50)
+            age_max_lot: Secondes max avant l'envoi d'un lot incomplet (défaut: 10)
+            spool: Spool local où écrire d'abord les mesures (None: envoi direct vers la BD)
+            agregats: True pour écrire aussi les agrégats par minute et par quart d'heure
+            retention_brutes: Jours de mesures brutes gardées en BD si agregats (None: toutes)
+            cadence_adaptative: True pour espacer les écritures quand la salle est calme
+                                et les resserrer près du seuil (voir cadence_adaptative)
+            clips_audio: True pour enregistrer un clip audio (avant et après le déclenchement)
+                         de chaque épisode, lié à un capteur AUDIO
+            classification: True pour classer chaque épisode (voix, claquement, ventilation)
+                            d'après le spectre des mesures (voir caracteristiques_son)
         """
         self.db = db_connection
         self.id_salle = id_salle
         self.intervalle = intervalle
         self.seuil_bruit_fort = seuil_bruit_fort
 
-        self.spi = None
-        self.id_capteur_bruit = None
-        self.compteur_mesures = 0
+        # Envoi des mesures par lots (une transaction par lot)
+        self.batch_writer = BatchWriter(db_connection, taille_max=taille_lot, age_max=age_max_lot)
 
-        # Paramètres ADC MCP3008
-        self.adc_channel = 0  # Canal 0 pour le micro
-        self.spi_bus = 0
-        self.spi_device = 0
-        self.spi_speed = 1350000
+        # Store-and-forward: le spool est vidé vers la BD en arrière-plan (par lots aussi)
+        self.spool = spool
+        self.expediteur = ExpediteurSpool(spool, db_connection, taille_lot=taille_lot) if spool else None
 
-        # Calibration
-        self.valeur_repos = None
-        self.est_calibre = False
+        # Chaîne audio commune (ADC, niveau, épisodes BRUIT_FORT, clips, classification)
+        self.son = PipelineSon(db_connection, id_salle, seuil_bruit_fort, seuil_fin_bruit_fort,
+                               spool=spool, clips_audio=clips_audio, classification=classification)
+        self.detecteur = self.son.detecteur
 
-    def setup(self):
-        """Configure le MCP3008 et récupère l'ID du capteur"""
-        print("=== Configuration du système de capture audio ===\n")
+        # Agrégats par minute et par quart d'heure (créés dans setup, avec l'ID du capteur)
+        self.agregats = agregats
+        self.retention_brutes = retention_brutes
+        self.agregateur = None
 
-        # 1. Récupérer l'ID du capteur de bruit
-        try:
-            capteur = self.db.execute_query(
-                "SELECT idCapteur_PK FROM Capteur WHERE type = 'BRUIT'"
-            )
+        # Cadence des mesures: intervalle fixe, ou adaptée au niveau sonore
+        self.cadence = None
+        if cadence_adaptative:
+            self.cadence = CadenceAdaptative(seuil_bruit_fort, intervalle=intervalle,
+                                             intervalle_min=CADENCE_INTERVALLE_MIN,
+                                             intervalle_max=CADENCE_INTERVALLE_MAX,
+                                             marge_rapide=CADENCE_MARGE_RAPIDE,
+                                             marge_calme=CADENCE_MARGE_CALME)
 
-            if not capteur:
-                print("✗ Aucun capteur BRUIT trouvé dans la BD")
-                print("   Lancez d'abord: python initialiser_bd.py")
-                return False
+        self.id_capteur_bruit = None
+        self.compteur_mesures = 0
 
-            self.id_capteur_bruit = capteur[0][0]
-            print(f"✓ Capteur BRUIT trouvé - ID: {self.id_capteur_bruit}")
+    def setup(self):
+        """Configure le MCP3008 et récupère l'ID du capteur"""
+        print("=== Configuration du système de capture audio ===\n")
 
-        except Exception as e:
-            print(f"✗ Erreur lors de la récupération du capteur: {e}")
+        # 1. Capteurs, MCP3008 et acquisition continue (micro + capteurs analogiques)
+        if not self.son.demarrer():
             return False
+        self.id_capteur_bruit = self.son.id_capteur_bruit
 
-        # 2. Initialiser le SPI et MCP3008
-        if SPI_AVAILABLE:
-            try:
-                self.spi = spidev.SpiDev()
-                self.spi.open(self.spi_bus, self.spi_device)
-                self.spi.max_speed_hz = self.spi_speed
-                print(f"✓ MCP3008 initialisé (SPI {self.spi_bus}.{self.spi_device})")
-
-                # Calibration
-                if self.calibrer():
-                    print(f"✓ Calibration terminée - Valeur repos: {self.valeur_repos}")
-                else:
-                    print("⚠ Calibration échouée - Utilisation de valeur par défaut")
-                    self.valeur_repos = 512
-                    self.est_calibre = False
-
-            except Exception as e:
-                print(f"✗ Erreur lors de l'initialisation du MCP3008: {e}")
-                print("   Vérifiez que le SPI est activé (raspi-config)")
-                return False
+        # 2. Démarrer l'envoi (spool local ou lots en mémoire)
+        if self.expediteur:
+            self.expediteur.demarrer()
+            print(f"✓ Spool local: {self.spool.chemin} ({self.spool.en_attente()} en attente)")
         else:
-            print("⚠ Mode simulation - Pas de vrai MCP3008")
-            self.valeur_repos = 512
+            self.batch_writer.demarrer()
+            print(f"✓ Envoi par lots: {self.batch_writer.taille_max} mesures "
+                  f"ou {self.batch_writer.age_max}s max")
+
+        if self.agregats:
+            self.agregateur = AgregateurMesures(self.db, self.id_capteur_bruit, self.id_salle,
+                                                retention_brutes=self.retention_brutes)
+            self.agregateur.demarrer()
+            retention = ("toutes" if self.retention_brutes is None
+                         else f"{self.retention_brutes} jour(s)")
+            print(f"✓ Agrégats 1 min / 15 min (mesures brutes gardées: {retention})")
 
         print("\n✓ Configuration terminée\n")
         return True
 
-    def read_adc(self, channel: int) -> int:
+    def envoyer_mesure_bd(self, mesure: dict) -> bool:
         """
-        Lit une valeur du MCP3008
+        Envoie la mesure vers la base de données
+
+        Les mesures fortes ne créent pas chacune un événement: le détecteur d'épisodes
+        regroupe une perturbation entière en un seul BRUIT_FORT, écrit à sa fin avec
+        la mesure qui la termine.
 
         Args:
-            channel: Canal à lire (0-7)
+            mesure: Dictionnaire contenant les données de mesure
 
         Returns:
-            Valeur brute (0-1023)
+            True si succès, False sinon
         """
-        if not SPI_AVAILABLE or self.spi is None:
-            # Mode simulation
-            import random
-            return random.randint(480, 550)
-
-        if channel < 0 or channel > 7:
-            return -1
-
         try:
-            # Commande SPI pour lire le canal
-            adc = self.spi.xfer2([1, (8 + channel) << 4, 0])
-            data = ((adc[1] & 3) << 8) + adc[2]
-            return data
-        except Exception as e:
-            print(f"✗ Erreur lecture ADC: {e}")
-            return -1
+            date_heure = mesure['date_heure']
+            niveau_db = mesure['niveau_db']
 
-    def calibrer(self) -> bool:
-        """
-        Calibre le micro en mesurant la valeur au repos
+            transition, description, classification = self.son.suivre(mesure)
+            if transition in (DEBUT, SUITE):
+                debut_episode = self.detecteur.episode_en_cours().debut.strftime('%H:%M:%S')
+                print(f"         ⚠ BRUIT_FORT détecté! (épisode depuis {debut_episode})")
 
-        Returns:
-            True si succès, False sinon
-        """
-        print("⏳ Calibration... (silence pendant 2 secondes)")
+            if self.agregateur:
+                self.agregateur.ajouter(date_heure, niveau_db)
 
-        try:
-            valeurs_repos = []
-            for i in range(20):
-                valeur = self.read_adc(self.adc_channel)
-                if valeur >= 0:
-                    valeurs_repos.append(valeur)
-                time.sleep(0.1)
-
-            if len(valeurs_repos) > 0:
-                self.valeur_repos = sum(valeurs_repos) // len(valeurs_repos)
-                self.est_calibre = True
-                return True
-            else:
-                return False
+            # Cadence adaptative: la mesure n'est écrite que si elle est due
+            # (niveau écrit = Leq depuis la précédente écriture)
+            if self.cadence:
+                niveau_db = self.cadence.ajouter(date_heure, niveau_db,
+                                                 incident=transition is not None or self.detecteur.en_cours)
+                if niveau_db is None:
+                    return True
+
+            return self._enregistrer(date_heure, niveau_db, mesure, description, classification)
 
         except Exception as e:
-            print(f"✗ Erreur calibration: {e}")
+            print(f"✗ Erreur lors de l'envoi: {e}")
             return False
 
-    def mesurer_son(self) -> dict:
-        """
-        Mesure le niveau sonore
-
-        Returns:
-            Dictionnaire avec valeur_brute, voltage, difference, niveau_db
-        """
-        # Lire plusieurs échantillons pour lisser
-        nb_echantillons = 10
-        valeurs = []
-
-        for _ in range(nb_echantillons):
-            valeur = self.read_adc(self.adc_channel)
-            if valeur >= 0:
-                valeurs.append(valeur)
-            time.sleep(0.01)
-
-        if not valeurs:
-            return None
-
-        # Calculer la moyenne et le pic
-        valeur_moyenne = sum(valeurs) // len(valeurs)
-        valeur_max = max(valeurs)
-        valeur_min = min(valeurs)
-        amplitude = valeur_max - valeur_min
-
-        # Convertir en voltage (0-3.3V pour le Raspberry Pi)
-        voltage = (valeur_moyenne * 3.3) / 1023
-
-        # Différence par rapport au repos
-        difference = abs(valeur_moyenne - self.valeur_repos) if self.valeur_repos else 0
-
-        # Conversion approximative en dB
-        # Formule simplifiée : dB = 20 * log10(amplitude / ref)
-        # Ici on utilise une échelle arbitraire 0-100
-        niveau_db = min(100, (amplitude / 10.23) * 10)  # Échelle 0-100
-
-        return {
-            'valeur_brute': valeur_moyenne,
-            'amplitude': amplitude,
-            'voltage': voltage,
-            'difference': difference,
-            'niveau_db': niveau_db
-        }
-
-    def envoyer_mesure_bd(self, mesure: dict) -> bool:
+    def _enregistrer(self, date_heure: datetime, niveau_db: float, mesure: dict,
+                     description: Optional[str],
+                     classification: Optional[Classification] = None) -> bool:
         """
-        Envoie la mesure vers la base de données
+        Écrit une mesure (spool, lot ou insertion directe)
 
         Args:
-            mesure: Dictionnaire contenant les données de mesure
+            date_heure: Heure d'acquisition
+            niveau_db: Niveau sonore
+            mesure: Dictionnaire de la mesure (affichage)
+            description: Résumé de l'épisode BRUIT_FORT qui se termine (None: mesure simple)
+            classification: Classe de l'épisode, écrite dans ClassificationBruit
 
         Returns:
             True si succès, False sinon
         """
-        try:
-            date_heure = datetime.now()
-            niveau_db = mesure['niveau_db']
-
-            # Insérer la mesure
-            self.db.execute_non_query(
-                """INSERT INTO Donnees (dateHeure, idCapteur, mesure, photoBlob, noSalle)
-                   VALUES (?, ?, ?, NULL, ?)""",
-                (date_heure, self.id_capteur_bruit, niveau_db, self.id_salle)
+        heure = date_heure.strftime('%H:%M:%S')
+        fin_episode = description is not None
+
+        # Spool local: écriture sur la carte SD, l'expéditeur s'occupe de la BD
+        if self.spool:
+            self.spool.ajouter(
+                date_heure, self.id_capteur_bruit, self.id_salle, mesure=niveau_db,
+                type_evenement='BRUIT_FORT' if fin_episode else None,
+                description=description,
+                classification=en_dict(classification) if classification else None
             )
+            self.compteur_mesures += 1
 
-            # Récupérer l'ID de la donnée insérée
-            id_donnee = self.db.execute_query("SELECT @@IDENTITY AS id")[0][0]
+            print(f"[{heure}] Mesure #{self.compteur_mesures:4d} | "
+                  f"Niveau: {niveau_db:5.1f} dB | "
+                  f"Amplitude: {mesure['amplitude']:4d} | "
+                  f"Spool: {self.spool.en_attente()}")
+            if fin_episode:
+                print(f"         ✓ {description}")
+            return True
 
+        # Mesure normale: mise en attente dans le lot (pas d'aller-retour BD)
+        if not fin_episode:
+            self.batch_writer.ajouter(date_heure, self.id_capteur_bruit, niveau_db, self.id_salle)
             self.compteur_mesures += 1
 
-            # Affichage
-            heure = date_heure.strftime('%H:%M:%S')
             print(f"[{heure}] Mesure #{self.compteur_mesures:4d} | "
                   f"Niveau: {niveau_db:5.1f} dB | "
                   f"Amplitude: {mesure['amplitude']:4d} | "
-                  f"ID: {id_donnee}")
-
-            # Créer un événement si bruit fort
-            if niveau_db > self.seuil_bruit_fort:
-                self.db.execute_non_query(
-                    """INSERT INTO Evenement (type, idDonnee, description)
-                       VALUES (?, ?, ?)""",
-                    ('BRUIT_FORT', id_donnee,
-                     f'Niveau sonore élevé: {niveau_db:.1f} dB (amplitude: {mesure["amplitude"]})')
-                )
-                print(f"         ⚠ BRUIT_FORT détecté!")
-
+                  f"Lot: {self.batch_writer.en_attente()}/{self.batch_writer.taille_max}")
             return True
 
-        except Exception as e:
-            print(f"✗ Erreur lors de l'envoi: {e}")
+        # Fin d'épisode: donnée + événement résumé (+ classe) insérés immédiatement, en une transaction
+        with self.db.transaction() as transaction:
+            ids = self.db.insert_donnee_avec_evenement(
+                date_heure, self.id_capteur_bruit, self.id_salle,
+                'BRUIT_FORT', description,
+                mesure=niveau_db
+            )
+            if ids and classification:
+                enregistrer_classification(self.db, ids[1], en_dict(classification))
+        if ids is None or not transaction.validee:
             return False
 
+        id_donnee, id_evenement = ids
+        self.compteur_mesures += 1
+
+        # Affichage
+        print(f"[{heure}] Mesure #{self.compteur_mesures:4d} | "
+              f"Niveau: {niveau_db:5.1f} dB | "
+              f"Amplitude: {mesure['amplitude']:4d} | "
+              f"ID: {id_donnee}")
+        print(f"         ✓ {description} (Event ID: {id_evenement})")
+
+        return True
+
     def capturer_en_continu(self):
         """Boucle principale de capture continue"""
         print("╔═══════════════════════════════════════════════════════════╗")
         print("║    Capture de son en continu - Micro Électret MCP3008    ║")
         print("╚═══════════════════════════════════════════════════════════╝\n")
-        print(f"🎤 Intervalle: {self.intervalle} seconde(s)")
+        print(f"🎤 Intervalle: {self.intervalle} seconde(s)"
+              + (f" (adaptatif: {self.cadence.intervalle_min:g}s à {self.cadence.intervalle_max:g}s)"
+                 if self.cadence else ""))
         print(f"🏢 Salle: {self.id_salle}")
-        print(f"📊 Seuil bruit fort: {self.seuil_bruit_fort} dB")
+        print(f"📊 Seuil bruit fort: {self.seuil_bruit_fort} dB "
+              f"(fin sous {self.detecteur.seuil_sortie} dB)")
         print(f"💾 Stockage: Base de données")
         print("\nAppuyez sur Ctrl+C pour arrêter\n")
         print("─" * 63)
@@ -263,7 +249,7 @@ class CaptureSonContinu:
         try:
             while True:
                 # Mesurer le son
-                mesure = self.mesurer_son()
+                mesure = self.son.mesurer()
 
                 if mesure:
                     # Envoyer vers la BD
@@ -272,21 +258,46 @@ class CaptureSonContinu:
                     print("✗ Échec de la mesure")
 
                 # Attendre avant la prochaine mesure
-                time.sleep(self.intervalle)
+                time.sleep(self.cadence.attente if self.cadence else self.intervalle)
 
         except KeyboardInterrupt:
             print("\n\n─" * 63)
             print(f"\n✓ Arrêt demandé - {self.compteur_mesures} mesures capturées")
+            if self.cadence:
+                print(f"✓ Cadence adaptative: {self.cadence.resume()}")
+            if self.son.extracteur:
+                print(f"✓ Caractéristiques spectrales: {self.son.extracteur.resume()}")
             print("✓ Programme terminé")
 
     def cleanup(self):
-        """Nettoie les ressources (SPI)"""
-        if self.spi:
-            try:
-                self.spi.close()
-                print("✓ SPI fermé proprement")
-            except:
-                pass
+        """Nettoie les ressources (lot en attente, SPI)"""
+        # Épisode de bruit en cours: l'enregistrer quand même (donnée = crête de l'épisode)
+        fin = self.son.terminer_episode()
+        if fin is not None:
+            episode, description, classification = fin
+            self._enregistrer(episode.fin, episode.crete, {'amplitude': 0}, description, classification)
+
+        # Clips et ADC (micro et capteurs analogiques) arrêtés avant l'envoi des dernières mesures
+        self.son.arreter()
+
+        # Écrire les fenêtres d'agrégats en cours (incomplètes)
+        if self.agregateur:
+            self.agregateur.arreter()
+            print(f"✓ Agrégats écrits: {self.agregateur.compteur_agregats}")
+
+        # Envoyer les mesures encore en attente avant de fermer la connexion
+        if self.expediteur:
+            self.expediteur.arreter()
+            self.spool.fermer()
+            print(f"✓ Spool: {self.expediteur.compteur_expedies} mesures expédiées")
+        else:
+            self.batch_writer.arreter()
+            print(f"✓ Lots envoyés: {self.batch_writer.compteur_lots} "
+                  f"({self.batch_writer.compteur_lignes} mesures)")
+
+        # Temps passé par requête (diagnostic de lenteur)
+        print("\n📊 Requêtes SQL:")
+        print(formater_stats(self.db.stats()))
 
 
 def main():
@@ -296,15 +307,25 @@ def main():
     print("╚═══════════════════════════════════════════════════════════╝\n")
 
     # Connexion à la base de données
-    db = DatabaseConnection(DB_SERVER, DB_NAME, DB_USERNAME, DB_PASSWORD)
+    db = DatabaseConnection(DB_SERVER, DB_NAME, DB_USERNAME, DB_PASSWORD,
+                            seuil_requete_lente=DB_SEUIL_REQUETE_LENTE,
+                            journal_requetes_lentes=DB_JOURNAL_REQUETES_LENTES)
 
     if not db.connect():
         print("\n✗ Impossible de se connecter à la base de données")
         return 1
 
     # Créer le système de capture
-    # Paramètres : intervalle=1s, seuil_bruit_fort=50dB
-    capture_system = CaptureSonContinu(db, ID_SALLE, intervalle=1, seuil_bruit_fort=50.0)
+    # Paramètres : intervalle=1s, seuil_bruit_fort=SEUIL_BRUIT_FORT (dB(A)), envoi par lots
+    spool = SpoolLocal(os.path.join(SPOOL_DIR, "capture_son.db")) if SPOOL_ACTIF else None
+    capture_system = CaptureSonContinu(db, ID_SALLE, intervalle=1, seuil_bruit_fort=SEUIL_BRUIT_FORT,
+                                       seuil_fin_bruit_fort=SEUIL_FIN_BRUIT_FORT,
+                                       taille_lot=BATCH_TAILLE_MAX, age_max_lot=BATCH_AGE_MAX,
+                                       spool=spool, agregats=AGREGATS_ACTIFS,
+                                       retention_brutes=RETENTION_BRUTES_JOURS,
+                                       cadence_adaptative=CADENCE_ADAPTATIVE,
+                                       clips_audio=CLIP_AUDIO_ACTIF,
+                                       classification=CLASSIFICATION_ACTIVE)
 
     # Configuration
     if not capture_system.setup():
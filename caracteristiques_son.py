@@ -0,0 +1,438 @@
+"""
+Caractéristiques spectrales des fenêtres audio et classification des épisodes de bruit
+Énergie par bande de fréquences (FFT), centroïde spectral, taux de passages par zéro
+et facteur de crête, puis classe de l'épisode (voix, claquement, ventilation) par
+le centroïde de classe le plus proche
+
+Usage (modèle de la salle, écrit dans CLASSIFIEUR_FICHIER):
+    python caracteristiques_son.py --entrainer <dossier>
+    <dossier>/VOIX/*.wav, <dossier>/CLAQUEMENT/*.wav, ... : un sous-dossier par classe,
+    clips WAV mono (clips des épisodes, ou PCM 16 bits) à ADC_FREQUENCE Hz
+"""
+
+import json
+import math
+import os
+import struct
+import sys
+import time
+from collections import namedtuple
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from db_connection import DatabaseConnection
+from clip_audio import lire_wav
+from config import ADC_FREQUENCE, CLASSIFIEUR_FICHIER
+
+
+# Bornes des bandes d'énergie (Hz); la dernière bande va jusqu'à la fréquence de Nyquist
+BANDES_HZ = (0, 250, 500, 1000, 2000)
+
+# Plancher des énergies relatives (évite log10(0) sur une bande vide)
+DB_MIN = -60.0
+
+NOMS_CARACTERISTIQUES = (
+    [f"bande_{debut}Hz_db" for debut in BANDES_HZ]
+    + ['centroide_khz', 'passages_zero', 'crete_db']
+)
+
+Classification = namedtuple('Classification', ['classe', 'confiance', 'caracteristiques', 'nb_fenetres'])
+
+REQUETE_INSERTION = (
+    """INSERT INTO ClassificationBruit (idEvenement, classe, confiance, nbFenetres, centroideHz,
+                                      passagesZero, facteurCreteDb, energiesBandesDb)
+       VALUES (?, ?, ?, ?, ?, ?, ?, ?)"""
+)
+
+# Fenêtres d'un clip d'entraînement retenues: à ECART_FENETRES_DB au plus de la plus forte
+# (en direct, seules les fenêtres au-dessus du seuil de fin d'épisode sont analysées)
+ECART_FENETRES_DB = 10.0
+
+# Modèle de départ (un centroïde par classe, ordre de NOMS_CARACTERISTIQUES), calculé sur
+# des signaux types: à remplacer par un modèle entraîné dans la salle (voir entrainer_dossier())
+MODELE_DEFAUT = {
+    'echelles': [8.0, 8.0, 8.0, 8.0, 8.0, 0.5, 0.1, 4.0],
+    'centroides': {
+        'VOIX':        [-14.0, -8.0, -3.0, -5.0, -27.0, 0.8, 0.25, 13.0],
+        'CLAQUEMENT':  [-12.5, -11.5, -9.5, -6.0, -3.0, 2.0, 0.5, 23.0],
+        'VENTILATION': [0.0, -27.0, -29.0, -32.0, -33.0, 0.07, 0.02, 8.0],
+    }
+}
+
+
+class ExtracteurCaracteristiques:
+    """
+    Caractéristiques d'une fenêtre d'échantillons, calculées par trames (NumPy, sans boucle)
+
+    La fenêtre est découpée en trames de taille_trame échantillons (fenêtre de Hann),
+    une seule rfft pour toutes les trames. Si le calcul dépasse budget_cpu (fraction
+    d'un cœur), seule une partie des trames, réparties sur la fenêtre, est analysée.
+    """
+
+    def __init__(self, frequence: int, taille_trame: int = 512, budget_cpu: Optional[float] = 0.05):
+        """
+        Args:
+            frequence: Échantillons par seconde
+            taille_trame: Échantillons par trame FFT (défaut: 512, 64 ms à 8000 Hz)
+            budget_cpu: Fraction d'un cœur allouée au calcul (défaut: 0.05, None: sans limite)
+        """
+        self.frequence = frequence
+        self.taille_trame = taille_trame
+        self.budget_cpu = budget_cpu
+
+        self._hann = np.hanning(taille_trame).astype(np.float32)
+        frequences = np.fft.rfftfreq(taille_trame, 1.0 / frequence)
+        self._frequences = frequences.astype(np.float32)
+        # Première raie de chaque bande (np.add.reduceat somme jusqu'à la bande suivante)
+        self._debuts_bandes = np.searchsorted(frequences, BANDES_HZ)
+
+        # Coût moyen d'une trame (secondes), mis à jour à chaque fenêtre
+        self.cout_trame: Optional[float] = None
+        self.compteur_fenetres = 0
+        self.compteur_reduites = 0
+        self.duree_totale = 0.0
+
+    def extraire(self, valeurs, repos: Optional[float] = None) -> Optional[np.ndarray]:
+        """
+        Calcule le vecteur de caractéristiques d'une fenêtre
+
+        Args:
+            valeurs: Échantillons bruts (0-1023), ex: AcquisitionADC.lire_depuis()
+            repos: Valeur au repos (None: moyenne de la fenêtre)
+
+        Returns:
+            Vecteur float32 (ordre de NOMS_CARACTERISTIQUES), ou None si la fenêtre est vide
+        """
+        n = len(valeurs)
+        if n == 0:
+            return None
+        debut = time.perf_counter()
+
+        signal = np.asarray(valeurs, dtype=np.float32)
+        signal -= signal.mean() if repos is None else repos
+
+        # Facteur de crête et passages par zéro sur la fenêtre entière (coût linéaire)
+        rms = float(np.sqrt(np.dot(signal, signal) / n))
+        crete = float(np.abs(signal).max())
+        crete_db = 20 * math.log10(crete / rms) if rms > 0 else 0.0
+        signes = np.signbit(signal)
+        passages_zero = float(np.count_nonzero(signes[1:] != signes[:-1])) / max(n - 1, 1)
+
+        # Spectre moyen des trames
+        trames = self._trames(signal)
+        spectre = np.abs(np.fft.rfft(trames * self._hann, axis=1)) ** 2
+        puissance = spectre.sum(axis=0)
+        total = float(puissance.sum())
+
+        if total > 0:
+            bandes = np.add.reduceat(puissance, self._debuts_bandes) / total
+            bandes_db = np.maximum(10 * np.log10(np.maximum(bandes, 1e-12)), DB_MIN)
+            centroide = float(np.dot(self._frequences, puissance)) / total
+        else:
+            bandes_db = np.full(len(BANDES_HZ), DB_MIN)
+            centroide = 0.0
+
+        vecteur = np.empty(len(NOMS_CARACTERISTIQUES), dtype=np.float32)
+        vecteur[:len(BANDES_HZ)] = bandes_db
+        vecteur[len(BANDES_HZ):] = (centroide / 1000, passages_zero, crete_db)
+
+        duree = time.perf_counter() - debut
+        cout = duree / len(trames)
+        self.cout_trame = cout if self.cout_trame is None else 0.9 * self.cout_trame + 0.1 * cout
+        self.compteur_fenetres += 1
+        self.duree_totale += duree
+        return vecteur
+
+    def resume(self) -> str:
+        """Temps de calcul moyen par fenêtre"""
+        if not self.compteur_fenetres:
+            return "aucune fenêtre analysée"
+        moyenne_ms = 1000 * self.duree_totale / self.compteur_fenetres
+        return (f"{self.compteur_fenetres} fenêtre(s), {moyenne_ms:.2f} ms/fenêtre, "
+                f"{self.compteur_reduites} réduite(s) pour tenir le budget")
+
+    def _trames(self, signal: np.ndarray) -> np.ndarray:
+        """Découpe le signal en trames (sans copie), en nombre limité par le budget CPU"""
+        taille = self.taille_trame
+        if len(signal) < taille:
+            # Fenêtre très courte: une seule trame complétée par des zéros
+            trame = np.zeros((1, taille), dtype=np.float32)
+            trame[0, :len(signal)] = signal
+            return trame
+
+        nb = len(signal) // taille
+        trames = signal[:nb * taille].reshape(nb, taille)
+
+        if self.budget_cpu is not None and self.cout_trame:
+            # Trames qu'on peut analyser pour rester sous budget_cpu de la durée de la fenêtre
+            nb_max = max(1, int(self.budget_cpu * len(signal) / self.frequence / self.cout_trame))
+            if nb > nb_max:
+                self.compteur_reduites += 1
+                trames = trames[np.linspace(0, nb - 1, nb_max).astype(int)]
+        return trames
+
+
+class ClassifieurBruit:
+    """
+    Classifieur par centroïde le plus proche (distance sur caractéristiques normalisées)
+
+    Quelques multiplications par épisode: rien à installer sur le Pi, et le modèle
+    se réentraîne avec des exemples étiquetés de la salle (voir entrainer()).
+    """
+
+    def __init__(self, fichier: Optional[str] = None):
+        """
+        Args:
+            fichier: Fichier JSON du modèle entraîné (None ou absent: MODELE_DEFAUT)
+        """
+        self.fichier = fichier
+        self.charge = False
+        self._appliquer(MODELE_DEFAUT)
+
+    @property
+    def classes(self) -> List[str]:
+        """Classes connues du modèle"""
+        return list(self._classes)
+
+    def charger(self) -> bool:
+        """
+        Lit le modèle entraîné
+
+        Returns:
+            True si le fichier a été lu, False sinon (modèle par défaut conservé)
+        """
+        if not self.fichier or not os.path.exists(self.fichier):
+            return False
+
+        try:
+            with open(self.fichier, encoding='utf-8') as f:
+                self._appliquer(json.load(f))
+            self.charge = True
+            return True
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"⚠ Modèle de classification illisible ({self.fichier}): {e}")
+            self._appliquer(MODELE_DEFAUT)
+            return False
+
+    def sauvegarder(self) -> bool:
+        """
+        Écrit le modèle courant (fichier temporaire puis remplacement atomique)
+
+        Returns:
+            True si succès, False sinon
+        """
+        if not self.fichier:
+            return False
+
+        modele = {
+            'echelles': [round(float(e), 4) for e in self._echelles],
+            'centroides': {classe: [round(float(v), 4) for v in centroide]
+                           for classe, centroide in zip(self._classes, self._centroides)}
+        }
+        temporaire = self.fichier + ".tmp"
+        try:
+            with open(temporaire, 'w', encoding='utf-8') as f:
+                json.dump(modele, f, indent=2)
+            os.replace(temporaire, self.fichier)
+            return True
+        except OSError as e:
+            print(f"⚠ Sauvegarde du modèle de classification impossible: {e}")
+            return False
+
+    def entrainer(self, exemples: Dict[str, Sequence[np.ndarray]]):
+        """
+        Recalcule les centroïdes à partir d'exemples étiquetés
+
+        Args:
+            exemples: {classe: vecteurs de caractéristiques (ExtracteurCaracteristiques.extraire)}
+        """
+        tous = np.vstack([np.asarray(v, dtype=np.float64) for vecteurs in exemples.values()
+                          for v in vecteurs])
+        echelles = tous.std(axis=0)
+        # Une caractéristique constante ne doit pas diviser par zéro
+        echelles[echelles < 1e-6] = 1.0
+
+        self._appliquer({
+            'echelles': echelles.tolist(),
+            'centroides': {classe: np.mean(np.asarray(vecteurs, dtype=np.float64), axis=0).tolist()
+                           for classe, vecteurs in exemples.items() if len(vecteurs)}
+        })
+
+    def classer(self, caracteristiques: np.ndarray, nb_fenetres: int = 1) -> Classification:
+        """
+        Classe un vecteur de caractéristiques (ex: moyenne des fenêtres d'un épisode)
+
+        Args:
+            caracteristiques: Vecteur (ordre de NOMS_CARACTERISTIQUES)
+            nb_fenetres: Nombre de fenêtres résumées par le vecteur (enregistré avec la classe)
+
+        Returns:
+            Classification (confiance entre 0 et 1: part de la classe retenue dans
+            l'inverse des distances à chaque centroïde)
+        """
+        normalise = np.asarray(caracteristiques, dtype=np.float64) / self._echelles
+        distances = np.linalg.norm(self._centroides_normalises - normalise, axis=1)
+
+        meilleure = int(np.argmin(distances))
+        inverses = 1.0 / np.maximum(distances, 1e-9)
+        confiance = float(inverses[meilleure] / inverses.sum())
+        return Classification(self._classes[meilleure], confiance,
+                              np.asarray(caracteristiques, dtype=np.float32), nb_fenetres)
+
+    def _appliquer(self, modele: dict):
+        self._echelles = np.asarray(modele['echelles'], dtype=np.float64)
+        self._classes = list(modele['centroides'])
+        self._centroides = np.asarray([modele['centroides'][c] for c in self._classes], dtype=np.float64)
+        if self._centroides.shape != (len(self._classes), len(NOMS_CARACTERISTIQUES)):
+            raise ValueError(f"modèle incompatible: {len(NOMS_CARACTERISTIQUES)} caractéristiques attendues")
+        self._centroides_normalises = self._centroides / self._echelles
+
+
+def decrire_classification(classification: Classification) -> str:
+    """Complément de description de l'événement BRUIT_FORT"""
+    return f"classe {classification.classe} ({classification.confiance:.0%})"
+
+
+def en_dict(classification: Classification) -> dict:
+    """Classification sérialisable (JSON), ex: pour le spool local"""
+    return {
+        'classe': classification.classe,
+        'confiance': round(classification.confiance, 4),
+        'nb_fenetres': classification.nb_fenetres,
+        'caracteristiques': [round(float(v), 4) for v in classification.caracteristiques]
+    }
+
+
+def enregistrer_classification(db: DatabaseConnection, id_evenement: int, classification: dict) -> bool:
+    """
+    Écrit la classification d'un événement BRUIT_FORT dans ClassificationBruit
+
+    Args:
+        db: Connexion (appeler dans la transaction qui a créé l'événement)
+        id_evenement: ID de l'événement
+        classification: Résultat de en_dict()
+
+    Returns:
+        True si succès, False sinon
+    """
+    valeurs = classification['caracteristiques']
+    bandes = valeurs[:len(BANDES_HZ)]
+    centroide_khz, passages_zero, crete_db = valeurs[len(BANDES_HZ):]
+    return db.execute_non_query(REQUETE_INSERTION, (
+        id_evenement, classification['classe'], classification['confiance'],
+        classification['nb_fenetres'], centroide_khz * 1000, passages_zero, crete_db,
+        ';'.join(f"{b:.1f}" for b in bandes)
+    ))
+
+
+def caracteristiques_clip(extracteur: ExtracteurCaracteristiques, pcm: np.ndarray,
+                          duree_fenetre: float = 1.0) -> Optional[np.ndarray]:
+    """
+    Caractéristiques moyennes des fenêtres fortes d'un clip, comme pour un épisode en direct
+
+    Args:
+        extracteur: Extracteur à la fréquence du clip
+        pcm: Échantillons du clip (ex: lire_wav())
+        duree_fenetre: Durée d'une fenêtre en secondes (défaut: 1, une mesure)
+
+    Returns:
+        Vecteur moyen (ordre de NOMS_CARACTERISTIQUES), ou None si le clip est vide ou muet
+    """
+    taille = max(1, int(duree_fenetre * extracteur.frequence))
+    signal = np.asarray(pcm, dtype=np.float32)
+    fenetres = [signal[debut:debut + taille] for debut in range(0, len(signal), taille)]
+    fenetres = [f for f in fenetres if len(f) >= taille // 2]
+    if not fenetres:
+        return None
+
+    rms = np.array([np.sqrt(np.mean((f - f.mean()) ** 2)) for f in fenetres])
+    if rms.max() <= 0:
+        return None
+    # Le pre-roll calme d'un clip n'appartient pas à l'épisode
+    fortes = [f for f, r in zip(fenetres, rms) if r >= rms.max() * 10 ** (-ECART_FENETRES_DB / 20)]
+    return np.mean([extracteur.extraire(f, float(f.mean())) for f in fortes], axis=0)
+
+
+def entrainer_dossier(dossier: str, fichier: str, frequence: int = ADC_FREQUENCE) -> bool:
+    """
+    Entraîne le modèle de la salle sur des clips étiquetés et l'écrit dans fichier
+
+    Chaque sous-dossier est une classe (son nom en majuscules); chaque clip WAV donne
+    un exemple: la moyenne de ses fenêtres fortes.
+
+    Args:
+        dossier: Dossier des clips, un sous-dossier par classe
+        fichier: Fichier JSON du modèle (ex: CLASSIFIEUR_FICHIER)
+        frequence: Fréquence d'échantillonnage attendue des clips (celle de l'acquisition)
+
+    Returns:
+        True si le modèle a été entraîné et sauvegardé, False sinon
+    """
+    if not os.path.isdir(dossier):
+        print(f"✗ Dossier introuvable: {dossier}")
+        return False
+
+    extracteur = ExtracteurCaracteristiques(frequence, budget_cpu=None)
+    exemples: Dict[str, List[np.ndarray]] = {}
+    ignores = 0
+
+    for classe in sorted(os.listdir(dossier)):
+        sous_dossier = os.path.join(dossier, classe)
+        if not os.path.isdir(sous_dossier):
+            continue
+        for nom in sorted(os.listdir(sous_dossier)):
+            if not nom.lower().endswith('.wav'):
+                continue
+            chemin = os.path.join(sous_dossier, nom)
+            try:
+                with open(chemin, 'rb') as f:
+                    pcm, frequence_clip = lire_wav(f.read())
+            except (OSError, ValueError, struct.error) as e:
+                print(f"⚠ {chemin} ignoré: {e}")
+                ignores += 1
+                continue
+            if frequence_clip != frequence:
+                print(f"⚠ {chemin} ignoré: {frequence_clip} Hz (clips à {frequence} Hz attendus)")
+                ignores += 1
+                continue
+
+            vecteur = caracteristiques_clip(extracteur, pcm)
+            if vecteur is None:
+                print(f"⚠ {chemin} ignoré: clip vide ou muet")
+                ignores += 1
+                continue
+            exemples.setdefault(classe.upper(), []).append(vecteur)
+
+    for classe, vecteurs in exemples.items():
+        print(f"✓ {classe}: {len(vecteurs)} clip(s)")
+    if len(exemples) < 2:
+        print(f"✗ Au moins deux classes requises ({len(exemples)} trouvée(s), {ignores} clip(s) ignoré(s))")
+        return False
+
+    classifieur = ClassifieurBruit(fichier)
+    classifieur.entrainer(exemples)
+    if not classifieur.sauvegarder():
+        return False
+
+    # Contrôle sur les clips d'entraînement eux-mêmes: détecte une classe confondue
+    # avec une autre, pas la précision sur de nouveaux épisodes
+    reconnus = sum(classifieur.classer(v).classe == classe
+                   for classe, vecteurs in exemples.items() for v in vecteurs)
+    total = sum(len(v) for v in exemples.values())
+    print(f"✓ Modèle écrit dans {fichier} ({', '.join(classifieur.classes)}) - "
+          f"{reconnus}/{total} clip(s) d'entraînement reconnus, {ignores} ignoré(s)")
+    return True
+
+
+def main():
+    """Entraîne le modèle de la salle (python caracteristiques_son.py --entrainer <dossier>)"""
+    if len(sys.argv) != 3 or sys.argv[1] != "--entrainer":
+        print("Usage: python caracteristiques_son.py --entrainer <dossier>")
+        print("   <dossier>/<CLASSE>/*.wav : un sous-dossier par classe (VOIX, CLAQUEMENT, VENTILATION...)")
+        return 1
+    return 0 if entrainer_dossier(sys.argv[2], CLASSIFIEUR_FICHIER) else 1
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,327 @@
+"""
+Clips audio des épisodes de bruit fort
+Quelques secondes avant le déclenchement (lues dans le tampon circulaire de l'ADC)
+et quelques secondes après, compressées en WAV IMA ADPCM (4 bits par échantillon)
+par un thread séparé: le thread d'échantillonnage n'est jamais ralenti
+"""
+
+import struct
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+
+from acquisition_adc import AcquisitionADC
+
+
+# Tables de l'IMA ADPCM (pas de quantification et variation de l'index par code)
+PAS_IMA = [
+    7, 8, 9, 10, 11, 12, 13, 14, 16, 17, 19, 21, 23, 25, 28, 31, 34, 37, 41, 45,
+    50, 55, 60, 66, 73, 80, 88, 97, 107, 118, 130, 143, 157, 173, 190, 209, 230,
+    253, 279, 307, 337, 371, 408, 449, 494, 544, 598, 658, 724, 796, 876, 963,
+    1060, 1166, 1282, 1411, 1552, 1707, 1878, 2066, 2272, 2499, 2749, 3024, 3327,
+    3660, 4026, 4428, 4871, 5358, 5894, 6484, 7132, 7845, 8630, 9493, 10442,
+    11487, 12635, 13899, 15289, 16818, 18500, 20350, 22385, 24623, 27086, 29794,
+    32767
+]
+VARIATION_INDEX = [-1, -1, -1, -1, 2, 4, 6, 8]
+
+FORMAT_IMA_ADPCM = 0x0011
+TAILLE_BLOC = 256  # Octets par bloc ADPCM (en-tête de 4 octets + 2 échantillons par octet)
+
+
+def en_pcm16(valeurs, repos: Optional[float] = None) -> np.ndarray:
+    """
+    Convertit des échantillons 10 bits du MCP3008 en PCM 16 bits signé
+
+    Args:
+        valeurs: Échantillons bruts (0-1023)
+        repos: Valeur au repos (None: moyenne du clip)
+
+    Returns:
+        Tableau int16 (pleine échelle 10 bits = pleine échelle 16 bits)
+    """
+    signal = np.asarray(valeurs, dtype=np.float32)
+    signal -= signal.mean() if repos is None else repos
+    return np.clip(signal * 64, -32768, 32767).astype(np.int16)
+
+
+def encoder_wav_ima_adpcm(pcm: np.ndarray, frequence: int) -> bytes:
+    """
+    Encode un signal mono PCM 16 bits en fichier WAV IMA ADPCM
+
+    Le format se lit avec les lecteurs courants (VLC, ffmpeg, Windows) et divise
+    la taille par 4 par rapport au PCM 16 bits.
+
+    Args:
+        pcm: Échantillons int16
+        frequence: Échantillons par seconde
+
+    Returns:
+        Contenu du fichier WAV
+    """
+    echantillons_par_bloc = (TAILLE_BLOC - 4) * 2 + 1
+    donnees = pcm.tolist()
+    blocs = bytearray()
+    index = 0
+
+    for debut in range(0, len(donnees), echantillons_par_bloc):
+        bloc = donnees[debut:debut + echantillons_par_bloc]
+        bloc += [bloc[-1]] * (echantillons_par_bloc - len(bloc))
+
+        # En-tête du bloc: premier échantillon (prédicteur) et index du pas
+        predicteur = bloc[0]
+        blocs += struct.pack('<hBB', predicteur, index, 0)
+
+        codes = []
+        for echantillon in bloc[1:]:
+            pas = PAS_IMA[index]
+            difference = echantillon - predicteur
+            code = 0
+            if difference < 0:
+                code = 8
+                difference = -difference
+
+            delta = pas >> 3
+            if difference >= pas:
+                code |= 4
+                difference -= pas
+                delta += pas
+            pas >>= 1
+            if difference >= pas:
+                code |= 2
+                difference -= pas
+                delta += pas
+            pas >>= 1
+            if difference >= pas:
+                code |= 1
+                delta += pas
+
+            predicteur = predicteur - delta if code & 8 else predicteur + delta
+            predicteur = max(-32768, min(32767, predicteur))
+            index = max(0, min(88, index + VARIATION_INDEX[code & 7]))
+            codes.append(code)
+
+        # Deux codes par octet, le premier dans les 4 bits de poids faible
+        blocs += bytes(codes[i] | (codes[i + 1] << 4) for i in range(0, len(codes), 2))
+
+    octets_par_seconde = frequence * TAILLE_BLOC // echantillons_par_bloc
+    fmt = struct.pack('<HHIIHHHH', FORMAT_IMA_ADPCM, 1, frequence, octets_par_seconde,
+                      TAILLE_BLOC, 4, 2, echantillons_par_bloc)
+    fact = struct.pack('<I', len(donnees))
+
+    contenu = (b'WAVE'
+               + b'fmt ' + struct.pack('<I', len(fmt)) + fmt
+               + b'fact' + struct.pack('<I', len(fact)) + fact
+               + b'data' + struct.pack('<I', len(blocs)) + bytes(blocs))
+    return b'RIFF' + struct.pack('<I', len(contenu)) + contenu
+
+
+def lire_wav(contenu: bytes) -> Tuple[np.ndarray, int]:
+    """
+    Décode un fichier WAV mono: IMA ADPCM (clips des épisodes) ou PCM 16 bits
+
+    Args:
+        contenu: Contenu du fichier WAV
+
+    Returns:
+        Tuple (échantillons int16, échantillons par seconde)
+
+    Raises:
+        ValueError: Fichier qui n'est pas un WAV, ou format non pris en charge
+    """
+    if contenu[:4] != b'RIFF' or contenu[8:12] != b'WAVE':
+        raise ValueError("pas un fichier WAV")
+
+    morceaux = {}
+    position = 12
+    while position + 8 <= len(contenu):
+        nom, taille = struct.unpack_from('<4sI', contenu, position)
+        morceaux[nom] = contenu[position + 8:position + 8 + taille]
+        position += 8 + taille + (taille & 1)
+    if b'fmt ' not in morceaux or b'data' not in morceaux:
+        raise ValueError("morceau fmt ou data manquant")
+
+    format_audio, canaux, frequence, _, taille_bloc, bits = struct.unpack_from('<HHIIHH', morceaux[b'fmt '])
+    if canaux != 1:
+        raise ValueError(f"{canaux} canaux (mono attendu)")
+    donnees = morceaux[b'data']
+
+    if format_audio == 1 and bits == 16:
+        return np.frombuffer(donnees[:len(donnees) // 2 * 2], dtype='<i2').astype(np.int16), frequence
+    if format_audio != FORMAT_IMA_ADPCM:
+        raise ValueError(f"format {format_audio:#06x} ({bits} bits) non pris en charge")
+
+    echantillons = []
+    for debut in range(0, len(donnees) - 3, taille_bloc):
+        bloc = donnees[debut:debut + taille_bloc]
+        predicteur, index = struct.unpack_from('<hB', bloc)
+        index = min(index, 88)
+        echantillons.append(predicteur)
+        for octet in bloc[4:]:
+            # Premier code dans les 4 bits de poids faible (voir encoder_wav_ima_adpcm)
+            for code in (octet & 0x0F, octet >> 4):
+                pas = PAS_IMA[index]
+                delta = pas >> 3
+                if code & 4:
+                    delta += pas
+                if code & 2:
+                    delta += pas >> 1
+                if code & 1:
+                    delta += pas >> 2
+                predicteur = predicteur - delta if code & 8 else predicteur + delta
+                predicteur = max(-32768, min(32767, predicteur))
+                index = max(0, min(88, index + VARIATION_INDEX[code & 7]))
+                echantillons.append(predicteur)
+
+    # Le dernier bloc est complété: longueur réelle dans le morceau fact
+    if b'fact' in morceaux:
+        echantillons = echantillons[:struct.unpack_from('<I', morceaux[b'fact'])[0]]
+    return np.asarray(echantillons, dtype=np.int16), frequence
+
+
+class EnregistreurClips:
+    """
+    Enregistre un clip audio autour d'un déclenchement (un seul clip à la fois)
+
+    Mémoire bornée: un seul tableau préalloué de (pre_roll + post_roll) secondes;
+    un déclenchement pendant un clip en cours est ignoré.
+    """
+
+    def __init__(self, acquisition: AcquisitionADC,
+                 enregistrer: Callable[[bytes, datetime, str], None],
+                 pre_roll: float = 5.0, post_roll: float = 10.0,
+                 repos: Optional[Callable[[], float]] = None):
+        """
+        Args:
+            acquisition: Acquisition continue du micro (tampon d'au moins pre_roll secondes)
+            enregistrer: Fonction appelée (sur le thread des clips) avec le WAV,
+                         l'heure du déclenchement et la description du clip
+            pre_roll: Secondes gardées avant le déclenchement (défaut: 5)
+            post_roll: Secondes enregistrées après le déclenchement (défaut: 10)
+            repos: Fonction qui retourne la valeur au repos du micro (None: moyenne du clip)
+        """
+        self.acquisition = acquisition
+        self.enregistrer = enregistrer
+        self.repos = repos
+
+        frequence = acquisition.frequence
+        capacite = acquisition.tampon.capacite
+        if pre_roll * frequence > capacite:
+            print(f"⚠ Tampon de l'ADC trop court pour {pre_roll:g}s avant le déclenchement "
+                  f"(ADC_DUREE_TAMPON): réduit à {capacite / frequence:g}s")
+        self.nb_avant = min(int(pre_roll * frequence), capacite)
+        self.nb_apres = int(post_roll * frequence)
+        self._clip = np.zeros(self.nb_avant + self.nb_apres, dtype=np.uint16)
+
+        self._demande = None  # (position, date_heure, description) du clip à enregistrer
+        self._verrou = threading.Lock()
+        self._reveil = threading.Event()
+        self._arret = threading.Event()
+        self._thread = None
+
+        # Statistiques
+        self.compteur_clips = 0
+        self.compteur_ignores = 0
+        self.octets_total = 0
+
+    @property
+    def en_cours(self) -> bool:
+        """Vrai si un clip est en cours d'enregistrement ou d'encodage"""
+        with self._verrou:
+            return self._demande is not None
+
+    def demarrer(self):
+        """Démarre le thread des clips"""
+        if self._thread is not None:
+            return
+
+        self._arret.clear()
+        self._thread = threading.Thread(target=self._boucle, name="ClipsAudio", daemon=True)
+        self._thread.start()
+
+    def arreter(self):
+        """Arrête le thread (un clip en cours est enregistré avec ce qui a été acquis)"""
+        if self._thread is not None:
+            self._arret.set()
+            self._reveil.set()
+            self._thread.join()
+            self._thread = None
+
+    def declencher(self, date_heure: datetime, description: str) -> bool:
+        """
+        Demande un clip autour de l'instant présent (appel non bloquant)
+
+        Args:
+            date_heure: Heure du déclenchement
+            description: Description de l'événement CAPTURE du clip
+
+        Returns:
+            True si le clip est lancé, False si un clip est déjà en cours
+        """
+        with self._verrou:
+            if self._demande is not None:
+                self.compteur_ignores += 1
+                return False
+            self._demande = (self.acquisition.tampon.compteur, date_heure, description)
+        self._reveil.set()
+        return True
+
+    def _boucle(self):
+        """Thread des clips: copie les échantillons au fil de l'eau, encode puis enregistre"""
+        while not self._arret.is_set():
+            self._reveil.wait()
+            self._reveil.clear()
+
+            with self._verrou:
+                demande = self._demande
+            if demande is None:
+                continue
+
+            try:
+                position, date_heure, description = demande
+                nb = self._copier(max(position - self.nb_avant, 0))
+                if nb > 0:
+                    pcm = en_pcm16(self._clip[:nb], self.repos() if self.repos else None)
+                    wav = encoder_wav_ima_adpcm(pcm, self.acquisition.frequence)
+                    self.enregistrer(wav, date_heure, description)
+                    self.compteur_clips += 1
+                    self.octets_total += len(wav)
+            except Exception as e:
+                print(f"✗ Erreur lors de l'enregistrement du clip audio: {e}")
+            finally:
+                with self._verrou:
+                    self._demande = None
+
+    def _copier(self, debut: int) -> int:
+        """
+        Copie les échantillons du clip depuis le tampon circulaire
+
+        Le tampon ne garde que quelques secondes: les échantillons sont copiés au fur
+        et à mesure de l'acquisition, toutes les 0.5 s.
+
+        Args:
+            debut: Position absolue du premier échantillon du clip
+
+        Returns:
+            Nombre d'échantillons copiés (moins que prévu si arrêt demandé)
+        """
+        fin = debut + len(self._clip)
+        position = debut
+        while position < fin:
+            valeurs, courant = self.acquisition.lire_depuis(position)
+            # Départ après position si des échantillons ont été écrasés entre-temps
+            depart = courant - len(valeurs)
+            arrivee = min(courant, fin)
+            if arrivee > depart:
+                self._clip[depart - debut:arrivee - debut] = valeurs[:arrivee - depart]
+                position = arrivee
+
+            if position < fin:
+                if self._arret.is_set():
+                    break
+                time.sleep(0.5)
+
+        return position - debut
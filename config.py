@@ -3,11 +3,22 @@ Configuration centrale pour le projet SalleSense
 """
 
 # Configuration base de données
+# DB_SERVER = "sqlite:///sallesense.db" pour travailler hors ligne sur une base SQLite locale
+# (schéma créé automatiquement depuis Script_bd/)
 DB_SERVER = "DICJWIN01.cegepjonquiere.ca"
 DB_NAME = "Prog3A25_bdSalleSense"
 DB_USERNAME = "prog3e09"
 DB_PASSWORD = "colonne42" # À définir si nécessaire
 
+# Configuration pool de connexions (une connexion par thread actif)
+DB_POOL_MIN = 1        # Connexions ouvertes au démarrage
+DB_POOL_MAX = 4        # Connexions simultanées maximales
+DB_POOL_TIMEOUT = 10   # Secondes d'attente max pour obtenir une connexion
+
+# Instrumentation des requêtes (voir DatabaseConnection.stats())
+DB_SEUIL_REQUETE_LENTE = 0.5                       # Secondes: au-delà, la requête est journalisée
+DB_JOURNAL_REQUETES_LENTES = "requetes_lentes.log"  # None pour afficher dans la console
+
 # Configuration salle
 ID_SALLE = 1  # ID de la salle à monitorer (doit exister dans la table Salle)
 
@@ -17,15 +28,90 @@ SOUND_PIN = 18  # Pin GPIO pour le module micro (sortie digitale)
 ADC_CHANNEL = 0  # Canal ADC pour le micro
 SPI_BUS = 0
 SPI_DEVICE = 0
+SPI_FICHIER_VERROU = "/run/lock/sallesense-spi{bus}.{device}.lock"  # Un seul programme ouvre le MCP3008
+
+# Acquisition audio continue (thread dédié, voir acquisition_adc.py)
+ADC_FREQUENCE = 8000      # Échantillons par seconde (8000-16000 pour l'audio)
+ADC_DUREE_TAMPON = 8.0    # Secondes d'échantillons conservées dans le tampon circulaire (>= CLIP_PRE_ROLL)
+
+# Capteurs analogiques sur les autres canaux du MCP3008 (voir service_adc.py)
+# Un seul programme lit le SPI: le micro et ces canaux passent par le même service
+ADC_FREQUENCE_BALAYAGE = 10.0  # Balayages des canaux lents par seconde
+CAPTEURS_ANALOGIQUES = []      # (canal, nom du Capteur, mesures par seconde, conversion), ex:
+#   (1, 'TMP-1', 0.2, 'TMP36'),          # Température (°C)
+#   (2, 'AIR-1', 0.2, 'CO2_ANALOGIQUE'), # CO2 (ppm)
+
+# Niveau sonore (voir niveau_sonore.py): RMS des échantillons arrivés depuis la mesure précédente
+SON_DECALAGE_SPL = 110.0  # dB SPL d'un signal pleine échelle (0 dBFS): à régler avec un sonomètre
+SON_PONDERATION_A = True  # Niveaux pondérés A (dB(A)), comme un sonomètre de salle
+SON_FICHIER_REPOS = "calibration_micro.json"  # Valeur au repos du micro, reprise au redémarrage
 
 # Configuration capteurs
-SEUIL_BRUIT_FORT = 70.0  # Seuil en dB (ou valeur arbitraire) pour déclencher un événement
+SEUIL_BRUIT_FORT = 70.0  # Seuil en dB SPL approximatif (dB(A)) qui ouvre un épisode de bruit fort
+
+# Épisodes de bruit fort: un seul événement BRUIT_FORT par perturbation (voir detection_episodes.py)
+SEUIL_FIN_BRUIT_FORT = 65.0     # dB(A): l'épisode se termine sous ce niveau (hystérésis)
+EPISODE_DUREE_MIN = 1.0         # Secondes au-dessus du seuil avant de confirmer l'épisode
+EPISODE_DUREE_MAX = 300.0       # Secondes: un épisode plus long est découpé
+EPISODE_REFROIDISSEMENT = 30.0  # Secondes sans nouvel épisode après la fin du précédent
+
+# Clip audio de chaque épisode (voir clip_audio.py), lié à un capteur de type AUDIO
+CLIP_AUDIO_ACTIF = True  # False pour ne pas enregistrer de clip
+CLIP_PRE_ROLL = 5.0      # Secondes gardées avant le début de l'épisode (tampon de l'ADC)
+CLIP_POST_ROLL = 10.0    # Secondes enregistrées après le début de l'épisode
+
+# Classe de chaque épisode (voix, claquement, ventilation) d'après le spectre (voir caracteristiques_son.py)
+CLASSIFICATION_ACTIVE = True                 # False pour ne pas classer les épisodes
+CLASSIFIEUR_FICHIER = "classifieur_bruit.json"  # Modèle entraîné dans la salle (absent: modèle par défaut)
+CARACTERISTIQUES_BUDGET_CPU = 0.05           # Fraction d'un cœur pour le calcul des caractéristiques
+
+# Cadence adaptative des mesures de son (moins d'écritures quand la salle est calme)
+CADENCE_ADAPTATIVE = True      # False pour écrire une mesure à chaque intervalle
+CADENCE_INTERVALLE_MIN = 0.25  # Secondes entre deux mesures près du seuil ou pendant un épisode
+CADENCE_INTERVALLE_MAX = 30.0  # Secondes max entre deux écritures quand le niveau est calme et stable
+CADENCE_MARGE_RAPIDE = 5.0     # dB sous SEUIL_BRUIT_FORT où la cadence devient rapide
+CADENCE_MARGE_CALME = 15.0     # dB sous SEUIL_BRUIT_FORT en dessous desquels la salle est calme
 
 # Configuration monitoring
 INTERVALLE_BRUIT = 5   # Secondes entre chaque mesure de bruit
 INTERVALLE_PHOTO = 60  # Secondes entre chaque capture photo
 
+# Configuration envoi par lots (mesures de bruit)
+BATCH_TAILLE_MAX = 50   # Nombre de mesures qui déclenche un envoi
+BATCH_AGE_MAX = 10      # Secondes max qu'une mesure attend avant l'envoi
+
+# Agrégats par minute et par quart d'heure (AgregatMinute, AgregatQuartHeure)
+AGREGATS_ACTIFS = True       # Calculer les agrégats sur le Pi
+RETENTION_BRUTES_JOURS = 7   # Jours de mesures brutes (1/s) gardées dans Donnees (None: tout garder)
+
+# Configuration spool local (les données attendent sur la carte SD si le serveur est injoignable)
+SPOOL_ACTIF = True      # False pour écrire directement dans la BD
+SPOOL_DIR = "spool"     # Dossier des fichiers de spool (un par script)
+
+# Configuration transfert des BLOBs (vidéos, photos) par morceaux
+BLOB_TAILLE_MORCEAU = 256 * 1024  # Octets par envoi (photoBlob.WRITE) ou par lecture (SUBSTRING)
+
 # Configuration photos
 PHOTO_DIR = "photos"  # Dossier où sauvegarder les photos
 PHOTO_WIDTH = 1920    # Largeur des photos (pixels)
 PHOTO_HEIGHT = 1080   # Hauteur des photos (pixels)
+CAMERA_TAILLE_LORES = (320, 240)  # Flux basse résolution de la caméra (analyse des images), voir session_camera.py
+
+# Configuration vidéos (surveillance_intelligente.py, voir video_circulaire.py)
+VIDEO_PRE_ROLL = 5.0            # Secondes gardées avant le déclenchement (tampon H.264 en mémoire)
+VIDEO_IMAGES_PAR_SECONDE = 30   # Cadence de la caméra (le tampon compte VIDEO_PRE_ROLL x cadence images)
+VIDEO_DEBIT = 4000000           # Débit de l'encodeur H.264 (bit/s): environ 2.5 MB pour 5 s en mémoire
+
+# Photos sur mouvement (capture_photos_continu.py, voir detection_mouvement.py)
+MOUVEMENT_ACTIF = True               # False pour une photo toutes les 5 s, même sans changement
+MOUVEMENT_SENSIBILITE = 0.01         # Proportion de l'image qui doit changer (1%)
+MOUVEMENT_SEUIL_PIXEL = 25           # Écart au fond (niveaux de gris 0-255) d'un pixel qui a changé
+MOUVEMENT_INTERVALLE_ANALYSE = 0.5   # Secondes entre deux analyses du flux basse résolution
+PHOTO_INTERVALLE_CONTROLE = 600      # Secondes max sans photo: image de contrôle même sans mouvement
+PHOTO_DEDOUBLONNAGE = True           # Ne pas envoyer une photo presque identique à la précédente (hash_perceptuel.py)
+PHOTO_DISTANCE_HAMMING_MAX = 5       # Bits différents (sur 64) jusqu'auxquels deux photos sont des doublons
+
+# Miniatures créées à la capture (galerie de interface_principale.py, voir miniatures.py)
+MINIATURE_TAILLE = (320, 180)         # Taille maximale de la miniature JPEG (proportions conservées)
+MINIATURE_TAILLE_APERCU = (48, 27)    # Taille maximale de l'aperçu minuscule
+MINIATURE_QUALITE = 75                # Qualité JPEG de la miniature (1-100)
@@ -0,0 +1,400 @@
+"""
+Backends de base de données pour DatabaseConnection
+- BackendSqlServer: serveur SQL Server du cégep (pyodbc, ODBC Driver 18)
+- BackendSqlite: fichier SQLite local (exécution hors ligne, tests de charge)
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+from datetime import datetime
+from functools import lru_cache
+from typing import Optional, Tuple
+
+try:
+    import pyodbc
+    PYODBC_AVAILABLE = True
+except ImportError:
+    print("⚠ pyodbc non disponible - seul le backend SQLite est utilisable")
+    PYODBC_AVAILABLE = False
+
+
+# Erreurs interceptées par DatabaseConnection, quel que soit le backend
+# (TimeoutError: pool épuisé, ConnectionError: connexion non établie)
+ERREURS_BD = (sqlite3.Error, TimeoutError, ConnectionError)
+if PYODBC_AVAILABLE:
+    ERREURS_BD = ERREURS_BD + (pyodbc.Error,)
+
+# Préfixe d'adresse serveur qui sélectionne le backend SQLite (ex: 'sqlite:///sallesense.db')
+PREFIXE_SQLITE = "sqlite:///"
+
+DOSSIER_SCRIPTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Script_bd")
+
+
+class BackendSqlServer:
+    """Connexion au serveur SQL Server via pyodbc"""
+
+    nom = "SQL Server"
+    requete_test = "SELECT 1"
+    supporte_fast_executemany = True
+
+    # Insertion d'une donnée en un seul lot SQL. OUTPUT ... INTO est obligatoire:
+    # Donnees porte un trigger (trg_check_donnees_capteur), ce qui interdit OUTPUT seul.
+    # CAST du BLOB: un paramètre None serait sinon envoyé en VARCHAR, refusé pour VARBINARY(MAX).
+    _SQL_INSERTION_DONNEE = (
+        "SET NOCOUNT ON; "
+        "DECLARE @donnee TABLE (id INT); "
+        "INSERT INTO Donnees (dateHeure, idCapteur, mesure, photoBlob, noSalle) "
+        "OUTPUT INSERTED.idDonnee_PK INTO @donnee "
+        "VALUES (?, ?, ?, CAST(? AS VARBINARY(MAX)), ?); "
+    )
+
+    # Ajout d'un morceau à la fin d'un BLOB existant (jamais NULL: insérer b'' d'abord)
+    SQL_AJOUT_BLOB = "UPDATE Donnees SET photoBlob.WRITE(?, NULL, NULL) WHERE idDonnee_PK = ?"
+
+    # Points de sauvegarde (SQL Server n'a pas d'équivalent à RELEASE)
+    SQL_SAVEPOINT = "SAVE TRANSACTION {}"
+    SQL_RETOUR_SAVEPOINT = "ROLLBACK TRANSACTION {}"
+    SQL_LIBERER_SAVEPOINT = None
+
+    def __init__(self, server: str, database: str,
+                 username: Optional[str] = None, password: Optional[str] = None):
+        """
+        Args:
+            server: Adresse du serveur SQL Server
+            database: Nom de la base de données
+            username: Nom d'utilisateur SQL (None pour Windows Authentication)
+            password: Mot de passe SQL (None pour Windows Authentication)
+        """
+        if not PYODBC_AVAILABLE:
+            raise ConnectionError("pyodbc n'est pas installé (pip install pyodbc)")
+
+        if username and password:
+            # Authentification SQL Server
+            self.connection_string = (
+                f"DRIVER={{ODBC Driver 18 for SQL Server}};"
+                f"SERVER={server};"
+                f"DATABASE={database};"
+                f"UID={username};"
+                f"PWD={password};"
+                f"TrustServerCertificate=yes;"
+            )
+        else:
+            # Authentification Windows
+            self.connection_string = (
+                f"DRIVER={{ODBC Driver 18 for SQL Server}};"
+                f"SERVER={server};"
+                f"DATABASE={database};"
+                f"Trusted_Connection=yes;"
+                f"TrustServerCertificate=yes;"
+            )
+
+    def connecter(self):
+        """Ouvre une nouvelle connexion"""
+        return pyodbc.connect(self.connection_string)
+
+    def traduire(self, query: str) -> str:
+        """Le SQL de l'application est écrit en T-SQL: rien à traduire"""
+        return query
+
+    @staticmethod
+    def debut_transaction(connexion):
+        """Désactive l'autocommit: la transaction commence à la première requête"""
+        connexion.autocommit = False
+
+    @staticmethod
+    def est_erreur_connexion(erreur: Exception) -> bool:
+        """Vrai si l'erreur indique un lien coupé avec le serveur (SQLSTATE 08xxx)"""
+        if not PYODBC_AVAILABLE or not isinstance(erreur, pyodbc.Error) or not erreur.args:
+            return False
+        return str(erreur.args[0]).startswith('08')
+
+    @staticmethod
+    def est_erreur_rejet(erreur: Exception) -> bool:
+        """
+        Vrai si le serveur refuse les données elles-mêmes: les renvoyer échouera toujours
+
+        SQLSTATE 23xxx (CHECK, FOREIGN KEY, UNIQUE), RAISERROR d'un trigger (erreur 50000)
+        ou transaction annulée par un trigger (erreur 3609).
+        """
+        if not PYODBC_AVAILABLE or not isinstance(erreur, pyodbc.Error) or not erreur.args:
+            return False
+        message = str(erreur.args[-1])
+        return str(erreur.args[0]).startswith('23') or '(50000)' in message or '(3609)' in message
+
+    def inserer_donnee(self, curseur, date_heure: datetime, id_capteur: int, id_salle: int,
+                       mesure: Optional[float], blob: Optional[bytes]) -> int:
+        """Insère une donnée et retourne son ID (un seul aller-retour)"""
+        return curseur.execute(
+            self._SQL_INSERTION_DONNEE + "SELECT id FROM @donnee;",
+            date_heure, id_capteur, mesure, blob, id_salle
+        ).fetchval()
+
+    def inserer_donnee_avec_evenement(self, curseur, date_heure: datetime, id_capteur: int,
+                                      id_salle: int, type_evenement: str, description: str,
+                                      mesure: Optional[float],
+                                      blob: Optional[bytes]) -> Tuple[int, int]:
+        """Insère une donnée et son événement dans le même lot SQL"""
+        ids = curseur.execute(
+            self._SQL_INSERTION_DONNEE +
+            "DECLARE @evenement TABLE (id INT); "
+            "INSERT INTO Evenement (type, idDonnee, description) "
+            "OUTPUT INSERTED.idEvenement_PK INTO @evenement "
+            "SELECT ?, id, ? FROM @donnee; "
+            "SELECT (SELECT id FROM @donnee), (SELECT id FROM @evenement);",
+            date_heure, id_capteur, mesure, blob, id_salle, type_evenement, description
+        ).fetchone()
+        return ids[0], ids[1]
+
+    def creer_utilisateur(self, curseur, pseudo: str, courriel: str, mot_de_passe: str) -> int:
+        """Crée un utilisateur via dbo.usp_Utilisateur_Create (paramètre OUTPUT)"""
+        return curseur.execute(
+            "DECLARE @id INT; "
+            "EXEC dbo.usp_Utilisateur_Create @Pseudo=?, @Courriel=?, @MotDePasse=?, @UserId=@id OUTPUT; "
+            "SELECT @id;",
+            pseudo, courriel, mot_de_passe
+        ).fetchval()
+
+    def authentifier(self, curseur, courriel: str, mot_de_passe: str) -> int:
+        """Authentifie un utilisateur via dbo.usp_Utilisateur_Login (paramètre OUTPUT)"""
+        return curseur.execute(
+            "DECLARE @id INT; "
+            "EXEC dbo.usp_Utilisateur_Login @Courriel=?, @MotDePasse=?, @UserId=@id OUTPUT; "
+            "SELECT @id;",
+            courriel, mot_de_passe
+        ).fetchval()
+
+
+class BackendSqlite:
+    """Base SQLite locale avec le schéma de Script_bd/ et les procédures utilisateur"""
+
+    nom = "SQLite"
+    requete_test = "SELECT 1"
+    supporte_fast_executemany = False
+
+    # || sur deux BLOBs donne du texte: CAST pour retrouver les octets intacts
+    SQL_AJOUT_BLOB = "UPDATE Donnees SET photoBlob = CAST(photoBlob || ? AS BLOB) WHERE idDonnee_PK = ?"
+
+    SQL_SAVEPOINT = "SAVEPOINT {}"
+    SQL_RETOUR_SAVEPOINT = "ROLLBACK TO SAVEPOINT {}"
+    SQL_LIBERER_SAVEPOINT = "RELEASE SAVEPOINT {}"
+
+    # Scripts de création du schéma, traduits du T-SQL à l'ouverture
+    SCRIPTS_SCHEMA = ["creationTables.sql", "spoolProgression.sql", "agregatsMesures.sql",
+                      "classificationBruit.sql", "miniatures.sql"]
+
+    def __init__(self, chemin: str):
+        """
+        Args:
+            chemin: Fichier SQLite (':memory:' pour une base en mémoire partagée entre threads)
+        """
+        self.chemin = chemin
+        if chemin == ":memory:":
+            # Chaque connexion du pool doit voir la même base en mémoire
+            self._uri = f"file:sallesense_{id(self)}?mode=memory&cache=shared"
+        else:
+            self._uri = f"file:{chemin}"
+        self._schema_cree = False
+        self._connexion_memoire = None  # Garde la base en mémoire vivante
+
+        sqlite3.register_adapter(datetime, lambda d: d.isoformat(" "))
+        sqlite3.register_converter("TIMESTAMP", lambda b: datetime.fromisoformat(b.decode()))
+
+    def connecter(self):
+        """Ouvre une nouvelle connexion (et crée le schéma à la première ouverture)"""
+        connexion = sqlite3.connect(self._uri, uri=True, timeout=30,
+                                    detect_types=sqlite3.PARSE_DECLTYPES,
+                                    check_same_thread=False)
+        if self.chemin != ":memory:":
+            connexion.execute("PRAGMA journal_mode=WAL")
+
+        if not self._schema_cree:
+            self.creer_schema(connexion)
+            self._schema_cree = True
+            if self.chemin == ":memory:":
+                self._connexion_memoire = sqlite3.connect(self._uri, uri=True, check_same_thread=False)
+
+        return connexion
+
+    def creer_schema(self, connexion):
+        """Crée les tables manquantes à partir des scripts T-SQL de Script_bd/"""
+        for script in self.SCRIPTS_SCHEMA:
+            with open(os.path.join(DOSSIER_SCRIPTS, script), encoding="utf-8") as f:
+                connexion.executescript(traduire_ddl(f.read()))
+
+        # Colonnes ajoutées par ProcedureStocke.sql (mot de passe salé/hashé)
+        colonnes = {ligne[1] for ligne in connexion.execute("PRAGMA table_info(Utilisateur)")}
+        if "mdp_salt" not in colonnes:
+            connexion.execute("ALTER TABLE Utilisateur ADD COLUMN mdp_salt BLOB NULL")
+        if "mdp_hash" not in colonnes:
+            connexion.execute("ALTER TABLE Utilisateur ADD COLUMN mdp_hash BLOB NULL")
+
+        # Colonne ajoutée par hashPerceptuel.sql (doublons de photos)
+        colonnes = {ligne[1] for ligne in connexion.execute("PRAGMA table_info(Donnees)")}
+        if "hashPerceptuel" not in colonnes:
+            connexion.execute("ALTER TABLE Donnees ADD COLUMN hashPerceptuel INTEGER NULL")
+        connexion.execute("CREATE INDEX IF NOT EXISTS IX_Donnees_hashPerceptuel "
+                          "ON Donnees(hashPerceptuel) WHERE hashPerceptuel IS NOT NULL")
+        connexion.commit()
+
+    def traduire(self, query: str) -> str:
+        """Traduit le T-SQL de l'application en SQL SQLite"""
+        return traduire_requete(query)
+
+    @staticmethod
+    def debut_transaction(connexion):
+        """
+        Ouvre la transaction explicitement
+
+        Sinon un SAVEPOINT placé avant la première écriture ouvrirait sa propre
+        transaction, que son RELEASE validerait aussitôt.
+        """
+        if not connexion.in_transaction:
+            connexion.execute("BEGIN")
+
+    @staticmethod
+    def est_erreur_connexion(erreur: Exception) -> bool:
+        """Un fichier local ne perd pas sa connexion"""
+        return False
+
+    @staticmethod
+    def est_erreur_rejet(erreur: Exception) -> bool:
+        """Vrai si une contrainte (CHECK, FOREIGN KEY, NOT NULL) ou un trigger refuse les données"""
+        return isinstance(erreur, sqlite3.IntegrityError)
+
+    def inserer_donnee(self, curseur, date_heure: datetime, id_capteur: int, id_salle: int,
+                       mesure: Optional[float], blob: Optional[bytes]) -> int:
+        """Insère une donnée et retourne son ID"""
+        curseur.execute(
+            """INSERT INTO Donnees (dateHeure, idCapteur, mesure, photoBlob, noSalle)
+               VALUES (?, ?, ?, ?, ?)""",
+            (date_heure, id_capteur, mesure, blob, id_salle)
+        )
+        return curseur.lastrowid
+
+    def inserer_donnee_avec_evenement(self, curseur, date_heure: datetime, id_capteur: int,
+                                      id_salle: int, type_evenement: str, description: str,
+                                      mesure: Optional[float],
+                                      blob: Optional[bytes]) -> Tuple[int, int]:
+        """Insère une donnée et son événement (même transaction)"""
+        id_donnee = self.inserer_donnee(curseur, date_heure, id_capteur, id_salle, mesure, blob)
+        curseur.execute(
+            "INSERT INTO Evenement (type, idDonnee, description) VALUES (?, ?, ?)",
+            (type_evenement, id_donnee, description)
+        )
+        return id_donnee, curseur.lastrowid
+
+    @staticmethod
+    def _hasher(salt: bytes, mot_de_passe: str) -> bytes:
+        # Même calcul que HASHBYTES('SHA2_256', @salt + CONVERT(VARBINARY(4000), @MotDePasse)):
+        # un NVARCHAR converti en VARBINARY donne ses octets UTF-16LE
+        return hashlib.sha256(salt + mot_de_passe.encode("utf-16-le")).digest()
+
+    def creer_utilisateur(self, curseur, pseudo: str, courriel: str, mot_de_passe: str) -> int:
+        """Équivalent de dbo.usp_Utilisateur_Create"""
+        # Un seul compte par courriel
+        if curseur.execute("SELECT 1 FROM Utilisateur WHERE courriel = ?", (courriel,)).fetchone():
+            return -1
+
+        salt = os.urandom(16)
+        curseur.execute(
+            """INSERT INTO Utilisateur (pseudo, courriel, motDePasse, mdp_hash, mdp_salt)
+               VALUES (?, ?, '', ?, ?)""",
+            (pseudo, courriel, self._hasher(salt, mot_de_passe), salt)
+        )
+        return curseur.lastrowid
+
+    def authentifier(self, curseur, courriel: str, mot_de_passe: str) -> int:
+        """Équivalent de dbo.usp_Utilisateur_Login"""
+        ligne = curseur.execute(
+            "SELECT idUtilisateur_PK, mdp_salt, mdp_hash FROM Utilisateur WHERE courriel = ?",
+            (courriel,)
+        ).fetchone()
+
+        if ligne is None or ligne[1] is None:
+            return -1  # courriel inconnu
+        if self._hasher(ligne[1], mot_de_passe) != ligne[2]:
+            return -1  # mauvais mot de passe
+        return ligne[0]
+
+
+def creer_backend(server: str, database: str,
+                  username: Optional[str] = None, password: Optional[str] = None):
+    """
+    Choisit le backend selon l'adresse du serveur
+
+    Args:
+        server: Adresse SQL Server, ou 'sqlite:///chemin.db' pour une base SQLite locale
+
+    Returns:
+        BackendSqlite ou BackendSqlServer
+    """
+    if server.startswith(PREFIXE_SQLITE):
+        return BackendSqlite(server[len(PREFIXE_SQLITE):])
+    return BackendSqlServer(server, database, username, password)
+
+
+def traduire_ddl(script: str) -> str:
+    """
+    Traduit un script de création de tables T-SQL en SQLite
+
+    Ignore USE/GO/DROP et convertit les types (IDENTITY, NVARCHAR, VARBINARY, DATETIME2, ...).
+    """
+    lignes = []
+    for ligne in script.splitlines():
+        instruction = ligne.split("--", 1)[0].strip()
+        if not instruction or instruction.upper() in ("GO", "GO;"):
+            continue
+        if instruction.upper().startswith(("USE ", "IF OBJECT_ID", "DROP ")):
+            continue
+        lignes.append(instruction)
+
+    ddl = "\n".join(lignes)
+    substitutions = [
+        (r"\bCREATE TABLE\b", "CREATE TABLE IF NOT EXISTS"),
+        (r"\bINT\s+IDENTITY\s*\(\s*1\s*,\s*1\s*\)\s+PRIMARY KEY", "INTEGER PRIMARY KEY AUTOINCREMENT"),
+        (r"\bN?VARCHAR\s*\(\s*(\d+|MAX)\s*\)", "TEXT"),
+        (r"\bVARBINARY\s*\(\s*(\d+|MAX)\s*\)", "BLOB"),
+        (r"\bDATETIME2?\b", "TIMESTAMP"),
+        (r"\bBIGINT\b", "INTEGER"),
+        (r"\bFLOAT\b", "REAL"),
+        (r"\bdbo\.", ""),
+    ]
+    for motif, remplacement in substitutions:
+        ddl = re.sub(motif, remplacement, ddl, flags=re.IGNORECASE)
+    return ddl
+
+
+@lru_cache(maxsize=256)
+def traduire_requete(query: str) -> str:
+    """
+    Traduit les éléments T-SQL utilisés par l'application vers SQLite
+
+    - SELECT TOP n ... -> SELECT ... LIMIT n
+    - N'texte' -> 'texte'
+    - DATALENGTH, SUBSTRING, ISNULL, @@IDENTITY, SYSDATETIME/GETDATE, CAST(... AS NVARCHAR)
+    - concaténation 'a' + b -> 'a' || b
+    """
+    sql = query.strip().rstrip(";")
+
+    top = re.match(r"(?is)^(\s*SELECT\s+)TOP\s*\(?\s*(\d+)\s*\)?\s+(.*)$", sql)
+    if top:
+        sql = f"{top.group(1)}{top.group(3)} LIMIT {top.group(2)}"
+
+    substitutions = [
+        (r"\bN'", "'"),
+        (r"\bDATALENGTH\s*\(", "LENGTH("),
+        (r"\bSUBSTRING\s*\(", "SUBSTR("),
+        (r"\bISNULL\s*\(", "IFNULL("),
+        (r"@@IDENTITY", "last_insert_rowid()"),
+        (r"\b(SYSDATETIME|GETDATE)\s*\(\s*\)", "datetime('now', 'localtime')"),
+        (r"\bAS\s+N?VARCHAR(\s*\(\s*(\d+|MAX)\s*\))?\s*\)", "AS TEXT)"),
+        (r"\bCAST\s*\(\s*\?\s+AS\s+VARBINARY\s*\(\s*MAX\s*\)\s*\)", "?"),
+        (r"'\s*\+", "' ||"),
+        (r"\+\s*'", "|| '"),
+        (r"\)\s*\+\s*(?=CAST\b)", ") || "),
+    ]
+    for motif, remplacement in substitutions:
+        sql = re.sub(motif, remplacement, sql, flags=re.IGNORECASE)
+    return sql
@@ -1,77 +1,383 @@
 """
 Module de connexion à la base de données SalleSense
-Nécessite: pip install pyodbc
+Nécessite: pip install pyodbc (SQL Server) - SQLite fonctionne sans dépendance
 """
 
-import pyodbc
-from typing import Optional, Tuple
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Iterator, Optional, Tuple
+from db_pool import ConnectionPool
+from db_backends import ERREURS_BD, creer_backend
+from db_stats import CLE_ATTENTE_POOL, StatistiquesRequetes
+from cache_reference import CacheReference
+
+
+class Transaction:
+    """État d'un bloc with db.transaction()"""
+
+    __slots__ = ('profondeur', 'echec', 'validee', 'erreur')
+
+    def __init__(self):
+        self.profondeur = 0      # Nombre de blocs imbriqués ouverts
+        self.echec = False       # Une requête du bloc a échoué: tout sera annulé
+        self.validee = False     # True après un COMMIT réussi à la sortie du bloc
+        self.erreur = None       # Première erreur d'une requête du bloc (voir est_rejet())
 
 
 class DatabaseConnection:
     """Gère la connexion à la base de données Prog3A25_bdSalleSense"""
 
     def __init__(self, server: str, database: str = "Prog3A25_bdSalleSense",
-                 username: Optional[str] = None, password: Optional[str] = None):
+                 username: Optional[str] = None, password: Optional[str] = None,
+                 pool_min: int = 1, pool_max: int = 4, pool_timeout: float = 10.0,
+                 backend=None, seuil_requete_lente: Optional[float] = 0.5,
+                 journal_requetes_lentes: Optional[str] = None,
+                 ttl_references: float = 300.0):
         """
         Initialise la connexion à la base de données
 
         Args:
-            server: Adresse du serveur SQL Server (ex: 'localhost' ou 'localhost\\SQLEXPRESS')
+            server: Adresse du serveur SQL Server (ex: 'localhost' ou 'localhost\\SQLEXPRESS'),
+                    ou 'sqlite:///chemin.db' pour une base SQLite locale
             database: Nom de la base de données (défaut: Prog3A25_bdSalleSense)
             username: Nom d'utilisateur SQL (None pour Windows Authentication)
             password: Mot de passe SQL (None pour Windows Authentication)
+            pool_min: Connexions ouvertes dès connect() (défaut: 1)
+            pool_max: Connexions simultanées maximales, une par thread actif (défaut: 4)
+            pool_timeout: Attente maximale en secondes pour obtenir une connexion (défaut: 10)
+            backend: Backend explicite (défaut: choisi d'après server, voir db_backends)
+            seuil_requete_lente: Durée en secondes au-delà de laquelle une requête est
+                                 journalisée (None pour désactiver, défaut: 0.5)
+            journal_requetes_lentes: Fichier du journal des requêtes lentes (None: console)
+            ttl_references: Secondes avant de relire Capteur et Salle (défaut: 300)
         """
         self.server = server
         self.database = database
         self.username = username
         self.password = password
-        self.connection = None
-        self.cursor = None
+        self.pool_min = pool_min
+        self.pool_max = pool_max
+        self.pool_timeout = pool_timeout
+        self.backend = backend
+
+        # Latences par requête normalisée (voir stats())
+        self.statistiques = StatistiquesRequetes(seuil_requete_lente, journal_requetes_lentes)
+
+        # Capteurs et salles en mémoire (voir cache_reference)
+        self.references = CacheReference(self, ttl=ttl_references)
+
+        # Chaque thread emprunte sa propre connexion et son propre curseur au pool,
+        # pour que ses requêtes (ex: INSERT puis SELECT @@IDENTITY) ne s'entremêlent
+        # jamais avec celles d'un autre thread
+        self.pool = None
+        self._sessions = {}  # ident du thread -> (thread, connexion, curseur)
+        self._verrou_sessions = threading.Lock()
+
+        # Bloc transaction() en cours, propre à chaque thread (voir transaction())
+        self._local = threading.local()
 
     def connect(self) -> bool:
         """
-        Établit la connexion à la base de données
+        Établit la connexion à la base de données (ouvre le pool de connexions)
 
         Returns:
             True si la connexion réussit, False sinon
         """
         try:
-            if self.username and self.password:
-                # Authentification SQL Server
-                connection_string = (
-                    f"DRIVER={{ODBC Driver 18 for SQL Server}};"
-                    f"SERVER={self.server};"
-                    f"DATABASE={self.database};"
-                    f"UID={self.username};"
-                    f"PWD={self.password};"
-                    f"TrustServerCertificate=yes;"
-                )
-            else:
-                # Authentification Windows
-                connection_string = (
-                    f"DRIVER={{ODBC Driver 18 for SQL Server}};"
-                    f"SERVER={self.server};"
-                    f"DATABASE={self.database};"
-                    f"Trusted_Connection=yes;"
-                    f"TrustServerCertificate=yes;"
-                )
-
-            self.connection = pyodbc.connect(connection_string)
-            self.cursor = self.connection.cursor()
-            print(f"✓ Connexion établie à la base de données '{self.database}'")
+            if self.backend is None:
+                self.backend = creer_backend(self.server, self.database, self.username, self.password)
+
+            self.pool = ConnectionPool(
+                self.backend.connecter,
+                min_size=self.pool_min,
+                max_size=self.pool_max,
+                timeout=self.pool_timeout,
+                requete_test=self.backend.requete_test
+            )
+            print(f"✓ Connexion établie à la base de données '{self.database}' ({self.backend.nom})")
             return True
 
-        except pyodbc.Error as e:
+        except ERREURS_BD as e:
             print(f"✗ Erreur de connexion: {e}")
             return False
 
     def disconnect(self):
-        """Ferme la connexion à la base de données"""
-        if self.cursor:
-            self.cursor.close()
-        if self.connection:
-            self.connection.close()
-            print("✓ Connexion fermée")
+        """Ferme la connexion à la base de données (toutes les connexions du pool)"""
+        if self.pool is None:
+            return
+
+        with self._verrou_sessions:
+            sessions, self._sessions = list(self._sessions.values()), {}
+
+        for _, connexion, curseur in sessions:
+            curseur.close()
+            self.pool.liberer(connexion)
+
+        self.pool.fermer()
+        self.pool = None
+        print("✓ Connexion fermée")
+
+    @property
+    def connection(self):
+        """Connexion empruntée par le thread courant"""
+        return self._session()[0]
+
+    @property
+    def cursor(self):
+        """Curseur propre au thread courant"""
+        return self._session()[1]
+
+    def _session(self) -> Tuple:
+        """
+        Retourne la connexion et le curseur du thread courant, en les empruntant au pool au besoin
+
+        Returns:
+            Tuple (connexion, curseur)
+        """
+        if self.pool is None:
+            raise ConnectionError("Connexion non établie - appelez connect() d'abord")
+
+        ident = threading.get_ident()
+        with self._verrou_sessions:
+            session = self._sessions.get(ident)
+            if session is not None:
+                return session[1], session[2]
+            threads_termines = [i for i, (thread, _, _) in self._sessions.items()
+                                if not thread.is_alive()]
+            sessions_orphelines = [self._sessions.pop(i) for i in threads_termines]
+
+        # Récupérer les connexions des threads terminés sans liberer_connexion()
+        for _, connexion, curseur in sessions_orphelines:
+            curseur.close()
+            self.pool.liberer(connexion)
+
+        debut = time.perf_counter()
+        connexion = self.pool.acquerir()
+        self.statistiques.enregistrer(CLE_ATTENTE_POOL, time.perf_counter() - debut)
+        curseur = connexion.cursor()
+        with self._verrou_sessions:
+            self._sessions[ident] = (threading.current_thread(), connexion, curseur)
+        return connexion, curseur
+
+    def liberer_connexion(self, invalide: bool = False):
+        """
+        Rend au pool la connexion du thread courant
+
+        À appeler à la fin d'un thread de travail (ex: enregistrement vidéo)
+        pour que la connexion soit réutilisée immédiatement.
+
+        Args:
+            invalide: True si la connexion est coupée (elle sera fermée, pas réutilisée)
+        """
+        with self._verrou_sessions:
+            session = self._sessions.pop(threading.get_ident(), None)
+
+        if session is not None and self.pool is not None:
+            _, connexion, curseur = session
+            try:
+                curseur.close()
+            except ERREURS_BD:
+                invalide = True
+            self.pool.liberer(connexion, invalide=invalide)
+
+    def _est_erreur_connexion(self, erreur: Exception) -> bool:
+        """Vrai si l'erreur indique un lien coupé avec le serveur"""
+        return self.backend is not None and self.backend.est_erreur_connexion(erreur)
+
+    def est_rejet(self, erreur: Optional[Exception]) -> bool:
+        """
+        Vrai si l'erreur est un refus définitif des données (contrainte, trigger)
+
+        Les renvoyer échouera toujours; une coupure de connexion ou un délai dépassé
+        ne sont pas des rejets (un nouvel essai peut réussir).
+        """
+        return erreur is not None and self.backend is not None and self.backend.est_erreur_rejet(erreur)
+
+    def _invalider_si_coupee(self, erreur: Exception) -> bool:
+        """
+        Jette la connexion du thread courant si l'erreur vient d'un lien coupé
+
+        Le prochain appel empruntera une nouvelle connexion au pool (reconnexion).
+
+        Returns:
+            True si la connexion a été jetée
+        """
+        if not self._est_erreur_connexion(erreur):
+            return False
+
+        print("⚠ Connexion au serveur perdue - reconnexion au prochain appel")
+        self.liberer_connexion(invalide=True)
+        return True
+
+    def _annuler(self, erreur: Optional[Exception] = None):
+        """Annule la transaction en cours du thread courant, s'il détient une connexion"""
+        transaction = getattr(self._local, 'transaction', None)
+        if transaction is not None:
+            # Dans un bloc transaction(): le bloc entier sera annulé à sa sortie
+            transaction.echec = True
+            if erreur is not None:
+                if transaction.erreur is None:
+                    transaction.erreur = erreur
+                self._invalider_si_coupee(erreur)
+            return
+
+        if erreur is not None and self._invalider_si_coupee(erreur):
+            return
+
+        with self._verrou_sessions:
+            session = self._sessions.get(threading.get_ident())
+
+        if session is not None:
+            try:
+                session[1].rollback()
+            except ERREURS_BD:
+                self.liberer_connexion(invalide=True)
+
+    def commit(self) -> bool:
+        """
+        Valide la transaction en cours du thread courant
+
+        Dans un bloc transaction(), ne fait rien: la validation a lieu à la sortie du bloc.
+
+        Returns:
+            True si succès, False sinon (la transaction est alors annulée)
+        """
+        transaction = getattr(self._local, 'transaction', None)
+        if transaction is not None:
+            return not transaction.echec
+
+        try:
+            connexion, _ = self._session()
+            connexion.commit()
+            return True
+
+        except ERREURS_BD as e:
+            print(f"✗ Erreur lors de la validation de la transaction: {e}")
+            self._annuler(e)
+            return False
+
+    def rollback(self):
+        """Annule la transaction en cours du thread courant (le bloc transaction() entier, le cas échéant)"""
+        self._annuler()
+
+    def _dans_transaction(self) -> bool:
+        """Vrai si le thread courant est dans un bloc transaction()"""
+        return getattr(self._local, 'transaction', None) is not None
+
+    @contextmanager
+    def transaction(self):
+        """
+        Regroupe plusieurs écritures du thread courant en une seule transaction
+
+        Dans le bloc, les méthodes ne valident plus rien elles-mêmes (commit=True est ignoré):
+        tout est validé en un seul COMMIT à la sortie. Si une requête du bloc échoue,
+        le bloc entier est annulé à la sortie (transaction.echec devient True).
+        Une exception qui sort du bloc l'annule aussi, puis est propagée.
+
+        Les blocs imbriqués posent un point de sauvegarde (savepoint): une exception
+        qui sort d'un bloc imbriqué n'annule que ce bloc.
+
+        Exemple:
+            with db.transaction() as transaction:
+                db.insert_donnee(...)
+                db.insert_donnee_avec_evenement(...)
+            if not transaction.validee:
+                ...
+
+        Yields:
+            Transaction (attributs echec et validee, ce dernier connu à la sortie)
+        """
+        transaction = getattr(self._local, 'transaction', None)
+
+        if transaction is not None:
+            # Bloc imbriqué: point de sauvegarde dans la transaction englobante
+            transaction.profondeur += 1
+            nom = f"sp_sallesense_{transaction.profondeur}"
+            curseur = None
+            try:
+                _, curseur = self._session()
+                curseur.execute(self.backend.SQL_SAVEPOINT.format(nom))
+            except ERREURS_BD as e:
+                print(f"✗ Erreur lors de la création du point de sauvegarde: {e}")
+                self._annuler(e)
+                curseur = None
+
+            try:
+                yield transaction
+            except BaseException:
+                if curseur is None:
+                    transaction.echec = True
+                else:
+                    try:
+                        curseur.execute(self.backend.SQL_RETOUR_SAVEPOINT.format(nom))
+                    except ERREURS_BD as e:
+                        # Point de sauvegarde perdu: la transaction entière sera annulée
+                        self._annuler(e)
+                raise
+            else:
+                if curseur is not None and self.backend.SQL_LIBERER_SAVEPOINT and not transaction.echec:
+                    try:
+                        curseur.execute(self.backend.SQL_LIBERER_SAVEPOINT.format(nom))
+                    except ERREURS_BD as e:
+                        self._annuler(e)
+            finally:
+                transaction.profondeur -= 1
+            return
+
+        transaction = self._local.transaction = Transaction()
+        try:
+            connexion, _ = self._session()
+            self.backend.debut_transaction(connexion)
+        except ERREURS_BD as e:
+            # Les requêtes du bloc échoueront ou seront annulées à la sortie
+            print(f"✗ Erreur lors du début de la transaction: {e}")
+            self._annuler(e)
+
+        try:
+            yield transaction
+        except BaseException:
+            self._local.transaction = None
+            self._annuler()
+            raise
+
+        self._local.transaction = None
+        if transaction.echec:
+            print("⚠ Transaction annulée: une requête du bloc a échoué")
+            self._annuler()
+        else:
+            transaction.validee = self.commit()
+
+    def stats(self) -> dict:
+        """
+        Instantané des statistiques des requêtes depuis le démarrage
+
+        Returns:
+            Dictionnaire {requête normalisée: {appels, erreurs, lignes, total, moyenne, max,
+            p50, p95, p99, execution, lecture}} (durées en secondes). La clé
+            '[attente pool]' mesure l'attente d'une connexion libre.
+        """
+        return self.statistiques.stats()
+
+    @contextmanager
+    def _mesurer(self, query: str):
+        """
+        Chronomètre un appel et l'ajoute aux statistiques (erreur si une exception sort du bloc)
+
+        Yields:
+            Dictionnaire à compléter: 'lignes' (lues ou affectées) et 'lecture' (durée des fetch)
+        """
+        chrono = {'lignes': 0, 'lecture': 0.0}
+        debut = time.perf_counter()
+        erreur = True
+        try:
+            yield chrono
+            erreur = False
+        finally:
+            self.statistiques.enregistrer(query, time.perf_counter() - debut, chrono['lignes'],
+                                          lecture=chrono['lecture'], erreur=erreur)
 
     def execute_query(self, query: str, params: Optional[tuple] = None) -> list:
         """
@@ -85,44 +391,333 @@ class DatabaseConnection:
             Liste des résultats
         """
         try:
-            if params:
-                self.cursor.execute(query, params)
-            else:
-                self.cursor.execute(query)
-
-            results = self.cursor.fetchall()
+            connexion, curseur = self._session()
+            with self._mesurer(query) as chrono:
+                query = self.backend.traduire(query)
+                if params:
+                    curseur.execute(query, params)
+                else:
+                    curseur.execute(query)
+
+                debut_lecture = time.perf_counter()
+                results = curseur.fetchall()
+                chrono['lecture'] = time.perf_counter() - debut_lecture
+                chrono['lignes'] = len(results)
             return results
 
-        except pyodbc.Error as e:
+        except ERREURS_BD as e:
             print(f"✗ Erreur lors de l'exécution de la requête: {e}")
+            self._invalider_si_coupee(e)
             return []
 
-    def execute_non_query(self, query: str, params: Optional[tuple] = None) -> bool:
+    def iter_query(self, query: str, params: Optional[tuple] = None,
+                   chunk_size: int = 100, ligne: Optional[Callable] = None) -> Iterator:
         """
-        Exécute une requête INSERT, UPDATE ou DELETE
+        Exécute une requête SELECT et parcourt les résultats par paquets (fetchmany)
+
+        Contrairement à execute_query(), seules chunk_size lignes sont en mémoire
+        à la fois: à utiliser pour les requêtes qui ramènent des BLOBs ou beaucoup de lignes.
+        Ne pas lancer d'autre requête sur le même thread avant la fin du parcours
+        (SQL Server ne sert qu'un jeu de résultats à la fois par connexion).
 
         Args:
             query: Requête SQL à exécuter
             params: Paramètres de la requête (optionnel)
+            chunk_size: Nombre de lignes lues par aller-retour (défaut: 100)
+            ligne: Type des lignes retournées, ex: namedtuple ou classe à __slots__
+                   (défaut: lignes brutes du pilote)
 
-        Returns:
-            True si succès, False sinon
+        Yields:
+            Une ligne de résultat à la fois
         """
+        curseur = None
+        # Seuls execute() et fetchmany() sont chronométrés, pas le traitement de l'appelant
+        execution = lecture = 0.0
+        nb_lignes = 0
+        erreur = False
         try:
+            connexion, _ = self._session()
+            # Curseur dédié: le curseur du thread reste libre pour les écritures
+            curseur = connexion.cursor()
+            sql = self.backend.traduire(query)
+            debut = time.perf_counter()
             if params:
-                self.cursor.execute(query, params)
+                curseur.execute(sql, params)
             else:
-                self.cursor.execute(query)
+                curseur.execute(sql)
+            execution = time.perf_counter() - debut
+
+            construire = getattr(ligne, '_make', None) or (lambda r: ligne(*r))
+            while True:
+                debut = time.perf_counter()
+                paquet = curseur.fetchmany(chunk_size)
+                lecture += time.perf_counter() - debut
+                if not paquet:
+                    break
+                nb_lignes += len(paquet)
+                for resultat in paquet:
+                    yield resultat if ligne is None else construire(resultat)
+
+        except ERREURS_BD as e:
+            erreur = True
+            print(f"✗ Erreur lors de l'exécution de la requête: {e}")
+            self._invalider_si_coupee(e)
+
+        finally:
+            if curseur is not None:
+                self.statistiques.enregistrer(query, execution + lecture, nb_lignes,
+                                              execution=execution, lecture=lecture, erreur=erreur)
+                try:
+                    curseur.close()
+                except ERREURS_BD:
+                    pass
+
+    def execute_non_query(self, query: str, params: Optional[tuple] = None,
+                          commit: bool = True) -> bool:
+        """
+        Exécute une requête INSERT, UPDATE ou DELETE
+
+        Args:
+            query: Requête SQL à exécuter
+            params: Paramètres de la requête (optionnel)
+            commit: False pour laisser la transaction ouverte (valider avec commit())
 
-            self.connection.commit()
-            print(f"✓ Requête exécutée avec succès ({self.cursor.rowcount} ligne(s) affectée(s))")
+        Returns:
+            True si succès, False sinon
+        """
+        try:
+            connexion, curseur = self._session()
+            with self._mesurer(query) as chrono:
+                query = self.backend.traduire(query)
+                if params:
+                    curseur.execute(query, params)
+                else:
+                    curseur.execute(query)
+
+                if commit and not self._dans_transaction():
+                    connexion.commit()
+                chrono['lignes'] = curseur.rowcount
+            self.references.invalider_si_ecriture(query)
+            print(f"✓ Requête exécutée avec succès ({curseur.rowcount} ligne(s) affectée(s))")
             return True
 
-        except pyodbc.Error as e:
+        except ERREURS_BD as e:
             print(f"✗ Erreur lors de l'exécution de la requête: {e}")
-            self.connection.rollback()
+            self._annuler(e)
+            return False
+
+    def execute_many(self, query: str, params_list: list, commit: bool = True) -> bool:
+        """
+        Exécute une requête INSERT/UPDATE pour plusieurs lignes en une seule transaction
+
+        Avec SQL Server, utilise fast_executemany de pyodbc: les paramètres sont envoyés
+        au serveur en un seul tableau plutôt qu'en un aller-retour par ligne.
+
+        Args:
+            query: Requête SQL paramétrée à exécuter
+            params_list: Liste de tuples de paramètres (une entrée par ligne)
+            commit: False pour laisser la transaction ouverte (valider avec commit())
+
+        Returns:
+            True si succès (toutes les lignes sont validées), False sinon (aucune ligne)
+        """
+        if not params_list:
+            return True
+
+        try:
+            connexion, curseur = self._session()
+            with self._mesurer(query) as chrono:
+                query = self.backend.traduire(query)
+                if self.backend.supporte_fast_executemany:
+                    curseur.fast_executemany = True
+                    try:
+                        curseur.executemany(query, params_list)
+                    finally:
+                        curseur.fast_executemany = False
+                else:
+                    curseur.executemany(query, params_list)
+
+                if commit and not self._dans_transaction():
+                    connexion.commit()
+                chrono['lignes'] = len(params_list)
+            self.references.invalider_si_ecriture(query)
+            print(f"✓ Lot exécuté avec succès ({len(params_list)} ligne(s))")
+            return True
+
+        except ERREURS_BD as e:
+            print(f"✗ Erreur lors de l'exécution du lot: {e}")
+            self._annuler(e)
+            return False
+
+    def insert_donnee(self, date_heure: datetime, id_capteur: int, id_salle: int,
+                      mesure: Optional[float] = None, blob: Optional[bytes] = None,
+                      commit: bool = True) -> Optional[int]:
+        """
+        Insère une donnée capteur et retourne son ID en un seul aller-retour
+
+        Args:
+            date_heure: Heure d'acquisition de la donnée
+            id_capteur: ID du capteur
+            id_salle: ID de la salle
+            mesure: Valeur mesurée (capteurs BRUIT, TEMPERATURE, ...)
+            blob: Photo ou vidéo (capteur CAMERA)
+            commit: False pour laisser la transaction ouverte (valider avec commit())
+
+        Returns:
+            ID de la donnée insérée (idDonnee_PK), ou None si erreur
+        """
+        try:
+            connexion, curseur = self._session()
+            with self._mesurer("[insert_donnee]") as chrono:
+                id_donnee = self.backend.inserer_donnee(
+                    curseur, date_heure, id_capteur, id_salle, mesure, blob
+                )
+
+                if commit and not self._dans_transaction():
+                    connexion.commit()
+                chrono['lignes'] = 1
+            return id_donnee
+
+        except ERREURS_BD as e:
+            print(f"✗ Erreur lors de l'insertion de la donnée: {e}")
+            self._annuler(e)
+            return None
+
+    def insert_donnee_avec_evenement(self, date_heure: datetime, id_capteur: int, id_salle: int,
+                                     type_evenement: str, description: str,
+                                     mesure: Optional[float] = None,
+                                     blob: Optional[bytes] = None,
+                                     commit: bool = True) -> Optional[Tuple[int, int]]:
+        """
+        Insère une donnée capteur et son événement dans une seule transaction
+
+        Les deux INSERT font partie de la même transaction: si l'événement échoue,
+        la donnée est annulée aussi (pas de mesure orpheline).
+
+        Args:
+            date_heure: Heure d'acquisition de la donnée
+            id_capteur: ID du capteur
+            id_salle: ID de la salle
+            type_evenement: Type d'événement (BRUIT_FORT, CAPTURE, ...)
+            description: Description de l'événement
+            mesure: Valeur mesurée (capteurs BRUIT, TEMPERATURE, ...)
+            blob: Photo ou vidéo (capteur CAMERA)
+            commit: False pour laisser la transaction ouverte (valider avec commit())
+
+        Returns:
+            Tuple (id_donnee, id_evenement), ou None si erreur
+        """
+        try:
+            connexion, curseur = self._session()
+            with self._mesurer("[insert_donnee_avec_evenement]") as chrono:
+                ids = self.backend.inserer_donnee_avec_evenement(
+                    curseur, date_heure, id_capteur, id_salle,
+                    type_evenement, description, mesure, blob
+                )
+
+                if commit and not self._dans_transaction():
+                    connexion.commit()
+                chrono['lignes'] = 2
+            return ids
+
+        except ERREURS_BD as e:
+            print(f"✗ Erreur lors de l'insertion de la donnée et de l'événement: {e}")
+            self._annuler(e)
+            return None
+
+    def append_blob(self, id_donnee: int, morceau: bytes, commit: bool = True) -> bool:
+        """
+        Ajoute un morceau à la fin du BLOB (photoBlob) d'une donnée existante
+
+        Avec SQL Server, utilise photoBlob.WRITE: le serveur ne réécrit pas le BLOB entier.
+        La donnée doit avoir été insérée avec blob=b'' (un BLOB NULL ne peut pas être prolongé).
+
+        Args:
+            id_donnee: ID de la donnée à compléter
+            morceau: Octets à ajouter
+            commit: False pour laisser la transaction ouverte (valider avec commit())
+
+        Returns:
+            True si succès, False sinon
+        """
+        try:
+            connexion, curseur = self._session()
+            with self._mesurer("[append_blob]") as chrono:
+                curseur.execute(self.backend.SQL_AJOUT_BLOB, (morceau, id_donnee))
+                chrono['lignes'] = curseur.rowcount
+            if curseur.rowcount == 0:
+                print(f"✗ Aucune donnée avec l'ID {id_donnee} (ou BLOB NULL)")
+                self._annuler()
+                return False
+
+            if commit and not self._dans_transaction():
+                connexion.commit()
+            return True
+
+        except ERREURS_BD as e:
+            print(f"✗ Erreur lors de l'envoi du morceau de BLOB: {e}")
+            self._annuler(e)
             return False
 
+    def iter_blob(self, id_donnee: int, taille_morceau: int = 262144) -> Iterator[bytes]:
+        """
+        Lit le BLOB d'une donnée morceau par morceau (SUBSTRING côté serveur)
+
+        Args:
+            id_donnee: ID de la donnée à lire
+            taille_morceau: Octets lus par aller-retour (défaut: 256 KB)
+
+        Yields:
+            Morceaux successifs du BLOB (rien si la donnée n'existe pas ou n'a pas de BLOB)
+        """
+        taille = self.execute_query(
+            "SELECT DATALENGTH(photoBlob) FROM Donnees WHERE idDonnee_PK = ?",
+            (id_donnee,)
+        )
+        if not taille or taille[0][0] is None:
+            return
+
+        # SUBSTRING compte à partir de 1
+        for debut in range(1, taille[0][0] + 1, taille_morceau):
+            morceau = self.execute_query(
+                "SELECT SUBSTRING(photoBlob, ?, ?) FROM Donnees WHERE idDonnee_PK = ?",
+                (debut, taille_morceau, id_donnee)
+            )
+            if not morceau:
+                raise IOError(f"lecture du BLOB {id_donnee} interrompue à l'octet {debut - 1}")
+            yield morceau[0][0]
+
+    def download_blob(self, id_donnee: int, chemin: str,
+                      taille_morceau: int = 262144) -> Optional[int]:
+        """
+        Écrit le BLOB d'une donnée dans un fichier, sans jamais le charger en entier
+
+        Args:
+            id_donnee: ID de la donnée à extraire
+            chemin: Fichier de destination
+            taille_morceau: Octets lus par aller-retour (défaut: 256 KB)
+
+        Returns:
+            Nombre d'octets écrits, ou None si la donnée n'a pas de BLOB ou si erreur
+        """
+        taille = 0
+        try:
+            with open(chemin, 'wb') as f:
+                for morceau in self.iter_blob(id_donnee, taille_morceau):
+                    f.write(morceau)
+                    taille += len(morceau)
+
+        except OSError as e:
+            print(f"✗ Erreur lors de l'extraction du BLOB: {e}")
+            if os.path.exists(chemin):
+                os.remove(chemin)
+            return None
+
+        if taille == 0:
+            os.remove(chemin)
+            return None
+        return taille
+
     def create_user(self, pseudo: str, courriel: str, mot_de_passe: str) -> int:
         """
         Crée un nouvel utilisateur via la procédure stockée
@@ -136,15 +731,12 @@ class DatabaseConnection:
             ID de l'utilisateur créé, ou -1 si erreur
         """
         try:
-            # Paramètre OUTPUT
-            user_id = self.cursor.execute(
-                "DECLARE @id INT; "
-                "EXEC dbo.usp_Utilisateur_Create @Pseudo=?, @Courriel=?, @MotDePasse=?, @UserId=@id OUTPUT; "
-                "SELECT @id;",
-                pseudo, courriel, mot_de_passe
-            ).fetchval()
+            connexion, curseur = self._session()
+            with self._mesurer("[create_user]"):
+                user_id = self.backend.creer_utilisateur(curseur, pseudo, courriel, mot_de_passe)
 
-            self.connection.commit()
+                if not self._dans_transaction():
+                    connexion.commit()
 
             if user_id == -1:
                 print(f"✗ Erreur: l'email '{courriel}' existe déjà")
@@ -153,9 +745,9 @@ class DatabaseConnection:
 
             return user_id
 
-        except pyodbc.Error as e:
+        except ERREURS_BD as e:
             print(f"✗ Erreur lors de la création de l'utilisateur: {e}")
-            self.connection.rollback()
+            self._annuler(e)
             return -1
 
     def login_user(self, courriel: str, mot_de_passe: str) -> int:
@@ -170,12 +762,9 @@ class DatabaseConnection:
             ID de l'utilisateur si succès, -1 si échec
         """
         try:
-            user_id = self.cursor.execute(
-                "DECLARE @id INT; "
-                "EXEC dbo.usp_Utilisateur_Login @Courriel=?, @MotDePasse=?, @UserId=@id OUTPUT; "
-                "SELECT @id;",
-                courriel, mot_de_passe
-            ).fetchval()
+            connexion, curseur = self._session()
+            with self._mesurer("[login_user]"):
+                user_id = self.backend.authentifier(curseur, courriel, mot_de_passe)
 
             if user_id == -1:
                 print("✗ Échec de l'authentification (email ou mot de passe incorrect)")
@@ -184,8 +773,9 @@ class DatabaseConnection:
 
             return user_id
 
-        except pyodbc.Error as e:
+        except ERREURS_BD as e:
             print(f"✗ Erreur lors de l'authentification: {e}")
+            self._invalider_si_coupee(e)
             return -1
 
     def get_user_by_id(self, id_utilisateur: int) -> Optional[dict]:
@@ -199,11 +789,12 @@ class DatabaseConnection:
             Dictionnaire contenant les informations de l'utilisateur, ou None si non trouvé
         """
         try:
-            result = self.cursor.execute(
+            connexion, curseur = self._session()
+            result = curseur.execute(
                 """SELECT idUtilisateur_PK, pseudo, courriel
                    FROM Utilisateur
                    WHERE idUtilisateur_PK = ?""",
-                id_utilisateur
+                (id_utilisateur,)
             ).fetchone()
 
             if result is None:
@@ -220,8 +811,9 @@ class DatabaseConnection:
             print(f"✓ Utilisateur trouvé: {user['pseudo']} ({user['courriel']})")
             return user
 
-        except pyodbc.Error as e:
+        except ERREURS_BD as e:
             print(f"✗ Erreur lors de la récupération de l'utilisateur: {e}")
+            self._invalider_si_coupee(e)
             return None
 
     def __enter__(self):
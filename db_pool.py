@@ -0,0 +1,166 @@
+"""
+Pool de connexions thread-safe pour la base de données SalleSense
+Partagé par les scripts de capture et l'interface graphique
+"""
+
+import threading
+import time
+from typing import Callable, Optional
+
+
+class ConnectionPool:
+    """Pool borné de connexions réutilisables (min/max, timeout, vérification)"""
+
+    def __init__(self, factory: Callable, min_size: int = 1, max_size: int = 4,
+                 timeout: float = 10.0, requete_test: str = "SELECT 1"):
+        """
+        Initialise le pool et ouvre les connexions minimales
+
+        Args:
+            factory: Fonction sans argument qui ouvre une nouvelle connexion
+            min_size: Nombre de connexions ouvertes dès le départ (défaut: 1)
+            max_size: Nombre maximal de connexions simultanées (défaut: 4)
+            timeout: Attente maximale en secondes pour emprunter une connexion (défaut: 10)
+            requete_test: Requête exécutée pour vérifier une connexion à l'emprunt
+        """
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError("Tailles de pool invalides (0 <= min_size <= max_size, max_size >= 1)")
+
+        self.factory = factory
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.requete_test = requete_test
+
+        self._libres = []          # Connexions disponibles (pile LIFO: les plus récentes restent chaudes)
+        self._nb_ouvertes = 0      # Connexions libres + empruntées
+        self._condition = threading.Condition()
+        self._ferme = False
+
+        for _ in range(min_size):
+            self._libres.append(self.factory())
+            self._nb_ouvertes += 1
+
+    def acquerir(self, timeout: Optional[float] = None):
+        """
+        Emprunte une connexion vérifiée au pool
+
+        Args:
+            timeout: Attente maximale en secondes (défaut: timeout du pool)
+
+        Returns:
+            Connexion prête à l'emploi
+
+        Raises:
+            TimeoutError: Si aucune connexion ne se libère à temps
+            ConnectionError: Si le pool est fermé
+        """
+        if timeout is None:
+            timeout = self.timeout
+        limite = time.monotonic() + timeout
+
+        while True:
+            with self._condition:
+                while True:
+                    if self._ferme:
+                        raise ConnectionError("Le pool de connexions est fermé")
+                    if self._libres:
+                        connexion = self._libres.pop()
+                        break
+                    if self._nb_ouvertes < self.max_size:
+                        # Réserver la place, la connexion est ouverte hors du verrou
+                        self._nb_ouvertes += 1
+                        connexion = None
+                        break
+                    restant = limite - time.monotonic()
+                    if restant <= 0:
+                        raise TimeoutError(
+                            f"Aucune connexion disponible après {timeout}s "
+                            f"({self.max_size} connexion(s) empruntée(s))"
+                        )
+                    self._condition.wait(restant)
+
+            if connexion is None:
+                try:
+                    return self.factory()
+                except Exception:
+                    self._oublier()
+                    raise
+
+            if self._est_valide(connexion):
+                return connexion
+
+            # Connexion morte (réseau coupé, serveur redémarré): on la jette et on recommence
+            self._fermer_connexion(connexion)
+            self._oublier()
+
+    def liberer(self, connexion, invalide: bool = False):
+        """
+        Rend une connexion au pool
+
+        Args:
+            connexion: Connexion empruntée avec acquerir()
+            invalide: True pour fermer la connexion au lieu de la réutiliser
+        """
+        if not invalide:
+            try:
+                # Ne jamais rendre une transaction ouverte au prochain emprunteur
+                connexion.rollback()
+            except Exception:
+                invalide = True
+
+        with self._condition:
+            if invalide or self._ferme:
+                self._nb_ouvertes -= 1
+            else:
+                self._libres.append(connexion)
+                connexion = None
+            self._condition.notify()
+
+        if connexion is not None:
+            self._fermer_connexion(connexion)
+
+    def fermer(self):
+        """Ferme toutes les connexions libres; les connexions empruntées seront fermées à leur retour"""
+        with self._condition:
+            self._ferme = True
+            libres, self._libres = self._libres, []
+            self._nb_ouvertes -= len(libres)
+            self._condition.notify_all()
+
+        for connexion in libres:
+            self._fermer_connexion(connexion)
+
+    def taille(self) -> dict:
+        """Retourne l'état courant du pool (ouvertes, libres, empruntées)"""
+        with self._condition:
+            return {
+                'ouvertes': self._nb_ouvertes,
+                'libres': len(self._libres),
+                'empruntees': self._nb_ouvertes - len(self._libres),
+                'max': self.max_size
+            }
+
+    def _est_valide(self, connexion) -> bool:
+        """Vérifie qu'une connexion répond encore avant de la prêter"""
+        try:
+            curseur = connexion.cursor()
+            curseur.execute(self.requete_test)
+            curseur.fetchall()
+            curseur.close()
+            return True
+        except Exception:
+            return False
+
+    def _oublier(self):
+        """Libère la place d'une connexion qui n'a pas pu être ouverte ou validée"""
+        with self._condition:
+            self._nb_ouvertes -= 1
+            self._condition.notify()
+
+    @staticmethod
+    def _fermer_connexion(connexion):
+        try:
+            connexion.close()
+        except Exception:
+            pass
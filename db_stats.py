@@ -0,0 +1,218 @@
+"""
+Instrumentation des requêtes SQL de DatabaseConnection
+Compteurs par requête normalisée, histogrammes de latence et journal des requêtes lentes
+"""
+
+import math
+import re
+import threading
+from datetime import datetime
+from typing import Optional
+
+
+# Bornes des classes de l'histogramme: de 0.1 ms à ~100 s, 4 classes par doublement
+# (précision d'environ 19% sur les percentiles, mémoire fixe quel que soit le nombre d'appels)
+LATENCE_MIN = 0.0001
+CLASSES_PAR_DOUBLEMENT = 4
+NB_CLASSES = 81
+
+# Clé de l'attente d'une connexion au pool (temps perdu avant même d'atteindre le serveur)
+CLE_ATTENTE_POOL = "[attente pool]"
+
+
+def normaliser_sql(query: str) -> str:
+    """
+    Réduit une requête à sa forme générique pour regrouper les appels semblables
+
+    Les littéraux (nombres, chaînes) deviennent '?' et les espaces sont compactés.
+
+    Args:
+        query: Requête SQL telle qu'exécutée
+
+    Returns:
+        Requête normalisée (clé des statistiques)
+    """
+    sql = re.sub(r"N?'(?:[^']|'')*'", "?", query)
+    sql = re.sub(r"\b\d+(\.\d+)?\b", "?", sql)
+    return " ".join(sql.split())
+
+
+class HistogrammeLatence:
+    """Histogramme logarithmique de durées (en secondes)"""
+
+    def __init__(self):
+        self.classes = [0] * NB_CLASSES
+        self.nombre = 0
+
+    def ajouter(self, duree: float):
+        """Ajoute une durée à l'histogramme"""
+        if duree <= LATENCE_MIN:
+            indice = 0
+        else:
+            indice = int(math.log2(duree / LATENCE_MIN) * CLASSES_PAR_DOUBLEMENT) + 1
+        self.classes[min(indice, NB_CLASSES - 1)] += 1
+        self.nombre += 1
+
+    def percentile(self, p: float) -> float:
+        """
+        Estime un percentile (borne haute de la classe qui le contient)
+
+        Args:
+            p: Percentile voulu entre 0 et 1 (ex: 0.95)
+
+        Returns:
+            Durée en secondes (0 si l'histogramme est vide)
+        """
+        if self.nombre == 0:
+            return 0.0
+
+        rang = p * self.nombre
+        cumul = 0
+        for indice, nombre in enumerate(self.classes):
+            cumul += nombre
+            if cumul >= rang:
+                return LATENCE_MIN * 2 ** (indice / CLASSES_PAR_DOUBLEMENT)
+        return LATENCE_MIN * 2 ** ((NB_CLASSES - 1) / CLASSES_PAR_DOUBLEMENT)
+
+
+class StatistiquesRequete:
+    """Compteurs d'une requête normalisée"""
+
+    __slots__ = ('appels', 'erreurs', 'lignes', 'total', 'max', 'execution', 'lecture', 'histogramme')
+
+    def __init__(self):
+        self.appels = 0
+        self.erreurs = 0
+        self.lignes = 0
+        self.total = 0.0       # Durée totale côté appelant
+        self.max = 0.0
+        self.execution = 0.0   # Part passée dans execute() (aller-retour réseau + serveur)
+        self.lecture = 0.0     # Part passée à rapatrier les lignes (fetch)
+        self.histogramme = HistogrammeLatence()
+
+
+class StatistiquesRequetes:
+    """Registre thread-safe des statistiques de toutes les requêtes d'une connexion"""
+
+    def __init__(self, seuil_lent: Optional[float] = 0.5, journal_lent: Optional[str] = None):
+        """
+        Args:
+            seuil_lent: Durée en secondes au-delà de laquelle une requête est journalisée
+                        (None pour désactiver le journal)
+            journal_lent: Fichier du journal des requêtes lentes (None: affichage console)
+        """
+        self.seuil_lent = seuil_lent
+        self.journal_lent = journal_lent
+        self._requetes = {}
+        self._verrou = threading.Lock()
+        self._verrou_journal = threading.Lock()
+
+    def enregistrer(self, query: str, duree: float, lignes: int = 0,
+                    execution: Optional[float] = None, lecture: float = 0.0,
+                    erreur: bool = False):
+        """
+        Enregistre un appel
+
+        Args:
+            query: Requête exécutée (ou étiquette entre crochets, ex: '[insert_donnee]')
+            duree: Durée totale de l'appel en secondes
+            lignes: Lignes lues ou affectées
+            execution: Durée de execute() (défaut: duree - lecture)
+            lecture: Durée des fetch
+            erreur: True si l'appel a échoué
+        """
+        cle = normaliser_sql(query)
+        if execution is None:
+            execution = duree - lecture
+
+        with self._verrou:
+            stats = self._requetes.get(cle)
+            if stats is None:
+                stats = self._requetes[cle] = StatistiquesRequete()
+            stats.appels += 1
+            stats.erreurs += erreur
+            stats.lignes += max(lignes, 0)
+            stats.total += duree
+            stats.max = max(stats.max, duree)
+            stats.execution += execution
+            stats.lecture += lecture
+            stats.histogramme.ajouter(duree)
+
+        if self.seuil_lent is not None and duree >= self.seuil_lent:
+            self._journaliser(cle, duree, execution, lecture, lignes)
+
+    def _journaliser(self, cle: str, duree: float, execution: float, lecture: float, lignes: int):
+        """Ajoute une requête lente au journal"""
+        ligne = (f"{datetime.now().isoformat(' ', 'milliseconds')} | {duree * 1000:8.1f} ms "
+                 f"(exécution {execution * 1000:.1f} ms, lecture {lecture * 1000:.1f} ms, "
+                 f"{lignes} ligne(s)) | {cle}")
+
+        if self.journal_lent is None:
+            print(f"⚠ Requête lente: {ligne}")
+            return
+
+        with self._verrou_journal:
+            try:
+                with open(self.journal_lent, 'a', encoding='utf-8') as f:
+                    f.write(ligne + "\n")
+            except OSError as e:
+                print(f"⚠ Journal des requêtes lentes inaccessible: {e}")
+
+    def stats(self) -> dict:
+        """
+        Instantané des statistiques
+
+        Returns:
+            Dictionnaire {requête normalisée: {appels, erreurs, lignes, total, moyenne, max,
+            p50, p95, p99, execution, lecture}} (durées en secondes)
+        """
+        with self._verrou:
+            return {
+                cle: {
+                    'appels': s.appels,
+                    'erreurs': s.erreurs,
+                    'lignes': s.lignes,
+                    'total': s.total,
+                    'moyenne': s.total / s.appels,
+                    'max': s.max,
+                    'p50': min(s.histogramme.percentile(0.50), s.max),
+                    'p95': min(s.histogramme.percentile(0.95), s.max),
+                    'p99': min(s.histogramme.percentile(0.99), s.max),
+                    'execution': s.execution,
+                    'lecture': s.lecture
+                }
+                for cle, s in self._requetes.items()
+            }
+
+    def reinitialiser(self):
+        """Remet tous les compteurs à zéro"""
+        with self._verrou:
+            self._requetes = {}
+
+
+def formater_stats(stats: dict, limite: int = 15, largeur_sql: int = 60) -> str:
+    """
+    Met en forme un instantané de stats() en tableau texte (requêtes les plus coûteuses d'abord)
+
+    Args:
+        stats: Résultat de DatabaseConnection.stats()
+        limite: Nombre maximal de requêtes affichées
+        largeur_sql: Largeur de la colonne requête
+
+    Returns:
+        Tableau prêt à afficher
+    """
+    lignes = [
+        f"{'Requête':{largeur_sql}} {'appels':>7} {'total s':>8} {'p50 ms':>8} "
+        f"{'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'exec %':>6}"
+    ]
+    lignes.append("-" * len(lignes[0]))
+
+    for cle, s in sorted(stats.items(), key=lambda e: e[1]['total'], reverse=True)[:limite]:
+        sql = cle if len(cle) <= largeur_sql else cle[:largeur_sql - 1] + "…"
+        part_execution = 100 * s['execution'] / s['total'] if s['total'] else 0
+        lignes.append(
+            f"{sql:{largeur_sql}} {s['appels']:7d} {s['total']:8.2f} {s['p50'] * 1000:8.1f} "
+            f"{s['p95'] * 1000:8.1f} {s['p99'] * 1000:8.1f} {s['max'] * 1000:8.1f} {part_execution:6.0f}"
+        )
+    return "\n".join(lignes)
@@ -0,0 +1,187 @@
+"""
+Détection des épisodes de bruit fort (machine à états avec hystérésis)
+Un épisode = une perturbation: un seul événement BRUIT_FORT au lieu d'un par mesure
+"""
+
+import math
+from collections import namedtuple
+from datetime import datetime, timedelta
+from typing import Optional
+
+import numpy as np
+
+
+# Transitions retournées par DetecteurEpisodes.ajouter()
+DEBUT = 'DEBUT'
+FIN = 'FIN'
+SUITE = 'SUITE'  # Épisode coupé à duree_max: FIN du premier segment et DEBUT de la suite à la fois
+
+# États de la machine
+CALME = 'CALME'
+CANDIDAT = 'CANDIDAT'
+EPISODE = 'EPISODE'
+REFROIDISSEMENT = 'REFROIDISSEMENT'
+
+# caracteristiques: moyenne des vecteurs de caractéristiques des mesures (None si aucun)
+Episode = namedtuple('Episode', ['debut', 'fin', 'crete', 'moyenne', 'nb_mesures', 'caracteristiques'],
+                     defaults=(None,))
+
+
+class DetecteurEpisodes:
+    """
+    Regroupe les mesures de bruit fort en épisodes
+
+    - Entrée quand le niveau atteint seuil_entree, sortie quand il repasse sous seuil_sortie
+      (hystérésis: un niveau qui oscille autour du seuil ne crée pas plusieurs épisodes)
+    - Un épisode n'est confirmé qu'après duree_min secondes au-dessus de seuil_sortie
+    - Après un épisode, aucun nouveau n'est ouvert pendant refroidissement secondes
+    - Un épisode plus long que duree_max est clos et un nouveau commence aussitôt (SUITE):
+      chaque segment a son événement BRUIT_FORT, son clip et sa vidéo
+    """
+
+    def __init__(self, seuil_entree: float, seuil_sortie: Optional[float] = None,
+                 duree_min: float = 1.0, refroidissement: float = 30.0,
+                 duree_max: float = 300.0):
+        """
+        Args:
+            seuil_entree: Niveau (dB) qui ouvre un épisode
+            seuil_sortie: Niveau (dB) sous lequel l'épisode se termine (défaut: seuil_entree - 5)
+            duree_min: Secondes au-dessus des seuils avant de confirmer l'épisode (défaut: 1)
+            refroidissement: Secondes sans nouvel épisode après la fin d'un épisode (défaut: 30)
+            duree_max: Durée maximale d'un épisode en secondes (défaut: 300)
+        """
+        self.seuil_entree = seuil_entree
+        self.seuil_sortie = seuil_entree - 5.0 if seuil_sortie is None else min(seuil_sortie, seuil_entree)
+        self.duree_min = timedelta(seconds=duree_min)
+        self.refroidissement = timedelta(seconds=refroidissement)
+        self.duree_max = timedelta(seconds=duree_max)
+
+        self.etat = CALME
+        self.dernier_episode: Optional[Episode] = None
+        self.compteur_episodes = 0
+
+        self._debut = None
+        self._derniere = None
+        self._fin_refroidissement = None
+        self._crete = 0.0
+        self._energie = 0.0
+        self._nb = 0
+        self._somme_caracteristiques = None
+        self._nb_caracteristiques = 0
+
+    @property
+    def en_cours(self) -> bool:
+        """Vrai si un épisode confirmé est en cours"""
+        return self.etat == EPISODE
+
+    def episode_en_cours(self) -> Optional[Episode]:
+        """Épisode en cours (fin = dernière mesure), ou None"""
+        if self.etat != EPISODE:
+            return None
+        return self._episode(self._derniere)
+
+    def ajouter(self, date_heure: datetime, niveau: float, caracteristiques=None) -> Optional[str]:
+        """
+        Fait avancer la machine à états avec une nouvelle mesure
+
+        Args:
+            date_heure: Heure de la mesure
+            niveau: Niveau sonore en dB
+            caracteristiques: Vecteur de caractéristiques de la fenêtre (optionnel),
+                              moyenné sur l'épisode (voir caracteristiques_son)
+
+        Returns:
+            DEBUT quand un épisode est confirmé, FIN quand il se termine
+            (voir dernier_episode), SUITE quand il est coupé à duree_max
+            (FIN du segment clos puis DEBUT de la suite), None sinon
+        """
+        if self.etat == REFROIDISSEMENT:
+            if date_heure < self._fin_refroidissement:
+                return None
+            self.etat = CALME
+
+        if self.etat == CALME:
+            if niveau < self.seuil_entree:
+                return None
+            self.etat = CANDIDAT
+            self._commencer(date_heure)
+
+        elif self.etat == CANDIDAT:
+            if niveau < self.seuil_sortie:
+                # Trop court: simple pic, pas d'épisode
+                self.etat = CALME
+                return None
+
+        elif self.etat == EPISODE:
+            if niveau < self.seuil_sortie:
+                return self._terminer(date_heure)
+
+            if date_heure - self._debut >= self.duree_max:
+                # Bruit continu: clore cet épisode et en ouvrir un autre aussitôt (déjà confirmé)
+                self._terminer(date_heure)
+                self.etat = EPISODE
+                self._commencer(date_heure)
+                self._accumuler(date_heure, niveau, caracteristiques)
+                return SUITE
+
+        self._accumuler(date_heure, niveau, caracteristiques)
+
+        if self.etat == CANDIDAT and date_heure - self._debut >= self.duree_min:
+            self.etat = EPISODE
+            return DEBUT
+        return None
+
+    def terminer(self, date_heure: Optional[datetime] = None) -> Optional[Episode]:
+        """
+        Clôt l'épisode en cours (ex: à l'arrêt du programme)
+
+        Returns:
+            L'épisode clos, ou None s'il n'y en avait pas
+        """
+        if self.etat != EPISODE:
+            self.etat = CALME
+            return None
+        self._terminer(date_heure or self._derniere)
+        return self.dernier_episode
+
+    def _commencer(self, date_heure: datetime):
+        self._debut = date_heure
+        self._crete = -math.inf
+        self._energie = 0.0
+        self._nb = 0
+        self._somme_caracteristiques = None
+        self._nb_caracteristiques = 0
+
+    def _accumuler(self, date_heure: datetime, niveau: float, caracteristiques=None):
+        self._derniere = date_heure
+        self._crete = max(self._crete, niveau)
+        self._energie += 10 ** (niveau / 10)
+        self._nb += 1
+        if caracteristiques is not None:
+            if self._somme_caracteristiques is None:
+                self._somme_caracteristiques = np.zeros(len(caracteristiques), dtype=np.float64)
+            self._somme_caracteristiques += caracteristiques
+            self._nb_caracteristiques += 1
+
+    def _terminer(self, date_heure: datetime) -> str:
+        self.dernier_episode = self._episode(date_heure)
+        self.compteur_episodes += 1
+        self.etat = REFROIDISSEMENT
+        self._fin_refroidissement = date_heure + self.refroidissement
+        return FIN
+
+    def _episode(self, fin: datetime) -> Episode:
+        # Moyenne énergétique (Leq des mesures), pas la moyenne arithmétique des dB
+        moyenne = 10 * math.log10(self._energie / self._nb) if self._nb else self._crete
+        caracteristiques = (self._somme_caracteristiques / self._nb_caracteristiques
+                            if self._nb_caracteristiques else None)
+        return Episode(self._debut, fin, self._crete, moyenne, self._nb, caracteristiques)
+
+
+def decrire_episode(episode: Episode) -> str:
+    """Description d'un épisode pour l'événement BRUIT_FORT"""
+    duree = (episode.fin - episode.debut).total_seconds()
+    return (f"Épisode de bruit fort {episode.debut.strftime('%H:%M:%S')} → "
+            f"{episode.fin.strftime('%H:%M:%S')} ({duree:.0f}s) - "
+            f"crête {episode.crete:.1f} dB, moyenne {episode.moyenne:.1f} dB "
+            f"({episode.nb_mesures} mesure(s))")
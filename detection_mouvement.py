@@ -0,0 +1,93 @@
+"""
+Détection de mouvement sur le flux basse résolution (lores) de la caméra
+Différence entre l'image réduite en niveaux de gris et un modèle du fond (moyenne
+glissante): seules les photos où la scène change sont gardées
+"""
+
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+class DetecteurMouvement:
+    """
+    Compare chaque image au fond appris
+
+    Un pixel a changé si son écart au fond dépasse seuil_pixel niveaux de gris;
+    il y a mouvement si la proportion de pixels changés atteint sensibilite.
+    Le fond apprend vite les pixels stables depuis l'image précédente (éclairage,
+    objet déplacé puis laissé, fond appris avec quelqu'un dans l'image) et
+    lentement ceux qui bougent encore.
+    """
+
+    def __init__(self, sensibilite: float = 0.01, seuil_pixel: int = 25, reduction: int = 4,
+                 apprentissage: float = 0.05, apprentissage_mouvement: float = 0.005):
+        """
+        Args:
+            sensibilite: Proportion de pixels changés qui signale un mouvement (défaut: 1%)
+            seuil_pixel: Écart au fond (0-255) à partir duquel un pixel a changé (défaut: 25)
+            reduction: Facteur de réduction de l'image (moyenne de blocs reduction x reduction,
+                       atténue le bruit du capteur; défaut: 4)
+            apprentissage: Part de l'image courante dans le fond, pixels stables (défaut: 0.05)
+            apprentissage_mouvement: Idem pour les pixels qui bougent encore (défaut: 0.005)
+        """
+        self.sensibilite = sensibilite
+        self.seuil_pixel = seuil_pixel
+        self.reduction = reduction
+        self.apprentissage = apprentissage
+        self.apprentissage_mouvement = apprentissage_mouvement
+
+        self._fond: Optional[np.ndarray] = None
+        self._precedente: Optional[np.ndarray] = None
+        self.derniere_proportion = 0.0
+
+        # Statistiques
+        self.compteur_images = 0
+        self.compteur_mouvements = 0
+
+    def reinitialiser(self):
+        """Oublie le fond (ex: après un changement de configuration de la caméra)"""
+        self._fond = None
+        self._precedente = None
+
+    def analyser(self, image: np.ndarray) -> Tuple[bool, float]:
+        """
+        Compare une image au fond puis met le fond à jour
+
+        Args:
+            image: Image en niveaux de gris (hauteur, largeur), uint8
+
+        Returns:
+            (mouvement, proportion de pixels changés)
+        """
+        reduite = self._reduire(image)
+        self.compteur_images += 1
+
+        if self._fond is None or self._fond.shape != reduite.shape:
+            self._fond = reduite
+            self._precedente = reduite
+            self.derniere_proportion = 0.0
+            return False, 0.0
+
+        changes = np.abs(reduite - self._fond) > self.seuil_pixel
+        proportion = float(changes.mean())
+
+        # Le fond apprend vite où rien n'a bougé depuis l'image précédente, lentement ailleurs
+        bouge = np.abs(reduite - self._precedente) > self.seuil_pixel
+        taux = np.where(bouge, self.apprentissage_mouvement, self.apprentissage).astype(np.float32)
+        self._fond += taux * (reduite - self._fond)
+        self._precedente = reduite
+
+        mouvement = proportion >= self.sensibilite
+        if mouvement:
+            self.compteur_mouvements += 1
+        self.derniere_proportion = proportion
+        return mouvement, proportion
+
+    def _reduire(self, image: np.ndarray) -> np.ndarray:
+        """Moyenne de blocs reduction x reduction (float32)"""
+        r = self.reduction
+        hauteur = image.shape[0] - image.shape[0] % r
+        largeur = image.shape[1] - image.shape[1] % r
+        blocs = image[:hauteur, :largeur].reshape(hauteur // r, r, largeur // r, r)
+        return blocs.mean(axis=(1, 3), dtype=np.float32)
@@ -0,0 +1,97 @@
+"""
+Envoi d'un BLOB vers la BD pendant sa production (vidéo en cours d'enregistrement)
+Les octets sont découpés en morceaux envoyés par un thread dédié (photoBlob.WRITE)
+"""
+
+import queue
+import threading
+from db_connection import DatabaseConnection
+
+
+class FluxBlob:
+    """Objet fichier (write/flush/close) qui envoie un BLOB à la BD morceau par morceau"""
+
+    def __init__(self, db_connection: DatabaseConnection, id_donnee: int,
+                 taille_morceau: int = 262144, morceaux_en_attente: int = 8):
+        """
+        Initialise le flux et démarre le thread d'envoi
+
+        Args:
+            db_connection: Connexion à la base de données
+            id_donnee: ID de la donnée à compléter (insérée avec blob=b'')
+            taille_morceau: Octets envoyés par UPDATE (défaut: 256 KB)
+            morceaux_en_attente: Morceaux gardés en mémoire au maximum si la BD est
+                                 plus lente que la source: write() bloque au-delà (défaut: 8)
+        """
+        self.db = db_connection
+        self.id_donnee = id_donnee
+        self.taille_morceau = taille_morceau
+
+        self._tampon = bytearray()
+        self._file = queue.Queue(maxsize=morceaux_en_attente)
+        self._erreur = False
+        self.octets_envoyes = 0
+        self.closed = False
+
+        self._thread = threading.Thread(target=self._boucle_envoi, name="FluxBlob", daemon=True)
+        self._thread.start()
+
+    def write(self, donnees) -> int:
+        """Ajoute des octets au flux (appelé par l'encodeur vidéo)"""
+        if self.closed:
+            raise ValueError("écriture dans un FluxBlob fermé")
+
+        self._tampon += donnees
+        while len(self._tampon) >= self.taille_morceau:
+            self._file.put(bytes(self._tampon[:self.taille_morceau]))
+            del self._tampon[:self.taille_morceau]
+        return len(donnees)
+
+    def flush(self):
+        """Rien à faire: les morceaux complets partent dès qu'ils sont prêts"""
+
+    def close(self):
+        """Envoie le dernier morceau et attend la fin des envois"""
+        self.fermer()
+
+    def fermer(self) -> bool:
+        """
+        Envoie le dernier morceau et attend la fin des envois
+
+        Returns:
+            True si tout le BLOB est en BD, False si un envoi a échoué
+        """
+        if not self.closed:
+            self.closed = True
+            if self._tampon:
+                self._file.put(bytes(self._tampon))
+                self._tampon = bytearray()
+            self._file.put(None)
+            self._thread.join()
+        return not self._erreur
+
+    def _boucle_envoi(self):
+        """Thread d'envoi: chaque morceau est validé dès qu'il est écrit"""
+        try:
+            while True:
+                morceau = self._file.get()
+                if morceau is None:
+                    break
+                if self._erreur:
+                    continue  # Vider la file sans envoyer: le BLOB est déjà incomplet
+                if self.db.append_blob(self.id_donnee, morceau):
+                    self.octets_envoyes += len(morceau)
+                else:
+                    self._erreur = True
+                    print(f"✗ BLOB {self.id_donnee} incomplet ({self.octets_envoyes} octets envoyés)")
+        finally:
+            # Rendre la connexion de ce thread au pool
+            self.db.liberer_connexion()
+
+    def __enter__(self):
+        """Support du context manager (with statement)"""
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Termine les envois à la sortie du context manager"""
+        self.fermer()
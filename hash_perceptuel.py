@@ -0,0 +1,107 @@
+"""
+Hash perceptuel des photos (dHash, 64 bits) calculé avec NumPy
+Deux images presque identiques (bruit du capteur, recompression JPEG) ont des hash
+à faible distance de Hamming: les photos en double ne sont pas envoyées, et les
+photos gardées se regroupent par ressemblance sans décoder les JPEG.
+"""
+
+from typing import List, Sequence
+
+import numpy as np
+
+from db_connection import DatabaseConnection
+
+
+# Taille du hash: HAUTEUR_HASH lignes de LARGEUR_HASH comparaisons entre cellules voisines
+LARGEUR_HASH = 8
+HAUTEUR_HASH = 8
+MASQUE_64_BITS = (1 << 64) - 1
+
+# Écart minimal (niveaux de gris) entre deux cellules voisines pour un bit à 1: dans une zone
+# uniforme (mur, sol), le bruit du capteur ferait sinon changer les bits d'une image à l'autre
+ECART_MIN = 1.0
+
+# Hash d'une photo déjà insérée (même transaction que la photo)
+REQUETE_HASH = "UPDATE Donnees SET hashPerceptuel = ? WHERE idDonnee_PK = ?"
+
+
+def dhash(image: np.ndarray) -> int:
+    """
+    Hash de différence d'une image en niveaux de gris
+
+    L'image est réduite à 9x8 cellules (moyenne des pixels de chaque cellule); chaque
+    bit indique si une cellule est plus claire que sa voisine de gauche (d'au moins ECART_MIN).
+
+    Args:
+        image: Tableau (hauteur, largeur) en niveaux de gris, ou (hauteur, largeur, 3) en RGB
+
+    Returns:
+        Hash sur 64 bits (entier non signé)
+    """
+    if image.ndim == 3:
+        image = image.mean(axis=2)
+    reduite = _reduire(image, LARGEUR_HASH + 1, HAUTEUR_HASH)
+    bits = reduite[:, 1:] - reduite[:, :-1] > ECART_MIN
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), "big")
+
+
+def distance_hamming(hash_a: int, hash_b: int) -> int:
+    """Nombre de bits différents entre deux hash (0: images presque identiques, 64: opposées)"""
+    return bin((hash_a ^ hash_b) & MASQUE_64_BITS).count("1")
+
+
+def en_bigint(hash_photo: int) -> int:
+    """Hash non signé -> valeur signée pour une colonne BIGINT"""
+    return hash_photo - (1 << 64) if hash_photo >= (1 << 63) else hash_photo
+
+
+def depuis_bigint(valeur: int) -> int:
+    """Valeur lue dans une colonne BIGINT -> hash non signé"""
+    return valeur & MASQUE_64_BITS
+
+
+def regrouper(hashes: Sequence[int], distance_max: int = 5) -> List[List[int]]:
+    """
+    Regroupe des photos consécutives presque identiques
+
+    Une photo rejoint le groupe courant si elle est à distance_max bits au plus
+    de la première photo du groupe, sinon elle commence un nouveau groupe.
+
+    Args:
+        hashes: Hash des photos, dans l'ordre chronologique
+        distance_max: Distance de Hamming maximale dans un groupe (défaut: 5)
+
+    Returns:
+        Groupes d'indices dans hashes
+    """
+    groupes = []
+    for indice, hash_photo in enumerate(hashes):
+        if groupes and distance_hamming(hashes[groupes[-1][0]], hash_photo) <= distance_max:
+            groupes[-1].append(indice)
+        else:
+            groupes.append([indice])
+    return groupes
+
+
+def enregistrer_hash(db: DatabaseConnection, id_donnee: int, hash_photo: int) -> bool:
+    """
+    Écrit le hash perceptuel d'une photo dans Donnees.hashPerceptuel
+
+    Args:
+        db: Connexion (appeler dans la transaction qui a inséré la photo)
+        id_donnee: ID de la photo
+        hash_photo: Résultat de dhash()
+
+    Returns:
+        True si succès, False sinon
+    """
+    return db.execute_non_query(REQUETE_HASH, (en_bigint(hash_photo), id_donnee))
+
+
+def _reduire(image: np.ndarray, largeur: int, hauteur: int) -> np.ndarray:
+    """Moyenne des pixels de chaque cellule d'une grille largeur x hauteur"""
+    image = np.asarray(image, dtype=np.float32)
+    lignes = np.linspace(0, image.shape[0], hauteur + 1).astype(int)
+    colonnes = np.linspace(0, image.shape[1], largeur + 1).astype(int)
+    sommes = np.add.reduceat(np.add.reduceat(image, lignes[:-1], axis=0), colonnes[:-1], axis=1)
+    return sommes / np.outer(np.diff(lignes), np.diff(colonnes))
@@ -57,7 +57,34 @@ def initialiser_bd():
         else:
             print("✓ Capteur PICAM-V2-1 existe déjà")
 
-        # 4. Afficher un résumé
+        # 4. Créer le capteur des clips audio (même micro, clips des épisodes de bruit fort)
+        print("\n--- Création du capteur des clips audio ---")
+        clips_existant = db.execute_query("SELECT idCapteur_PK FROM Capteur WHERE nom = 'MIC-CLIPS-1'")
+
+        if not clips_existant:
+            db.execute_non_query(
+                "INSERT INTO Capteur (nom, type) VALUES (?, ?)",
+                ('MIC-CLIPS-1', 'AUDIO')
+            )
+            print("✓ Capteur MIC-CLIPS-1 créé")
+        else:
+            print("✓ Capteur MIC-CLIPS-1 existe déjà")
+
+        # 5. Créer les capteurs analogiques (autres canaux du MCP3008)
+        print("\n--- Création des capteurs analogiques ---")
+        for nom, type_capteur in (('TMP-1', 'TEMPERATURE'), ('AIR-1', 'CO2')):
+            existant = db.execute_query("SELECT idCapteur_PK FROM Capteur WHERE nom = ?", (nom,))
+
+            if not existant:
+                db.execute_non_query(
+                    "INSERT INTO Capteur (nom, type) VALUES (?, ?)",
+                    (nom, type_capteur)
+                )
+                print(f"✓ Capteur {nom} créé")
+            else:
+                print(f"✓ Capteur {nom} existe déjà")
+
+        # 6. Afficher un résumé
         print("\n=== Résumé de la configuration ===")
 
         print("\n--- Salles ---")
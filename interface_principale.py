@@ -15,6 +15,7 @@ matplotlib.use('TkAgg')
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from matplotlib.figure import Figure
+from db_stats import formater_stats
 
 
 class InterfacePrincipaleModerne:
@@ -548,24 +549,44 @@ class InterfacePrincipaleModerne:
                 "24h": 24
             }.get(period_str, 1)
 
-            # Récupérer les données
+            # Récupérer les données: agrégats au-delà d'une heure (une mesure/s sinon)
             date_debut = datetime.now() - timedelta(hours=hours)
-
-            donnees = self.db.execute_query("""
-                SELECT d.dateHeure, d.mesure
-                FROM Donnees d
-                JOIN Capteur c ON d.idCapteur = c.idCapteur_PK
-                WHERE c.type = N'BRUIT'
-                  AND d.dateHeure >= ?
-                ORDER BY d.dateHeure ASC
-            """, (date_debut,))
+            donnees = []
+            if hours > 1:
+                table = 'AgregatQuartHeure' if hours >= 12 else 'AgregatMinute'
+                donnees = self.db.execute_query(f"""
+                    SELECT a.debut,
+                           SUM(a.moyenne * a.nbMesures) / SUM(a.nbMesures),
+                           MIN(a.minimum),
+                           MAX(a.maximum)
+                    FROM {table} a
+                    WHERE {self.db.references.filtre_capteurs('BRUIT', 'a.idCapteur')}
+                      AND a.debut >= ?
+                    GROUP BY a.debut
+                    ORDER BY a.debut ASC
+                """, (date_debut,))
+
+            if not donnees:
+                # Période courte, ou pas encore d'agrégats: mesures brutes
+                donnees = self.db.execute_query(f"""
+                    SELECT d.dateHeure, d.mesure
+                    FROM Donnees d
+                    WHERE {self.db.references.filtre_capteurs('BRUIT')}
+                      AND d.dateHeure >= ?
+                    ORDER BY d.dateHeure ASC
+                """, (date_debut,))
 
             if donnees:
                 dates = [row[0] for row in donnees]
                 mesures = [row[1] for row in donnees]
 
-                # Tracer le graphique
-                self.ax.plot(dates, mesures, color=self.colors['primary'], linewidth=2, marker='o', markersize=4)
+                # Tracer le graphique (agrégats: moyenne et bande min-max)
+                if len(donnees[0]) > 2:
+                    self.ax.fill_between(dates, [row[2] for row in donnees], [row[3] for row in donnees],
+                                         color=self.colors['primary'], alpha=0.2, linewidth=0)
+                    self.ax.plot(dates, mesures, color=self.colors['primary'], linewidth=2)
+                else:
+                    self.ax.plot(dates, mesures, color=self.colors['primary'], linewidth=2, marker='o', markersize=4)
 
                 # Zones de couleur
                 self.ax.axhspan(0, 50, facecolor=self.colors['success'], alpha=0.1)
@@ -597,77 +618,107 @@ class InterfacePrincipaleModerne:
             self.canvas_graph.draw()
 
     def charger_galerie(self):
-        """Charge les dernières photos dans la galerie"""
-        try:
-            # Vider la galerie
-            for widget in self.gallery_frame.winfo_children():
-                widget.destroy()
+        """Charge les miniatures des dernières photos et vidéos (lecture en arrière-plan)"""
+        threading.Thread(target=self._lire_galerie, daemon=True).start()
 
-            # Récupérer les 12 dernières photos
-            photos = self.db.execute_query("""
-                SELECT TOP 12 d.idDonnee_PK, d.photoBlob, d.dateHeure
+    def _lire_galerie(self):
+        """Lit et décode les miniatures hors du thread Tk, puis demande leur affichage"""
+        try:
+            # 12 dernières miniatures (quelques KB chacune, produites à la capture):
+            # les photos pleine résolution ne sont pas transférées
+            lignes = self.db.execute_query(f"""
+                SELECT TOP 12 d.idDonnee_PK, m.miniatureJpeg, d.dateHeure
                 FROM Donnees d
-                JOIN Capteur c ON d.idCapteur = c.idCapteur_PK
-                WHERE c.type = N'CAMERA' AND d.photoBlob IS NOT NULL
+                LEFT JOIN MiniatureDonnee m ON m.idDonnee = d.idDonnee_PK
+                WHERE {self.db.references.filtre_capteurs('CAMERA')} AND d.photoBlob IS NOT NULL
                 ORDER BY d.dateHeure DESC
             """)
 
-            if photos:
-                row_frame = None
-                for idx, (photo_id, photo_blob, date) in enumerate(photos):
-                    # Créer une nouvelle ligne tous les 3 éléments
-                    if idx % 3 == 0:
-                        row_frame = tk.Frame(self.gallery_frame, bg=self.colors['card'])
-                        row_frame.pack(fill=tk.X, pady=5)
-
-                    # Container pour la photo
-                    photo_container = tk.Frame(row_frame, bg=self.colors['border'],
-                                              relief=tk.RAISED, borderwidth=2)
-                    photo_container.pack(side=tk.LEFT, padx=10, pady=5)
-
+            tuiles = []
+            for photo_id, miniature, date in lignes or []:
+                image = None
+                if miniature is not None:
                     try:
-                        # Charger l'image
-                        image = Image.open(BytesIO(photo_blob))
-                        # Redimensionner
-                        image.thumbnail((300, 200), Image.Resampling.LANCZOS)
-                        photo = ImageTk.PhotoImage(image)
-
-                        # Label pour l'image
-                        img_label = tk.Label(photo_container, image=photo, bg=self.colors['card'])
-                        img_label.image = photo  # Garder une référence
-                        img_label.pack()
-
-                        # Info sous l'image
-                        info_frame = tk.Frame(photo_container, bg=self.colors['card'])
-                        info_frame.pack(fill=tk.X, padx=5, pady=5)
-
-                        tk.Label(info_frame,
-                                text=f"📅 {date.strftime('%Y-%m-%d %H:%M:%S')}",
-                                font=('Arial', 9),
-                                fg=self.colors['dark'],
-                                bg=self.colors['card']).pack()
-
-                    except Exception as e:
-                        tk.Label(photo_container,
-                                text=f"❌ Erreur\n{str(e)[:20]}",
-                                font=('Arial', 10),
-                                fg=self.colors['danger'],
-                                bg=self.colors['card'],
-                                padx=20, pady=20).pack()
-            else:
-                tk.Label(self.gallery_frame,
-                        text="Aucune photo disponible",
-                        font=('Arial', 14),
-                        fg=self.colors['gray'],
-                        bg=self.colors['card']).pack(pady=50)
+                        image = Image.open(BytesIO(miniature))
+                        image.load()
+                    except Exception:
+                        image = None
+                tuiles.append((photo_id, image, date))
+
+            self.root.after(0, self._afficher_galerie, tuiles)
 
         except Exception as e:
             print(f"Erreur chargement galerie: {e}")
+            self.root.after(0, self._afficher_erreur_galerie, str(e))
+
+    def _vider_galerie(self):
+        """Retire les tuiles affichées"""
+        for widget in self.gallery_frame.winfo_children():
+            widget.destroy()
+
+    def _afficher_galerie(self, tuiles: list):
+        """
+        Affiche les miniatures dans la galerie (thread Tk)
+
+        Args:
+            tuiles: (ID de la donnée, image PIL ou None sans miniature, date) par photo ou vidéo
+        """
+        self._vider_galerie()
+
+        if not tuiles:
             tk.Label(self.gallery_frame,
-                    text=f"Erreur: {str(e)}",
-                    font=('Arial', 12),
-                    fg=self.colors['danger'],
+                    text="Aucune photo disponible",
+                    font=('Arial', 14),
+                    fg=self.colors['gray'],
                     bg=self.colors['card']).pack(pady=50)
+            return
+
+        row_frame = None
+        for idx, (photo_id, image, date) in enumerate(tuiles):
+            # Créer une nouvelle ligne tous les 3 éléments
+            if idx % 3 == 0:
+                row_frame = tk.Frame(self.gallery_frame, bg=self.colors['card'])
+                row_frame.pack(fill=tk.X, pady=5)
+
+            # Container pour la photo
+            photo_container = tk.Frame(row_frame, bg=self.colors['border'],
+                                      relief=tk.RAISED, borderwidth=2)
+            photo_container.pack(side=tk.LEFT, padx=10, pady=5)
+
+            if image is not None:
+                photo = ImageTk.PhotoImage(image)
+
+                # Label pour l'image
+                img_label = tk.Label(photo_container, image=photo, bg=self.colors['card'])
+                img_label.image = photo  # Garder une référence
+                img_label.pack()
+            else:
+                # Photo prise avant les miniatures (python miniatures.py pour les créer)
+                tk.Label(photo_container,
+                        text=f"📷 #{photo_id}\nMiniature indisponible",
+                        font=('Arial', 10),
+                        fg=self.colors['gray'],
+                        bg=self.colors['card'],
+                        padx=20, pady=20).pack()
+
+            # Info sous l'image
+            info_frame = tk.Frame(photo_container, bg=self.colors['card'])
+            info_frame.pack(fill=tk.X, padx=5, pady=5)
+
+            tk.Label(info_frame,
+                    text=f"📅 {date.strftime('%Y-%m-%d %H:%M:%S')}",
+                    font=('Arial', 9),
+                    fg=self.colors['dark'],
+                    bg=self.colors['card']).pack()
+
+    def _afficher_erreur_galerie(self, message: str):
+        """Affiche l'erreur de chargement à la place de la galerie (thread Tk)"""
+        self._vider_galerie()
+        tk.Label(self.gallery_frame,
+                text=f"Erreur: {message}",
+                font=('Arial', 12),
+                fg=self.colors['danger'],
+                bg=self.colors['card']).pack(pady=50)
 
     def rafraichir_donnees(self):
         """Rafraîchit les données affichées"""
@@ -676,12 +727,15 @@ class InterfacePrincipaleModerne:
 
         if self.auto_refresh.get():
             try:
+                # Filtres sur les IDs de capteurs en cache: pas de jointure sur Capteur
+                filtre_bruit = self.db.references.filtre_capteurs('BRUIT')
+                filtre_camera = self.db.references.filtre_capteurs('CAMERA')
+
                 # Dernière mesure de son
-                son = self.db.execute_query("""
+                son = self.db.execute_query(f"""
                     SELECT TOP 1 d.mesure, d.dateHeure
                     FROM Donnees d
-                    JOIN Capteur c ON d.idCapteur = c.idCapteur_PK
-                    WHERE c.type = N'BRUIT'
+                    WHERE {filtre_bruit}
                     ORDER BY d.dateHeure DESC
                 """)
 
@@ -711,22 +765,20 @@ class InterfacePrincipaleModerne:
                         self.son_progress_bar.config(bg=self.colors['success'])
 
                 # Compter les médias
-                media_count = self.db.execute_query("""
+                media_count = self.db.execute_query(f"""
                     SELECT COUNT(*)
                     FROM Donnees d
-                    JOIN Capteur c ON d.idCapteur = c.idCapteur_PK
-                    WHERE c.type = N'CAMERA' AND d.photoBlob IS NOT NULL
+                    WHERE {filtre_camera} AND d.photoBlob IS NOT NULL
                 """)
 
                 if media_count:
                     self.media_count_label.config(text=str(media_count[0][0]))
 
                 # Dernière capture
-                last_media = self.db.execute_query("""
+                last_media = self.db.execute_query(f"""
                     SELECT TOP 1 d.dateHeure
                     FROM Donnees d
-                    JOIN Capteur c ON d.idCapteur = c.idCapteur_PK
-                    WHERE c.type = N'CAMERA' AND d.photoBlob IS NOT NULL
+                    WHERE {filtre_camera} AND d.photoBlob IS NOT NULL
                     ORDER BY d.dateHeure DESC
                 """)
 
@@ -796,44 +848,48 @@ class InterfacePrincipaleModerne:
 
             type_filtre = self.hist_type_var.get()
 
-            # Construire la requête
+            # Construire la requête (capteurs et salles viennent du cache, sans jointure)
             if type_filtre == "TOUS":
                 where_clause = ""
             else:
-                where_clause = f"WHERE c.type = N'{type_filtre}'"
+                where_clause = f"WHERE {self.db.references.filtre_capteurs(type_filtre)}"
 
             query = f"""
                 SELECT TOP 100
                     d.idDonnee_PK,
                     d.dateHeure,
-                    c.nom,
-                    c.type,
-                    CASE
-                        WHEN c.type = N'BRUIT' THEN CAST(d.mesure AS NVARCHAR) + ' dB'
-                        WHEN c.type = N'CAMERA' THEN
-                            CAST(DATALENGTH(d.photoBlob)/1024.0 AS NVARCHAR) + ' KB'
-                        ELSE 'N/A'
-                    END AS mesure,
-                    s.numero
+                    d.idCapteur,
+                    d.mesure,
+                    DATALENGTH(d.photoBlob),
+                    d.noSalle
                 FROM Donnees d
-                JOIN Capteur c ON d.idCapteur = c.idCapteur_PK
-                JOIN Salle s ON d.noSalle = s.idSalle_PK
                 {where_clause}
                 ORDER BY d.dateHeure DESC
             """
 
-            donnees = self.db.execute_query(query)
+            # Lire le cache avant le parcours: aucune autre requête pendant iter_query
+            capteurs = self.db.references.capteurs()
+            salles = self.db.references.salles()
+
+            donnees = self.db.iter_query(query, chunk_size=50)
 
             for data in donnees:
                 id_donnee = data[0]
                 date = data[1].strftime('%Y-%m-%d %H:%M:%S') if data[1] else ''
-                capteur = data[2]
-                type_cap = data[3]
-                mesure = data[4]
-                salle = data[5]
+                capteur = capteurs.get(data[2])
+                salle = salles.get(data[5])
+
+                type_cap = capteur.type if capteur else ''
+                if type_cap == 'BRUIT' and data[3] is not None:
+                    mesure = f"{data[3]:.1f} dB"
+                elif type_cap in ('CAMERA', 'AUDIO') and data[4] is not None:
+                    mesure = f"{data[4] / 1024:.1f} KB"
+                else:
+                    mesure = 'N/A'
 
                 self.hist_tree.insert('', tk.END,
-                                    values=(id_donnee, date, capteur, type_cap, mesure, salle))
+                                    values=(id_donnee, date, capteur.nom if capteur else data[2],
+                                            type_cap, mesure, salle.numero if salle else data[5]))
 
         except Exception as e:
             messagebox.showerror("Erreur", f"Erreur chargement historique:\n{str(e)}")
@@ -856,21 +912,27 @@ class InterfacePrincipaleModerne:
             stats.append("")
 
             # Par type de capteur
-            by_type = self.db.execute_query("""
-                SELECT c.type, COUNT(*) AS nb
+            capteurs = self.db.references.capteurs()
+            by_capteur = self.db.iter_query("""
+                SELECT d.idCapteur, COUNT(*) AS nb
                 FROM Donnees d
-                JOIN Capteur c ON d.idCapteur = c.idCapteur_PK
-                GROUP BY c.type
+                GROUP BY d.idCapteur
             """)
 
+            by_type = {}
+            for row in by_capteur:
+                capteur = capteurs.get(row[0])
+                type_cap = capteur.type if capteur else '?'
+                by_type[type_cap] = by_type.get(type_cap, 0) + row[1]
+
             stats.append("📌 Répartition par type de capteur:")
             stats.append("-" * 40)
-            for row in by_type:
-                stats.append(f"  • {row[0]:15} : {row[1]:,} mesures")
+            for type_cap, nb in by_type.items():
+                stats.append(f"  • {type_cap:15} : {nb:,} mesures")
             stats.append("")
 
             # Événements
-            events_count = self.db.execute_query("""
+            events_count = self.db.iter_query("""
                 SELECT type, COUNT(*) AS nb
                 FROM Evenement
                 GROUP BY type
@@ -883,17 +945,26 @@ class InterfacePrincipaleModerne:
                 stats.append(f"  • {row[0]:15} : {row[1]:,} événements")
             stats.append("")
 
-            # Niveau sonore moyen/max
-            son_stats = self.db.execute_query("""
+            # Niveau sonore moyen/max (agrégats par quart d'heure, mesures brutes s'il n'y en a pas)
+            son_stats = self.db.execute_query(f"""
                 SELECT
-                    AVG(d.mesure) AS moyenne,
-                    MAX(d.mesure) AS maximum,
-                    MIN(d.mesure) AS minimum
-                FROM Donnees d
-                JOIN Capteur c ON d.idCapteur = c.idCapteur_PK
-                WHERE c.type = N'BRUIT'
+                    SUM(a.moyenne * a.nbMesures) / SUM(a.nbMesures) AS moyenne,
+                    MAX(a.maximum) AS maximum,
+                    MIN(a.minimum) AS minimum
+                FROM AgregatQuartHeure a
+                WHERE {self.db.references.filtre_capteurs('BRUIT', 'a.idCapteur')}
             """)
 
+            if not son_stats or son_stats[0][0] is None:
+                son_stats = self.db.execute_query(f"""
+                    SELECT
+                        AVG(d.mesure) AS moyenne,
+                        MAX(d.mesure) AS maximum,
+                        MIN(d.mesure) AS minimum
+                    FROM Donnees d
+                    WHERE {self.db.references.filtre_capteurs('BRUIT')}
+                """)
+
             if son_stats and son_stats[0][0]:
                 stats.append("🎤 Analyse niveau sonore:")
                 stats.append("-" * 40)
@@ -902,6 +973,12 @@ class InterfacePrincipaleModerne:
                 stats.append(f"  • Minimum    : {son_stats[0][2]:6.1f} dB")
                 stats.append("")
 
+            # Temps passé par requête depuis l'ouverture de l'interface
+            stats.append("⏱ Requêtes SQL de cette session:")
+            stats.append("-" * 40)
+            stats.append(formater_stats(self.db.stats(), limite=10, largeur_sql=40))
+            stats.append("")
+
             stats.append("=" * 60)
             stats.append(f"Généré le: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
             stats.append("=" * 60)
@@ -0,0 +1,189 @@
+"""
+Lecture du convertisseur MCP3008 (8 canaux, 10 bits) par le bus SPI
+Lecture échantillon par échantillon (xfer2) ou par lots de conversions décodés avec NumPy
+"""
+
+from typing import Iterable, Optional
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    print("⚠ numpy non disponible - lecture MCP3008 échantillon par échantillon seulement")
+    NUMPY_AVAILABLE = False
+
+try:
+    from fcntl import ioctl
+    IOCTL_AVAILABLE = True
+except ImportError:
+    IOCTL_AVAILABLE = False
+
+
+# Le MCP3008 ne démarre une conversion qu'après une remontée de CS: on ne peut pas
+# enchaîner plusieurs trames dans un seul xfer2 (CS reste bas tout le buffer).
+# Un lot est donc envoyé en un seul ioctl SPI_IOC_MESSAGE(N): N transferts de 3 octets,
+# avec remontée de CS (cs_change) et délai programmé entre chacun.
+TAILLE_TRAME = 3
+BITS_PAR_TRAME = 24
+SPI_IOC_MAGIC = ord('k')
+TAILLE_TRANSFERT = 32       # sizeof(struct spi_ioc_transfer)
+TRANSFERTS_MAX = 511        # Taille du message limitée à 14 bits dans le numéro d'ioctl
+
+if NUMPY_AVAILABLE:
+    # struct spi_ioc_transfer (linux/spi/spidev.h)
+    TYPE_TRANSFERT = np.dtype([
+        ('tx_buf', np.uint64), ('rx_buf', np.uint64),
+        ('len', np.uint32), ('speed_hz', np.uint32),
+        ('delay_usecs', np.uint16), ('bits_per_word', np.uint8), ('cs_change', np.uint8),
+        ('tx_nbits', np.uint8), ('rx_nbits', np.uint8),
+        ('word_delay_usecs', np.uint8), ('pad', np.uint8)
+    ])
+
+
+def spi_ioc_message(nb_transferts: int) -> int:
+    """Numéro d'ioctl SPI_IOC_MESSAGE(nb_transferts) (_IOW('k', 0, char[32 * N]))"""
+    return (1 << 30) | ((nb_transferts * TAILLE_TRANSFERT) << 16) | (SPI_IOC_MAGIC << 8)
+
+
+def commande(canal: int) -> list:
+    """Trame de lecture d'un canal en mode single-ended: bit de départ, SGL + canal, 8 bits d'horloge"""
+    return [1, (8 + canal) << 4, 0]
+
+
+def decoder(reponse) -> int:
+    """Extrait la valeur 10 bits d'une réponse de 3 octets"""
+    return ((reponse[1] & 3) << 8) + reponse[2]
+
+
+def decoder_lot(reponses, nb_canaux: int = 1):
+    """
+    Décode un lot de réponses de 3 octets en une seule opération NumPy
+
+    Args:
+        reponses: Octets reçus (uint8), trames bout à bout
+        nb_canaux: Nombre de canaux par balayage
+
+    Returns:
+        Tableau uint16 de forme (nb_balayages, nb_canaux)
+    """
+    trames = np.asarray(reponses, dtype=np.uint8).reshape(-1, TAILLE_TRAME)
+    valeurs = ((trames[:, 1] & 3).astype(np.uint16) << 8) | trames[:, 2]
+    return valeurs.reshape(-1, nb_canaux)
+
+
+class LecteurMCP3008:
+    """Lit les canaux du MCP3008 sur un périphérique spidev déjà ouvert"""
+
+    def __init__(self, spi):
+        """
+        Args:
+            spi: spidev.SpiDev ouvert (max_speed_hz configuré)
+        """
+        self.spi = spi
+
+        # Lots par ioctl seulement si le périphérique expose son descripteur (vrai spidev, Linux)
+        self._fd = None
+        if NUMPY_AVAILABLE and IOCTL_AVAILABLE:
+            try:
+                self._fd = spi.fileno()
+            except (AttributeError, OSError):
+                self._fd = None
+
+        self._lots = {}  # (canaux, nb_balayages, frequence) -> (tx, rx, transferts)
+
+    @property
+    def par_lots(self) -> bool:
+        """Vrai si lire_bloc() est disponible (NumPy installé)"""
+        return NUMPY_AVAILABLE
+
+    @property
+    def par_ioctl(self) -> bool:
+        """Vrai si un lot part en un seul appel système (sinon un xfer2 par trame)"""
+        return self._fd is not None
+
+    def lire(self, canal: int) -> int:
+        """
+        Lit un échantillon (un xfer2)
+
+        Args:
+            canal: Canal à lire (0-7)
+
+        Returns:
+            Valeur brute (0-1023)
+        """
+        return decoder(self.spi.xfer2(commande(canal)))
+
+    def lire_bloc(self, canaux: Iterable[int], nb_balayages: int,
+                  frequence: Optional[float] = None):
+        """
+        Lit nb_balayages balayages des canaux demandés en un lot
+
+        Avec ioctl, le noyau espace les balayages de 1/frequence secondes (délai SPI):
+        les échantillons sont régulièrement espacés. Sans ioctl, les trames partent
+        une par une (xfer2) aussi vite que possible.
+
+        Args:
+            canaux: Canaux lus à chaque balayage, dans l'ordre (ex: (0,) ou range(8))
+            nb_balayages: Nombre de balayages
+            frequence: Balayages par seconde visés (None: au plus vite)
+
+        Returns:
+            Tableau uint16 de forme (nb_balayages, nb_canaux)
+        """
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("numpy est requis pour la lecture par lots (pip install numpy)")
+
+        canaux = tuple(canaux)
+        if not canaux or any(c < 0 or c > 7 for c in canaux):
+            raise ValueError(f"Canaux MCP3008 invalides: {canaux}")
+
+        tx, rx, transferts = self._preparer(canaux, nb_balayages, frequence)
+
+        if transferts is not None:
+            octets = transferts.view(np.uint8)
+            for debut in range(0, len(transferts), TRANSFERTS_MAX):
+                fin = min(debut + TRANSFERTS_MAX, len(transferts))
+                ioctl(self._fd, spi_ioc_message(fin - debut),
+                      octets[debut * TAILLE_TRANSFERT:fin * TAILLE_TRANSFERT])
+        else:
+            reponses = [self.spi.xfer2(trame) for trame in tx.reshape(-1, TAILLE_TRAME).tolist()]
+            rx[:] = np.array(reponses, dtype=np.uint8).reshape(-1)
+
+        return decoder_lot(rx, len(canaux))
+
+    def _preparer(self, canaux: tuple, nb_balayages: int, frequence: Optional[float]):
+        """Construit (une fois par forme de lot) les trames à envoyer et la liste des transferts"""
+        cle = (canaux, nb_balayages, frequence)
+        lot = self._lots.get(cle)
+        if lot is not None:
+            return lot
+
+        balayage = np.array([commande(c) for c in canaux], dtype=np.uint8).reshape(-1)
+        tx = np.tile(balayage, nb_balayages)
+        rx = np.zeros_like(tx)
+        transferts = None
+
+        if self._fd is not None:
+            nb_trames = nb_balayages * len(canaux)
+            decalages = np.arange(nb_trames, dtype=np.uint64) * np.uint64(TAILLE_TRAME)
+
+            transferts = np.zeros(nb_trames, dtype=TYPE_TRANSFERT)
+            transferts['tx_buf'] = np.uint64(tx.ctypes.data) + decalages
+            transferts['rx_buf'] = np.uint64(rx.ctypes.data) + decalages
+            transferts['len'] = TAILLE_TRAME
+            transferts['speed_hz'] = self.spi.max_speed_hz
+            transferts['bits_per_word'] = 8
+
+            # Remonter CS après chaque trame, sauf la dernière de chaque ioctl
+            transferts['cs_change'] = 1
+            transferts['cs_change'][TRANSFERTS_MAX - 1::TRANSFERTS_MAX] = 0
+            transferts['cs_change'][-1] = 0
+
+            if frequence:
+                # Délai après le dernier canal de chaque balayage pour tenir la fréquence
+                duree_balayage = len(canaux) * BITS_PAR_TRAME * 1e6 / self.spi.max_speed_hz
+                delai = int(1e6 / frequence - duree_balayage)
+                transferts['delay_usecs'][len(canaux) - 1::len(canaux)] = min(max(delai, 0), 0xFFFF)
+
+        lot = self._lots[cle] = (tx, rx, transferts)
+        return lot
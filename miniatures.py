@@ -0,0 +1,169 @@
+"""
+Miniatures des photos et vidéos, produites sur le Pi au moment de la capture
+Une miniature JPEG (320x180 au plus) et un aperçu minuscule (48x27 au plus) sont
+écrits dans MiniatureDonnee avec la photo: la galerie lit quelques KB par image
+au lieu de la photo pleine résolution, sans la décoder.
+
+Usage (miniatures des photos déjà en base):
+    python miniatures.py
+"""
+
+from collections import namedtuple
+from io import BytesIO
+from typing import Optional, Tuple
+
+import numpy as np
+
+from db_connection import DatabaseConnection
+from config import (DB_SERVER, DB_NAME, DB_USERNAME, DB_PASSWORD, MINIATURE_TAILLE,
+                    MINIATURE_TAILLE_APERCU, MINIATURE_QUALITE)
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    print("⚠ Pillow non disponible - photos enregistrées sans miniature")
+    PIL_AVAILABLE = False
+
+
+# Miniature (galerie) et aperçu (affiché en attendant la miniature), en JPEG
+Miniatures = namedtuple('Miniatures', ['miniature', 'apercu', 'largeur', 'hauteur'])
+
+REQUETE_INSERTION = """
+    INSERT INTO MiniatureDonnee (idDonnee, miniatureJpeg, apercuJpeg, largeur, hauteur)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+
+def creer_miniatures(image, taille: Tuple[int, int] = (320, 180),
+                     taille_apercu: Tuple[int, int] = (48, 27), qualite: int = 75) -> Optional[Miniatures]:
+    """
+    Miniature et aperçu d'une image (proportions conservées)
+
+    Args:
+        image: Image PIL, ou tableau NumPy RGB (hauteur, largeur, 3), RGBX (4 canaux) ou niveaux de gris
+        taille: (largeur, hauteur) maximale de la miniature
+        taille_apercu: (largeur, hauteur) maximale de l'aperçu
+        qualite: Qualité JPEG de la miniature (l'aperçu est en qualité 50)
+
+    Returns:
+        Miniatures, ou None si Pillow est absent ou l'image illisible
+    """
+    if not PIL_AVAILABLE:
+        return None
+
+    try:
+        if isinstance(image, np.ndarray):
+            # Format XBGR8888 de picamera2: [R, G, B, 255] par pixel
+            image = Image.fromarray(np.ascontiguousarray(image[..., :3]) if image.ndim == 3 else image)
+        image = image.convert('RGB') if image.mode not in ('RGB', 'L') else image
+
+        # BILINEAR avec reducing_gap: réduction par étapes, rapide sur le Pi même en 1080p
+        miniature = image.copy()
+        miniature.thumbnail(taille, Image.Resampling.BILINEAR, reducing_gap=2.0)
+        apercu = miniature.copy()
+        apercu.thumbnail(taille_apercu, Image.Resampling.BILINEAR)
+
+        return Miniatures(_jpeg(miniature, qualite), _jpeg(apercu, 50), *miniature.size)
+
+    except Exception as e:
+        print(f"⚠ Miniature impossible: {e}")
+        return None
+
+
+def miniatures_jpeg(photo: bytes, taille: Tuple[int, int] = (320, 180),
+                    taille_apercu: Tuple[int, int] = (48, 27), qualite: int = 75) -> Optional[Miniatures]:
+    """
+    Miniature et aperçu d'une photo JPEG
+
+    Le JPEG est décodé directement à échelle réduite (1/2, 1/4 ou 1/8, Image.draft):
+    une photo 1080p se décode en 480x270 au lieu de 1920x1080.
+
+    Args:
+        photo: Contenu du fichier JPEG
+        taille, taille_apercu, qualite: Voir creer_miniatures()
+
+    Returns:
+        Miniatures, ou None si Pillow est absent ou la photo n'est pas un JPEG lisible
+    """
+    if not PIL_AVAILABLE:
+        return None
+
+    try:
+        image = Image.open(BytesIO(photo))
+        image.draft('RGB', taille)
+        image.load()
+    except Exception:
+        return None
+    return creer_miniatures(image, taille, taille_apercu, qualite)
+
+
+def enregistrer_miniatures(db: DatabaseConnection, id_donnee: int, miniatures: Miniatures) -> bool:
+    """
+    Écrit la miniature et l'aperçu d'une photo ou vidéo dans MiniatureDonnee
+
+    Args:
+        db: Connexion (appeler dans la transaction qui a inséré la donnée)
+        id_donnee: ID de la photo ou vidéo
+        miniatures: Résultat de creer_miniatures() ou miniatures_jpeg()
+
+    Returns:
+        True si succès, False sinon
+    """
+    return db.execute_non_query(REQUETE_INSERTION, (
+        id_donnee, miniatures.miniature, miniatures.apercu, miniatures.largeur, miniatures.hauteur
+    ))
+
+
+def generer_miniatures_manquantes(db: DatabaseConnection, taille: Tuple[int, int] = (320, 180),
+                                  taille_apercu: Tuple[int, int] = (48, 27), qualite: int = 75) -> int:
+    """
+    Crée les miniatures des photos enregistrées avant MiniatureDonnee
+
+    Les photos sont lues une à une; les vidéos sont ignorées (pas de décodeur H.264).
+
+    Returns:
+        Nombre de miniatures créées
+    """
+    manquantes = db.execute_query(f"""
+        SELECT d.idDonnee_PK
+        FROM Donnees d
+        WHERE {db.references.filtre_capteurs('CAMERA')} AND d.photoBlob IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM MiniatureDonnee m WHERE m.idDonnee = d.idDonnee_PK)
+        ORDER BY d.idDonnee_PK
+    """) or []
+
+    crees = 0
+    for (id_donnee,) in manquantes:
+        photo = db.execute_query("SELECT photoBlob FROM Donnees WHERE idDonnee_PK = ?", (id_donnee,))
+        miniatures = miniatures_jpeg(bytes(photo[0][0]), taille, taille_apercu, qualite) if photo else None
+        if miniatures and enregistrer_miniatures(db, id_donnee, miniatures):
+            crees += 1
+
+    print(f"✓ {crees} miniature(s) créée(s), {len(manquantes) - crees} donnée(s) ignorée(s) (vidéos, photos illisibles)")
+    return crees
+
+
+def _jpeg(image, qualite: int) -> bytes:
+    """Encode une image PIL en JPEG"""
+    tampon = BytesIO()
+    image.save(tampon, format='JPEG', quality=qualite, optimize=True)
+    return tampon.getvalue()
+
+
+def main():
+    """Crée les miniatures manquantes des photos déjà en base"""
+    db = DatabaseConnection(DB_SERVER, DB_NAME, DB_USERNAME, DB_PASSWORD)
+    if not db.connect():
+        print("✗ Impossible de se connecter à la base de données")
+        return 1
+
+    try:
+        generer_miniatures_manquantes(db, MINIATURE_TAILLE, MINIATURE_TAILLE_APERCU, MINIATURE_QUALITE)
+    finally:
+        db.disconnect()
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,179 @@
+"""
+Calcul du niveau sonore sur les échantillons du micro (NumPy)
+RMS sans composante continue, dBFS, dB SPL approximatif, crête, Leq glissants
+et pondération A optionnelle (appliquée dans le domaine fréquentiel)
+"""
+
+import math
+from collections import deque, namedtuple
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+
+# Pleine échelle du MCP3008 (10 bits): une sinusoïde de ±512 autour du repos vaut 0 dBFS
+AMPLITUDE_PLEINE_ECHELLE = 512.0
+RMS_PLEINE_ECHELLE = AMPLITUDE_PLEINE_ECHELLE / math.sqrt(2)
+
+# Plancher des niveaux (évite log10(0) sur un silence parfait)
+DBFS_MIN = -120.0
+
+NiveauSonore = namedtuple('NiveauSonore', ['rms', 'dbfs', 'db', 'crete_db', 'leq_1s', 'leq_1min'])
+
+
+def gain_ponderation_a(frequences: np.ndarray) -> np.ndarray:
+    """
+    Gain linéaire de la pondération A (IEC 61672) aux fréquences données
+
+    Args:
+        frequences: Fréquences en Hz
+
+    Returns:
+        Gain en amplitude (1.0 à 1 kHz)
+    """
+    f2 = np.asarray(frequences, dtype=np.float64) ** 2
+    ra = (12194.0 ** 2 * f2 ** 2) / (
+        (f2 + 20.6 ** 2) * np.sqrt((f2 + 107.7 ** 2) * (f2 + 737.9 ** 2)) * (f2 + 12194.0 ** 2)
+    )
+    return ra * 10 ** (2.0 / 20)
+
+
+def signal_plat(valeurs) -> bool:
+    """
+    Vrai si le bloc n'a aucune composante alternative (micro débranché, bloqué ou ADC saturé)
+
+    Un tel bloc n'a pas de niveau sonore: la pondération A, de gain nul au continu,
+    lui donnerait le plancher DBFS_MIN, et sans pondération son écart au repos
+    passerait pour un bruit fort.
+    """
+    return len(valeurs) > 1 and float(np.ptp(np.asarray(valeurs))) == 0.0
+
+
+def en_db(carre_moyen: float) -> float:
+    """Convertit un carré moyen (unités ADC²) en dBFS"""
+    if carre_moyen <= 0:
+        return DBFS_MIN
+    return max(DBFS_MIN, 10 * math.log10(carre_moyen / RMS_PLEINE_ECHELLE ** 2))
+
+
+class IntegrateurLeq:
+    """Niveau équivalent (Leq) glissant: moyenne d'énergie sur les dernières secondes"""
+
+    def __init__(self, duree: float, frequence: int):
+        """
+        Args:
+            duree: Durée d'intégration en secondes (ex: 1, 60)
+            frequence: Échantillons par seconde
+        """
+        self.nb_max = int(duree * frequence)
+        self._blocs = deque()  # (nb échantillons, somme des carrés)
+        self._nb = 0
+        self._somme = 0.0
+
+    def ajouter(self, nb: int, somme_carres: float):
+        """Ajoute un bloc, puis oublie les blocs sortis de la durée d'intégration"""
+        self._blocs.append((nb, somme_carres))
+        self._nb += nb
+        self._somme += somme_carres
+
+        while len(self._blocs) > 1 and self._nb - self._blocs[0][0] >= self.nb_max:
+            nb_ancien, somme_ancienne = self._blocs.popleft()
+            self._nb -= nb_ancien
+            self._somme -= somme_ancienne
+
+    def carre_moyen(self) -> float:
+        """Carré moyen sur la durée d'intégration (0 si vide)"""
+        return max(self._somme, 0.0) / self._nb if self._nb else 0.0
+
+
+class AnalyseurNiveau:
+    """Calcule le niveau sonore des blocs d'échantillons successifs d'un même flux"""
+
+    def __init__(self, frequence: int, repos: Optional[float] = None,
+                 decalage_spl: float = 110.0, ponderation_a: bool = False,
+                 durees_leq: Sequence[float] = (1.0, 60.0),
+                 plage: Optional[Tuple[float, float]] = None):
+        """
+        Args:
+            frequence: Échantillons par seconde du flux
+            repos: Valeur ADC au repos (composante continue); None: moyenne de chaque bloc
+            decalage_spl: dB SPL d'un signal à 0 dBFS (à régler avec un sonomètre)
+            ponderation_a: True pour des niveaux pondérés A (dB(A)); la crête reste non pondérée
+            durees_leq: Durées des deux Leq glissants en secondes (défaut: 1 s et 1 min)
+            plage: Bornes (min, max) des niveaux rapportés en dB, ex: plage acceptée par la BD
+                   (None: pas de bornes); dbfs n'est pas borné
+        """
+        self.frequence = frequence
+        self.repos = repos
+        self.decalage_spl = decalage_spl
+        self.ponderation_a = ponderation_a
+        self.leq = [IntegrateurLeq(duree, frequence) for duree in durees_leq]
+        self.plage = plage
+        self._gains = {}  # nb d'échantillons -> gains² de la pondération A par raie de rfft
+
+    def analyser(self, valeurs) -> Optional[NiveauSonore]:
+        """
+        Analyse un bloc d'échantillons (ceux arrivés depuis le bloc précédent)
+
+        Args:
+            valeurs: Échantillons bruts (0-1023), ex: AcquisitionADC.lire_depuis()
+
+        Returns:
+            NiveauSonore (rms en unités ADC, niveaux en dB), ou None si le bloc est vide
+            ou plat (voir signal_plat: ni mesure ni Leq)
+        """
+        n = len(valeurs)
+        if n == 0 or signal_plat(valeurs):
+            return None
+
+        signal = np.asarray(valeurs, dtype=np.float32)
+        signal -= signal.mean() if self.repos is None else self.repos
+
+        crete = float(np.abs(signal).max())
+        if self.ponderation_a and n > 1:
+            somme_carres = self._somme_carres_ponderee(signal)
+        else:
+            somme_carres = float(np.dot(signal, signal))
+
+        for integrateur in self.leq:
+            integrateur.ajouter(n, somme_carres)
+
+        dbfs = en_db(somme_carres / n)
+        crete_dbfs = (max(DBFS_MIN, 20 * math.log10(crete / AMPLITUDE_PLEINE_ECHELLE))
+                      if crete > 0 else DBFS_MIN)
+
+        return NiveauSonore(
+            rms=math.sqrt(somme_carres / n),
+            dbfs=dbfs,
+            db=self._borner(dbfs + self.decalage_spl),
+            crete_db=self._borner(crete_dbfs + self.decalage_spl),
+            leq_1s=self._borner(en_db(self.leq[0].carre_moyen()) + self.decalage_spl),
+            leq_1min=self._borner(en_db(self.leq[-1].carre_moyen()) + self.decalage_spl)
+        )
+
+    def _borner(self, niveau_db: float) -> float:
+        """Ramène un niveau dans la plage configurée (inchangé sans plage)"""
+        if self.plage is None:
+            return niveau_db
+        minimum, maximum = self.plage
+        return min(max(niveau_db, minimum), maximum)
+
+    def _somme_carres_ponderee(self, signal: np.ndarray) -> float:
+        """
+        Somme des carrés du signal pondéré A, sans reconstruire le signal filtré
+
+        Parseval: l'énergie est la somme des |X(f)|² pondérés par le gain² de chaque raie.
+        """
+        n = len(signal)
+        gains = self._gains.get(n)
+        if gains is None:
+            gains = gain_ponderation_a(np.fft.rfftfreq(n, 1.0 / self.frequence)) ** 2
+            # Raies comptées deux fois (partie négative du spectre), sauf le continu et Nyquist
+            gains[1:(n + 1) // 2] *= 2
+            if len(self._gains) > 8:
+                self._gains.clear()
+            self._gains[n] = gains
+
+        spectre = np.fft.rfft(signal)
+        puissance = spectre.real ** 2 + spectre.imag ** 2
+        return float(np.dot(puissance, gains)) / n
@@ -0,0 +1,470 @@
+"""
+Chaîne audio commune à capture_son_continu.py et surveillance_intelligente.py
+Micro électret + MCP3008: service ADC (micro en flux et capteurs analogiques),
+niveau sonore, épisodes BRUIT_FORT, clips audio et classification des épisodes.
+Les programmes gardent l'écriture des mesures de son et ce qui leur est propre
+(lots, agrégats, cadence, vidéo).
+"""
+
+import random
+import time
+from datetime import datetime
+from typing import Optional, Tuple
+
+from db_connection import DatabaseConnection
+from batch_writer import BatchWriter
+from spool import SpoolLocal
+from acquisition_adc import statistiques_fenetre
+from mcp3008 import LecteurMCP3008
+from service_adc import ServiceADC, VerrouSPI, PLAGES_MESURE, brancher_capteurs, dans_plage
+from niveau_sonore import AnalyseurNiveau, signal_plat
+from suivi_repos import SuiviRepos
+from detection_episodes import DetecteurEpisodes, DEBUT, FIN, SUITE, decrire_episode
+from clip_audio import EnregistreurClips
+from caracteristiques_son import (ExtracteurCaracteristiques, ClassifieurBruit, Classification,
+                                  decrire_classification)
+from config import (ADC_CHANNEL, SPI_BUS, SPI_DEVICE, SPI_FICHIER_VERROU, ADC_FREQUENCE, ADC_DUREE_TAMPON,
+                    BATCH_TAILLE_MAX, BATCH_AGE_MAX,
+                    SON_DECALAGE_SPL, SON_PONDERATION_A, SON_FICHIER_REPOS,
+                    EPISODE_DUREE_MIN, EPISODE_DUREE_MAX, EPISODE_REFROIDISSEMENT,
+                    CLIP_PRE_ROLL, CLIP_POST_ROLL, CLASSIFIEUR_FICHIER,
+                    CARACTERISTIQUES_BUDGET_CPU, ADC_FREQUENCE_BALAYAGE, CAPTEURS_ANALOGIQUES)
+
+try:
+    import spidev
+    SPI_AVAILABLE = True
+except ImportError:
+    print("⚠ spidev non disponible - mode simulation")
+    SPI_AVAILABLE = False
+
+# Mode simulation: bruit de fond réaliste et rafales de bruit fort pour exercer les épisodes
+SIMULATION_ECART_CALME = 1.5         # Écart-type ADC du bruit de fond (environ 60 dB(A))
+SIMULATION_ECART_RAFALE = 30.0       # Écart-type ADC d'une rafale (environ 85 dB(A))
+SIMULATION_DELAI_RAFALE = (30, 90)   # Secondes entre deux rafales
+SIMULATION_DUREE_RAFALE = (2, 5)     # Durée d'une rafale en secondes
+
+
+class PipelineSon:
+    """
+    Mesure du son, épisodes BRUIT_FORT, clips et classification
+
+    Usage:
+        son = PipelineSon(db, id_salle, seuil_bruit_fort, spool=spool)
+        if son.demarrer():
+            mesure = son.mesurer()
+            transition, description, classification = son.suivre(mesure)
+            ...
+            son.arreter()
+    """
+
+    def __init__(self, db_connection: DatabaseConnection, id_salle: int,
+                 seuil_bruit_fort: float = 50.0, seuil_fin_bruit_fort: Optional[float] = None,
+                 spool: Optional[SpoolLocal] = None, clips_audio: bool = False,
+                 classification: bool = False):
+        """
+        Args:
+            db_connection: Connexion à la base de données
+            id_salle: ID de la salle à monitorer
+            seuil_bruit_fort: Seuil qui ouvre un épisode BRUIT_FORT (défaut: 50.0)
+            seuil_fin_bruit_fort: Seuil sous lequel l'épisode se termine (défaut: seuil - 5)
+            spool: Spool local des clips et des capteurs analogiques (None: écriture en BD)
+            clips_audio: True pour enregistrer un clip audio (avant et après le déclenchement)
+                         de chaque épisode, lié à un capteur AUDIO
+            classification: True pour classer chaque épisode (voix, claquement, ventilation)
+                            d'après le spectre des mesures (voir caracteristiques_son)
+        """
+        self.db = db_connection
+        self.id_salle = id_salle
+        self.spool = spool
+
+        # Capteurs analogiques sans spool: leurs propres lots, jamais mêlés aux mesures de son
+        self.lot_analogique = None if spool else BatchWriter(db_connection, taille_max=BATCH_TAILLE_MAX,
+                                                             age_max=BATCH_AGE_MAX)
+        self.compteur_hors_plage = 0
+        self._hors_plage_signales = set()  # Capteurs dont une mesure hors plage a été affichée
+
+        # Un événement BRUIT_FORT par épisode (hystérésis, durée minimale, refroidissement)
+        self.detecteur = DetecteurEpisodes(seuil_bruit_fort, seuil_fin_bruit_fort,
+                                           duree_min=EPISODE_DUREE_MIN,
+                                           refroidissement=EPISODE_REFROIDISSEMENT,
+                                           duree_max=EPISODE_DUREE_MAX)
+
+        # Clips audio des épisodes (créés dans demarrer, sur l'acquisition continue)
+        self.clips_audio = clips_audio
+        self.clips = None
+        self.id_capteur_bruit = None
+        self.id_capteur_audio = None
+
+        # Classe des épisodes: caractéristiques spectrales des fenêtres fortes, moyennées par épisode
+        self.extracteur = None
+        self.classifieur = None
+        if classification:
+            self.extracteur = ExtracteurCaracteristiques(ADC_FREQUENCE, budget_cpu=CARACTERISTIQUES_BUDGET_CPU)
+            self.classifieur = ClassifieurBruit(CLASSIFIEUR_FICHIER)
+
+        # Paramètres ADC MCP3008
+        self.spi = None
+        self.adc_channel = ADC_CHANNEL
+        self.spi_bus = SPI_BUS
+        self.spi_device = SPI_DEVICE
+        self.spi_speed = 1350000
+        self.verrou_spi = VerrouSPI(SPI_FICHIER_VERROU.format(bus=self.spi_bus, device=self.spi_device))
+
+        # Calibration (valeur au repos suivie en continu, voir suivi_repos)
+        self.valeur_repos = None
+        self.suivi_repos = SuiviRepos(SON_FICHIER_REPOS)
+
+        # Échantillonnage continu du micro (thread dédié, démarré dans demarrer)
+        # Le service ADC lit aussi les capteurs analogiques des autres canaux
+        self.service_adc = None
+        self.acquisition = None
+        self.analyseur = None
+        self._position_son = 0  # Position dans le flux d'échantillons de la dernière mesure
+        self._rafale = (None, None)    # Mode simulation: (début, fin) de la prochaine rafale
+        self.compteur_signal_plat = 0  # Fenêtres sans composante alternative (micro en défaut)
+        self._signal_plat = False
+
+    def demarrer(self) -> bool:
+        """
+        Récupère les capteurs, ouvre le SPI et démarre l'acquisition (micro, analogiques, clips)
+
+        Returns:
+            True si la chaîne audio est prête, False sinon
+        """
+        # 1. Capteur BRUIT (obligatoire) et AUDIO (facultatif: sans lui, pas de clip audio)
+        try:
+            self.id_capteur_bruit = self.db.references.premier_capteur('BRUIT')
+            if self.id_capteur_bruit is None:
+                print("✗ Aucun capteur BRUIT trouvé dans la BD")
+                print("   Lancez d'abord: python initialiser_bd.py")
+                return False
+            print(f"✓ Capteur BRUIT trouvé - ID: {self.id_capteur_bruit}")
+
+            if self.clips_audio:
+                self.id_capteur_audio = self.db.references.premier_capteur('AUDIO')
+                if self.id_capteur_audio is None:
+                    print("⚠ Aucun capteur AUDIO trouvé - clips audio désactivés")
+                else:
+                    print(f"✓ Capteur AUDIO trouvé - ID: {self.id_capteur_audio}")
+
+        except Exception as e:
+            print(f"✗ Erreur lors de la récupération des capteurs: {e}")
+            return False
+
+        # 2. Initialiser le SPI et MCP3008
+        if SPI_AVAILABLE:
+            # Un seul programme lit le MCP3008 (micro et capteurs analogiques)
+            if not self.verrou_spi.acquerir():
+                print(f"✗ MCP3008 déjà utilisé par un autre programme "
+                      f"(PID {self.verrou_spi.proprietaire() or '?'}, verrou {self.verrou_spi.chemin})")
+                print("   Arrêtez capture_son_continu.py ou surveillance_intelligente.py avant de lancer l'autre")
+                return False
+
+            try:
+                self.spi = spidev.SpiDev()
+                self.spi.open(self.spi_bus, self.spi_device)
+                self.spi.max_speed_hz = self.spi_speed
+                print(f"✓ MCP3008 initialisé (SPI {self.spi_bus}.{self.spi_device})")
+
+            except Exception as e:
+                print(f"✗ Erreur lors de l'initialisation du MCP3008: {e}")
+                print("   Vérifiez que le SPI est activé (raspi-config)")
+                self.verrou_spi.liberer()
+                return False
+        else:
+            print("⚠ Mode simulation - Pas de vrai MCP3008")
+
+        # Valeur au repos: dernière calibration connue, affinée en continu pendant la capture
+        # (plus d'attente de calibration au démarrage)
+        if self.suivi_repos.charger():
+            print(f"✓ Calibration reprise - Valeur repos: {self.suivi_repos.repos:.1f}")
+        else:
+            print("⚠ Aucune calibration sauvegardée - valeur repos affinée dès les premières mesures")
+        self.valeur_repos = self.suivi_repos.repos
+
+        # 3. Démarrer l'échantillonnage continu
+        # Seul propriétaire du SPI: micro en flux + capteurs analogiques des autres canaux
+        if self.spi:
+            # Lots de conversions en un appel SPI, décodés avec NumPy
+            self.service_adc = ServiceADC(LecteurMCP3008(self.spi), frequence_balayage=ADC_FREQUENCE_BALAYAGE,
+                                          liberer=self.db.liberer_connexion)
+        else:
+            self.service_adc = ServiceADC(lire_canal=self.read_adc, frequence_balayage=ADC_FREQUENCE_BALAYAGE,
+                                          liberer=self.db.liberer_connexion)
+        self.acquisition = self.service_adc.ajouter_flux(self.adc_channel, frequence=ADC_FREQUENCE,
+                                                         duree_tampon=ADC_DUREE_TAMPON)
+        if not self.spi and CAPTEURS_ANALOGIQUES:
+            # Valeurs aléatoires: ne pas les écrire comme de vraies températures ou CO2
+            print("⚠ Mode simulation - capteurs analogiques ignorés")
+        elif brancher_capteurs(self.service_adc, self.db.references, CAPTEURS_ANALOGIQUES,
+                               self.enregistrer_analogique) and self.lot_analogique:
+            self.lot_analogique.demarrer()
+        self.service_adc.demarrer()
+        self.acquisition.attendre(ADC_FREQUENCE // 10, timeout=2.0)
+        self.analyseur = AnalyseurNiveau(ADC_FREQUENCE, repos=self.valeur_repos,
+                                         decalage_spl=SON_DECALAGE_SPL, ponderation_a=SON_PONDERATION_A,
+                                         plage=PLAGES_MESURE['BRUIT'])
+        print(f"✓ Acquisition audio: {ADC_FREQUENCE} Hz, niveaux en dB{'(A)' if SON_PONDERATION_A else ''}")
+
+        if self.id_capteur_audio is not None:
+            self.clips = EnregistreurClips(self.acquisition, self.enregistrer_clip,
+                                           pre_roll=CLIP_PRE_ROLL, post_roll=CLIP_POST_ROLL,
+                                           repos=lambda: self.suivi_repos.repos)
+            self.clips.demarrer()
+            print(f"✓ Clips audio: {CLIP_PRE_ROLL:g}s avant + {CLIP_POST_ROLL:g}s après chaque épisode")
+
+        if self.classifieur:
+            origine = "modèle entraîné" if self.classifieur.charger() else "modèle par défaut"
+            print(f"✓ Classification des épisodes: {', '.join(self.classifieur.classes)} ({origine})")
+
+        return True
+
+    def read_adc(self, channel: int) -> int:
+        """
+        Lit une valeur du MCP3008
+
+        Args:
+            channel: Canal à lire (0-7)
+
+        Returns:
+            Valeur brute (0-1023)
+        """
+        if not SPI_AVAILABLE or self.spi is None:
+            # Mode simulation
+            return self._valeur_simulee()
+
+        if channel < 0 or channel > 7:
+            return -1
+
+        try:
+            # Commande SPI pour lire le canal
+            adc = self.spi.xfer2([1, (8 + channel) << 4, 0])
+            data = ((adc[1] & 3) << 8) + adc[2]
+            return data
+        except Exception as e:
+            print(f"✗ Erreur lecture ADC: {e}")
+            return -1
+
+    def _valeur_simulee(self) -> int:
+        """Échantillon simulé: bruit de fond autour du repos, rafale de bruit fort de temps en temps"""
+        maintenant = time.monotonic()
+        debut, fin = self._rafale
+        if debut is None or maintenant >= fin:
+            debut = maintenant + random.uniform(*SIMULATION_DELAI_RAFALE)
+            self._rafale = (debut, debut + random.uniform(*SIMULATION_DUREE_RAFALE))
+
+        ecart = SIMULATION_ECART_RAFALE if maintenant >= debut else SIMULATION_ECART_CALME
+        return min(max(round(random.gauss(512, ecart)), 0), 1023)
+
+    def mesurer(self) -> Optional[dict]:
+        """
+        Mesure le niveau sonore sur les échantillons arrivés depuis la mesure précédente
+
+        Returns:
+            Dictionnaire avec date_heure, valeur_brute, amplitude, voltage, difference,
+            niveau_db, crete_db, leq_1min, caracteristiques (None si pas d'échantillons
+            ou si le signal du micro est plat)
+        """
+        # Heure d'acquisition (conservée jusqu'à l'insertion en BD)
+        date_heure = datetime.now()
+
+        # Échantillons arrivés depuis la mesure précédente (lus sans copie, sans attente)
+        valeurs, self._position_son = self.acquisition.lire_depuis(self._position_son)
+
+        # Signal plat (micro débranché, bloqué ou saturé): pas de niveau, et la
+        # fenêtre ne doit pas déplacer la valeur au repos
+        if signal_plat(valeurs):
+            self.compteur_signal_plat += 1
+            if not self._signal_plat:
+                print(f"⚠ Signal du micro plat (valeur {int(valeurs[0])}) - mesures ignorées, "
+                      f"vérifiez le branchement du micro (canal {self.adc_channel})")
+            self._signal_plat = True
+            return None
+        if self._signal_plat:
+            print("✓ Signal du micro rétabli")
+            self._signal_plat = False
+
+        # Affiner la valeur au repos (fenêtres calmes seulement) avant de calculer le niveau
+        self.suivi_repos.ajouter(valeurs)
+        self.valeur_repos = self.analyseur.repos = self.suivi_repos.repos
+        niveau = self.analyseur.analyser(valeurs)
+        if niveau is None:
+            return None
+
+        # Calculer la moyenne et le pic
+        valeur_moyenne, valeur_min, valeur_max = statistiques_fenetre(valeurs)
+        amplitude = valeur_max - valeur_min
+
+        # Convertir en voltage (0-3.3V pour le Raspberry Pi)
+        voltage = (valeur_moyenne * 3.3) / 1023
+
+        # Différence par rapport au repos
+        difference = abs(valeur_moyenne - self.valeur_repos) if self.valeur_repos else 0
+
+        # Caractéristiques spectrales seulement si la fenêtre peut appartenir à un épisode
+        caracteristiques = None
+        if self.extracteur and niveau.db >= self.detecteur.seuil_sortie:
+            caracteristiques = self.extracteur.extraire(valeurs, self.valeur_repos)
+
+        return {
+            'date_heure': date_heure,
+            'valeur_brute': valeur_moyenne,
+            'amplitude': amplitude,
+            'voltage': voltage,
+            'difference': difference,
+            'niveau_db': niveau.db,          # dB SPL approximatif (RMS sans composante continue)
+            'crete_db': niveau.crete_db,
+            'leq_1min': niveau.leq_1min,
+            'caracteristiques': caracteristiques
+        }
+
+    def suivre(self, mesure: dict) -> Tuple[Optional[str], Optional[str], Optional[Classification]]:
+        """
+        Passe une mesure au détecteur d'épisodes
+
+        Au début d'un épisode (ou de la suite d'un épisode coupé à duree_max), le clip
+        audio est déclenché; à sa fin, l'épisode est résumé et classé.
+
+        Args:
+            mesure: Résultat de mesurer()
+
+        Returns:
+            Tuple (transition DEBUT/FIN/SUITE ou None, description de l'événement BRUIT_FORT
+            à écrire avec cette mesure ou None, classification ou None)
+        """
+        date_heure = mesure['date_heure']
+        transition = self.detecteur.ajouter(date_heure, mesure['niveau_db'], mesure['caracteristiques'])
+
+        # Clip audio: les secondes d'avant sont encore dans le tampon de l'ADC
+        if transition in (DEBUT, SUITE) and self.clips:
+            debut_episode = self.detecteur.episode_en_cours().debut
+            self.clips.declencher(
+                date_heure,
+                f"Clip audio {CLIP_PRE_ROLL + CLIP_POST_ROLL:g}s "
+                f"({CLIP_PRE_ROLL:g}s avant le déclenchement) - "
+                f"Épisode du {debut_episode.strftime('%H:%M:%S')}"
+            )
+
+        description = classification = None
+        if transition in (FIN, SUITE):
+            description, classification = self.resumer_episode(self.detecteur.dernier_episode)
+        return transition, description, classification
+
+    def resumer_episode(self, episode) -> Tuple[str, Optional[Classification]]:
+        """
+        Description de l'événement BRUIT_FORT d'un épisode terminé, et sa classe
+
+        Returns:
+            Tuple (description, classification ou None si la classification est désactivée)
+        """
+        description = decrire_episode(episode)
+        if self.classifieur is None or episode.caracteristiques is None:
+            return description, None
+
+        classification = self.classifieur.classer(episode.caracteristiques, episode.nb_mesures)
+        return f"{description} - {decrire_classification(classification)}", classification
+
+    def terminer_episode(self):
+        """
+        Termine l'épisode en cours à l'arrêt (donnée = crête de l'épisode)
+
+        Returns:
+            Tuple (episode, description, classification), ou None sans épisode en cours
+        """
+        episode = self.detecteur.terminer()
+        if episode is None:
+            return None
+        description, classification = self.resumer_episode(episode)
+        return episode, description + " - interrompu par l'arrêt", classification
+
+    def enregistrer_clip(self, wav: bytes, date_heure: datetime, description: str):
+        """
+        Écrit le clip audio d'un épisode (appelé par le thread des clips)
+
+        Args:
+            wav: Clip encodé (WAV IMA ADPCM)
+            date_heure: Heure du déclenchement
+            description: Description de l'événement CAPTURE
+        """
+        if self.spool:
+            id_local = self.spool.ajouter(
+                date_heure, self.id_capteur_audio, self.id_salle, blob=wav,
+                type_evenement='CAPTURE', description=description
+            )
+            print(f"         ✓ Clip audio mis en spool - ID local: {id_local} ({len(wav)/1024:.1f} KB)")
+            return
+
+        try:
+            ids = self.db.insert_donnee_avec_evenement(
+                date_heure, self.id_capteur_audio, self.id_salle,
+                'CAPTURE', description,
+                blob=wav
+            )
+            if ids is None:
+                raise RuntimeError("insertion du clip audio refusée par la BD")
+            print(f"         ✓ Clip audio enregistré en BD - ID: {ids[0]} ({len(wav)/1024:.1f} KB)")
+        finally:
+            # Rendre la connexion du thread des clips au pool entre deux épisodes
+            self.db.liberer_connexion()
+
+    def enregistrer_analogique(self, capteur, date_heure: datetime, valeur: Optional[float]):
+        """
+        Écrit la mesure d'un capteur analogique (appelé par le thread de distribution du service ADC)
+
+        Une mesure hors de la plage acceptée par la BD pour son type (capteur débranché,
+        mauvaise conversion) est ignorée avant d'être mise en spool ou en lot.
+
+        Args:
+            capteur: Capteur (id, nom, type) branché sur un canal du MCP3008
+            date_heure: Heure du balayage
+            valeur: Valeur convertie (None pour un mouvement)
+        """
+        if not dans_plage(capteur.type, valeur):
+            self.compteur_hors_plage += 1
+            if capteur.nom not in self._hors_plage_signales:
+                self._hors_plage_signales.add(capteur.nom)
+                print(f"⚠ Mesure {capteur.nom} hors plage ({valeur:.1f}) ignorée - vérifiez le "
+                      f"branchement et la conversion dans CAPTEURS_ANALOGIQUES")
+            return
+
+        if self.spool:
+            self.spool.ajouter(date_heure, capteur.id, self.id_salle, mesure=valeur)
+        else:
+            self.lot_analogique.ajouter(date_heure, capteur.id, valeur, self.id_salle)
+
+    def arreter(self):
+        """Arrête les clips et l'ADC, sauvegarde la calibration et ferme le SPI"""
+        # Un clip en cours est écrit avec les échantillons déjà acquis
+        if self.clips:
+            self.clips.arreter()
+            print(f"✓ Clips audio: {self.clips.compteur_clips} "
+                  f"({self.clips.octets_total/1024:.1f} KB, {self.clips.compteur_ignores} ignoré(s))")
+
+        # Arrêter l'ADC (micro et capteurs analogiques) avant l'envoi des dernières mesures
+        if self.service_adc:
+            self.service_adc.arreter()
+            print(f"✓ Acquisition audio: {self.acquisition.resume()}")
+            print(f"✓ Capteurs analogiques: {self.service_adc.resume()}")
+
+        # Dernières mesures analogiques, dans leurs propres lots
+        if self.lot_analogique:
+            self.lot_analogique.arreter()
+        if self.lot_analogique and self.lot_analogique.compteur_lignes:
+            print(f"✓ Lots analogiques envoyés: {self.lot_analogique.compteur_lots} "
+                  f"({self.lot_analogique.compteur_lignes} mesures)")
+        if self.compteur_hors_plage:
+            print(f"⚠ Mesures analogiques hors plage ignorées: {self.compteur_hors_plage}")
+        if self.compteur_signal_plat:
+            print(f"⚠ Mesures de son ignorées (signal du micro plat): {self.compteur_signal_plat}")
+
+        if self.suivi_repos.sauvegarder():
+            print(f"✓ Calibration sauvegardée - Valeur repos: {self.suivi_repos.repos:.1f}")
+
+        if self.spi:
+            try:
+                self.spi.close()
+                print("✓ SPI fermé proprement")
+            except:
+                pass
+            self.spi = None
+        self.verrou_spi.liberer()
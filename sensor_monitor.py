@@ -17,6 +17,10 @@ except ImportError:
     CAMERA_AVAILABLE = False
 
 from db_connection import DatabaseConnection
+from session_camera import SessionCamera
+from miniatures import miniatures_jpeg, enregistrer_miniatures
+from config import (PHOTO_WIDTH, PHOTO_HEIGHT, CAMERA_TAILLE_LORES, MINIATURE_TAILLE,
+                    MINIATURE_TAILLE_APERCU, MINIATURE_QUALITE)
 
 
 class SensorMonitor:
@@ -42,8 +46,8 @@ class SensorMonitor:
         self.adc_channel = 0  # Canal ADC pour le micro
         self.sound_pin = 18   # Pin digital si vous utilisez un module avec sortie digitale
 
-        # Configuration caméra
-        self.camera = None
+        # Configuration caméra (session démarrée une fois dans setup)
+        self.session_camera = None
         self.photo_dir = "photos"
 
         # IDs des capteurs (à récupérer de la BD)
@@ -64,17 +68,13 @@ class SensorMonitor:
 
         # Récupérer les IDs des capteurs depuis la BD
         try:
-            capteurs = self.db.execute_query(
-                "SELECT idCapteur_PK, nom, type FROM Capteur WHERE type IN ('BRUIT', 'CAMERA')"
-            )
-
-            for capteur in capteurs:
-                if capteur[2] == 'BRUIT':
-                    self.id_capteur_bruit = capteur[0]
-                    print(f"✓ Capteur BRUIT trouvé - ID: {capteur[0]}, Nom: {capteur[1]}")
-                elif capteur[2] == 'CAMERA':
-                    self.id_capteur_camera = capteur[0]
-                    print(f"✓ Capteur CAMERA trouvé - ID: {capteur[0]}, Nom: {capteur[1]}")
+            for capteur in self.db.references.capteurs().values():
+                if capteur.type == 'BRUIT':
+                    self.id_capteur_bruit = capteur.id
+                    print(f"✓ Capteur BRUIT trouvé - ID: {capteur.id}, Nom: {capteur.nom}")
+                elif capteur.type == 'CAMERA':
+                    self.id_capteur_camera = capteur.id
+                    print(f"✓ Capteur CAMERA trouvé - ID: {capteur.id}, Nom: {capteur.nom}")
 
             # Si les capteurs n'existent pas, les créer
             if self.id_capteur_bruit is None:
@@ -82,8 +82,7 @@ class SensorMonitor:
                     "INSERT INTO Capteur (nom, type) VALUES (?, ?)",
                     ('MIC-ELECTRET-1', 'BRUIT')
                 )
-                result = self.db.execute_query("SELECT @@IDENTITY AS id")
-                self.id_capteur_bruit = result[0][0]
+                self.id_capteur_bruit = self.db.references.premier_capteur('BRUIT')
                 print(f"✓ Capteur BRUIT créé - ID: {self.id_capteur_bruit}")
 
             if self.id_capteur_camera is None:
@@ -91,24 +90,25 @@ class SensorMonitor:
                     "INSERT INTO Capteur (nom, type) VALUES (?, ?)",
                     ('PICAM-V2-1', 'CAMERA')
                 )
-                result = self.db.execute_query("SELECT @@IDENTITY AS id")
-                self.id_capteur_camera = result[0][0]
+                self.id_capteur_camera = self.db.references.premier_capteur('CAMERA')
                 print(f"✓ Capteur CAMERA créé - ID: {self.id_capteur_camera}")
 
         except Exception as e:
             print(f"✗ Erreur lors de la configuration des capteurs: {e}")
             return False
 
-        # Initialiser la caméra si disponible
-        if CAMERA_AVAILABLE:
-            try:
-                self.camera = Picamera2()
-                camera_config = self.camera.create_still_configuration()
-                self.camera.configure(camera_config)
-                print("✓ Pi Camera initialisée")
-            except Exception as e:
-                print(f"✗ Erreur d'initialisation de la caméra: {e}")
-                self.camera = None
+        # Démarrer la caméra une fois pour toutes (source simulée sans Pi Camera)
+        try:
+            self.session_camera = SessionCamera(Picamera2() if CAMERA_AVAILABLE else None,
+                                                taille=(PHOTO_WIDTH, PHOTO_HEIGHT),
+                                                taille_lores=CAMERA_TAILLE_LORES)
+            self.session_camera.demarrer()
+            origine = "source simulée" if self.session_camera.simulee else "Pi Camera"
+            print(f"✓ Caméra démarrée ({origine}, {PHOTO_WIDTH}x{PHOTO_HEIGHT} + lores "
+                  f"{CAMERA_TAILLE_LORES[0]}x{CAMERA_TAILLE_LORES[1]})")
+        except Exception as e:
+            print(f"✗ Erreur d'initialisation de la caméra: {e}")
+            self.session_camera = None
 
         print("✓ Configuration terminée\n")
         return True
@@ -141,12 +141,12 @@ class SensorMonitor:
 
     def capture_photo(self) -> Optional[str]:
         """
-        Capture une photo avec la Pi Camera
+        Capture une photo avec la Pi Camera (caméra déjà démarrée: pas d'attente)
 
         Returns:
             Chemin de la photo capturée, ou None si erreur
         """
-        if not CAMERA_AVAILABLE or self.camera is None:
+        if self.session_camera is None:
             print("⚠ Caméra non disponible")
             return None
 
@@ -156,11 +156,12 @@ class SensorMonitor:
             filename = f"salle{self.id_salle}_{timestamp}.jpg"
             filepath = os.path.join(self.photo_dir, filename)
 
-            # Capturer la photo
-            self.camera.start()
-            time.sleep(2)  # Laisser le temps à la caméra de s'ajuster
-            self.camera.capture_file(filepath)
-            self.camera.stop()
+            # Capturer la photo sur le flux déjà actif
+            photo_bytes = self.session_camera.photo_jpeg()
+            if photo_bytes is None:
+                return None
+            with open(filepath, 'wb') as f:
+                f.write(photo_bytes)
 
             print(f"✓ Photo capturée: {filepath}")
             return filepath
@@ -182,23 +183,24 @@ class SensorMonitor:
         try:
             date_heure = datetime.now()
 
-            # Insérer la donnée
-            self.db.execute_non_query(
-                """INSERT INTO Donnees (dateHeure, idCapteur, mesure, photo, noSalle)
-                   VALUES (?, ?, ?, NULL, ?)""",
-                (date_heure, self.id_capteur_bruit, niveau_sonore, self.id_salle)
-            )
-
-            # Récupérer l'ID de la donnée insérée
-            result = self.db.execute_query("SELECT @@IDENTITY AS id")
-            id_donnee = result[0][0]
-
-            print(f"📊 Bruit enregistré: {niveau_sonore:.1f} dB - ID: {id_donnee}")
-
-            # Créer un événement si bruit fort
+            # Bruit fort: donnée + événement dans une seule transaction
             if niveau_sonore > self.seuil_bruit_fort:
-                self.creer_evenement('BRUIT_FORT', id_donnee,
-                                    f"Niveau sonore élevé: {niveau_sonore:.1f} dB")
+                ids = self.db.insert_donnee_avec_evenement(
+                    date_heure, self.id_capteur_bruit, self.id_salle,
+                    'BRUIT_FORT', f"Niveau sonore élevé: {niveau_sonore:.1f} dB",
+                    mesure=niveau_sonore
+                )
+                id_donnee = ids[0] if ids else None
+                if id_donnee is not None:
+                    print(f"📊 Bruit enregistré: {niveau_sonore:.1f} dB - ID: {id_donnee}")
+                    print("⚡ Événement créé: BRUIT_FORT")
+                return id_donnee
+
+            id_donnee = self.db.insert_donnee(
+                date_heure, self.id_capteur_bruit, self.id_salle, mesure=niveau_sonore
+            )
+            if id_donnee is not None:
+                print(f"📊 Bruit enregistré: {niveau_sonore:.1f} dB - ID: {id_donnee}")
 
             return id_donnee
 
@@ -219,22 +221,28 @@ class SensorMonitor:
         try:
             date_heure = datetime.now()
 
-            # Insérer la donnée
-            self.db.execute_non_query(
-                """INSERT INTO Donnees (dateHeure, idCapteur, mesure, photo, noSalle)
-                   VALUES (?, ?, NULL, ?, ?)""",
-                (date_heure, self.id_capteur_camera, chemin_photo, self.id_salle)
-            )
+            # La colonne photo (chemin) a été remplacée par photoBlob: envoyer le contenu du fichier
+            with open(chemin_photo, 'rb') as f:
+                photo_bytes = f.read()
 
-            # Récupérer l'ID de la donnée insérée
-            result = self.db.execute_query("SELECT @@IDENTITY AS id")
-            id_donnee = result[0][0]
+            miniatures = miniatures_jpeg(photo_bytes, MINIATURE_TAILLE, MINIATURE_TAILLE_APERCU,
+                                         MINIATURE_QUALITE)
 
-            print(f"📷 Photo enregistrée: {chemin_photo} - ID: {id_donnee}")
+            # Insérer la photo, son événement CAPTURE et sa miniature en une transaction
+            with self.db.transaction() as transaction:
+                ids = self.db.insert_donnee_avec_evenement(
+                    date_heure, self.id_capteur_camera, self.id_salle,
+                    'CAPTURE', f"Photo enregistrée: {chemin_photo}",
+                    blob=photo_bytes
+                )
+                if ids and miniatures:
+                    enregistrer_miniatures(self.db, ids[0], miniatures)
+            if ids is None or not transaction.validee:
+                return None
 
-            # Créer un événement
-            self.creer_evenement('CAPTURE', id_donnee,
-                                f"Photo enregistrée: {chemin_photo}")
+            id_donnee = ids[0]
+            print(f"📷 Photo enregistrée: {chemin_photo} - ID: {id_donnee}")
+            print("⚡ Événement créé: CAPTURE")
 
             return id_donnee
 
@@ -281,15 +289,19 @@ class SensorMonitor:
             while True:
                 # Mesurer le niveau sonore
                 niveau_sonore = self.read_sound_level()
-                self.envoyer_donnee_bruit(niveau_sonore)
 
                 # Capturer une photo si l'intervalle est écoulé
+                chemin_photo = None
                 temps_actuel = time.time()
                 if temps_actuel - dernier_temps_photo >= intervalle_photo:
                     chemin_photo = self.capture_photo()
+                    dernier_temps_photo = temps_actuel
+
+                # Toutes les écritures du cycle (mesure, photo, événements) en un seul COMMIT
+                with self.db.transaction():
+                    self.envoyer_donnee_bruit(niveau_sonore)
                     if chemin_photo:
                         self.envoyer_donnee_photo(chemin_photo)
-                    dernier_temps_photo = temps_actuel
 
                 # Attendre avant la prochaine mesure
                 time.sleep(intervalle_bruit)
@@ -302,8 +314,9 @@ class SensorMonitor:
     def cleanup(self):
         """Nettoie les ressources (GPIO, caméra)"""
         GPIO.cleanup()
-        if self.camera:
-            self.camera.close()
+        if self.session_camera:
+            print(f"✓ Caméra: {self.session_camera.resume()}")
+            self.session_camera.arreter()
         print("✓ Ressources libérées")
 
 
@@ -0,0 +1,474 @@
+"""
+Service ADC partagé: un seul propriétaire du MCP3008 (/dev/spidev0.0) pour tous les canaux
+Le canal du micro est échantillonné en continu (AcquisitionADC); les canaux lents
+(température, CO2, mouvement...) sont lus ensemble en un seul balayage SPI, convertis
+et distribués aux consommateurs de chaque capteur par un thread séparé
+"""
+
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from acquisition_adc import AcquisitionADC
+from cache_reference import Capteur
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+
+# Tension de référence du MCP3008 sur le Raspberry Pi (VREF = 3.3 V)
+TENSION_REFERENCE = 3.3
+
+
+def en_tension(valeur: float) -> float:
+    """Valeur brute 10 bits (0-1023) en volts"""
+    return valeur * TENSION_REFERENCE / 1023
+
+
+def tmp36(valeur: float) -> float:
+    """Capteur de température TMP36: 10 mV/°C, 0.5 V à 0 °C"""
+    return (en_tension(valeur) - 0.5) * 100
+
+
+def lm35(valeur: float) -> float:
+    """Capteur de température LM35: 10 mV/°C, 0 V à 0 °C"""
+    return en_tension(valeur) * 100
+
+
+def co2_analogique(valeur: float) -> float:
+    """Sortie analogique d'un capteur CO2 type MH-Z19 (0.4 V = 0 ppm, 2.0 V = 5000 ppm)"""
+    return max(0.0, (en_tension(valeur) - 0.4) * 5000 / 1.6)
+
+
+def pourcentage(valeur: float) -> float:
+    """Pleine échelle en pourcentage (ex: humidité relative d'un capteur à sortie linéaire)"""
+    return valeur * 100 / 1023
+
+
+def seuil_numerique(valeur: float) -> float:
+    """Sortie tout-ou-rien (ex: détecteur PIR): 1.0 au-dessus de la moitié de l'échelle"""
+    return 1.0 if valeur >= 512 else 0.0
+
+
+# Conversions utilisables dans config.CAPTEURS_ANALOGIQUES
+CONVERSIONS = {
+    'BRUT': float,
+    'TENSION': en_tension,
+    'TMP36': tmp36,
+    'LM35': lm35,
+    'CO2_ANALOGIQUE': co2_analogique,
+    'POURCENTAGE': pourcentage,
+    'NUMERIQUE': seuil_numerique,
+}
+
+# Plage acceptée par la BD pour chaque type de capteur (trg_check_donnees_capteur,
+# Script_bd/contraintesAvancees.sql), et pour les autres (ck_donnees_mesure_range):
+# une mesure hors plage ferait échouer son lot
+PLAGE_MESURE_DONNEES = (-40.0, 10000.0)
+PLAGES_MESURE = {
+    'BRUIT': (0.0, 120.0),           # dB
+    'TEMPERATURE': (-40.0, 125.0),   # °C
+    'HUMIDITE': (0.0, 100.0),        # %
+    'CO2': (0.0, 10000.0),           # ppm
+}
+
+
+def dans_plage(type_capteur: str, valeur: Optional[float]) -> bool:
+    """True si la BD accepte cette mesure pour ce type de capteur (None: donnée sans mesure)"""
+    if valeur is None:
+        return True
+    minimum, maximum = PLAGES_MESURE.get(type_capteur, PLAGE_MESURE_DONNEES)
+    return minimum <= valeur <= maximum
+
+
+class VerrouSPI:
+    """
+    Verrou exclusif (flock) sur un fichier: un seul programme ouvre le MCP3008
+
+    capture_son_continu.py et surveillance_intelligente.py ont chacun un service ADC:
+    le second lancé refuse de démarrer au lieu de se partager le bus avec le premier.
+    Le verrou disparaît avec le programme qui le tient, même après un plantage.
+    """
+
+    def __init__(self, chemin: str):
+        """
+        Args:
+            chemin: Fichier de verrou (ex: /run/lock/sallesense-spi0.0.lock)
+        """
+        self.chemin = chemin
+        self._fichier = None
+
+    def acquerir(self) -> bool:
+        """
+        Prend le verrou sans attendre
+
+        Returns:
+            True si le verrou est pris (ou si flock n'existe pas sur ce système),
+            False s'il est tenu par un autre programme (voir proprietaire)
+        """
+        if not FCNTL_AVAILABLE or self._fichier is not None:
+            return True
+
+        try:
+            fichier = open(self.chemin, "a+")
+        except OSError as e:
+            print(f"⚠ Verrou du MCP3008 impossible ({e}) - aucune protection contre un second programme")
+            return True
+
+        try:
+            fcntl.flock(fichier, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            fichier.close()
+            return False
+
+        # PID du propriétaire, affiché par le programme qui trouve le verrou pris
+        fichier.seek(0)
+        fichier.truncate()
+        fichier.write(f"{os.getpid()}\n")
+        fichier.flush()
+        self._fichier = fichier
+        return True
+
+    def proprietaire(self) -> Optional[str]:
+        """PID écrit par le programme qui tient le verrou (None si inconnu)"""
+        try:
+            with open(self.chemin) as fichier:
+                return fichier.read().strip() or None
+        except OSError:
+            return None
+
+    def liberer(self):
+        """Rend le verrou"""
+        if self._fichier is None:
+            return
+        fcntl.flock(self._fichier, fcntl.LOCK_UN)
+        self._fichier.close()
+        self._fichier = None
+
+
+class CanalLent:
+    """Canal lu à chaque balayage, moyenné puis converti à sa propre fréquence"""
+
+    def __init__(self, canal: int, frequence: float, conversion: Callable[[float], float],
+                 balayages_par_mesure: int):
+        self.canal = canal
+        self.frequence = frequence
+        self.conversion = conversion
+        self.balayages_par_mesure = balayages_par_mesure
+        self.consommateurs: List[Callable[[datetime, float], None]] = []
+        self.derniere_valeur: Optional[float] = None
+        self._somme = 0
+        self._nb = 0
+
+    def ajouter(self, valeur: int) -> Optional[float]:
+        """
+        Ajoute la lecture d'un balayage
+
+        Returns:
+            Valeur convertie (moyenne des lectures) quand une mesure est due, None sinon
+        """
+        self._somme += valeur
+        self._nb += 1
+        if self._nb < self.balayages_par_mesure:
+            return None
+
+        moyenne = self._somme / self._nb
+        self._somme = 0
+        self._nb = 0
+        self.derniere_valeur = self.conversion(moyenne)
+        return self.derniere_valeur
+
+
+class ServiceADC:
+    """
+    Seul lecteur du MCP3008: un thread d'acquisition pour les 8 canaux
+
+    - Canal en flux (micro): échantillonné en continu dans le tampon d'une AcquisitionADC
+    - Canaux lents: tous lus en un seul balayage SPI, frequence_balayage fois par seconde,
+      entre deux blocs du flux; chaque canal moyenne ses lectures jusqu'à sa propre
+      fréquence, convertit la moyenne et la passe à ses consommateurs
+    - Les consommateurs (écriture en BD...) sont appelés par un thread de distribution:
+      le thread d'acquisition n'attend jamais
+    """
+
+    def __init__(self, lecteur=None, lire_canal: Optional[Callable[[int], int]] = None,
+                 frequence_balayage: float = 10.0, taille_file: int = 1000,
+                 liberer: Optional[Callable[[], None]] = None):
+        """
+        Args:
+            lecteur: LecteurMCP3008 (None: lecture par lire_canal, ex: simulation)
+            lire_canal: Fonction qui lit un échantillon d'un canal (0-1023, -1 si erreur),
+                        utilisée si lecteur est None
+            frequence_balayage: Balayages des canaux lents par seconde (défaut: 10)
+            taille_file: Mesures gardées au maximum en attente de distribution (défaut: 1000)
+            liberer: Fonction appelée par le thread de distribution à l'arrêt
+                     (ex: db.liberer_connexion)
+        """
+        if lecteur is None and lire_canal is None:
+            raise ValueError("lecteur ou lire_canal est requis")
+
+        self.lecteur = lecteur
+        self.lire_canal = lire_canal if lire_canal is not None else lecteur.lire
+        self.frequence_balayage = frequence_balayage
+        self.liberer = liberer
+
+        self.flux: Optional[AcquisitionADC] = None
+        self.canal_flux: Optional[int] = None
+        self.canaux: Dict[int, CanalLent] = {}
+        self._ordre: tuple = ()  # Canaux lents, dans l'ordre du balayage
+
+        self._file = queue.Queue(maxsize=taille_file)
+        self._prochain_balayage = 0.0
+        self._arret = threading.Event()
+        self._thread = None             # Balayages sans canal en flux
+        self._thread_distribution = None
+
+        # Statistiques
+        self.compteur_balayages = 0
+        self.compteur_mesures = 0
+        self.erreurs = 0
+        self.pertes = 0                 # Mesures abandonnées: file de distribution pleine
+
+    def ajouter_flux(self, canal: int, frequence: int = 8000, duree_tampon: float = 2.0) -> AcquisitionADC:
+        """
+        Échantillonne un canal en continu (un seul canal en flux: le micro)
+
+        Args:
+            canal: Canal du MCP3008 (0-7)
+            frequence: Échantillons par seconde
+            duree_tampon: Secondes d'échantillons conservées
+
+        Returns:
+            AcquisitionADC dont le tampon se lit comme d'habitude (lire_depuis, fenetre...);
+            elle est démarrée et arrêtée par le service
+        """
+        self._verifier_canal(canal)
+        if self.flux is not None:
+            raise ValueError(f"Le canal {self.canal_flux} est déjà en flux")
+        if canal in self.canaux:
+            raise ValueError(f"Canal {canal} déjà configuré")
+
+        lire_bloc = None
+        if self.lecteur is not None and self.lecteur.par_lots:
+            def lire_bloc(n):
+                bloc = self.lecteur.lire_bloc((canal,), n, frequence)[:, 0]
+                self._balayer_si_du()
+                return bloc
+
+        def lire_echantillon():
+            valeur = self.lire_canal(canal)
+            self._balayer_si_du()
+            return valeur
+
+        self.canal_flux = canal
+        self.flux = AcquisitionADC(lire_echantillon, frequence=frequence,
+                                   duree_tampon=duree_tampon, lire_bloc=lire_bloc)
+        return self.flux
+
+    def ajouter_canal(self, canal: int, frequence: float = 1.0,
+                      conversion: Callable[[float], float] = float) -> CanalLent:
+        """
+        Ajoute un canal lent au balayage
+
+        Args:
+            canal: Canal du MCP3008 (0-7)
+            frequence: Mesures par seconde (au plus frequence_balayage)
+            conversion: Fonction valeur brute moyenne -> grandeur physique (voir CONVERSIONS)
+
+        Returns:
+            CanalLent (voir abonner)
+        """
+        self._verifier_canal(canal)
+        if canal in self.canaux or canal == self.canal_flux:
+            raise ValueError(f"Canal {canal} déjà configuré")
+
+        balayages = max(1, round(self.frequence_balayage / frequence))
+        self.canaux[canal] = CanalLent(canal, frequence, conversion, balayages)
+        self._ordre = tuple(sorted(self.canaux))
+        return self.canaux[canal]
+
+    def abonner(self, canal: int, consommateur: Callable[[datetime, float], None]):
+        """
+        Ajoute un consommateur des mesures d'un canal lent
+
+        Args:
+            canal: Canal configuré avec ajouter_canal
+            consommateur: Fonction appelée (thread de distribution) avec l'heure et la valeur convertie
+        """
+        self.canaux[canal].consommateurs.append(consommateur)
+
+    def demarrer(self):
+        """Démarre l'acquisition (flux et balayages) et la distribution"""
+        if self._thread_distribution is not None:
+            return
+
+        self._arret.clear()
+        self._prochain_balayage = time.perf_counter()
+        self._thread_distribution = threading.Thread(target=self._boucle_distribution,
+                                                     name="DistributionADC", daemon=True)
+        self._thread_distribution.start()
+
+        if self.flux is not None:
+            # Les balayages se font entre deux lectures du flux, dans son thread
+            self.flux.demarrer()
+        elif self.canaux:
+            self._thread = threading.Thread(target=self._boucle_balayages, name="ServiceADC", daemon=True)
+            self._thread.start()
+
+    def arreter(self):
+        """Arrête l'acquisition, puis distribue les mesures encore en file"""
+        if self._thread_distribution is None:
+            return
+
+        if self.flux is not None:
+            self.flux.arreter()
+        self._arret.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+        self._file.put(None)  # Fin de la distribution, après les mesures en file
+        self._thread_distribution.join()
+        self._thread_distribution = None
+
+    def resume(self) -> str:
+        """Résumé d'une ligne pour l'affichage (ex: à l'arrêt)"""
+        canaux = ", ".join(f"{c}: {self.canaux[c].derniere_valeur:.1f}" if self.canaux[c].derniere_valeur is not None
+                           else f"{c}: -" for c in self._ordre)
+        return (f"{self.compteur_balayages} balayage(s), {self.compteur_mesures} mesure(s) "
+                f"[{canaux or 'aucun canal lent'}], {self.erreurs} erreur(s), {self.pertes} perdue(s)")
+
+    @staticmethod
+    def _verifier_canal(canal: int):
+        if canal < 0 or canal > 7:
+            raise ValueError(f"Canal MCP3008 invalide: {canal}")
+
+    def _balayer_si_du(self):
+        """Balaye les canaux lents si c'est l'heure (appelé par le thread d'acquisition)"""
+        if not self._ordre or time.perf_counter() < self._prochain_balayage:
+            return
+        self._prochain_balayage += 1.0 / self.frequence_balayage
+        if self._prochain_balayage < time.perf_counter():
+            # Retard (démarrage, ordonnanceur): ne pas rattraper en rafale
+            self._prochain_balayage = time.perf_counter() + 1.0 / self.frequence_balayage
+        self._balayer()
+
+    def _balayer(self):
+        """Lit tous les canaux lents en un balayage et met en file les mesures dues"""
+        try:
+            if self.lecteur is not None and self.lecteur.par_lots:
+                valeurs = self.lecteur.lire_bloc(self._ordre, 1)[0].tolist()
+            else:
+                valeurs = [self.lire_canal(canal) for canal in self._ordre]
+        except (OSError, ValueError) as e:
+            self.erreurs += 1
+            if self.erreurs == 1:
+                print(f"✗ Erreur balayage ADC: {e}")
+            return
+
+        self.compteur_balayages += 1
+        date_heure = datetime.now()
+        for canal, valeur in zip(self._ordre, valeurs):
+            if valeur < 0:
+                self.erreurs += 1
+                continue
+            mesure = self.canaux[canal].ajouter(valeur)
+            if mesure is None:
+                continue
+            try:
+                self._file.put_nowait((canal, date_heure, mesure))
+            except queue.Full:
+                self.pertes += 1
+
+    def _boucle_balayages(self):
+        """Thread des balayages quand aucun canal n'est en flux"""
+        periode = 1.0 / self.frequence_balayage
+        prochaine = time.perf_counter()
+        while not self._arret.is_set():
+            self._balayer()
+            prochaine += periode
+            attente = prochaine - time.perf_counter()
+            if attente < 0:
+                prochaine = time.perf_counter()
+            else:
+                self._arret.wait(attente)
+
+    def _boucle_distribution(self):
+        """Thread de distribution: appelle les consommateurs de chaque mesure"""
+        try:
+            while True:
+                element = self._file.get()
+                if element is None:
+                    break
+
+                canal, date_heure, mesure = element
+                self.compteur_mesures += 1
+                for consommateur in self.canaux[canal].consommateurs:
+                    try:
+                        consommateur(date_heure, mesure)
+                    except Exception as e:
+                        print(f"✗ Erreur consommateur du canal {canal}: {e}")
+        finally:
+            if self.liberer:
+                self.liberer()
+
+
+def brancher_capteurs(service: ServiceADC, references, capteurs,
+                      enregistrer: Callable[[Capteur, datetime, Optional[float]], None]) -> int:
+    """
+    Ajoute au service les capteurs analogiques de la configuration (config.CAPTEURS_ANALOGIQUES)
+
+    Les capteurs MOUVEMENT n'ont pas de mesure: une donnée est écrite à chaque
+    front montant (passage de 0 à 1 de la sortie tout-ou-rien).
+
+    Args:
+        service: Service ADC (pas encore démarré)
+        references: Cache des tables de référence (db.references)
+        capteurs: Liste de (canal, nom du capteur, mesures par seconde, conversion)
+        enregistrer: Fonction appelée (thread de distribution) avec le capteur,
+                     l'heure et la valeur (None pour un mouvement)
+
+    Returns:
+        Nombre de capteurs branchés
+    """
+    nb = 0
+    for canal, nom, frequence, conversion in capteurs:
+        capteur = references.capteur_nomme(nom)
+        if capteur is None:
+            print(f"⚠ Capteur {nom} introuvable (canal {canal} ignoré) - lancez: python initialiser_bd.py")
+            continue
+        if conversion not in CONVERSIONS:
+            print(f"✗ Conversion inconnue pour {nom}: {conversion} ({', '.join(CONVERSIONS)})")
+            continue
+
+        try:
+            service.ajouter_canal(canal, frequence, CONVERSIONS[conversion])
+        except ValueError as e:
+            print(f"✗ Capteur {nom}: {e}")
+            continue
+
+        if capteur.type == 'MOUVEMENT':
+            service.abonner(canal, _front_montant(capteur, enregistrer))
+        else:
+            service.abonner(canal, lambda date_heure, valeur, c=capteur: enregistrer(c, date_heure, valeur))
+        print(f"✓ Capteur {nom} ({capteur.type}) sur le canal {canal}: "
+              f"{frequence:g} mesure(s)/s, conversion {conversion}")
+        nb += 1
+    return nb
+
+
+def _front_montant(capteur: Capteur, enregistrer):
+    """Consommateur qui n'appelle enregistrer qu'au passage de 0 à 1"""
+    precedent = [0.0]
+
+    def consommateur(date_heure: datetime, valeur: float):
+        if valeur >= 0.5 > precedent[0]:
+            enregistrer(capteur, date_heure, None)
+        precedent[0] = valeur
+    return consommateur
@@ -0,0 +1,248 @@
+"""
+Session caméra longue durée: la caméra est configurée et démarrée une seule fois
+Deux flux: main (pleine résolution, photos et vidéo) et lores (basse résolution, analyse)
+Une photo est prise sur le flux déjà actif (quelques dizaines de ms, pas de
+start/stop ni de stabilisation à chaque photo); une vidéo peut être encodée en même
+temps sans reconfigurer la caméra. Sans Pi Camera, une source simulée produit les images.
+"""
+
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from io import BytesIO
+from typing import Optional, Tuple
+
+import numpy as np
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    print("⚠ Pillow non disponible - photos simulées non encodées en JPEG")
+    PIL_AVAILABLE = False
+
+
+class SourceSimulee:
+    """
+    Remplaçant de Picamera2 (capture_array) pour travailler sans caméra
+
+    Scène fixe (murs, tables) avec bruit de capteur; un objet traverse l'image
+    pendant duree_mouvement secondes toutes les periode_mouvement secondes.
+    """
+
+    def __init__(self, taille: Tuple[int, int], taille_lores: Tuple[int, int],
+                 periode_mouvement: float = 60.0, duree_mouvement: float = 10.0, graine: int = 0):
+        """
+        Args:
+            taille: (largeur, hauteur) du flux main
+            taille_lores: (largeur, hauteur) du flux lores
+            periode_mouvement: Secondes entre deux passages de l'objet (défaut: 60)
+            duree_mouvement: Durée d'un passage en secondes (défaut: 10)
+            graine: Graine du bruit de capteur
+        """
+        self.taille = taille
+        self.taille_lores = taille_lores
+        self.periode_mouvement = periode_mouvement
+        self.duree_mouvement = duree_mouvement
+        self._generateur = np.random.default_rng(graine)
+        self._debut = time.monotonic()
+        self._fonds = {}  # (largeur, hauteur) -> (fond, tirages de bruit)
+
+    def capture_array(self, flux: str = "main") -> np.ndarray:
+        """
+        Image du flux demandé à l'instant présent
+
+        Returns:
+            main: tableau RGB uint8 (hauteur, largeur, 3); lores: niveaux de gris uint8 (hauteur, largeur)
+        """
+        largeur, hauteur = self.taille if flux == "main" else self.taille_lores
+        gris = self._scene(time.monotonic() - self._debut, largeur, hauteur)
+        if flux != "main":
+            return gris
+        return np.stack([gris, gris, (gris * 0.9).astype(np.uint8)], axis=-1)
+
+    def _scene(self, t: float, largeur: int, hauteur: int) -> np.ndarray:
+        """Scène en coordonnées relatives: identique (au bruit près) quelle que soit la résolution"""
+        fond, bruits = self._fonds.get((largeur, hauteur)) or self._preparer(largeur, hauteur)
+        image = fond.copy()
+
+        # Objet en mouvement (une personne qui traverse la salle)
+        phase = t % self.periode_mouvement
+        if phase < self.duree_mouvement:
+            centre = phase / self.duree_mouvement
+            gauche = max(0, int((centre - 0.06) * largeur))
+            droite = min(largeur, int((centre + 0.06) * largeur))
+            image[int(0.3 * hauteur):int(0.9 * hauteur), gauche:droite] = 220
+
+        # Bruit de capteur: tirages préparés, choisis au hasard (rapide même en 1080p)
+        image += bruits[self._generateur.integers(len(bruits))]
+        return np.clip(image, 0, 255).astype(np.uint8)
+
+    def _preparer(self, largeur: int, hauteur: int):
+        """Fond fixe (mur dégradé, sol, deux tables) et tirages de bruit pour une résolution"""
+        y = np.linspace(0.0, 1.0, hauteur, dtype=np.float32)[:, None]
+        x = np.linspace(0.0, 1.0, largeur, dtype=np.float32)[None, :]
+        fond = 150 + 40 * x - 30 * y
+        fond = np.where(y > 0.7, 90.0, fond)
+        for gauche in (0.15, 0.6):
+            fond = np.where((x > gauche) & (x < gauche + 0.25) & (y > 0.6) & (y < 0.75), 60.0, fond)
+
+        fond = fond.astype(np.int16)
+        bruits = self._generateur.normal(0.0, 3.0, (4, hauteur, largeur)).astype(np.int16)
+        self._fonds[(largeur, hauteur)] = (fond, bruits)
+        return fond, bruits
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class SessionCamera:
+    """
+    Caméra démarrée une fois pour toute la durée du programme
+
+    - photo_jpeg(): photo du flux main, encodée en JPEG
+    - image_lores(): image basse résolution en niveaux de gris (détection de mouvement...)
+    - demarrer_video() / arreter_video(): encodeur sur le flux main, en parallèle des photos
+    """
+
+    def __init__(self, camera=None, taille: Tuple[int, int] = (1920, 1080),
+                 taille_lores: Tuple[int, int] = (320, 240), images_par_seconde: int = 30,
+                 duree_chauffe: float = 2.0, qualite_jpeg: int = 90):
+        """
+        Args:
+            camera: Picamera2 (None: source simulée)
+            taille: (largeur, hauteur) du flux main (photos et vidéo)
+            taille_lores: (largeur, hauteur) du flux lores (analyse)
+            images_par_seconde: Cadence de la caméra
+            duree_chauffe: Secondes de stabilisation (exposition, balance des blancs) au démarrage seulement
+            qualite_jpeg: Qualité des photos (1-100)
+        """
+        self.camera = camera
+        self.simulee = camera is None
+        self.taille = taille
+        self.taille_lores = taille_lores
+        self.images_par_seconde = images_par_seconde
+        self.duree_chauffe = duree_chauffe
+        self.qualite_jpeg = qualite_jpeg
+
+        self.demarree = False
+        self.video_en_cours = False
+        self._verrou = threading.Lock()
+
+        # Statistiques
+        self.compteur_photos = 0
+        self._latences = deque(maxlen=100)  # Secondes par photo (capture + encodage)
+
+    def demarrer(self):
+        """Configure les deux flux, démarre la caméra et attend la stabilisation (une seule fois)"""
+        if self.demarree:
+            return
+
+        if self.simulee:
+            self.camera = SourceSimulee(self.taille, self.taille_lores)
+        else:
+            # Configuration vidéo: l'encodeur peut tourner sans changer de mode pour les photos
+            # (le flux lores doit être en YUV420 sur les Pi 4 et antérieurs)
+            config = self.camera.create_video_configuration(
+                main={"size": self.taille, "format": "RGB888"},
+                lores={"size": self.taille_lores, "format": "YUV420"},
+                controls={"FrameRate": self.images_par_seconde},
+                buffer_count=4
+            )
+            self.camera.configure(config)
+            self.camera.options["quality"] = self.qualite_jpeg
+
+        self.camera.start()
+        if not self.simulee:
+            time.sleep(self.duree_chauffe)
+        self.demarree = True
+
+    def arreter(self):
+        """Arrête la vidéo en cours et la caméra"""
+        if not self.demarree:
+            return
+
+        self.arreter_video()
+        self.camera.stop()
+        self.camera.close()
+        self.demarree = False
+
+    def photo_jpeg(self) -> Optional[bytes]:
+        """
+        Photo du flux main, sans redémarrer la caméra
+
+        Returns:
+            JPEG (ou image simulée brute sans Pillow), None si erreur
+        """
+        debut = time.perf_counter()
+        try:
+            with self._verrou:
+                if self.simulee:
+                    photo = self._encoder_simulee(self.camera.capture_array("main"))
+                else:
+                    tampon = BytesIO()
+                    self.camera.capture_file(tampon, format='jpeg')
+                    photo = tampon.getvalue()
+        except Exception as e:
+            print(f"✗ Erreur lors de la capture: {e}")
+            return None
+
+        self._latences.append(time.perf_counter() - debut)
+        self.compteur_photos += 1
+        return photo
+
+    def image_lores(self) -> np.ndarray:
+        """
+        Image basse résolution en niveaux de gris
+
+        Returns:
+            Tableau uint8 (hauteur, largeur) du flux lores
+        """
+        image = self.camera.capture_array("lores")
+        if self.simulee:
+            return image
+        # YUV420: les hauteur premières lignes sont la luminance (Y)
+        largeur, hauteur = self.taille_lores
+        return image[:hauteur, :largeur]
+
+    def demarrer_video(self, encodeur, sortie):
+        """
+        Encode le flux main en parallèle des photos (picamera2 start_encoder)
+
+        Args:
+            encodeur: Encodeur picamera2 (ex: H264Encoder)
+            sortie: Sortie picamera2 (FileOutput, CircularOutput...)
+        """
+        if self.simulee or self.video_en_cours:
+            return
+        self.camera.start_encoder(encodeur, sortie)
+        self.video_en_cours = True
+
+    def arreter_video(self):
+        """Arrête l'encodeur vidéo (la caméra continue de tourner)"""
+        if self.video_en_cours:
+            self.camera.stop_encoder()
+            self.video_en_cours = False
+
+    def resume(self) -> str:
+        """Résumé d'une ligne: nombre de photos et latence"""
+        if not self._latences:
+            return "aucune photo"
+        moyenne = 1000 * sum(self._latences) / len(self._latences)
+        return (f"{self.compteur_photos} photo(s), latence moyenne {moyenne:.0f} ms "
+                f"(max {1000 * max(self._latences):.0f} ms)")
+
+    def _encoder_simulee(self, image: np.ndarray) -> bytes:
+        """JPEG d'une image simulée (données brutes si Pillow est absent)"""
+        if not PIL_AVAILABLE:
+            return b"PHOTO_SIMULEE_" + str(datetime.now()).encode() + b"_" + image[::16, ::16].tobytes()
+        tampon = BytesIO()
+        Image.fromarray(image).save(tampon, format='JPEG', quality=self.qualite_jpeg)
+        return tampon.getvalue()
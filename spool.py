@@ -0,0 +1,529 @@
+"""
+Spool local (store-and-forward) pour les données capteurs
+Les mesures sont d'abord écrites sur la carte SD (SQLite en mode WAL),
+puis expédiées vers SQL Server par un thread en arrière-plan.
+Aucune donnée n'est perdue si le serveur est injoignable ou si le Pi perd l'alimentation.
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import Optional
+from db_connection import DatabaseConnection
+from caracteristiques_son import enregistrer_classification
+from hash_perceptuel import enregistrer_hash, en_bigint, depuis_bigint
+from miniatures import Miniatures, enregistrer_miniatures
+
+
+class SpoolLocal:
+    """File d'attente durable des données à envoyer (SQLite, append-only)"""
+
+    def __init__(self, chemin: str):
+        """
+        Ouvre (ou crée) le fichier de spool
+
+        Args:
+            chemin: Chemin du fichier SQLite (ex: 'spool/capture_son.db')
+        """
+        self.chemin = chemin
+        dossier = os.path.dirname(chemin)
+        if dossier:
+            os.makedirs(dossier, exist_ok=True)
+
+        self._verrou = threading.Lock()
+        self._connexion = sqlite3.connect(chemin, check_same_thread=False, isolation_level=None)
+
+        # WAL: les écritures de la boucle de mesure ne bloquent pas les lectures de l'expéditeur
+        # synchronous=FULL: chaque ajout est sur disque avant de rendre la main (coupure de courant)
+        self._connexion.execute("PRAGMA journal_mode=WAL")
+        self._connexion.execute("PRAGMA synchronous=FULL")
+
+        # AUTOINCREMENT: un id n'est jamais réutilisé, la progression d'envoi reste croissante
+        self._connexion.executescript("""
+            CREATE TABLE IF NOT EXISTS spool (
+                id              INTEGER PRIMARY KEY AUTOINCREMENT,
+                date_heure      TEXT    NOT NULL,
+                id_capteur      INTEGER NOT NULL,
+                id_salle        INTEGER NOT NULL,
+                mesure          REAL    NULL,
+                blob            BLOB    NULL,
+                type_evenement  TEXT    NULL,
+                description     TEXT    NULL,
+                ref_spool       INTEGER NULL,
+                classification  TEXT    NULL,
+                hash_perceptuel INTEGER NULL,
+                miniature       BLOB    NULL,
+                apercu          BLOB    NULL,
+                largeur_mini    INTEGER NULL,
+                hauteur_mini    INTEGER NULL
+            );
+            CREATE TABLE IF NOT EXISTS evenements_expedies (
+                id_spool        INTEGER PRIMARY KEY,
+                id_evenement    INTEGER NOT NULL,
+                date_expedition TEXT    NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS rejets (
+                id_spool        INTEGER PRIMARY KEY,
+                date_heure      TEXT    NOT NULL,
+                id_capteur      INTEGER NOT NULL,
+                id_salle        INTEGER NOT NULL,
+                mesure          REAL    NULL,
+                blob            BLOB    NULL,
+                type_evenement  TEXT    NULL,
+                description     TEXT    NULL,
+                erreur          TEXT    NOT NULL,
+                date_rejet      TEXT    NOT NULL
+            );
+        """)
+
+        # Spool créé avant la classification des épisodes
+        colonnes = {ligne[1] for ligne in self._connexion.execute("PRAGMA table_info(spool)")}
+        if "classification" not in colonnes:
+            self._connexion.execute("ALTER TABLE spool ADD COLUMN classification TEXT NULL")
+        # ... et avant le hash perceptuel des photos
+        if "hash_perceptuel" not in colonnes:
+            self._connexion.execute("ALTER TABLE spool ADD COLUMN hash_perceptuel INTEGER NULL")
+        # ... et avant les miniatures
+        for colonne, type_sql in (("miniature", "BLOB"), ("apercu", "BLOB"),
+                                  ("largeur_mini", "INTEGER"), ("hauteur_mini", "INTEGER")):
+            if colonne not in colonnes:
+                self._connexion.execute(f"ALTER TABLE spool ADD COLUMN {colonne} {type_sql} NULL")
+
+    def ajouter(self, date_heure: datetime, id_capteur: int, id_salle: int,
+                mesure: Optional[float] = None, blob: Optional[bytes] = None,
+                type_evenement: Optional[str] = None, description: Optional[str] = None,
+                ref_spool: Optional[int] = None, classification: Optional[dict] = None,
+                hash_perceptuel: Optional[int] = None, miniatures: Optional[Miniatures] = None) -> int:
+        """
+        Ajoute une donnée (et éventuellement son événement) au spool
+
+        Args:
+            date_heure: Heure d'acquisition de la donnée
+            id_capteur: ID du capteur
+            id_salle: ID de la salle
+            mesure: Valeur mesurée (optionnel)
+            blob: Photo ou vidéo (optionnel)
+            type_evenement: Type d'événement à créer avec la donnée (optionnel)
+            description: Description de l'événement; '{id_evenement}' y sera remplacé
+                         par l'ID serveur de l'événement de la ligne ref_spool
+            ref_spool: ID local d'une autre ligne du spool dont l'événement est référencé
+            classification: Classe de l'épisode BRUIT_FORT (caracteristiques_son.en_dict()),
+                            écrite dans ClassificationBruit avec l'événement
+            hash_perceptuel: Hash de la photo (hash_perceptuel.dhash()), écrit dans Donnees
+            miniatures: Miniature et aperçu de la photo ou vidéo, écrits dans MiniatureDonnee
+
+        Returns:
+            ID local de la ligne dans le spool
+        """
+        with self._verrou:
+            curseur = self._connexion.execute(
+                """INSERT INTO spool (date_heure, id_capteur, id_salle, mesure, blob,
+                                      type_evenement, description, ref_spool, classification,
+                                      hash_perceptuel, miniature, apercu, largeur_mini, hauteur_mini)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (date_heure.isoformat(), id_capteur, id_salle, mesure, blob,
+                 type_evenement, description, ref_spool,
+                 json.dumps(classification) if classification else None,
+                 None if hash_perceptuel is None else en_bigint(hash_perceptuel),
+                 *(miniatures or (None, None, None, None)))
+            )
+            return curseur.lastrowid
+
+    def lire_lot(self, taille_max: int = 100, octets_max: int = 8 * 1024 * 1024) -> list:
+        """
+        Lit les plus vieilles lignes en attente, dans l'ordre d'ajout
+
+        Args:
+            taille_max: Nombre maximal de lignes (défaut: 100)
+            octets_max: Taille cumulée maximale des BLOBs (défaut: 8 MB, au moins une ligne)
+
+        Returns:
+            Liste de dictionnaires (une entrée par ligne)
+        """
+        with self._verrou:
+            tailles = self._connexion.execute(
+                "SELECT id, IFNULL(LENGTH(blob), 0) FROM spool ORDER BY id LIMIT ?",
+                (taille_max,)
+            ).fetchall()
+
+            # Borner la mémoire: ne pas charger plusieurs vidéos d'un coup
+            dernier_id, total = None, 0
+            for id_spool, taille in tailles:
+                if dernier_id is not None and total + taille > octets_max:
+                    break
+                dernier_id, total = id_spool, total + taille
+
+            if dernier_id is None:
+                return []
+
+            lignes = self._connexion.execute(
+                """SELECT id, date_heure, id_capteur, id_salle, mesure, blob,
+                          type_evenement, description, ref_spool, classification,
+                          hash_perceptuel, miniature, apercu, largeur_mini, hauteur_mini
+                   FROM spool WHERE id <= ? ORDER BY id""",
+                (dernier_id,)
+            ).fetchall()
+
+        return [{
+            'id': ligne[0],
+            'date_heure': datetime.fromisoformat(ligne[1]),
+            'id_capteur': ligne[2],
+            'id_salle': ligne[3],
+            'mesure': ligne[4],
+            'blob': ligne[5],
+            'type_evenement': ligne[6],
+            'description': ligne[7],
+            'ref_spool': ligne[8],
+            'classification': json.loads(ligne[9]) if ligne[9] else None,
+            'hash_perceptuel': None if ligne[10] is None else depuis_bigint(ligne[10]),
+            'miniatures': Miniatures(*ligne[11:15]) if ligne[11] is not None else None
+        } for ligne in lignes]
+
+    def confirmer(self, dernier_id: int, evenements: Optional[dict] = None):
+        """
+        Retire du spool les lignes expédiées (id <= dernier_id)
+
+        Args:
+            dernier_id: Plus grand ID local confirmé par le serveur
+            evenements: {id_spool: id_evenement serveur} des lignes avec événement
+        """
+        maintenant = datetime.now().isoformat()
+        with self._verrou:
+            self._connexion.execute("BEGIN IMMEDIATE")
+            try:
+                if evenements:
+                    self._connexion.executemany(
+                        """INSERT OR REPLACE INTO evenements_expedies (id_spool, id_evenement, date_expedition)
+                           VALUES (?, ?, ?)""",
+                        [(id_spool, id_ev, maintenant) for id_spool, id_ev in evenements.items()]
+                    )
+                self._connexion.execute("DELETE FROM spool WHERE id <= ?", (dernier_id,))
+                self._connexion.execute("COMMIT")
+            except sqlite3.Error:
+                self._connexion.execute("ROLLBACK")
+                raise
+
+    def rejeter(self, id_spool: int, erreur: str):
+        """
+        Met de côté une ligne refusée par le serveur (table rejets), pour ne plus bloquer les suivantes
+
+        Args:
+            id_spool: ID local de la ligne refusée
+            erreur: Message d'erreur du serveur
+        """
+        with self._verrou:
+            self._connexion.execute("BEGIN IMMEDIATE")
+            try:
+                self._connexion.execute(
+                    """INSERT OR REPLACE INTO rejets (id_spool, date_heure, id_capteur, id_salle, mesure, blob,
+                                                     type_evenement, description, erreur, date_rejet)
+                       SELECT id, date_heure, id_capteur, id_salle, mesure, blob,
+                              type_evenement, description, ?, ?
+                       FROM spool WHERE id = ?""",
+                    (erreur, datetime.now().isoformat(), id_spool)
+                )
+                self._connexion.execute("DELETE FROM spool WHERE id = ?", (id_spool,))
+                self._connexion.execute("COMMIT")
+            except sqlite3.Error:
+                self._connexion.execute("ROLLBACK")
+                raise
+
+    def rejetes(self) -> int:
+        """Retourne le nombre de lignes mises de côté après un refus du serveur"""
+        with self._verrou:
+            return self._connexion.execute("SELECT COUNT(*) FROM rejets").fetchone()[0]
+
+    def id_evenement_expedie(self, id_spool: int) -> Optional[int]:
+        """Retourne l'ID serveur de l'événement créé pour une ligne déjà expédiée"""
+        with self._verrou:
+            ligne = self._connexion.execute(
+                "SELECT id_evenement FROM evenements_expedies WHERE id_spool = ?",
+                (id_spool,)
+            ).fetchone()
+        return ligne[0] if ligne else None
+
+    def purger_evenements(self, age_max: timedelta = timedelta(days=1)):
+        """Oublie les correspondances d'événements plus vieilles que age_max"""
+        limite = (datetime.now() - age_max).isoformat()
+        with self._verrou:
+            self._connexion.execute(
+                "DELETE FROM evenements_expedies WHERE date_expedition < ?", (limite,)
+            )
+
+    def en_attente(self) -> int:
+        """Retourne le nombre de lignes en attente d'expédition"""
+        with self._verrou:
+            return self._connexion.execute("SELECT COUNT(*) FROM spool").fetchone()[0]
+
+    def fermer(self):
+        """Ferme le fichier de spool"""
+        with self._verrou:
+            self._connexion.close()
+
+
+class ExpediteurSpool:
+    """Thread qui vide le spool vers SQL Server (lots, reconnexion, backoff exponentiel)"""
+
+    REQUETE_INSERTION = (
+        """INSERT INTO Donnees (dateHeure, idCapteur, mesure, photoBlob, noSalle)
+           VALUES (?, ?, ?, NULL, ?)"""
+    )
+
+    def __init__(self, spool: SpoolLocal, db_connection: DatabaseConnection,
+                 nom: Optional[str] = None, taille_lot: int = 100,
+                 delai_min: float = 1.0, delai_max: float = 60.0):
+        """
+        Initialise l'expéditeur
+
+        Args:
+            spool: Spool local à vider
+            db_connection: Connexion à la base de données
+            nom: Identifiant unique du spool côté serveur (défaut: hôte/fichier)
+            taille_lot: Nombre maximal de lignes par transaction (défaut: 100)
+            delai_min: Attente en secondes entre deux envois, et premier délai de reprise (défaut: 1)
+            delai_max: Délai de reprise maximal en secondes (défaut: 60)
+        """
+        self.spool = spool
+        self.db = db_connection
+        self.nom = nom or f"{socket.gethostname()}/{os.path.basename(spool.chemin)}"
+        self.taille_lot = taille_lot
+        self.delai_min = delai_min
+        self.delai_max = delai_max
+
+        self._arret = threading.Event()
+        self._thread = None
+        self._progression_verifiee = False
+
+        # Statistiques
+        self.compteur_expedies = 0
+        self.compteur_echecs = 0
+        self.compteur_rejets = 0
+
+    def demarrer(self):
+        """Démarre le thread d'expédition"""
+        if self._thread is not None:
+            return
+
+        self._arret.clear()
+        self._thread = threading.Thread(target=self._boucle, name="ExpediteurSpool", daemon=True)
+        self._thread.start()
+
+    def arreter(self):
+        """Arrête le thread d'expédition (les lignes restantes partiront au prochain démarrage)"""
+        if self._thread is not None:
+            self._arret.set()
+            self._thread.join()
+            self._thread = None
+
+        restant = self.spool.en_attente()
+        if restant:
+            print(f"⚠ {restant} donnée(s) en attente dans le spool "
+                  f"(envoyées au prochain démarrage)")
+        rejetes = self.spool.rejetes()
+        if rejetes:
+            print(f"⚠ {rejetes} donnée(s) refusée(s) par le serveur, gardées dans la table rejets "
+                  f"de {self.spool.chemin}")
+
+    def _boucle(self):
+        """Expédie les lots en continu; double l'attente après chaque échec"""
+        delai = self.delai_min
+        try:
+            while not self._arret.is_set():
+                resultat = self.expedier_lot()
+
+                if resultat is None:
+                    # Serveur injoignable: reprise avec backoff exponentiel
+                    self.compteur_echecs += 1
+                    print(f"⚠ Spool: envoi impossible, nouvel essai dans {delai:.0f}s "
+                          f"({self.spool.en_attente()} en attente)")
+                    self._arret.wait(delai)
+                    delai = min(delai * 2, self.delai_max)
+                    continue
+
+                delai = self.delai_min
+                if resultat == 0:
+                    self._arret.wait(self.delai_min)
+        finally:
+            self.db.liberer_connexion()
+
+    def _synchroniser_progression(self) -> bool:
+        """
+        Retire du spool local les lignes déjà validées par le serveur
+
+        Cas d'une coupure juste après le COMMIT serveur, avant le nettoyage local:
+        sans cette étape, ces lignes seraient envoyées deux fois.
+        """
+        # ISNULL: toujours une ligne si la requête réussit (liste vide = erreur)
+        resultat = self.db.execute_query(
+            """SELECT ISNULL((SELECT dernierIdSpool FROM SpoolProgression
+                              WHERE nomSpool = ?), 0)""",
+            (self.nom,)
+        )
+        if not resultat:
+            return False
+
+        self.spool.confirmer(resultat[0][0])
+        self._progression_verifiee = True
+        return True
+
+    def expedier_lot(self) -> Optional[int]:
+        """
+        Expédie le plus vieux lot du spool dans une seule transaction serveur
+
+        La progression (dernier ID local expédié) est écrite dans la même transaction
+        que les données: après un redémarrage, rien n'est renvoyé en double.
+
+        Si le serveur refuse des données (contrainte, trigger), le lot est renvoyé ligne par
+        ligne et les lignes refusées sont mises de côté: elles ne bloquent pas les suivantes.
+
+        Returns:
+            Nombre de lignes expédiées (0 si spool vide), None si échec
+        """
+        if not self._progression_verifiee and not self._synchroniser_progression():
+            return None
+
+        lot = self.spool.lire_lot(self.taille_lot)
+        if not lot:
+            return 0
+
+        evenements = {}
+        with self.db.transaction() as transaction:
+            if not self._envoyer_lot(lot, evenements):
+                self.db.rollback()
+
+        if not transaction.validee:
+            if self.db.est_rejet(transaction.erreur):
+                return self._isoler_rejets(lot)
+            # Le serveur a peut-être validé avant la coupure: relire SpoolProgression
+            # avant de renvoyer ce lot, sinon ses lignes seraient insérées deux fois
+            self._progression_verifiee = False
+            return None
+
+        self.spool.confirmer(lot[-1]['id'], evenements)
+        self.spool.purger_evenements()
+        self.compteur_expedies += len(lot)
+        return len(lot)
+
+    def _isoler_rejets(self, lot: list) -> Optional[int]:
+        """
+        Renvoie un lot refusé ligne par ligne; les lignes refusées vont dans la table rejets
+
+        Returns:
+            Nombre de lignes expédiées, None si la connexion est perdue avant la première
+        """
+        expedies, coupure = 0, False
+        for ligne in lot:
+            evenements = {}
+            with self.db.transaction() as transaction:
+                if not self._envoyer_lot([ligne], evenements):
+                    self.db.rollback()
+
+            if transaction.validee:
+                self.spool.confirmer(ligne['id'], evenements)
+                expedies += 1
+            elif self.db.est_rejet(transaction.erreur):
+                self.spool.rejeter(ligne['id'], str(transaction.erreur))
+                self.compteur_rejets += 1
+                print(f"✗ Spool: donnée {ligne['id']} refusée par le serveur, mise de côté: "
+                      f"{transaction.erreur}")
+            else:
+                self._progression_verifiee = False
+                coupure = True
+                break
+
+        self.compteur_expedies += expedies
+        return None if coupure and not expedies else expedies
+
+    def _envoyer_lot(self, lot: list, evenements: dict) -> bool:
+        """
+        Envoie les lignes d'un lot et la progression (appelé dans un bloc db.transaction())
+
+        Args:
+            lot: Lignes lues dans le spool
+            evenements: Rempli avec {ID local: ID de l'événement serveur}
+
+        Returns:
+            True si tout a été envoyé, False sinon
+        """
+        lignes_simples = []
+
+        def envoyer_lignes_simples() -> bool:
+            ok = self.db.execute_many(self.REQUETE_INSERTION, lignes_simples)
+            lignes_simples.clear()
+            return ok
+
+        for ligne in lot:
+            if ligne['type_evenement'] is None and ligne['blob'] is None:
+                # Mesure simple: regroupée avec les suivantes (fast_executemany)
+                lignes_simples.append((ligne['date_heure'], ligne['id_capteur'],
+                                       ligne['mesure'], ligne['id_salle']))
+                continue
+
+            if lignes_simples and not envoyer_lignes_simples():
+                return False
+
+            if ligne['type_evenement'] is None:
+                id_donnee = self.db.insert_donnee(ligne['date_heure'], ligne['id_capteur'], ligne['id_salle'],
+                                                  mesure=ligne['mesure'], blob=ligne['blob'])
+                if id_donnee is None:
+                    return False
+                if ligne['hash_perceptuel'] is not None and not enregistrer_hash(self.db, id_donnee,
+                                                                                 ligne['hash_perceptuel']):
+                    return False
+                if ligne['miniatures'] and not enregistrer_miniatures(self.db, id_donnee, ligne['miniatures']):
+                    return False
+                continue
+
+            description = ligne['description'] or ''
+            if ligne['ref_spool'] is not None:
+                id_ref = evenements.get(ligne['ref_spool'])
+                if id_ref is None:
+                    id_ref = self.spool.id_evenement_expedie(ligne['ref_spool'])
+                description = description.replace('{id_evenement}', str(id_ref if id_ref is not None else '?'))
+
+            ids = self.db.insert_donnee_avec_evenement(
+                ligne['date_heure'], ligne['id_capteur'], ligne['id_salle'],
+                ligne['type_evenement'], description,
+                mesure=ligne['mesure'], blob=ligne['blob']
+            )
+            if ids is None:
+                return False
+            evenements[ligne['id']] = ids[1]
+
+            if ligne['classification'] and not enregistrer_classification(self.db, ids[1],
+                                                                          ligne['classification']):
+                return False
+
+            if ligne['hash_perceptuel'] is not None and not enregistrer_hash(self.db, ids[0],
+                                                                             ligne['hash_perceptuel']):
+                return False
+
+            if ligne['miniatures'] and not enregistrer_miniatures(self.db, ids[0], ligne['miniatures']):
+                return False
+
+        if lignes_simples and not envoyer_lignes_simples():
+            return False
+
+        # Progression dans la même transaction que les données
+        # (INSERT conditionnel puis UPDATE: SQL portable entre SQL Server et SQLite)
+        dernier_id = lot[-1]['id']
+        maintenant = datetime.now()
+        if not self.db.execute_non_query(
+            """INSERT INTO SpoolProgression (nomSpool, dernierIdSpool, dateMaj)
+               SELECT ?, 0, ?
+               WHERE NOT EXISTS (SELECT 1 FROM SpoolProgression WHERE nomSpool = ?)""",
+            (self.nom, maintenant, self.nom)
+        ):
+            return False
+
+        if not self.db.execute_non_query(
+            """UPDATE SpoolProgression SET dernierIdSpool = ?, dateMaj = ?
+               WHERE nomSpool = ?""",
+            (dernier_id, maintenant, self.nom)
+        ):
+            return False
+
+        return True
@@ -0,0 +1,132 @@
+"""
+Suivi continu de la valeur au repos du micro (composante continue de l'ADC)
+Remplace la calibration unique au démarrage: moyenne mobile exponentielle sur les
+fenêtres calmes, sauvegardée dans un fichier pour repartir sans attendre
+"""
+
+import json
+import os
+import time
+from collections import deque
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+
+
+class SuiviRepos:
+    """Valeur au repos et bruit de fond du micro, affinés en continu sur les fenêtres calmes"""
+
+    def __init__(self, fichier: Optional[str] = None, repos_defaut: float = 512.0,
+                 alpha: float = 0.05, nb_historique: int = 60, facteur_calme: float = 1.5,
+                 intervalle_sauvegarde: float = 60.0):
+        """
+        Args:
+            fichier: Fichier JSON de la dernière calibration (None: pas de persistance)
+            repos_defaut: Valeur au repos si aucune calibration n'est connue (milieu de l'ADC)
+            alpha: Poids d'une nouvelle fenêtre calme dans la moyenne mobile (défaut: 0.05)
+            nb_historique: Fenêtres récentes servant à juger ce qui est calme (défaut: 60)
+            facteur_calme: Une fenêtre est calme si son écart-type ne dépasse pas la
+                           médiane récente multipliée par ce facteur (défaut: 1.5)
+            intervalle_sauvegarde: Secondes minimum entre deux sauvegardes (défaut: 60)
+        """
+        self.fichier = fichier
+        self.alpha = alpha
+        self.facteur_calme = facteur_calme
+        self.intervalle_sauvegarde = intervalle_sauvegarde
+
+        self.repos = float(repos_defaut)
+        self.bruit_fond = None          # Écart-type des fenêtres calmes (unités ADC)
+        self.nb_fenetres_calmes = 0
+        self.charge = False             # True si la calibration vient du fichier
+
+        self._ecarts_recents = deque(maxlen=nb_historique)
+        self._derniere_sauvegarde = time.monotonic()
+
+    @property
+    def est_calibre(self) -> bool:
+        """Vrai si la valeur au repos est fiable (fichier chargé ou assez de fenêtres calmes)"""
+        return self.charge or self.nb_fenetres_calmes >= 5
+
+    def charger(self) -> bool:
+        """
+        Reprend la dernière calibration sauvegardée
+
+        Returns:
+            True si le fichier a été lu, False sinon (valeurs par défaut conservées)
+        """
+        if not self.fichier or not os.path.exists(self.fichier):
+            return False
+
+        try:
+            with open(self.fichier, encoding='utf-8') as f:
+                donnees = json.load(f)
+            self.repos = float(donnees['repos'])
+            if donnees.get('bruit_fond') is not None:
+                self.bruit_fond = float(donnees['bruit_fond'])
+            self.charge = True
+            return True
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"⚠ Calibration du micro illisible ({self.fichier}): {e}")
+            return False
+
+    def sauvegarder(self) -> bool:
+        """
+        Écrit la calibration courante (fichier temporaire puis remplacement atomique)
+
+        Returns:
+            True si succès, False sinon
+        """
+        self._derniere_sauvegarde = time.monotonic()
+        if not self.fichier:
+            return False
+
+        donnees = {
+            'repos': round(self.repos, 3),
+            'bruit_fond': None if self.bruit_fond is None else round(self.bruit_fond, 3),
+            'date': datetime.now().isoformat(timespec='seconds')
+        }
+        temporaire = self.fichier + ".tmp"
+        try:
+            with open(temporaire, 'w', encoding='utf-8') as f:
+                json.dump(donnees, f)
+            os.replace(temporaire, self.fichier)
+            return True
+        except OSError as e:
+            print(f"⚠ Sauvegarde de la calibration du micro impossible: {e}")
+            return False
+
+    def ajouter(self, valeurs) -> bool:
+        """
+        Prend en compte une fenêtre d'échantillons
+
+        Seules les fenêtres calmes (écart-type proche de la médiane récente) affinent
+        la valeur au repos: un bruit fort ne la déplace pas. Le calme est relatif,
+        pour que le suivi continue quand le bruit de fond de la salle change.
+
+        Args:
+            valeurs: Échantillons bruts (0-1023)
+
+        Returns:
+            True si la fenêtre était calme et a été prise en compte
+        """
+        if len(valeurs) == 0:
+            return False
+
+        signal = np.asarray(valeurs, dtype=np.float32)
+        moyenne = float(signal.mean())
+        ecart = float(signal.std())
+
+        self._ecarts_recents.append(ecart)
+        if ecart > float(np.median(self._ecarts_recents)) * self.facteur_calme:
+            return False
+
+        # Démarrage sans fichier: moyenne simple des premières fenêtres (convergence rapide)
+        alpha = self.alpha if self.charge else max(self.alpha, 1.0 / (self.nb_fenetres_calmes + 1))
+        self.repos += alpha * (moyenne - self.repos)
+        self.bruit_fond = ecart if self.bruit_fond is None else self.bruit_fond + alpha * (ecart - self.bruit_fond)
+        self.nb_fenetres_calmes += 1
+
+        if time.monotonic() - self._derniere_sauvegarde >= self.intervalle_sauvegarde:
+            self.sauvegarder()
+        return True
@@ -3,25 +3,34 @@ Système de surveillance intelligente
 Capture du son en continu + enregistrement vidéo lors de bruit fort
 """
 
-import spidev
+import os
 import time
 from datetime import datetime
-from io import BytesIO
 from threading import Thread, Event
+from typing import Optional
 from db_connection import DatabaseConnection
-from config import DB_SERVER, DB_NAME, DB_USERNAME, DB_PASSWORD, ID_SALLE
-
-try:
-    import spidev
-    SPI_AVAILABLE = True
-except ImportError:
-    print("⚠ spidev non disponible - mode simulation")
-    SPI_AVAILABLE = False
+from spool import SpoolLocal, ExpediteurSpool
+from flux_blob import FluxBlob
+from db_stats import formater_stats
+from pipeline_son import PipelineSon
+from detection_episodes import DEBUT, SUITE
+from agregation import AgregateurMesures
+from cadence_adaptative import CadenceAdaptative
+from video_circulaire import VideoCirculaire, SortieMemoire
+from miniatures import Miniatures, creer_miniatures, enregistrer_miniatures
+from caracteristiques_son import Classification, en_dict, enregistrer_classification
+from config import (DB_SERVER, DB_NAME, DB_USERNAME, DB_PASSWORD, ID_SALLE,
+                    DB_POOL_MIN, DB_POOL_MAX, DB_POOL_TIMEOUT, SPOOL_ACTIF, SPOOL_DIR,
+                    BLOB_TAILLE_MORCEAU, DB_SEUIL_REQUETE_LENTE, DB_JOURNAL_REQUETES_LENTES,
+                    SEUIL_BRUIT_FORT, SEUIL_FIN_BRUIT_FORT,
+                    AGREGATS_ACTIFS, RETENTION_BRUTES_JOURS, CADENCE_ADAPTATIVE,
+                    CADENCE_INTERVALLE_MIN, CADENCE_INTERVALLE_MAX, CADENCE_MARGE_RAPIDE,
+                    CADENCE_MARGE_CALME, CLIP_AUDIO_ACTIF, CLASSIFICATION_ACTIVE, VIDEO_PRE_ROLL,
+                    VIDEO_IMAGES_PAR_SECONDE, VIDEO_DEBIT, MINIATURE_TAILLE,
+                    MINIATURE_TAILLE_APERCU, MINIATURE_QUALITE)
 
 try:
     from picamera2 import Picamera2
-    from picamera2.encoders import H264Encoder
-    from picamera2.outputs import FileOutput
     CAMERA_AVAILABLE = True
 except ImportError:
     print("⚠ picamera2 non disponible - mode simulation")
@@ -35,7 +44,12 @@ class SurveillanceIntelligente:
 
     def __init__(self, db_connection: DatabaseConnection, id_salle: int,
                  intervalle: int = 1, seuil_bruit_fort: float = 50.0,
-                 duree_video: int = 10):
+                 seuil_fin_bruit_fort: Optional[float] = None,
+                 duree_video: int = 10, pre_roll_video: float = 5.0,
+                 spool: Optional[SpoolLocal] = None,
+                 agregats: bool = False, retention_brutes: Optional[float] = None,
+                 cadence_adaptative: bool = False, clips_audio: bool = False,
+                 classification: bool = False):
         """
         Initialise le système de surveillance
 
@@ -43,18 +57,54 @@ class SurveillanceIntelligente:
             db_connection: Connexion à la base de données
             id_salle: ID de la salle à monitorer
             intervalle: Intervalle en secondes entre mesures son (défaut: 1)
-            seuil_bruit_fort: Seuil pour déclencher vidéo (défaut: 50.0)
-            duree_video: Durée de la vidéo en secondes (défaut: 10)
+            seuil_bruit_fort: Seuil qui ouvre un épisode BRUIT_FORT et déclenche la vidéo (défaut: 50.0)
+            seuil_fin_bruit_fort: Seuil sous lequel l'épisode se termine (défaut: seuil - 5)
+            duree_video: Secondes de vidéo enregistrées après le déclenchement (défaut: 10)
+            pre_roll_video: Secondes de vidéo gardées avant le déclenchement (défaut: 5)
+            spool: Spool local où écrire d'abord les données (None: envoi direct vers la BD)
+            agregats: True pour écrire aussi les agrégats du son par minute et par quart d'heure
+            retention_brutes: Jours de mesures brutes gardées en BD si agregats (None: toutes)
+            cadence_adaptative: True pour espacer les écritures quand la salle est calme
+                                et les resserrer près du seuil (voir cadence_adaptative)
+            clips_audio: True pour enregistrer un clip audio (avant et après le déclenchement)
+                         de chaque épisode, lié à un capteur AUDIO
+            classification: True pour classer chaque épisode (voix, claquement, ventilation)
+                            d'après le spectre des mesures (voir caracteristiques_son)
         """
         self.db = db_connection
         self.id_salle = id_salle
         self.intervalle = intervalle
         self.seuil_bruit_fort = seuil_bruit_fort
         self.duree_video = duree_video
+        self.pre_roll_video = pre_roll_video
+
+        # Store-and-forward: son et vidéos passent par la carte SD avant la BD
+        self.spool = spool
+        self.expediteur = ExpediteurSpool(spool, db_connection) if spool else None
+
+        # Chaîne audio commune (ADC, niveau, épisodes BRUIT_FORT, clips, classification)
+        # Une vidéo et un événement BRUIT_FORT par épisode, pas par mesure
+        self.son = PipelineSon(db_connection, id_salle, seuil_bruit_fort, seuil_fin_bruit_fort,
+                               spool=spool, clips_audio=clips_audio, classification=classification)
+        self.detecteur = self.son.detecteur
+
+        # Agrégats par minute et par quart d'heure (créés dans setup, avec l'ID du capteur)
+        self.agregats = agregats
+        self.retention_brutes = retention_brutes
+        self.agregateur = None
+
+        # Cadence des mesures: intervalle fixe, ou adaptée au niveau sonore
+        self.cadence = None
+        if cadence_adaptative:
+            self.cadence = CadenceAdaptative(seuil_bruit_fort, intervalle=intervalle,
+                                             intervalle_min=CADENCE_INTERVALLE_MIN,
+                                             intervalle_max=CADENCE_INTERVALLE_MAX,
+                                             marge_rapide=CADENCE_MARGE_RAPIDE,
+                                             marge_calme=CADENCE_MARGE_CALME)
 
         # Composants
-        self.spi = None
         self.camera = None
+        self.video = None  # Encodage continu dans un tampon circulaire (créé dans setup)
         self.id_capteur_bruit = None
         self.id_capteur_camera = None
 
@@ -62,13 +112,6 @@ class SurveillanceIntelligente:
         self.compteur_mesures = 0
         self.compteur_videos = 0
 
-        # Paramètres MCP3008
-        self.adc_channel = 0
-        self.spi_bus = 0
-        self.spi_device = 0
-        self.spi_speed = 1350000
-        self.valeur_repos = None
-
         # État d'enregistrement
         self.en_enregistrement = False
         self.stop_event = Event()
@@ -77,53 +120,22 @@ class SurveillanceIntelligente:
         """Configure tous les capteurs"""
         print("=== Configuration du système de surveillance intelligente ===\n")
 
-        # 1. Récupérer les IDs des capteurs
+        # 1. Capteur CAMERA
         try:
-            # Capteur BRUIT
-            capteur_bruit = self.db.execute_query(
-                "SELECT idCapteur_PK FROM Capteur WHERE type = 'BRUIT'"
-            )
-            if not capteur_bruit:
-                print("✗ Aucun capteur BRUIT trouvé")
-                return False
-            self.id_capteur_bruit = capteur_bruit[0][0]
-            print(f"✓ Capteur BRUIT trouvé - ID: {self.id_capteur_bruit}")
-
-            # Capteur CAMERA
-            capteur_camera = self.db.execute_query(
-                "SELECT idCapteur_PK FROM Capteur WHERE type = 'CAMERA'"
-            )
-            if not capteur_camera:
+            self.id_capteur_camera = self.db.references.premier_capteur('CAMERA')
+            if self.id_capteur_camera is None:
                 print("✗ Aucun capteur CAMERA trouvé")
                 return False
-            self.id_capteur_camera = capteur_camera[0][0]
             print(f"✓ Capteur CAMERA trouvé - ID: {self.id_capteur_camera}")
 
         except Exception as e:
             print(f"✗ Erreur récupération capteurs: {e}")
             return False
 
-        # 2. Initialiser MCP3008
-        if SPI_AVAILABLE:
-            try:
-                self.spi = spidev.SpiDev()
-                self.spi.open(self.spi_bus, self.spi_device)
-                self.spi.max_speed_hz = self.spi_speed
-                print(f"✓ MCP3008 initialisé (SPI {self.spi_bus}.{self.spi_device})")
-
-                # Calibration
-                if self.calibrer():
-                    print(f"✓ Calibration audio - Valeur repos: {self.valeur_repos}")
-                else:
-                    self.valeur_repos = 512
-                    print("⚠ Calibration par défaut")
-
-            except Exception as e:
-                print(f"✗ Erreur MCP3008: {e}")
-                return False
-        else:
-            print("⚠ Mode simulation - Pas de vrai MCP3008")
-            self.valeur_repos = 512
+        # 2. Capteur BRUIT, MCP3008 et acquisition continue (micro + capteurs analogiques)
+        if not self.son.demarrer():
+            return False
+        self.id_capteur_bruit = self.son.id_capteur_bruit
 
         # 3. Initialiser caméra
         if CAMERA_AVAILABLE:
@@ -132,92 +144,109 @@ class SurveillanceIntelligente:
                 # Configuration vidéo
                 video_config = self.camera.create_video_configuration(
                     main={"size": (1280, 720)},  # 720p
+                    controls={"FrameRate": VIDEO_IMAGES_PAR_SECONDE},
                     buffer_count=4
                 )
                 self.camera.configure(video_config)
-                print("✓ Pi Camera initialisée (720p)")
+
+                # La caméra filme en continu: chaque vidéo commence pre_roll_video secondes avant le bruit
+                self.video = VideoCirculaire(self.camera, pre_roll=self.pre_roll_video,
+                                             images_par_seconde=VIDEO_IMAGES_PAR_SECONDE,
+                                             debit=VIDEO_DEBIT)
+                self.video.demarrer()
+                print(f"✓ Pi Camera initialisée (720p, {self.pre_roll_video:g}s gardées en mémoire)")
 
             except Exception as e:
                 print(f"✗ Erreur caméra: {e}")
                 self.camera = None
+                self.video = None
         else:
             print("⚠ Mode simulation - Pas de vraie caméra")
 
+        # 4. Démarrer l'expédition du spool local
+        if self.expediteur:
+            self.expediteur.demarrer()
+            print(f"✓ Spool local: {self.spool.chemin} ({self.spool.en_attente()} en attente)")
+
+        if self.agregats:
+            self.agregateur = AgregateurMesures(self.db, self.id_capteur_bruit, self.id_salle,
+                                                retention_brutes=self.retention_brutes)
+            self.agregateur.demarrer()
+            retention = ("toutes" if self.retention_brutes is None
+                         else f"{self.retention_brutes} jour(s)")
+            print(f"✓ Agrégats 1 min / 15 min (mesures brutes gardées: {retention})")
+
         print("\n✓ Configuration terminée\n")
         return True
 
-    def read_adc(self, channel: int) -> int:
-        """Lit une valeur du MCP3008"""
-        if not SPI_AVAILABLE or self.spi is None:
-            import random
-            return random.randint(480, 550)
+    def enregistrer_mesure(self, date_heure: datetime, niveau_db: float,
+                           description: Optional[str] = None,
+                           classification: Optional[Classification] = None):
+        """
+        Écrit une mesure de son (spool local ou BD)
 
-        if channel < 0 or channel > 7:
-            return -1
+        Args:
+            date_heure: Heure d'acquisition
+            niveau_db: Niveau sonore
+            description: Résumé de l'épisode BRUIT_FORT qui se termine (None: mesure simple)
+            classification: Classe de l'épisode, écrite dans ClassificationBruit
 
-        try:
-            adc = self.spi.xfer2([1, (8 + channel) << 4, 0])
-            data = ((adc[1] & 3) << 8) + adc[2]
-            return data
-        except Exception as e:
-            return -1
+        Returns:
+            ID de la donnée (ou 'spool #id' si spoolée), None si erreur
+        """
+        if self.spool:
+            # Écriture locale: ne bloque pas la boucle si le serveur est injoignable
+            id_local = self.spool.ajouter(
+                date_heure, self.id_capteur_bruit, self.id_salle, mesure=niveau_db,
+                type_evenement='BRUIT_FORT' if description else None,
+                description=description,
+                classification=en_dict(classification) if classification else None
+            )
+            return f"spool #{id_local}"
+
+        if description:
+            # Événement et classification dans la même transaction
+            with self.db.transaction() as transaction:
+                ids = self.db.insert_donnee_avec_evenement(
+                    date_heure, self.id_capteur_bruit, self.id_salle,
+                    'BRUIT_FORT', description,
+                    mesure=niveau_db
+                )
+                if ids and classification:
+                    enregistrer_classification(self.db, ids[1], en_dict(classification))
+            return ids[0] if ids and transaction.validee else None
 
-    def calibrer(self) -> bool:
-        """Calibre le micro"""
-        print("⏳ Calibration audio... (2 secondes)")
-        try:
-            valeurs = []
-            for _ in range(20):
-                valeur = self.read_adc(self.adc_channel)
-                if valeur >= 0:
-                    valeurs.append(valeur)
-                time.sleep(0.1)
-
-            if valeurs:
-                self.valeur_repos = sum(valeurs) // len(valeurs)
-                return True
-            return False
-        except:
-            return False
+        return self.db.insert_donnee(
+            date_heure, self.id_capteur_bruit, self.id_salle, mesure=niveau_db
+        )
 
-    def mesurer_son(self) -> dict:
-        """Mesure le niveau sonore"""
-        nb_echantillons = 10
-        valeurs = []
+    def miniatures_video(self) -> Optional[Miniatures]:
+        """
+        Miniature d'une vidéo: image du flux main au moment du déclenchement
 
-        for _ in range(nb_echantillons):
-            valeur = self.read_adc(self.adc_channel)
-            if valeur >= 0:
-                valeurs.append(valeur)
-            time.sleep(0.01)
+        Le H.264 n'est pas décodé sur le Pi: l'image est prise sur le flux que l'encodeur
+        est en train de compresser (format XBGR8888 par défaut de la configuration vidéo).
 
-        if not valeurs:
+        Returns:
+            Miniatures, ou None sans caméra ou si la capture échoue
+        """
+        if not self.camera:
             return None
+        try:
+            image = self.camera.capture_array("main")
+        except Exception as e:
+            print(f"         ⚠ Miniature de la vidéo impossible: {e}")
+            return None
+        return creer_miniatures(image, MINIATURE_TAILLE, MINIATURE_TAILLE_APERCU, MINIATURE_QUALITE)
 
-        valeur_moyenne = sum(valeurs) // len(valeurs)
-        valeur_max = max(valeurs)
-        valeur_min = min(valeurs)
-        amplitude = valeur_max - valeur_min
-
-        voltage = (valeur_moyenne * 3.3) / 1023
-        difference = abs(valeur_moyenne - self.valeur_repos) if self.valeur_repos else 0
-        niveau_db = min(100, (amplitude / 10.23) * 10)
-
-        return {
-            'valeur_brute': valeur_moyenne,
-            'amplitude': amplitude,
-            'voltage': voltage,
-            'difference': difference,
-            'niveau_db': niveau_db
-        }
-
-    def enregistrer_video(self, id_evenement: int, niveau_db: float):
+    def enregistrer_video(self, niveau_db: float, debut_episode: datetime):
         """
         Enregistre une vidéo et l'envoie vers la BD
 
         Args:
-            id_evenement: ID de l'événement qui a déclenché l'enregistrement
             niveau_db: Niveau sonore qui a déclenché
+            debut_episode: Début de l'épisode de bruit fort (l'événement BRUIT_FORT
+                           n'est écrit qu'à la fin de l'épisode)
         """
         if self.en_enregistrement:
             print("         ⚠ Enregistrement déjà en cours, ignoré")
@@ -227,79 +256,88 @@ class SurveillanceIntelligente:
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 
         print(f"\n         🎬 ENREGISTREMENT VIDÉO DÉCLENCHÉ!")
-        print(f"         📹 Durée: {self.duree_video}s | Déclencheur: {niveau_db:.1f} dB")
+        print(f"         📹 Durée: {self.pre_roll_video:g}s + {self.duree_video}s | Déclencheur: {niveau_db:.1f} dB")
 
+        sortie = None
         try:
-            if CAMERA_AVAILABLE and self.camera:
-                # Enregistrer en mémoire (BytesIO)
-                video_buffer = BytesIO()
-
-                # Démarrer l'enregistrement
-                self.camera.start_recording(
-                    encoder=H264Encoder(),
-                    output=FileOutput(video_buffer)
-                )
-
-                # Enregistrer pendant la durée spécifiée
-                debut = time.time()
-                while time.time() - debut < self.duree_video:
-                    temps_restant = int(self.duree_video - (time.time() - debut))
-                    if temps_restant > 0 and temps_restant % 2 == 0:
-                        print(f"         ⏱ {temps_restant}s restantes...", end='\r')
-                    time.sleep(0.5)
-
-                # Arrêter l'enregistrement
-                self.camera.stop_recording()
-
-                # Récupérer les bytes de la vidéo
-                video_bytes = video_buffer.getvalue()
-                video_buffer.close()
-
-                print(f"         ✓ Vidéo capturée ({len(video_bytes)/1024:.1f} KB)      ")
+            date_heure = datetime.now()
+            description = (f'Vidéo {self.pre_roll_video + self.duree_video:g}s '
+                           f'({self.pre_roll_video:g}s avant le déclenchement) - Déclenchée par BRUIT_FORT '
+                           f'({niveau_db:.1f} dB) - Épisode du {debut_episode.strftime("%H:%M:%S")}')
+            miniatures = self.miniatures_video()
+
+            if self.spool:
+                # Le spool garde la vidéo entière sur la carte SD
+                sortie = SortieMemoire()
+            else:
+                # Créer la donnée (BLOB vide), l'événement CAPTURE et la miniature avant de filmer:
+                # la vidéo part ensuite en BD par morceaux pendant l'enregistrement
+                with self.db.transaction() as transaction:
+                    ids = self.db.insert_donnee_avec_evenement(
+                        date_heure, self.id_capteur_camera, self.id_salle,
+                        'CAPTURE', description,
+                        blob=b''
+                    )
+                    if ids and miniatures:
+                        enregistrer_miniatures(self.db, ids[0], miniatures)
+                if ids is None or not transaction.validee:
+                    raise RuntimeError("insertion de la vidéo refusée par la BD")
+                sortie = FluxBlob(self.db, ids[0], taille_morceau=BLOB_TAILLE_MORCEAU)
+
+            if self.video:
+                # Le tampon circulaire part aussitôt, puis la suite pendant duree_video secondes
+                if not self.video.enregistrer(sortie, self.duree_video):
+                    raise RuntimeError("encodeur vidéo arrêté")
+                print("         ✓ Vidéo capturée")
 
             else:
                 # Mode simulation
-                video_bytes = b"VIDEO_SIMULEE_" + timestamp.encode() + b"_" + str(self.duree_video).encode() + b"s"
+                sortie.write(b"VIDEO_SIMULEE_" + timestamp.encode() + b"_" + str(self.duree_video).encode() + b"s")
                 time.sleep(2)  # Simuler un enregistrement
-                print(f"         ✓ Vidéo simulée ({len(video_bytes)} bytes)")
+                print("         ✓ Vidéo simulée")
 
-            # Envoyer vers la BD
-            date_heure = datetime.now()
-            self.db.execute_non_query(
-                """INSERT INTO Donnees (dateHeure, idCapteur, mesure, photoBlob, noSalle)
-                   VALUES (?, ?, NULL, ?, ?)""",
-                (date_heure, self.id_capteur_camera, video_bytes, self.id_salle)
-            )
+            if self.spool:
+                video_bytes = sortie.contenu()
+                id_local = self.spool.ajouter(
+                    date_heure, self.id_capteur_camera, self.id_salle, blob=video_bytes,
+                    type_evenement='CAPTURE', description=description, miniatures=miniatures
+                )
+                self.compteur_videos += 1
+                print(f"         ✓ Vidéo mise en spool - ID local: {id_local} ({len(video_bytes)/1024:.1f} KB)")
+                print()
+                return
 
-            id_donnee = self.db.execute_query("SELECT @@IDENTITY AS id")[0][0]
-            self.compteur_videos += 1
+            # Attendre l'envoi des derniers morceaux
+            if not sortie.fermer():
+                raise RuntimeError(f"envoi de la vidéo {ids[0]} incomplet")
 
-            # Créer un événement
-            self.db.execute_non_query(
-                """INSERT INTO Evenement (type, idDonnee, description)
-                   VALUES (?, ?, ?)""",
-                ('CAPTURE', id_donnee,
-                 f'Vidéo {self.duree_video}s - Déclenchée par BRUIT_FORT ({niveau_db:.1f} dB) - Event ID: {id_evenement}')
-            )
+            self.compteur_videos += 1
 
-            print(f"         ✓ Vidéo enregistrée en BD - ID: {id_donnee}")
+            print(f"         ✓ Vidéo enregistrée en BD - ID: {ids[0]} ({sortie.octets_envoyes/1024:.1f} KB)")
             print()
 
         except Exception as e:
             print(f"         ✗ Erreur enregistrement vidéo: {e}\n")
 
         finally:
+            if isinstance(sortie, FluxBlob):
+                sortie.fermer()  # Arrête le thread d'envoi même après une erreur
             self.en_enregistrement = False
+            # Rendre la connexion de ce thread au pool pour la prochaine vidéo
+            self.db.liberer_connexion()
 
     def surveiller_en_continu(self):
         """Boucle principale de surveillance"""
         print("╔═══════════════════════════════════════════════════════════╗")
         print("║         Surveillance Intelligente - SalleSense           ║")
         print("╚═══════════════════════════════════════════════════════════╝\n")
-        print(f"🎤 Intervalle mesures: {self.intervalle}s")
+        print(f"🎤 Intervalle mesures: {self.intervalle}s"
+              + (f" (adaptatif: {self.cadence.intervalle_min:g}s à {self.cadence.intervalle_max:g}s)"
+                 if self.cadence else ""))
         print(f"🏢 Salle: {self.id_salle}")
-        print(f"📊 Seuil déclenchement: {self.seuil_bruit_fort} dB")
-        print(f"🎬 Durée vidéo: {self.duree_video}s")
+        print(f"📊 Seuil déclenchement: {self.seuil_bruit_fort} dB "
+              f"(fin sous {self.detecteur.seuil_sortie} dB)")
+        print(f"🎬 Durée vidéo: {self.pre_roll_video:g}s avant + {self.duree_video}s après le déclenchement")
         print(f"💾 Stockage: Base de données")
         print("\nAppuyez sur Ctrl+C pour arrêter\n")
         print("─" * 63)
@@ -307,47 +345,50 @@ class SurveillanceIntelligente:
         try:
             while not self.stop_event.is_set():
                 # Mesurer le son
-                mesure = self.mesurer_son()
+                mesure = self.son.mesurer()
 
                 if mesure:
-                    date_heure = datetime.now()
+                    date_heure = mesure['date_heure']
                     niveau_db = mesure['niveau_db']
 
-                    # Enregistrer la mesure de son
-                    self.db.execute_non_query(
-                        """INSERT INTO Donnees (dateHeure, idCapteur, mesure, photoBlob, noSalle)
-                           VALUES (?, ?, ?, NULL, ?)""",
-                        (date_heure, self.id_capteur_bruit, niveau_db, self.id_salle)
-                    )
-
-                    id_donnee = self.db.execute_query("SELECT @@IDENTITY AS id")[0][0]
-                    self.compteur_mesures += 1
-
-                    # Affichage
-                    heure = date_heure.strftime('%H:%M:%S')
-                    print(f"[{heure}] Son #{self.compteur_mesures:4d} | "
-                          f"Niveau: {niveau_db:5.1f} dB | "
-                          f"Amplitude: {mesure['amplitude']:4d} | "
-                          f"ID: {id_donnee}")
-
-                    # Si bruit fort : créer événement + déclencher vidéo
-                    if niveau_db > self.seuil_bruit_fort:
-                        # Créer événement BRUIT_FORT
-                        self.db.execute_non_query(
-                            """INSERT INTO Evenement (type, idDonnee, description)
-                               VALUES (?, ?, ?)""",
-                            ('BRUIT_FORT', id_donnee,
-                             f'Niveau sonore élevé: {niveau_db:.1f} dB (amplitude: {mesure["amplitude"]})')
+                    # Un seul événement BRUIT_FORT par épisode, écrit à sa fin avec son résumé
+                    transition, description, classification = self.son.suivre(mesure)
+                    if self.agregateur:
+                        self.agregateur.ajouter(date_heure, niveau_db)
+
+                    # Cadence adaptative: la mesure n'est écrite que si elle est due
+                    # (niveau écrit = Leq depuis la précédente écriture)
+                    niveau_envoi = niveau_db
+                    if self.cadence:
+                        niveau_envoi = self.cadence.ajouter(
+                            date_heure, niveau_db,
+                            incident=transition is not None or self.detecteur.en_cours
                         )
-                        id_evenement = self.db.execute_query("SELECT @@IDENTITY AS id")[0][0]
 
-                        print(f"         ⚠ BRUIT_FORT détecté! (Event ID: {id_evenement})")
+                    if niveau_envoi is not None:
+                        id_donnee = self.enregistrer_mesure(date_heure, niveau_envoi, description,
+                                                            classification)
+                        self.compteur_mesures += 1
+
+                        # Affichage
+                        heure = date_heure.strftime('%H:%M:%S')
+                        print(f"[{heure}] Son #{self.compteur_mesures:4d} | "
+                              f"Niveau: {niveau_envoi:5.1f} dB | "
+                              f"Amplitude: {mesure['amplitude']:4d} | "
+                              f"ID: {id_donnee}")
+                        if description:
+                            print(f"         ✓ {description}")
+
+                    # Début d'épisode (ou suite d'un épisode coupé): une seule vidéo par segment
+                    if transition in (DEBUT, SUITE):
+                        print(f"         ⚠ BRUIT_FORT détecté! ({niveau_db:.1f} dB)")
+                        debut_episode = self.detecteur.episode_en_cours().debut
 
                         # Lancer l'enregistrement vidéo dans un thread séparé
                         # pour ne pas bloquer la surveillance audio
                         video_thread = Thread(
                             target=self.enregistrer_video,
-                            args=(id_evenement, niveau_db)
+                            args=(niveau_db, debut_episode)
                         )
                         video_thread.daemon = True
                         video_thread.start()
@@ -356,23 +397,51 @@ class SurveillanceIntelligente:
                     print("✗ Échec mesure son")
 
                 # Attendre avant la prochaine mesure
-                time.sleep(self.intervalle)
+                time.sleep(self.cadence.attente if self.cadence else self.intervalle)
 
         except KeyboardInterrupt:
             print("\n\n─" * 63)
             print(f"\n📊 Statistiques de session:")
             print(f"   • Mesures audio: {self.compteur_mesures}")
+            if self.cadence:
+                print(f"   • Cadence adaptative: {self.cadence.resume()}")
             print(f"   • Vidéos enregistrées: {self.compteur_videos}")
+            if self.son.clips:
+                print(f"   • Clips audio: {self.son.clips.compteur_clips}")
+            if self.son.extracteur:
+                print(f"   • Caractéristiques spectrales: {self.son.extracteur.resume()}")
             print("\n✓ Arrêt demandé - Programme terminé")
 
     def cleanup(self):
         """Nettoie les ressources"""
         self.stop_event.set()
 
-        if self.spi:
+        # Un épisode en cours à l'arrêt est quand même enregistré
+        fin = self.son.terminer_episode()
+        if fin is not None:
+            episode, description, classification = fin
+            self.enregistrer_mesure(episode.fin, episode.crete, description, classification)
+
+        # Clips et ADC (micro et capteurs analogiques) arrêtés avant le spool qui reçoit leurs mesures
+        self.son.arreter()
+
+        # Écrire les fenêtres d'agrégats en cours (incomplètes)
+        if self.agregateur:
+            self.agregateur.arreter()
+            print(f"✓ Agrégats écrits: {self.agregateur.compteur_agregats}")
+
+        if self.expediteur:
+            self.expediteur.arreter()
+            self.spool.fermer()
+            print(f"✓ Spool: {self.expediteur.compteur_expedies} donnée(s) expédiée(s)")
+
+        # Temps passé par requête (diagnostic de lenteur)
+        print("\n📊 Requêtes SQL:")
+        print(formater_stats(self.db.stats()))
+
+        if self.video:
             try:
-                self.spi.close()
-                print("✓ SPI fermé")
+                self.video.arreter()
             except:
                 pass
 
@@ -391,20 +460,33 @@ def main():
     print("║    SalleSense - Surveillance Intelligente avec Vidéo     ║")
     print("╚═══════════════════════════════════════════════════════════╝\n")
 
-    # Connexion BD
-    db = DatabaseConnection(DB_SERVER, DB_NAME, DB_USERNAME, DB_PASSWORD)
+    # Connexion BD (pool partagé: le thread vidéo a sa propre connexion)
+    db = DatabaseConnection(DB_SERVER, DB_NAME, DB_USERNAME, DB_PASSWORD,
+                            pool_min=DB_POOL_MIN, pool_max=DB_POOL_MAX,
+                            pool_timeout=DB_POOL_TIMEOUT,
+                            seuil_requete_lente=DB_SEUIL_REQUETE_LENTE,
+                            journal_requetes_lentes=DB_JOURNAL_REQUETES_LENTES)
 
     if not db.connect():
         print("\n✗ Impossible de se connecter à la base de données")
         return 1
 
     # Créer le système de surveillance
-    # Paramètres: intervalle=1s, seuil=50dB, durée_vidéo=10s
+    # Paramètres: intervalle=1s, seuil=SEUIL_BRUIT_FORT (dB(A)), vidéo=VIDEO_PRE_ROLL s avant + 10s après
+    spool = SpoolLocal(os.path.join(SPOOL_DIR, "surveillance.db")) if SPOOL_ACTIF else None
     surveillance = SurveillanceIntelligente(
         db, ID_SALLE,
         intervalle=1,
-        seuil_bruit_fort=50.0,
-        duree_video=10
+        seuil_bruit_fort=SEUIL_BRUIT_FORT,
+        seuil_fin_bruit_fort=SEUIL_FIN_BRUIT_FORT,
+        duree_video=10,
+        pre_roll_video=VIDEO_PRE_ROLL,
+        spool=spool,
+        agregats=AGREGATS_ACTIFS,
+        retention_brutes=RETENTION_BRUTES_JOURS,
+        cadence_adaptative=CADENCE_ADAPTATIVE,
+        clips_audio=CLIP_AUDIO_ACTIF,
+        classification=CLASSIFICATION_ACTIVE
     )
 
     # Configuration
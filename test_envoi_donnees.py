@@ -39,25 +39,25 @@ def test_envoi_bruit():
         for i, niveau in enumerate(mesures, 1):
             print(f"\nMesure #{i}: {niveau} dB")
 
-            # Insérer la donnée
-            db.execute_non_query(
-                """INSERT INTO Donnees (dateHeure, idCapteur, mesure, photo, noSalle)
-                   VALUES (?, ?, ?, NULL, ?)""",
-                (datetime.now(), id_capteur_bruit, niveau, ID_SALLE)
-            )
-
-            # Récupérer l'ID de la donnée insérée
-            id_donnee = db.execute_query("SELECT @@IDENTITY AS id")[0][0]
-            print(f"  ✓ Donnée enregistrée - ID: {id_donnee}")
-
-            # Créer un événement si bruit fort
+            # Insérer la donnée (avec un événement si bruit fort)
             if niveau > 70:
-                db.execute_non_query(
-                    """INSERT INTO Evenement (type, idDonnee, description)
-                       VALUES (?, ?, ?)""",
-                    ('BRUIT_FORT', id_donnee, f'Niveau sonore élevé: {niveau} dB')
+                ids = db.insert_donnee_avec_evenement(
+                    datetime.now(), id_capteur_bruit, ID_SALLE,
+                    'BRUIT_FORT', f'Niveau sonore élevé: {niveau} dB',
+                    mesure=niveau
                 )
+                if ids is None:
+                    print("  ✗ Insertion de la donnée et de l'événement refusée")
+                    return False
+                id_donnee = ids[0]
+                print(f"  ✓ Donnée enregistrée - ID: {id_donnee}")
                 print(f"  ⚡ Événement BRUIT_FORT créé")
+            else:
+                id_donnee = db.insert_donnee(datetime.now(), id_capteur_bruit, ID_SALLE, mesure=niveau)
+                if id_donnee is None:
+                    print("  ✗ Insertion de la donnée refusée")
+                    return False
+                print(f"  ✓ Donnée enregistrée - ID: {id_donnee}")
 
             time.sleep(0.5)  # Pause entre les mesures
 
@@ -104,23 +104,17 @@ def test_envoi_photo():
 
         print(f"Photo simulée: {len(photo_bytes)} bytes")
 
-        # Insérer la donnée
-        db.execute_non_query(
-            """INSERT INTO Donnees (dateHeure, idCapteur, mesure, photoBlob, noSalle)
-               VALUES (?, ?, NULL, ?, ?)""",
-            (datetime.now(), id_capteur_camera, photo_bytes, ID_SALLE)
+        # Insérer la donnée et son événement en une transaction
+        ids = db.insert_donnee_avec_evenement(
+            datetime.now(), id_capteur_camera, ID_SALLE,
+            'CAPTURE', f'Photo capturée à {timestamp}',
+            blob=photo_bytes
         )
-
-        # Récupérer l'ID de la donnée insérée
-        id_donnee = db.execute_query("SELECT @@IDENTITY AS id")[0][0]
+        if ids is None:
+            print("✗ Insertion de la photo et de l'événement refusée")
+            return False
+        id_donnee = ids[0]
         print(f"✓ Donnée enregistrée - ID: {id_donnee}")
-
-        # Créer un événement
-        db.execute_non_query(
-            """INSERT INTO Evenement (type, idDonnee, description)
-               VALUES (?, ?, ?)""",
-            ('CAPTURE', id_donnee, f'Photo capturée à {timestamp}')
-        )
         print(f"⚡ Événement CAPTURE créé")
 
         print("\n✓ Test terminé avec succès!")
@@ -0,0 +1,115 @@
+"""
+Vidéo avec pré-déclenchement: la caméra encode en continu en H.264 dans un tampon
+circulaire en mémoire (CircularOutput de picamera2). Au déclenchement, les secondes
+déjà encodées partent en premier, puis l'enregistrement continue pendant le post-roll:
+la vidéo commence avant le bruit qui l'a déclenchée, sans redémarrer l'encodeur.
+"""
+
+import threading
+
+try:
+    from picamera2.encoders import H264Encoder
+    from picamera2.outputs import CircularOutput
+    CIRCULAIRE_AVAILABLE = True
+except ImportError:
+    CIRCULAIRE_AVAILABLE = False
+
+
+class SortieMemoire:
+    """Objet fichier qui garde la vidéo en mémoire, lisible après close() (contrairement à BytesIO)"""
+
+    def __init__(self):
+        self._morceaux = []
+        self.closed = False
+
+    def write(self, donnees) -> int:
+        self._morceaux.append(bytes(donnees))
+        return len(donnees)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def contenu(self) -> bytes:
+        """Octets écrits depuis la création"""
+        return b''.join(self._morceaux)
+
+
+class VideoCirculaire:
+    """
+    Encodage H.264 continu dans un tampon circulaire, vidé dans une sortie au déclenchement
+
+    Mémoire bornée: pre_roll secondes d'images encodées (environ 2.5 MB pour 5 s
+    en 720p à 4 Mbit/s). Une seule vidéo à la fois.
+    """
+
+    def __init__(self, camera, pre_roll: float = 5.0, images_par_seconde: int = 30,
+                 debit: int = 4000000):
+        """
+        Args:
+            camera: Picamera2 configurée en vidéo (non démarrée)
+            pre_roll: Secondes gardées avant le déclenchement (défaut: 5)
+            images_par_seconde: Cadence de la configuration vidéo (taille du tampon en images)
+            debit: Débit de l'encodeur H.264 en bit/s (défaut: 4 Mbit/s)
+        """
+        self.camera = camera
+        self.pre_roll = pre_roll
+        self.images_par_seconde = images_par_seconde
+        self.debit = debit
+
+        self._sortie = None  # CircularOutput, créée au démarrage
+        self._verrou = threading.Lock()
+        self._arret = threading.Event()
+        self.en_cours = False
+
+    def demarrer(self):
+        """Démarre la caméra et l'encodage continu dans le tampon circulaire"""
+        if self._sortie is not None:
+            return
+
+        # repeat: en-têtes SPS/PPS répétés devant chaque image clé, pour que la vidéo
+        # puisse commencer au milieu du flux; une image clé par seconde au plus
+        encodeur = H264Encoder(bitrate=self.debit, repeat=True, iperiod=self.images_par_seconde)
+        # Une seconde de plus: la vidéo commence à la plus vieille image clé du tampon
+        self._sortie = CircularOutput(buffersize=int((self.pre_roll + 1) * self.images_par_seconde))
+        self._arret.clear()
+        self.camera.start_recording(encodeur, self._sortie)
+
+    def arreter(self):
+        """Interrompt la vidéo en cours (écrite avec ce qui a été encodé) et arrête l'encodeur"""
+        self._arret.set()
+        with self._verrou:
+            if self._sortie is not None:
+                self.camera.stop_recording()
+                self._sortie = None
+
+    def enregistrer(self, fichier, post_roll: float) -> bool:
+        """
+        Écrit le tampon (pre_roll secondes) puis post_roll secondes de plus (appel bloquant)
+
+        Args:
+            fichier: Objet fichier (write/flush/close), fermé à la fin par picamera2
+            post_roll: Secondes enregistrées après le déclenchement
+
+        Returns:
+            True si la vidéo est écrite, False si l'encodeur est arrêté
+        """
+        with self._verrou:
+            if self._sortie is None:
+                return False
+            self.en_cours = True
+            self._sortie.fileoutput = fichier
+            self._sortie.start()  # Le tampon part à partir de sa plus vieille image clé
+
+        try:
+            self._arret.wait(post_roll)
+        finally:
+            with self._verrou:
+                if self._sortie is not None:
+                    self._sortie.stop()
+                elif not getattr(fichier, 'closed', False):
+                    fichier.close()
+                self.en_cours = False
+        return True
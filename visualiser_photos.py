@@ -3,9 +3,15 @@ Script pour visualiser les photos stockées dans la base de données
 """
 
 from db_connection import DatabaseConnection
-from config import DB_SERVER, DB_NAME, DB_USERNAME, DB_PASSWORD
+from config import DB_SERVER, DB_NAME, DB_USERNAME, DB_PASSWORD, BLOB_TAILLE_MORCEAU, PHOTO_DISTANCE_HAMMING_MAX
+from hash_perceptuel import depuis_bigint, regrouper
 from datetime import datetime
 import os
+from collections import namedtuple
+
+
+# Ligne extraite: ID de la donnée, contenu de la photo, heure de capture
+LignePhoto = namedtuple('LignePhoto', ['id_donnee', 'blob', 'date_heure'])
 
 
 def lister_photos():
@@ -77,20 +83,19 @@ def extraire_photo(id_donnee: int, nom_fichier: str = None):
         return
 
     try:
-        # Récupérer la photo
+        # Récupérer l'heure de la photo (le BLOB est lu à part, par morceaux)
         result = db.execute_query(
-            """SELECT photoBlob, dateHeure
+            """SELECT dateHeure
                FROM Donnees
-               WHERE idDonnee_PK = ?""",
+               WHERE idDonnee_PK = ? AND photoBlob IS NOT NULL""",
             (id_donnee,)
         )
 
-        if not result or not result[0][0]:
+        if not result:
             print(f"✗ Aucune photo trouvée avec l'ID {id_donnee}")
             return
 
-        photo_bytes = result[0][0]
-        date_heure = result[0][1]
+        date_heure = result[0][0]
 
         # Générer le nom de fichier si non fourni
         if not nom_fichier:
@@ -102,10 +107,12 @@ def extraire_photo(id_donnee: int, nom_fichier: str = None):
         chemin_complet = os.path.join("photos_extraites", nom_fichier)
 
         # Sauvegarder la photo
-        with open(chemin_complet, 'wb') as f:
-            f.write(photo_bytes)
+        taille = db.download_blob(id_donnee, chemin_complet, BLOB_TAILLE_MORCEAU)
+        if taille is None:
+            print(f"✗ Aucune photo trouvée avec l'ID {id_donnee}")
+            return
 
-        taille_kb = len(photo_bytes) / 1024
+        taille_kb = taille / 1024
         print(f"✓ Photo extraite: {chemin_complet} ({taille_kb:.1f} KB)")
 
     except Exception as e:
@@ -127,8 +134,8 @@ def extraire_toutes_photos():
         return
 
     try:
-        # Récupérer toutes les photos
-        photos = db.execute_query("""
+        # Parcourir les photos une à une: jamais plus d'une photo en mémoire
+        photos = db.iter_query("""
             SELECT
                 d.idDonnee_PK,
                 d.photoBlob,
@@ -136,33 +143,84 @@ def extraire_toutes_photos():
             FROM Donnees d
             WHERE d.photoBlob IS NOT NULL
             ORDER BY d.dateHeure DESC
-        """)
-
-        if not photos:
-            print("Aucune photo trouvée")
-            return
+        """, chunk_size=1, ligne=LignePhoto)
 
         # Créer le dossier
         os.makedirs("photos_extraites", exist_ok=True)
 
-        print(f"Extraction de {len(photos)} photo(s)...\n")
+        print("Extraction des photos...\n")
 
+        nb_photos = 0
         for photo in photos:
-            id_donnee = photo[0]
-            photo_bytes = photo[1]
-            date_heure = photo[2]
-
-            timestamp = date_heure.strftime("%Y%m%d_%H%M%S")
-            nom_fichier = f"photo_{id_donnee}_{timestamp}.jpg"
+            timestamp = photo.date_heure.strftime("%Y%m%d_%H%M%S")
+            nom_fichier = f"photo_{photo.id_donnee}_{timestamp}.jpg"
             chemin_complet = os.path.join("photos_extraites", nom_fichier)
 
             with open(chemin_complet, 'wb') as f:
-                f.write(photo_bytes)
+                f.write(photo.blob)
 
-            taille_kb = len(photo_bytes) / 1024
+            taille_kb = len(photo.blob) / 1024
             print(f"  ✓ {nom_fichier} ({taille_kb:.1f} KB)")
+            nb_photos += 1
 
-        print(f"\n✓ {len(photos)} photo(s) extraite(s) dans le dossier 'photos_extraites/'")
+        if nb_photos == 0:
+            print("Aucune photo trouvée")
+            return
+
+        print(f"\n✓ {nb_photos} photo(s) extraite(s) dans le dossier 'photos_extraites/'")
+
+    except Exception as e:
+        print(f"✗ Erreur: {e}")
+
+    finally:
+        db.disconnect()
+
+
+def regrouper_doublons(distance_max: int = PHOTO_DISTANCE_HAMMING_MAX):
+    """
+    Regroupe les photos consécutives presque identiques (hash perceptuel, sans lire les photos)
+
+    Args:
+        distance_max: Distance de Hamming maximale entre deux photos d'un groupe
+    """
+
+    print("\n=== Photos presque identiques ===\n")
+
+    db = DatabaseConnection(DB_SERVER, DB_NAME, DB_USERNAME, DB_PASSWORD)
+
+    if not db.connect():
+        print("✗ Impossible de se connecter à la base de données")
+        return
+
+    try:
+        # Seulement les hash: aucun BLOB n'est transféré
+        photos = db.execute_query("""
+            SELECT idDonnee_PK, dateHeure, noSalle, hashPerceptuel
+            FROM Donnees
+            WHERE hashPerceptuel IS NOT NULL
+            ORDER BY noSalle, dateHeure
+        """)
+
+        if not photos:
+            print("Aucune photo avec hash perceptuel (photos prises avant hashPerceptuel.sql?)")
+            return
+
+        groupes = []
+        for salle in dict.fromkeys(photo[2] for photo in photos):
+            photos_salle = [photo for photo in photos if photo[2] == salle]
+            indices = regrouper([depuis_bigint(photo[3]) for photo in photos_salle], distance_max)
+            groupes.extend([photos_salle[i] for i in groupe] for groupe in indices)
+
+        doublons = [groupe for groupe in groupes if len(groupe) > 1]
+        print(f"{len(photos)} photo(s), {len(groupes)} scène(s) différente(s), "
+              f"{len(doublons)} groupe(s) de doublons\n")
+        print("─" * 80)
+
+        for groupe in doublons:
+            print(f"Salle {groupe[0][2]} | {groupe[0][1]} → {groupe[-1][1]} | {len(groupe):3d} photos | "
+                  f"IDs: {', '.join(str(photo[0]) for photo in groupe)}")
+
+        print("─" * 80)
 
     except Exception as e:
         print(f"✗ Erreur: {e}")
@@ -180,7 +238,8 @@ def menu():
         print("\n1. Lister toutes les photos")
         print("2. Extraire une photo (par ID)")
         print("3. Extraire toutes les photos")
-        print("4. Quitter")
+        print("4. Regrouper les photos presque identiques")
+        print("5. Quitter")
         print()
 
         choix = input("Votre choix: ").strip()
@@ -199,6 +258,9 @@ def menu():
             extraire_toutes_photos()
 
         elif choix == "4":
+            regrouper_doublons()
+
+        elif choix == "5":
             print("\nAu revoir!\n")
             break
 
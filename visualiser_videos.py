@@ -3,8 +3,13 @@ Script pour visualiser et extraire les vidéos stockées dans la base de donnée
 """
 
 from db_connection import DatabaseConnection
-from config import DB_SERVER, DB_NAME, DB_USERNAME, DB_PASSWORD
+from config import DB_SERVER, DB_NAME, DB_USERNAME, DB_PASSWORD, BLOB_TAILLE_MORCEAU
 import os
+from collections import namedtuple
+
+
+# Vidéo à extraire: ID de la donnée, heure de capture
+LigneVideo = namedtuple('LigneVideo', ['id_donnee', 'date_heure'])
 
 
 def lister_videos():
@@ -94,24 +99,24 @@ def extraire_video(id_donnee: int, nom_fichier: str = None):
         return
 
     try:
-        # Récupérer la vidéo
+        # Récupérer l'heure et la taille de la vidéo (le BLOB est lu à part, par morceaux)
         result = db.execute_query(
-            """SELECT photoBlob, dateHeure
+            """SELECT dateHeure, DATALENGTH(photoBlob)
                FROM Donnees
                WHERE idDonnee_PK = ?""",
             (id_donnee,)
         )
 
-        if not result or not result[0][0]:
+        if not result or not result[0][1]:
             print(f"✗ Aucune vidéo trouvée avec l'ID {id_donnee}")
             return
 
-        video_bytes = result[0][0]
-        date_heure = result[0][1]
+        date_heure = result[0][0]
+        taille_video = result[0][1]
 
         # Vérifier la taille
-        if len(video_bytes) < 100:
-            print(f"⚠ Attention: fichier très petit ({len(video_bytes)} bytes)")
+        if taille_video < 100:
+            print(f"⚠ Attention: fichier très petit ({taille_video} bytes)")
             print("  Cela pourrait être une simulation, pas une vraie vidéo")
 
         # Générer le nom de fichier si non fourni
@@ -124,10 +129,11 @@ def extraire_video(id_donnee: int, nom_fichier: str = None):
         chemin_complet = os.path.join("videos_extraites", nom_fichier)
 
         # Sauvegarder la vidéo
-        with open(chemin_complet, 'wb') as f:
-            f.write(video_bytes)
+        if db.download_blob(id_donnee, chemin_complet, BLOB_TAILLE_MORCEAU) is None:
+            print(f"✗ Extraction de la vidéo {id_donnee} impossible")
+            return
 
-        taille_kb = len(video_bytes) / 1024
+        taille_kb = taille_video / 1024
         taille_mb = taille_kb / 1024
 
         if taille_mb > 1:
@@ -138,7 +144,7 @@ def extraire_video(id_donnee: int, nom_fichier: str = None):
         print(f"✓ Vidéo extraite: {chemin_complet} ({taille_str})")
 
         # Si c'est un vrai fichier H.264, donner des instructions
-        if len(video_bytes) > 1000:
+        if taille_video > 1000:
             print("\n📹 Pour lire la vidéo H.264:")
             print(f"   vlc {chemin_complet}")
             print(f"   # ou")
@@ -165,11 +171,10 @@ def extraire_toutes_videos():
         return
 
     try:
-        # Récupérer toutes les vidéos
-        videos = db.execute_query("""
+        # Liste des vidéos sans leur contenu: chaque vidéo est ensuite lue par morceaux
+        videos = [LigneVideo._make(ligne) for ligne in db.execute_query("""
             SELECT
                 d.idDonnee_PK,
-                d.photoBlob,
                 d.dateHeure
             FROM Donnees d
             JOIN Capteur c ON d.idCapteur = c.idCapteur_PK
@@ -177,30 +182,25 @@ def extraire_toutes_videos():
               AND c.type = N'CAMERA'
               AND DATALENGTH(d.photoBlob) > 100
             ORDER BY d.dateHeure DESC
-        """)
-
-        if not videos:
-            print("Aucune vidéo trouvée")
-            return
+        """)]
 
         # Créer le dossier
         os.makedirs("videos_extraites", exist_ok=True)
 
-        print(f"Extraction de {len(videos)} vidéo(s)...\n")
+        print("Extraction des vidéos...\n")
 
+        nb_videos = 0
         for video in videos:
-            id_donnee = video[0]
-            video_bytes = video[1]
-            date_heure = video[2]
-
-            timestamp = date_heure.strftime("%Y%m%d_%H%M%S")
-            nom_fichier = f"video_{id_donnee}_{timestamp}.h264"
+            timestamp = video.date_heure.strftime("%Y%m%d_%H%M%S")
+            nom_fichier = f"video_{video.id_donnee}_{timestamp}.h264"
             chemin_complet = os.path.join("videos_extraites", nom_fichier)
 
-            with open(chemin_complet, 'wb') as f:
-                f.write(video_bytes)
+            taille = db.download_blob(video.id_donnee, chemin_complet, BLOB_TAILLE_MORCEAU)
+            if taille is None:
+                print(f"  ✗ {nom_fichier} non extraite")
+                continue
 
-            taille_kb = len(video_bytes) / 1024
+            taille_kb = taille / 1024
             taille_mb = taille_kb / 1024
 
             if taille_mb > 1:
@@ -209,8 +209,13 @@ def extraire_toutes_videos():
                 taille_str = f"{taille_kb:.1f} KB"
 
             print(f"  ✓ {nom_fichier} ({taille_str})")
+            nb_videos += 1
+
+        if nb_videos == 0:
+            print("Aucune vidéo trouvée")
+            return
 
-        print(f"\n✓ {len(videos)} vidéo(s) extraite(s) dans 'videos_extraites/'")
+        print(f"\n✓ {nb_videos} vidéo(s) extraite(s) dans 'videos_extraites/'")
 
         # Instructions
         print("\n📹 Pour lire les vidéos:")
@@ -240,7 +245,7 @@ def afficher_historique_evenements():
 
     try:
         # Récupérer les événements BRUIT_FORT et leurs vidéos associées
-        historique = db.execute_query("""
+        historique = db.iter_query("""
             SELECT
                 e1.idEvenement_PK,
                 d1.dateHeure AS date_bruit,
@@ -255,16 +260,13 @@ def afficher_historique_evenements():
             LEFT JOIN Donnees d2 ON e2.idDonnee = d2.idDonnee_PK
             WHERE e1.type = N'BRUIT_FORT'
             ORDER BY d1.dateHeure DESC
-        """)
+        """, chunk_size=200)
 
-        if not historique:
-            print("Aucun événement BRUIT_FORT trouvé")
-            return
-
-        print(f"Total: {len(historique)} événement(s)\n")
         print("─" * 100)
 
+        nb_evenements = 0
         for event in historique:
+            nb_evenements += 1
             id_event = event[0]
             date_bruit = event[1]
             desc_bruit = event[2]
@@ -284,7 +286,12 @@ def afficher_historique_evenements():
 
             print()
 
+        if nb_evenements == 0:
+            print("Aucun événement BRUIT_FORT trouvé")
+            return
+
         print("─" * 100)
+        print(f"Total: {nb_evenements} événement(s)")
 
     except Exception as e:
         print(f"✗ Erreur: {e}")